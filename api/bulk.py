@@ -0,0 +1,223 @@
+"""
+Bulk create, update and delete of events.
+
+An upsert takes a list of events. An item with an ``id`` updates that event.
+An item with an ``external_id`` updates the user's event with that external
+id, or creates it. Any other item creates a new event. The events to update
+are loaded with one query per batch of ids, the items are validated without
+queries, and all writes run in one transaction through bulk_create and
+bulk_update. Invalid items are reported in the results and skipped; they
+don't stop the rest of the request.
+
+bulk_create and bulk_update don't send model signals, so the discovery feed
+is invalidated once after the transaction commits.
+"""
+from typing import Dict, List, Tuple
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import serializers
+
+from events.models import Event
+from events.utils import discovery
+from .serializers import EventSerializer
+
+LOOKUP_BATCH = 500
+WRITE_BATCH = 500
+# bulk_update writes one CASE expression per field, which databases evaluate
+# row by row, so its cost grows with the square of the batch size
+UPDATE_BATCH = 100
+
+
+def max_items() -> int:
+    return getattr(settings, 'API_BULK_MAX_ITEMS', 1000)
+
+
+def _check_list(data, name='events') -> None:
+    if not isinstance(data, list):
+        raise serializers.ValidationError({'non_field_errors': [f'Expected a list of {name}.']})
+    if len(data) > max_items():
+        raise serializers.ValidationError(
+            {'non_field_errors': [f'At most {max_items()} {name} per request, got {len(data)}.']}
+        )
+
+
+def _in_batches(queryset, lookup: str, values: List) -> List[Event]:
+    found = []
+    for offset in range(0, len(values), LOOKUP_BATCH):
+        found.extend(queryset.filter(**{f'{lookup}__in': values[offset:offset + LOOKUP_BATCH]}))
+    return found
+
+
+class BulkEventListSerializer(serializers.ListSerializer):
+    """
+    Validates a list of events one item at a time, keeping the valid ones.
+
+    ``existing`` maps item positions to the events they update; those items
+    are validated as partial updates. ``validated_data`` is a list of
+    ``(data, errors)`` pairs in item order.
+    """
+
+    def __init__(self, *args, existing=None, **kwargs):
+        self.existing = existing or {}
+        super().__init__(*args, **kwargs)
+
+    def to_internal_value(self, data):
+        _check_list(data)
+        results = []
+        for position, item in enumerate(data):
+            # Fields read ``partial`` from the root serializer, which is this one
+            self.partial = position in self.existing
+            self.child.instance = self.existing.get(position)
+            try:
+                results.append((self.child.run_validation(item), None))
+            except serializers.ValidationError as e:
+                results.append((None, e.detail))
+        self.partial = False
+        self.child.instance = None
+        return results
+
+
+def _match_existing(user, items: List) -> Tuple[Dict[int, Event], Dict[int, Dict]]:
+    """Find the events that items update; returns ``(existing, errors)`` keyed by item position."""
+    ids, external_ids = {}, {}
+    errors = {}
+    for position, item in enumerate(items):
+        if not isinstance(item, dict):
+            continue
+        key, seen = ('id', ids) if item.get('id') is not None else ('external_id', external_ids)
+        value = item.get(key)
+        if key == 'external_id' and not value:
+            continue
+        if not isinstance(value, (str, int)) or isinstance(value, bool):
+            errors[position] = {key: ['Must be a string or an integer.']}
+        elif value in seen:
+            errors[position] = {key: [f'Duplicate of item {seen[value]}.']}
+        else:
+            seen[value] = position
+
+    queryset = Event.objects.filter(user=user)
+    by_id = {event.pk: event for event in _in_batches(queryset, 'pk', [
+        value for value in ids if isinstance(value, int) or str(value).isdigit()
+    ])}
+    by_external_id = {event.external_id: event for event in _in_batches(
+        queryset.exclude(external_id=''), 'external_id', [str(value) for value in external_ids]
+    )}
+
+    existing = {}
+    for value, position in ids.items():
+        event = by_id.get(int(value)) if str(value).isdigit() else None
+        if event is None:
+            errors[position] = {'id': ['Not found.']}
+        else:
+            existing[position] = event
+    for value, position in external_ids.items():
+        if str(value) in by_external_id:
+            existing[position] = by_external_id[str(value)]
+    return existing, errors
+
+
+def upsert_events(user, items, context=None) -> Dict:
+    """Create or update ``items`` for ``user``; returns per-item results and counts."""
+    _check_list(items)
+    existing, errors = _match_existing(user, items)
+    serializer = BulkEventListSerializer(
+        child=EventSerializer(), data=items, existing=existing, context=context or {}
+    )
+    serializer.is_valid(raise_exception=True)
+
+    results = []
+    to_create, to_update = [], []
+    update_fields = set()
+    now = timezone.now()
+    for position, (data, item_errors) in enumerate(serializer.validated_data):
+        item_errors = errors.get(position) or item_errors
+        if item_errors:
+            results.append({'index': position, 'status': 'invalid', 'errors': item_errors})
+            continue
+        event = existing.get(position)
+        if event is None:
+            event = Event(user=user, **data)
+            to_create.append(event)
+            results.append({'index': position, 'status': 'created', 'event': event})
+        else:
+            changed = [name for name, value in data.items() if getattr(event, name) != value]
+            if not changed:
+                # Nightly syncs resend mostly unchanged events; they cost no write
+                results.append({'index': position, 'status': 'unchanged', 'event': event})
+                continue
+            for name in changed:
+                setattr(event, name, data[name])
+            # bulk_update doesn't apply auto_now
+            event.updated_at = now
+            update_fields.update(changed)
+            to_update.append(event)
+            results.append({'index': position, 'status': 'updated', 'event': event})
+
+    try:
+        if to_create or to_update:
+            with transaction.atomic():
+                Event.objects.bulk_create(to_create, batch_size=WRITE_BATCH)
+                if to_update:
+                    Event.objects.bulk_update(to_update, sorted(update_fields | {'updated_at'}),
+                                              batch_size=UPDATE_BATCH)
+                transaction.on_commit(discovery.invalidate)
+    except IntegrityError:
+        # Only possible when an update by id takes an external_id another event already has
+        raise serializers.ValidationError({'non_field_errors': ['An external_id is already used by another event.']})
+
+    for result in results:
+        event = result.pop('event', None)
+        if event is not None:
+            result['id'] = event.pk
+            result['external_id'] = event.external_id
+    return {
+        'created': len(to_create),
+        'updated': len(to_update),
+        'unchanged': sum(1 for result in results if result['status'] == 'unchanged'),
+        'invalid': sum(1 for result in results if result['status'] == 'invalid'),
+        'results': results,
+    }
+
+
+def delete_events(user, data) -> Dict:
+    """Delete the user's events listed by ``ids`` and/or ``external_ids``; returns per-item results."""
+    if not isinstance(data, dict):
+        raise serializers.ValidationError({'non_field_errors': ['Expected an object with ids and/or external_ids.']})
+    ids, external_ids = data.get('ids', []), data.get('external_ids', [])
+    _check_list(ids, 'ids')
+    _check_list(external_ids, 'external_ids')
+    if len(ids) + len(external_ids) > max_items():
+        raise serializers.ValidationError({'non_field_errors': [f'At most {max_items()} events per request.']})
+    if not all(isinstance(value, int) and not isinstance(value, bool) for value in ids):
+        raise serializers.ValidationError({'ids': ['Expected a list of integers.']})
+    if not all(isinstance(value, str) and value for value in external_ids):
+        raise serializers.ValidationError({'external_ids': ['Expected a list of non-empty strings.']})
+
+    queryset = Event.objects.filter(user=user)
+    with transaction.atomic():
+        found_ids = {pk for pk, in _values(queryset, 'pk', ids)}
+        found_external = dict(_values(queryset.exclude(external_id=''), 'external_id', external_ids, 'pk'))
+        to_delete = found_ids | set(found_external.values())
+        for offset in range(0, len(to_delete), LOOKUP_BATCH):
+            queryset.filter(pk__in=sorted(to_delete)[offset:offset + LOOKUP_BATCH]).delete()
+
+    results = [{'id': pk, 'status': 'deleted' if pk in found_ids else 'not_found'} for pk in ids]
+    results += [
+        {'external_id': value, 'status': 'deleted' if value in found_external else 'not_found'}
+        for value in external_ids
+    ]
+    return {
+        'deleted': len(to_delete),
+        'not_found': sum(1 for result in results if result['status'] == 'not_found'),
+        'results': results,
+    }
+
+
+def _values(queryset, lookup: str, values: List, *extra) -> List[tuple]:
+    rows = []
+    for offset in range(0, len(values), LOOKUP_BATCH):
+        batch = queryset.filter(**{f'{lookup}__in': values[offset:offset + LOOKUP_BATCH]})
+        rows.extend(batch.values_list(lookup, *extra))
+    return rows
@@ -0,0 +1,131 @@
+"""
+The event changes feed: what changed in a user's events since a cursor.
+
+Changes come from two streams, both read through an index on
+``(user, timestamp, id)``: events ordered by ``(updated_at, id)`` and
+tombstones of deleted events ordered by ``(deleted_at, id)``. A cursor holds
+the timestamp of the last change returned plus the last event and tombstone
+ids returned at that timestamp. Each page is therefore two index range scans
+whatever the size of the user's calendar.
+
+Changes from the last EVENT_CHANGES_SETTLE_SECONDS are held back. A
+transaction that is still open may commit a change with an earlier
+``updated_at`` than changes already returned, and a cursor past it would
+skip it. Cursors older than EVENT_TOMBSTONE_RETENTION_DAYS are refused,
+because the tombstones they would need may have been pruned.
+"""
+import base64
+import binascii
+import json
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from events.models import Event, EventTombstone
+
+
+class CursorError(ValueError):
+    pass
+
+
+class CursorExpired(CursorError):
+    pass
+
+
+def retention() -> timedelta:
+    return timedelta(days=getattr(settings, 'EVENT_TOMBSTONE_RETENTION_DAYS', 90))
+
+
+def encode_cursor(timestamp: datetime, event_id: int = 0, tombstone_id: int = 0) -> str:
+    payload = json.dumps({'t': timestamp.isoformat(), 'e': event_id, 'd': tombstone_id}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str):
+    """Returns ``(timestamp, event_id, tombstone_id)``."""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        timestamp = datetime.fromisoformat(payload['t'])
+        event_id, tombstone_id = int(payload['e']), int(payload['d'])
+    except (binascii.Error, ValueError, TypeError, KeyError, AttributeError):
+        raise CursorError('Invalid cursor.')
+    if timezone.is_naive(timestamp):
+        raise CursorError('Invalid cursor.')
+    if timestamp < timezone.now() - retention():
+        raise CursorExpired('Cursor expired; download all events again.')
+    return timestamp, event_id, tombstone_id
+
+
+def _after(timestamp_field: str, timestamp: Optional[datetime], last_id: int) -> Q:
+    if timestamp is None:
+        return Q()
+    return Q(**{f'{timestamp_field}__gt': timestamp}) | Q(**{timestamp_field: timestamp, 'id__gt': last_id})
+
+
+def changes_since(user, cursor: Optional[str] = None, limit: Optional[int] = None) -> Dict:
+    """
+    Events created, updated and deleted after ``cursor``, oldest first.
+
+    Without a cursor every event is returned, as ``created``. Returns the
+    events, the tombstones, the cursor to continue from, and whether more
+    changes are waiting.
+    """
+    limit = limit or getattr(settings, 'EVENT_CHANGES_PAGE_SIZE', 500)
+    since, last_event, last_tombstone = decode_cursor(cursor) if cursor else (None, 0, 0)
+    settled = timezone.now() - timedelta(seconds=getattr(settings, 'EVENT_CHANGES_SETTLE_SECONDS', 5))
+
+    events = list(
+        Event.objects.filter(user=user, updated_at__lte=settled)
+        .filter(_after('updated_at', since, last_event))
+        .order_by('updated_at', 'id')[:limit + 1]
+    )
+    tombstones = []
+    if since is not None:
+        tombstones = list(
+            EventTombstone.objects.filter(user=user, deleted_at__lte=settled)
+            .filter(_after('deleted_at', since, last_tombstone))
+            .order_by('deleted_at', 'id')[:limit + 1]
+        )
+
+    # Merge both streams by timestamp and keep the first ``limit`` changes
+    merged = sorted(
+        [(event.updated_at, 0, event.pk, event) for event in events]
+        + [(tombstone.deleted_at, 1, tombstone.pk, tombstone) for tombstone in tombstones],
+        key=lambda change: change[:3],
+    )
+    has_more = len(merged) > limit
+    page = merged[:limit]
+
+    if page:
+        timestamp = page[-1][0]
+        event_id = max((pk for at, kind, pk, _ in page if kind == 0 and at == timestamp), default=0)
+        tombstone_id = max((pk for at, kind, pk, _ in page if kind == 1 and at == timestamp), default=0)
+        next_cursor = encode_cursor(timestamp, event_id, tombstone_id)
+    else:
+        next_cursor = cursor or encode_cursor(settled)
+
+    created, updated, deleted = [], [], []
+    for _, kind, _, change in page:
+        if kind == 1:
+            deleted.append(change)
+        elif since is None or change.created_at > since:
+            created.append(change)
+        else:
+            updated.append(change)
+    return {
+        'created': created,
+        'updated': updated,
+        'deleted': deleted,
+        'cursor': next_cursor,
+        'has_more': has_more,
+    }
+
+
+def prune_tombstones(now: Optional[datetime] = None) -> int:
+    """Delete tombstones no cursor can still need; returns how many were deleted."""
+    cutoff = (now or timezone.now()) - retention()
+    deleted, _ = EventTombstone.objects.filter(deleted_at__lt=cutoff).delete()
+    return deleted
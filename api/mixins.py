@@ -0,0 +1,122 @@
+"""
+View mixins for cheap API reads: conditional GET, sparse fieldsets and row lists.
+"""
+import hashlib
+from functools import reduce
+
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, quote_etag
+from django.utils.http import http_date
+from rest_framework.response import Response
+
+
+class SparseQuerysetMixin:
+    """
+    Loads only the columns behind ``?fields=`` on list and retrieve.
+
+    The serializer drops the other fields from the output (see
+    ``SparseFieldsMixin``); this keeps them out of the SQL too.
+    """
+
+    def sparse(self, queryset):
+        if self.action not in ('list', 'retrieve'):
+            return queryset
+        serializer_class = self.get_serializer_class()
+        requested = serializer_class.requested_fields(self.request)
+        if requested is None:
+            return queryset
+        # updated_at feeds the conditional GET validators
+        return queryset.only('updated_at', *serializer_class.columns_for(requested))
+
+
+class RowListMixin:
+    """
+    Serves unpaginated lists through ``row_serializer_class``.
+
+    A row serializer builds the list from ``.values_list()`` instead of one
+    model instance and serializer per row (see ``EventRowSerializer``).
+    """
+    row_serializer_class = None
+
+    def list(self, request, *args, **kwargs):
+        if self.paginator is not None:
+            return super().list(request, *args, **kwargs)
+        queryset = self.filter_queryset(self.get_queryset())
+        fields = self.get_serializer_class().requested_fields(request)
+        return Response(self.row_serializer_class(queryset, fields).data)
+
+
+class ConditionalGetMixin:
+    """
+    ETag and Last-Modified on list and retrieve, so unchanged responses are 304s.
+
+    A list's validators come from one aggregate over its queryset: the row
+    count and the latest ``updated_at``. The count catches deletions, which
+    leave no ``updated_at`` behind, but a date can't, so lists only send
+    Last-Modified when ``last_deleted`` says when a row last left them.
+
+    ``etag_fields`` names related columns the response shows whose changes
+    don't touch ``updated_at``, such as a profile's username. Their values
+    go into the ETag, so lists read them with each row's ``updated_at`` in
+    place of the aggregate. ``updated_at`` can't say when they changed, so
+    such views send no Last-Modified.
+    """
+    etag_fields = ()
+
+    def last_deleted(self):
+        """An expression for when a row last left the list, or None if deletions leave no trace."""
+        return None
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        last_deleted = self.last_deleted()
+        if self.etag_fields:
+            # The related values need the rows anyway, so the validators come from them too
+            related = list(queryset.order_by('pk').values_list('pk', 'updated_at', *self.etag_fields))
+            state = {
+                'count': len(related),
+                'latest': max((row[1] for row in related), default=None),
+            }
+            if last_deleted is not None:
+                state.update(queryset.aggregate(deleted=Max(last_deleted)))
+        else:
+            related = []
+            aggregates = {'count': Count('pk'), 'latest': Max('updated_at')}
+            if last_deleted is not None:
+                aggregates['deleted'] = Max(last_deleted)
+            state = queryset.aggregate(**aggregates)
+
+        last_modified = None
+        if last_deleted is not None and not self.etag_fields:
+            last_modified = max((at for at in (state['latest'], state['deleted']) if at), default=None)
+        return self.conditional_response(
+            request,
+            self.make_etag(request, state['count'], state['latest'], state.get('deleted'), related),
+            last_modified,
+            lambda: super(ConditionalGetMixin, self).list(request, *args, **kwargs),
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        instance = self.get_object()
+        related = [reduce(getattr, name.split('__'), instance) for name in self.etag_fields]
+        return self.conditional_response(
+            request,
+            self.make_etag(request, instance.pk, instance.updated_at, related),
+            None if self.etag_fields else instance.updated_at,
+            lambda: Response(self.get_serializer(instance).data),
+        )
+
+    def make_etag(self, request, *state):
+        # The same state looks different to another user, with other ?fields= or in another format
+        key = [request.user.pk, request.accepted_renderer.format, request.get_full_path(), *state]
+        return quote_etag(hashlib.sha1(repr(key).encode()).hexdigest())
+
+    def conditional_response(self, request, etag, last_modified, render):
+        timestamp = int(last_modified.timestamp()) if last_modified else None
+        response = get_conditional_response(request._request, etag=etag, last_modified=timestamp)
+        if response is None:
+            response = render()
+        response.headers['ETag'] = etag
+        if timestamp is not None:
+            response.headers['Last-Modified'] = http_date(timestamp)
+        return response
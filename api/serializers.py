@@ -1,18 +1,134 @@
-from rest_framework import serializers
+from django.utils import timezone
+from rest_framework import ISO_8601, serializers
+from rest_framework.settings import api_settings
 from events.models import Event
 from profiles.models import Profile
 
-class EventSerializer(serializers.ModelSerializer):
+class SparseFieldsMixin:
+    """
+    Lets clients pick the fields they need with ``?fields=id,title``.
+
+    ``Meta.field_columns`` names the model columns behind fields that are not
+    columns themselves, so views can load only those with ``.only()``.
+    """
+
+    @classmethod
+    def requested_fields(cls, request):
+        """The field names asked for, or None for all of them."""
+        if request is None or request.method not in ('GET', 'HEAD') or not request.query_params.get('fields'):
+            return None
+        requested = [name.strip() for name in request.query_params['fields'].split(',') if name.strip()]
+        unknown = [name for name in requested if name not in cls.Meta.fields]
+        if unknown:
+            raise serializers.ValidationError({'fields': [f'Unknown field: {name}' for name in unknown]})
+        return requested
+
+    @classmethod
+    def columns_for(cls, names):
+        columns = []
+        for name in names:
+            columns.extend(getattr(cls.Meta, 'field_columns', {}).get(name, [name]))
+        return columns
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        requested = self.requested_fields(self.context.get('request'))
+        if requested is not None:
+            for name in set(self.fields) - set(requested):
+                self.fields.pop(name)
+
+class EventSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Event
-        fields = ['id', 'title', 'description', 'location', 'start_time', 
-                 'end_time', 'is_public', 'created_at', 'updated_at']
+        fields = ['id', 'title', 'description', 'location', 'start_time',
+                 'end_time', 'is_public', 'external_id', 'created_at', 'updated_at']
         read_only_fields = ['created_at', 'updated_at']
+        field_columns = {
+            'location': ['venue_name', 'venue_address', 'venue_city', 'venue_state',
+                         'venue_postal_code', 'venue_country'],
+        }
+
+    def validate_external_id(self, value):
+        """Reject an external_id the user already has on another event, which the database would refuse."""
+        request = self.context.get('request')
+        # Bulk upserts match items to events by external_id in one query and handle clashes themselves
+        if not value or request is None or self.parent is not None:
+            return value
+        clashes = Event.objects.filter(user=request.user, external_id=value)
+        if self.instance is not None:
+            clashes = clashes.exclude(pk=self.instance.pk)
+        if clashes.exists():
+            raise serializers.ValidationError('You already have an event with this external_id.')
+        return value
 
-class ProfileSerializer(serializers.ModelSerializer):
+class ProfileSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     username = serializers.CharField(source='user.username', read_only=True)
-    
+
     class Meta:
         model = Profile
-        fields = ['id', 'username', 'bio', 'location', 'birth_date', 
-                 'avatar', 'calendar_public'] 
\ No newline at end of file
+        fields = ['id', 'username', 'bio', 'location', 'birth_date',
+                 'avatar', 'calendar_public']
+        field_columns = {'username': ['user__username']}
+
+class EventRowSerializer:
+    """
+    Read-only EventSerializer for listings, producing the same dicts.
+
+    Rows come from ``.values_list()`` and are turned into dicts directly, with
+    no Event or serializer field instances per row. Datetimes are formatted
+    the way EventSerializer's fields format them, with the timezone looked up
+    once per listing rather than once per value.
+    """
+
+    def __init__(self, queryset, fields=None):
+        self.queryset = queryset
+        self.fields = fields or EventSerializer.Meta.fields
+
+    @property
+    def data(self):
+        serializer_fields = EventSerializer().fields
+        plan, position = [], 0
+        for name in self.fields:
+            width = len(EventSerializer.columns_for([name]))
+            if name == 'location':
+                convert = _join_location
+            elif isinstance(serializer_fields[name], serializers.DateTimeField):
+                convert = _datetime_converter(serializer_fields[name])
+            else:
+                convert = None
+            plan.append((name, position, width, convert))
+            position += width
+
+        columns = EventSerializer.columns_for(self.fields)
+        data = []
+        for row in self.queryset.values_list(*columns):
+            item = {}
+            for name, start, width, convert in plan:
+                if width > 1:
+                    item[name] = convert(row[start:start + width])
+                elif convert is None:
+                    item[name] = row[start]
+                else:
+                    item[name] = convert(row[start])
+            data.append(item)
+        return data
+
+def _datetime_converter(field):
+    # DateTimeField.to_representation with the timezone resolved up front
+    output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+    field_timezone = field.timezone if hasattr(field, 'timezone') else field.default_timezone()
+    if output_format is None or output_format.lower() != ISO_8601 or field_timezone is None:
+        return field.to_representation
+
+    def convert(value):
+        if not value:
+            return None
+        if timezone.is_naive(value):
+            return field.to_representation(value)
+        value = value.astimezone(field_timezone).isoformat()
+        return value[:-6] + 'Z' if value.endswith('+00:00') else value
+    return convert
+
+def _join_location(parts):
+    # Event.location for a row of venue columns
+    return ', '.join(part for part in parts if part)
@@ -1,34 +1,95 @@
-from rest_framework import viewsets, permissions
+from django.conf import settings
+from django.db.models import Subquery
+from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
+from rest_framework.renderers import BrowsableAPIRenderer
 from rest_framework.response import Response
-from events.models import Event
+from events.models import Event, EventTombstone
 from profiles.models import Profile
-from .serializers import EventSerializer, ProfileSerializer
+from . import bulk
+from .changes import CursorError, CursorExpired, changes_since
+from .mixins import ConditionalGetMixin, RowListMixin, SparseQuerysetMixin
+from .renderers import FastJSONRenderer
+from .serializers import EventRowSerializer, EventSerializer, ProfileSerializer
 
-class EventViewSet(viewsets.ModelViewSet):
+class EventViewSet(ConditionalGetMixin, RowListMixin, SparseQuerysetMixin, viewsets.ModelViewSet):
     queryset = Event.objects.all()
     serializer_class = EventSerializer
+    row_serializer_class = EventRowSerializer
+    renderer_classes = [FastJSONRenderer, BrowsableAPIRenderer]
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
-        return Event.objects.filter(user=self.request.user)
+        return self.sparse(Event.objects.filter(user=self.request.user))
+
+    def last_deleted(self):
+        return Subquery(
+            EventTombstone.objects.filter(user=self.request.user)
+            .order_by('-deleted_at').values('deleted_at')[:1]
+        )
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
-class ProfileViewSet(viewsets.ModelViewSet):
+    @action(detail=False, methods=['post', 'delete'], url_path='bulk')
+    def bulk(self, request):
+        """
+        POST a list of events to create or update them, upserting by id or external_id.
+        DELETE ``{"ids": [...], "external_ids": [...]}`` to delete events.
+        """
+        if request.method == 'DELETE':
+            return Response(bulk.delete_events(request.user, request.data))
+        return Response(bulk.upsert_events(request.user, request.data, self.get_serializer_context()))
+
+    @action(detail=False, methods=['get'])
+    def changes(self, request):
+        """
+        Events created, updated and deleted since ``?since=<cursor>``, oldest first.
+
+        Without ``since`` every event is returned as created. Pass the returned
+        ``cursor`` as ``since`` next time; keep going while ``has_more`` is true.
+        """
+        page_size = getattr(settings, 'EVENT_CHANGES_PAGE_SIZE', 500)
+        try:
+            limit = min(int(request.query_params.get('limit', page_size)), page_size)
+        except ValueError:
+            limit = page_size
+        try:
+            result = changes_since(request.user, request.query_params.get('since'), max(limit, 1))
+        except CursorExpired as e:
+            return Response({'detail': str(e)}, status=status.HTTP_410_GONE)
+        except CursorError as e:
+            return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        context = self.get_serializer_context()
+        return Response({
+            'created': EventSerializer(result['created'], many=True, context=context).data,
+            'updated': EventSerializer(result['updated'], many=True, context=context).data,
+            'deleted': [
+                {'id': tombstone.event_id, 'external_id': tombstone.external_id, 'deleted_at': tombstone.deleted_at}
+                for tombstone in result['deleted']
+            ],
+            'cursor': result['cursor'],
+            'has_more': result['has_more'],
+        })
+
+class ProfileViewSet(ConditionalGetMixin, SparseQuerysetMixin, viewsets.ModelViewSet):
     queryset = Profile.objects.all()
     serializer_class = ProfileSerializer
+    renderer_classes = [FastJSONRenderer, BrowsableAPIRenderer]
     permission_classes = [permissions.IsAuthenticated]
+    # Renaming the user doesn't touch Profile.updated_at
+    etag_fields = ('user__username',)
 
     def get_queryset(self):
+        # The serializer reads user.username for every profile
+        profiles = self.sparse(Profile.objects.select_related('user'))
         if self.action == 'list':
-            return Profile.objects.all()
-        return Profile.objects.filter(user=self.request.user)
+            return profiles
+        return profiles.filter(user=self.request.user)
 
     @action(detail=True, methods=['get'])
     def events(self, request, pk=None):
         profile = self.get_object()
         events = Event.objects.filter(user=profile.user)
-        serializer = EventSerializer(events, many=True)
-        return Response(serializer.data) 
\ No newline at end of file
+        return Response(EventRowSerializer(events, EventSerializer.requested_fields(request)).data) 
\ No newline at end of file
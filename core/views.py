@@ -1,8 +1,10 @@
 from django.shortcuts import render
 from django.contrib.auth.decorators import login_required
+from events.utils import discovery
 
 def home(request):
-    return render(request, 'core/home.html')
+    upcoming = discovery.upcoming_entries()[:6]
+    return render(request, 'core/home.html', {'upcoming': upcoming})
 
 def about(request):
     return render(request, 'core/about.html')
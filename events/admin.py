@@ -103,11 +103,14 @@ class SiteScraperAdmin(admin.ModelAdmin):
         'user',
         'is_active',
         'last_tested',
+        'last_run_status',
+        'next_run_at',
         'created_at'
     ]
     list_filter = [
         SiteScraperUserFilter,
         'is_active',
+        'requires_js',
         'created_at',
         'last_tested'
     ]
@@ -0,0 +1,10 @@
+"""
+Benchmarks for the event import pipeline.
+
+``manage.py run_benchmarks`` replays recorded fixtures (the Wayland Post iCal
+feed and the saved Berklee events page) and synthetic venue pages and feeds
+of 10 to 10,000 events through each stage of an import, and sends the same
+numbers of events through the event API. It also lists 1,000 to 100,000
+saved events through the API's serializers. The timings are written to JSON
+so runs from different commits can be compared.
+"""
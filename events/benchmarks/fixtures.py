@@ -0,0 +1,173 @@
+"""Recorded and synthetic inputs for the pipeline benchmarks."""
+import os
+import random
+from datetime import date, datetime, time, timedelta
+from datetime import timezone as dt_timezone
+
+EVENTS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WAYLAND_FEED = os.path.join(EVENTS_DIR, 'management', 'commands', 'wayland-post.ics')
+EXAMPLE_PAGE = os.path.join(EVENTS_DIR, 'scrapers', 'example.html')
+
+EXAMPLE_URL = 'https://www.berklee.edu/events/by-type/clinics-and-master-classes'
+SYNTHETIC_URL = 'https://venue.example.com/calendar/events'
+SYNTHETIC_SIZES = (10, 100, 1000, 10000)
+LISTING_SIZES = (1000, 10000, 100000)
+# Events on the event list page rendered by the render:list scenario
+RENDER_PAGE_SIZE = 500
+
+# The schema a generated schema for example.html comes out as
+EXAMPLE_SCHEMA = {
+    'name': 'Berklee events',
+    'baseSelector': '.event.teaser',
+    'fields': [
+        {'name': 'title', 'selector': '.title a', 'type': 'text'},
+        {'name': 'url', 'selector': '.title a', 'type': 'attribute', 'attribute': 'href'},
+        {'name': 'date', 'selector': 'time', 'type': 'text'},
+        {'name': 'start_time', 'selector': 'time', 'type': 'attribute', 'attribute': 'datetime'},
+        {'name': 'image_url', 'selector': 'img', 'type': 'attribute', 'attribute': 'src'},
+    ],
+}
+
+SYNTHETIC_SCHEMA = {
+    'name': 'Synthetic venue calendar',
+    'baseSelector': 'article.event-card',
+    'fields': [
+        {'name': 'title', 'selector': 'h3.event-title a', 'type': 'text'},
+        {'name': 'url', 'selector': 'h3.event-title a', 'type': 'attribute', 'attribute': 'href'},
+        {'name': 'date', 'selector': '.event-date', 'type': 'text'},
+        {'name': 'location', 'selector': '.event-venue', 'type': 'text'},
+        {'name': 'description', 'selector': '.event-summary', 'type': 'text'},
+        {'name': 'image_url', 'selector': 'img', 'type': 'attribute', 'attribute': 'src'},
+        {'name': 'data_image_url', 'selector': 'img', 'type': 'attribute', 'attribute': 'data-src'},
+    ],
+}
+
+BANDS = ['Blue Harbor Trio', 'Night Owl Quartet', 'Riverside Jazz Ensemble', 'Copper Street Band',
+         'Lantern Orchestra', 'Midnight Brass Quintet', 'Harbor Lights Group', 'Old North Sextet']
+VENUES = ['Main Stage', 'The Parlor', 'Garden Room', 'Club Lounge', 'Rooftop']
+FIRST_DAY = date(2025, 1, 6)
+
+# Event titles and descriptions labeled by hand: whether each is a music event
+# and the artist to search Spotify for. The first ones are the cases from
+# events/tests/test_spotify.py.
+LABELED_EVENTS = [
+    ('Concert with Test Artist', 'Live music event', True, 'Test Artist'),
+    ('Business Meeting', 'Quarterly review', False, None),
+    ('Test Artist live at Venue', 'Live music event', True, 'Test Artist'),
+    ('Venue presents Test Artist', 'An evening of live music', True, 'Test Artist'),
+    ('Test Artist in concert', '', True, 'Test Artist'),
+    ('Vista Philharmonic Orchestra - Music Without Boundaries', '', True, 'Vista Philharmonic Orchestra'),
+    ('John Pizzarelli Swing Seven: Dear Mr. Sinatra', 'Jazz guitarist and his band', True,
+     'John Pizzarelli Swing Seven'),
+    ('Test String Quartet performs Mozart', '', True, 'Test String Quartet'),
+    ('Jazz Ensemble presents: A Night of Swing', '', True, 'Jazz Ensemble'),
+    ('Blue Harbor Trio at The Parlor', 'Standards and originals', True, 'Blue Harbor Trio'),
+    ('DJ Nightshift', 'House and techno all night', True, 'DJ Nightshift'),
+    ('Open Mic Night', 'Singers and songwriters welcome', True, 'Open Mic Night'),
+    ('Copper Street Band with special guests', '', True, 'Copper Street Band'),
+    ('Spring Choir Recital', 'The youth choir sings Brahms', True, 'Spring Choir Recital'),
+    ('Hip-Hop Showcase', 'Local rappers and producers', True, 'Hip-Hop Showcase'),
+    ('Blues Jam', 'Bring your instrument', True, 'Blues Jam'),
+    ('Startup Showcase', 'Founders pitch to investors', False, None),
+    ('Board Game Night', 'Bring a game or borrow one of ours', False, None),
+    ('Rock Climbing Meetup', 'Beginner friendly bouldering', False, None),
+    ('Town Hall Meeting', 'Budget discussion with the select board', False, None),
+    ('Farmers Market', 'Local produce, bread and flowers', False, None),
+    ('Python Workshop', 'Hands-on introduction to programming', False, None),
+    ('Yoga in the Park', 'All levels, bring a mat', False, None),
+    ('Book Club: The Overstory', 'Discussion of chapters 1-10', False, None),
+    ('Art Show Opening', 'Paintings by local artists', False, None),
+    ('Film Screening: Casablanca', 'Classic cinema on the big screen', False, None),
+    ('Trivia Night', 'Teams of up to six', False, None),
+    ('Walking Tour of the Old Town', 'History of the waterfront', False, None),
+    ('Comedy Showcase', 'Stand-up from five comedians', False, None),
+    ('Charity 5K Run', 'Registration at 8am', False, None),
+]
+
+
+def read_fixture(path: str, mode: str = 'r'):
+    encoding = None if 'b' in mode else 'utf-8'
+    with open(path, mode, encoding=encoding) as f:
+        return f.read()
+
+
+def _synthetic_events(count: int, seed: int):
+    """Shows spread over a season: a few per night per venue, every title distinct."""
+    rng = random.Random(seed)
+    for index in range(count):
+        day = FIRST_DAY + timedelta(days=index * 365 // max(count, 1))
+        yield {
+            'index': index,
+            'title': f'{rng.choice(BANDS)} - Night {index}',
+            'day': day,
+            'hour': rng.choice([7, 8, 9]),
+            'venue': rng.choice(VENUES),
+            # A third of the pages lazy-load their images
+            'lazy': index % 3 == 0,
+        }
+
+
+def synthetic_page(count: int, seed: int = 0) -> str:
+    """A venue calendar page with ``count`` events, matching SYNTHETIC_SCHEMA."""
+    parts = ['<!DOCTYPE html><html><head><title>Calendar</title></head><body>',
+             '<nav><a href="/">Home</a><a href="/calendar">Calendar</a></nav><main class="calendar">']
+    for event in _synthetic_events(count, seed):
+        index = event['index']
+        if event['lazy']:
+            image = f'<img src="data:image/gif;base64,R0lGOD" data-src="/lazy/show-{index}.jpg" alt="">'
+        else:
+            image = f'<img src="images/show-{index}.jpg" alt="">'
+        parts.append(
+            f'<article class="event-card"><h3 class="event-title"><a href="/events/show-{index}">'
+            f'{event["title"]}</a></h3>'
+            f'<div class="event-date">{event["day"].strftime("%B")} {event["day"].day}, {event["day"].year}'
+            f' at {event["hour"]}:00 PM</div>'
+            f'<div class="event-venue">{event["venue"]}</div>'
+            f'<p class="event-summary">An evening of live music with {event["title"].split(" - ")[0]}.</p>'
+            f'{image}</article>'
+        )
+    parts.append('</main><footer>Box office open daily</footer></body></html>')
+    return '\n'.join(parts)
+
+
+def synthetic_feed(count: int, seed: int = 0) -> bytes:
+    """An iCal feed with ``count`` events, in the shape of the Wayland Post export."""
+    lines = ['BEGIN:VCALENDAR', 'VERSION:2.0', 'PRODID:-//SocialCal Benchmarks//EN', 'CALSCALE:GREGORIAN',
+             'METHOD:PUBLISH', 'X-WR-CALNAME:Synthetic Venue']
+    for event in _synthetic_events(count, seed):
+        index = event['index']
+        start = f'{event["day"].strftime("%Y%m%d")}T{event["hour"] + 12:02d}0000'
+        end = f'{event["day"].strftime("%Y%m%d")}T{event["hour"] + 14:02d}0000'
+        lines += [
+            'BEGIN:VEVENT',
+            f'DTSTART;TZID=America/New_York:{start}',
+            f'DTEND;TZID=America/New_York:{end}',
+            f'UID:show-{index}@venue.example.com',
+            f'SUMMARY:{event["title"]}',
+            'DESCRIPTION:An evening of live music.',
+            f'URL:https://venue.example.com/events/show-{index}/',
+            f'LOCATION:{event["venue"]}\\, 1 Main Street\\, Boston\\, MA',
+        ]
+        if not event['lazy']:
+            lines.append(f'ATTACH;FMTTYPE=image/jpeg:https://venue.example.com/images/show-{index}.jpg')
+        lines.append('END:VEVENT')
+    lines.append('END:VCALENDAR')
+    return ('\r\n'.join(lines) + '\r\n').encode('utf-8')
+
+
+def synthetic_events(count: int, seed: int = 0):
+    """Event fields for ``count`` saved shows, as the event API lists them."""
+    for event in _synthetic_events(count, seed):
+        start = datetime.combine(event['day'], time(event['hour'] + 12), tzinfo=dt_timezone.utc)
+        yield {
+            'title': event['title'],
+            'description': f'An evening of live music with {event["title"].split(" - ")[0]}.',
+            'venue_name': event['venue'],
+            'venue_address': '1 Main Street',
+            'venue_city': 'Boston',
+            'venue_state': 'MA',
+            'start_time': start,
+            'end_time': start + timedelta(hours=2),
+            'external_id': f'show-{event["index"]}',
+            'is_public': not event['lazy'],
+        }
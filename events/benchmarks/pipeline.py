@@ -0,0 +1,516 @@
+"""
+Stage-by-stage timing of an event import.
+
+A scenario is one input run through the stages an import of that kind goes
+through: ``ical_parse`` for feeds, ``extract`` and ``parse_dates`` for pages,
+then ``classify`` and ``db_upsert`` for both, and ``enrichment``, the Spotify
+lookups that now run after the import. API scenarios save events one at
+a time through the event serializer and then through the bulk API; listing
+scenarios render a user's events through the event serializer and then
+through the row serializer the list endpoints use; export scenarios write
+them as an .ics file through an ``icalendar`` object tree, as the exports
+used to, and then through ICalGenerator. The render scenario renders the
+event list page with its event cards first missing from the fragment cache
+and then cached. The music scenario classifies
+hand-labeled events the old way and through events.utils.music, and
+reports the accuracy of each.
+
+Spotify is replaced by a stub that answers instantly, so enrichment measures
+our enrichment code and not the network. Database writes run in a
+transaction that is rolled back, under a throwaway user, so benchmarks can
+run against any database.
+
+Each scenario is run ``repeat`` times and the fastest time of each stage is
+kept. Peak memory comes from one more run under tracemalloc, which slows
+code down too much to be timed at the same time.
+"""
+import logging
+import platform
+import subprocess
+import time
+import tracemalloc
+import uuid
+from contextlib import contextmanager
+from datetime import timezone as dt_timezone
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.test import override_settings
+from django.urls import reverse
+from django.utils import timezone
+from icalendar import Calendar, Event as ICalEvent
+
+from ..models import Event
+from ..scrapers.ical_scraper import ICalScraper
+from ..scrapers.site_scraper import normalize_event_rows
+from ..scrapers.static_extractor import extract_with_schema
+from ..utils import dedup, enrichment, ical_generator, music
+from ..utils.spotify import SpotifyAPI
+from . import fixtures
+
+
+class Scenario:
+    """One input and the stages it runs through, each taking the previous stage's output."""
+
+    def __init__(self, name: str, source: str, load: Callable, stages: List[Tuple[str, Callable]]):
+        self.name = name
+        self.source = source
+        self.load = load
+        self.stages = stages
+
+    @property
+    def stage_names(self) -> List[str]:
+        return [stage for stage, _ in self.stages]
+
+
+def parse_ical(content: bytes, url: str = '') -> List[Dict]:
+    scraper = ICalScraper()
+    calendar = Calendar.from_ical(content)
+    return [scraper.parse_event(component) for component in calendar.walk('VEVENT')]
+
+
+def parse_dates(rows: List[Dict], url: str) -> List[Dict]:
+    """Normalize extracted rows and turn their dates into datetimes, as a site scraper import does."""
+    events = []
+    for row in normalize_event_rows(rows, url):
+        if not row['start_datetime']:
+            continue
+        events.append({
+            'title': row['title'],
+            'description': row['description'],
+            'start_time': row['start_datetime'],
+            'end_time': row['end_datetime'],
+            'venue_name': row['location'],
+            'url': row['url'],
+            'image_url': row['image_url'],
+        })
+    return events
+
+
+def stub_search_track(query, artist_name=None, limit=10):
+    name = artist_name or query
+    return [{
+        'id': f'track-{abs(hash(name)) % 10 ** 8}',
+        'name': f'{name} (Live)',
+        'artist': name,
+        'artist_id': f'artist-{abs(hash(name)) % 10 ** 8}',
+        'preview_url': None,
+        'external_url': 'https://open.spotify.com/track/benchmark',
+    }]
+
+
+@contextmanager
+def stub_spotify():
+    original = SpotifyAPI.__dict__['search_track']
+    SpotifyAPI.search_track = staticmethod(stub_search_track)
+    try:
+        yield
+    finally:
+        SpotifyAPI.search_track = original
+
+
+def classify(events: List[Dict]) -> List[Dict]:
+    """Mark the music events to be enriched after saving, as imports do."""
+    return [enrichment.mark(dict(event), classification)
+            for event, classification in zip(events, music.classify_events(events))]
+
+
+def upsert(events: List[Dict], user=None) -> Dict[str, int]:
+    """Save ``events`` through the dedup index for ``user`` or a new one; the caller rolls the writes back."""
+    user = user or new_user()
+    index = dedup.EventIndex.for_user(user, events)
+    counts = {'created': 0, 'merged': 0}
+    for data in events:
+        _, created = dedup.save_deduplicated(index, user, data)
+        counts['created' if created else 'merged'] += 1
+    return counts
+
+
+def new_user():
+    return get_user_model().objects.create_user(username=f'benchmark-{uuid.uuid4().hex[:12]}')
+
+
+def api_items(count: int) -> List[Dict]:
+    """Events as an integration would send them to the bulk API."""
+    return [
+        {
+            'external_id': f'show-{index}',
+            'title': event['title'],
+            'description': event['description'],
+            'start_time': event['start_time'].isoformat(),
+            'end_time': event['end_time'].isoformat(),
+        }
+        for index, event in enumerate(parse_ical(fixtures.synthetic_feed(count)))
+    ]
+
+
+def api_scenario(size: int) -> Scenario:
+    """
+    The same events saved one at a time through EventSerializer, as single API
+    requests do, then through the bulk API, then updated through the bulk API.
+    """
+    from api import bulk
+    from api.serializers import EventSerializer
+
+    users = {}
+
+    def serial_create(items):
+        user = new_user()
+        for item in items:
+            serializer = EventSerializer(data=item)
+            serializer.is_valid(raise_exception=True)
+            serializer.save(user=user)
+        return items
+
+    def bulk_upsert(user, items):
+        counts = {'created': 0, 'updated': 0}
+        for offset in range(0, len(items), bulk.max_items()):
+            result = bulk.upsert_events(user, items[offset:offset + bulk.max_items()])
+            counts['created'] += result['created']
+            counts['updated'] += result['updated']
+        return counts
+
+    def bulk_create(items):
+        users['bulk'] = new_user()
+        bulk_upsert(users['bulk'], items)
+        return items
+
+    def bulk_update(items):
+        return bulk_upsert(users['bulk'], [dict(item, title=f"{item['title']} (moved)") for item in items])
+
+    return Scenario(f'api:bulk-{size}', f'{size} events through the event API', lambda: api_items(size), [
+        ('serial_create', serial_create),
+        ('bulk_create', bulk_create),
+        ('bulk_update', bulk_update),
+    ])
+
+
+def listing_scenario(size: int) -> Scenario:
+    """
+    A user's events listed as JSON through EventSerializer and the stock
+    JSONRenderer, then through EventRowSerializer and FastJSONRenderer.
+    """
+    from rest_framework.renderers import JSONRenderer
+    from api.renderers import FastJSONRenderer
+    from api.serializers import EventRowSerializer, EventSerializer
+
+    users = {}
+
+    def seed(items):
+        users['list'] = new_user()
+        Event.objects.bulk_create([Event(user=users['list'], **item) for item in items], batch_size=1000)
+        return items
+
+    def serializer(items):
+        JSONRenderer().render(EventSerializer(Event.objects.filter(user=users['list']), many=True).data)
+        return items
+
+    def rows(items):
+        FastJSONRenderer().render(EventRowSerializer(Event.objects.filter(user=users['list'])).data)
+        return items
+
+    return Scenario(f'api:list-{size}', f'{size} events listed by the event API',
+                    lambda: list(fixtures.synthetic_events(size)), [
+                        ('seed', seed),
+                        ('serializer', serializer),
+                        ('rows', rows),
+                    ])
+
+
+def render_scenario(size: int = fixtures.RENDER_PAGE_SIZE) -> Scenario:
+    """
+    The event list page of a user with ``size`` events, rendered with every
+    event card missing from the fragment cache and then again with all cached.
+    """
+    from django.test import RequestFactory
+    from ..views import event_list
+
+    users = {}
+
+    def seed(items):
+        users['render'] = new_user()
+        Event.objects.bulk_create([Event(user=users['render'], **item) for item in items], batch_size=1000)
+        return items
+
+    def render(items):
+        # New events each run, so the first render always misses
+        request = RequestFactory().get(reverse('events:list'))
+        request.user = users['render']
+        event_list(request)
+        return items
+
+    return Scenario(f'render:list-{size}', f'event list page of {size} events',
+                    lambda: list(fixtures.synthetic_events(size)), [
+                        ('seed', seed),
+                        ('cold', render),
+                        ('warm', render),
+                    ])
+
+
+def keyword_scan(event: Dict) -> bool:
+    """is_music_event before events.utils.music: substring search for any keyword."""
+    keywords = {
+        'concert', 'live music', 'band', 'performance', 'gig', 'show',
+        'musician', 'singer', 'performer', 'dj', 'jazz', 'rock', 'blues',
+        'hip hop', 'rap', 'electronic', 'classical', 'orchestra', 'ensemble',
+        'quartet', 'trio', 'recital', 'festival'
+    }
+    text = f"{event.get('title', '')} {event.get('description', '')}".lower()
+    return any(keyword in text for keyword in keywords)
+
+
+def music_scenario(repeat: int = 100) -> Scenario:
+    """
+    The labeled events, ``repeat`` times over, classified by keyword substring
+    search and then by events.utils.music. The result is each one's accuracy.
+    """
+    results = {}
+
+    def load():
+        return [{'title': title, 'description': description, 'label': (is_music, artist)}
+                for title, description, is_music, artist in fixtures.LABELED_EVENTS] * repeat
+
+    def keywords(events):
+        # Imports then looked for an artist in every event the scan flagged
+        results['keywords'] = [keyword_scan(event) for event in events]
+        for event, found in zip(events, results['keywords']):
+            if found:
+                music.extract_artist(event['title'])
+        return events
+
+    def classifier(events):
+        results['classifier'] = music.classify_events(events)
+        return events
+
+    def accuracy(events):
+        labels = [event['label'] for event in events]
+        return {
+            'keywords': round(sum(found == label[0] for found, label in zip(results['keywords'], labels))
+                              / len(labels), 3),
+            'classifier': round(sum(result.is_music == label[0]
+                                    for result, label in zip(results['classifier'], labels)) / len(labels), 3),
+            'artist': round(sum(result.artist == label[1] for result, label in zip(results['classifier'], labels)
+                                if label[0]) / sum(1 for label in labels if label[0]), 3),
+        }
+
+    return Scenario('music:labeled', f'{len(fixtures.LABELED_EVENTS)} labeled events x {repeat}', load, [
+        ('keywords', keywords),
+        ('classifier', classifier),
+        ('accuracy', accuracy),
+    ])
+
+
+def icalendar_export(events, host: str = 'testserver') -> bytes:
+    """The exports before ICalGenerator: an icalendar tree serialized in one go."""
+    calendar = Calendar()
+    calendar.add('prodid', '-//SocialCal//EN')
+    calendar.add('version', '2.0')
+    calendar.add('calscale', 'GREGORIAN')
+    calendar.add('method', 'PUBLISH')
+    for event in events:
+        component = ICalEvent()
+        component.add('summary', event.title)
+        component.add('description', event.description)
+        component.add('dtstart', event.start_time)
+        component.add('dtend', event.end_time or event.start_time + ical_generator.DEFAULT_DURATION)
+        if event.location:
+            component.add('location', event.location)
+        component.add('url', f'http://{host}{event.get_absolute_url()}')
+        component.add('dtstamp', timezone.now())
+        component.add('uid', f'{event.id}@{host}')
+        component.add('status', 'CONFIRMED')
+        calendar.add_component(component)
+    return calendar.to_ical()
+
+
+def export_scenario(size: int) -> Scenario:
+    """A user's events exported as an .ics file through icalendar, then through ICalGenerator."""
+    users = {}
+
+    def seed(items):
+        users['export'] = new_user()
+        Event.objects.bulk_create([Event(user=users['export'], **item) for item in items], batch_size=1000)
+        return items
+
+    def tree(items):
+        icalendar_export(Event.objects.filter(user=users['export']))
+        return items
+
+    def generator(items):
+        generator = ical_generator.ICalGenerator(base_url='http://testserver', uid_domain='testserver')
+        for _ in generator.stream(Event.objects.filter(user=users['export'])):
+            pass
+        return items
+
+    return Scenario(f'export:ical-{size}', f'{size} events exported as iCalendar',
+                    lambda: list(fixtures.synthetic_events(size)), [
+                        ('seed', seed),
+                        ('icalendar', tree),
+                        ('generator', generator),
+                    ])
+
+
+def import_stages() -> List[Tuple[str, Callable]]:
+    """The stages every import ends with: marking music events, saving, and the enrichment that follows."""
+    saved = {}
+
+    def save(events):
+        saved['user'] = new_user()
+        return upsert(events, saved['user'])
+
+    def enrich(counts):
+        # Without the cache, every run searches for every artist
+        with stub_spotify(), override_settings(EVENT_ENRICHMENT_CACHE_SECONDS=0):
+            enriched = enrichment.drain(events=Event.objects.filter(user=saved['user']))
+        return dict(counts, enriched=enriched)
+
+    return [('classify', classify), ('db_upsert', save), ('enrichment', enrich)]
+
+
+def ical_scenario(name: str, source: str, load: Callable) -> Scenario:
+    return Scenario(name, source, load, [
+        ('ical_parse', parse_ical),
+        *import_stages(),
+    ])
+
+
+def page_scenario(name: str, source: str, load: Callable, schema: Dict, url: str) -> Scenario:
+    return Scenario(name, source, load, [
+        ('extract', lambda html: extract_with_schema(html, schema, url)),
+        ('parse_dates', lambda rows: parse_dates(rows, url)),
+        *import_stages(),
+    ])
+
+
+def default_scenarios(sizes=fixtures.SYNTHETIC_SIZES, listing_sizes=fixtures.LISTING_SIZES) -> List[Scenario]:
+    scenarios = [
+        ical_scenario('ical:wayland-post', fixtures.WAYLAND_FEED,
+                      lambda: fixtures.read_fixture(fixtures.WAYLAND_FEED, 'rb')),
+        page_scenario('html:example', fixtures.EXAMPLE_PAGE, lambda: fixtures.read_fixture(fixtures.EXAMPLE_PAGE),
+                      fixtures.EXAMPLE_SCHEMA, fixtures.EXAMPLE_URL),
+    ]
+    for size in sizes:
+        scenarios.append(ical_scenario(f'ical:synthetic-{size}', f'synthetic feed of {size} events',
+                                       lambda size=size: fixtures.synthetic_feed(size)))
+        scenarios.append(page_scenario(f'html:synthetic-{size}', f'synthetic page of {size} events',
+                                       lambda size=size: fixtures.synthetic_page(size),
+                                       fixtures.SYNTHETIC_SCHEMA, fixtures.SYNTHETIC_URL))
+        scenarios.append(api_scenario(size))
+    scenarios += [listing_scenario(size) for size in listing_sizes]
+    scenarios += [export_scenario(size) for size in listing_sizes]
+    scenarios.append(render_scenario())
+    scenarios.append(music_scenario())
+    return scenarios
+
+
+def _run_once(scenario: Scenario, trace_memory: bool = False):
+    """Run every stage once; returns per-stage seconds, per-stage peak bytes, events and upsert counts."""
+    payload = scenario.load()
+    seconds, peaks = {}, {}
+    events, counts = 0, {}
+    with transaction.atomic():
+        for stage, func in scenario.stages:
+            if trace_memory:
+                tracemalloc.reset_peak()
+                baseline = tracemalloc.get_traced_memory()[0]
+            started = time.perf_counter()
+            payload = func(payload)
+            seconds[stage] = time.perf_counter() - started
+            if trace_memory:
+                peaks[stage] = tracemalloc.get_traced_memory()[1] - baseline
+            if isinstance(payload, list):
+                events = len(payload)
+            else:
+                counts = payload
+        transaction.set_rollback(True)
+    return seconds, peaks, events, counts
+
+
+def run_scenario(scenario: Scenario, repeat: int = 3) -> Dict:
+    best = {}
+    for _ in range(max(repeat, 1)):
+        seconds, _, events, counts = _run_once(scenario)
+        for stage, elapsed in seconds.items():
+            best[stage] = min(elapsed, best.get(stage, elapsed))
+
+    tracemalloc.start()
+    try:
+        _, peaks, _, _ = _run_once(scenario, trace_memory=True)
+    finally:
+        tracemalloc.stop()
+
+    stages = {}
+    for stage in scenario.stage_names:
+        stages[stage] = {
+            'seconds': round(best[stage], 6),
+            'events_per_second': round(events / best[stage], 1) if best[stage] else None,
+            'peak_memory_bytes': peaks[stage],
+        }
+    total = sum(best.values())
+    return {
+        'source': scenario.source,
+        'events': events,
+        'upsert': counts,
+        'stages': stages,
+        'total': {
+            'seconds': round(total, 6),
+            'events_per_second': round(events / total, 1) if total else None,
+            'peak_memory_bytes': max(peaks.values()),
+        },
+    }
+
+
+def current_commit() -> Optional[str]:
+    try:
+        result = subprocess.run(['git', 'describe', '--always', '--dirty'], capture_output=True, text=True,
+                                cwd=fixtures.EVENTS_DIR, timeout=10)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return result.stdout.strip() or None
+
+
+def run_suite(scenarios: List[Scenario], repeat: int = 3, progress: Optional[Callable] = None) -> Dict:
+    results = {}
+    # Time the work, not the log handlers; parse_dates logs every event at INFO
+    logging.disable(logging.INFO)
+    try:
+        for scenario in scenarios:
+            if progress:
+                progress(scenario)
+            results[scenario.name] = run_scenario(scenario, repeat)
+    finally:
+        logging.disable(logging.NOTSET)
+    return {
+        'commit': current_commit(),
+        'created_at': datetime.now(dt_timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'repeat': repeat,
+        'scenarios': results,
+    }
+
+
+def compare(previous: Dict, current: Dict, threshold: float = 0.1) -> List[Dict]:
+    """Stage timings of scenarios present in both runs; ``regression`` marks slowdowns above ``threshold``."""
+    rows = []
+    for name, result in current['scenarios'].items():
+        before = previous.get('scenarios', {}).get(name)
+        if not before:
+            continue
+        stages = dict(result['stages'], total=result['total'])
+        old_stages = dict(before['stages'], total=before['total'])
+        for stage, timing in stages.items():
+            old = old_stages.get(stage)
+            if not old or not old['seconds']:
+                continue
+            change = timing['seconds'] / old['seconds'] - 1
+            rows.append({
+                'scenario': name,
+                'stage': stage,
+                'before': old['seconds'],
+                'after': timing['seconds'],
+                'change': change,
+                'regression': change > threshold,
+            })
+    return rows
@@ -3,7 +3,6 @@ from .models import Event, SiteScraper
 import pytz
 from django.conf import settings
 from django.utils import timezone
-from .utils.spotify import SpotifyAPI
 import json
 from django.core.exceptions import ValidationError
 
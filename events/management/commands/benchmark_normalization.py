@@ -0,0 +1,63 @@
+import logging
+import random
+import time
+from django.core.management.base import BaseCommand
+from events.scrapers.site_scraper import normalize_event_rows
+
+PAGE_URL = 'https://venue.example.com/calendar/events'
+
+
+def synthetic_rows(count, seed=0):
+    """Rows shaped like a CSS schema extraction of a long venue calendar."""
+    rng = random.Random(seed)
+    months = ['January', 'February', 'March', 'April', 'May', 'June']
+    rows = []
+    for index in range(count):
+        day = rng.randint(1, 28)
+        month = rng.choice(months)
+        hour = rng.choice([7, 8, 9])
+        rows.append({
+            'title': f'Show {index}',
+            'description': 'An evening of live music.',
+            'date': f'{month} {day}, 2025 at {hour}:00 PM',
+            'location': 'Main Stage',
+            'url': f'/events/show-{index}',
+            'image_url': '' if index % 3 else f'images/show-{index}.jpg',
+            'data_image_url': f'/lazy/show-{index}.jpg',
+        })
+    return rows
+
+
+class Command(BaseCommand):
+    help = 'Compare per-row and batch normalization of extracted event rows'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=2000, help='Number of rows on the synthetic page')
+        parser.add_argument('--repeat', type=int, default=3, help='Runs per variant, the best one is reported')
+
+    def time_best(self, func, repeat):
+        best = None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            func()
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        return best
+
+    def handle(self, *args, **options):
+        rows = synthetic_rows(options['rows'])
+
+        # Keep the comparison about the work, not about where log records go
+        logging.disable(logging.INFO)
+        try:
+            per_row = self.time_best(
+                lambda: [normalize_event_rows([row], PAGE_URL) for row in rows], options['repeat']
+            )
+            batch = self.time_best(lambda: normalize_event_rows(rows, PAGE_URL), options['repeat'])
+        finally:
+            logging.disable(logging.NOTSET)
+
+        self.stdout.write(f"{len(rows)} rows")
+        self.stdout.write(f"  per row: {per_row * 1000:8.1f} ms")
+        self.stdout.write(f"  batch:   {batch * 1000:8.1f} ms")
+        self.stdout.write(self.style.SUCCESS(f"  speedup: {per_row / batch:.1f}x"))
@@ -0,0 +1,48 @@
+import asyncio
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+from events.utils import bulk_import
+
+
+class Command(BaseCommand):
+    help = 'Import events from many URLs at once, detecting iCal, site scraper or LLM extraction per URL'
+
+    def add_arguments(self, parser):
+        parser.add_argument('urls', nargs='*', help='URLs to import')
+        parser.add_argument('--user', required=True, help='Username or email of the user to import events for')
+        parser.add_argument('--file', action='append', default=[],
+                            help='File with URLs: one per line, CSV or OPML (can be repeated)')
+        parser.add_argument('--concurrency', type=int,
+                            help='Sources imported at once (defaults to BULK_IMPORT_MAX_CONCURRENCY)')
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        try:
+            user = User.objects.get(Q(username=options['user']) | Q(email=options['user']))
+        except (User.DoesNotExist, User.MultipleObjectsReturned):
+            raise CommandError(f"No single user matches {options['user']!r}")
+
+        text = '\n'.join(options['urls'])
+        for path in options['file']:
+            try:
+                with open(path, encoding='utf-8', errors='replace') as f:
+                    text += '\n' + f.read()
+            except OSError as e:
+                raise CommandError(f'Could not read {path}: {e}')
+        try:
+            urls = bulk_import.parse_sources(text)
+        except ValueError as e:
+            raise CommandError(str(e))
+        if not urls:
+            raise CommandError('No http(s) or webcal URLs given')
+
+        job_id = bulk_import.new_job_id()
+        self.stdout.write(f'Importing {len(urls)} sources as job {job_id}')
+        status = asyncio.run(bulk_import.run_bulk_import(job_id, urls, user, options['concurrency']))
+
+        for child in status['children']:
+            line = f"- {child['url']} [{child['importer'] or '-'}]: {child['message']}"
+            self.stdout.write(self.style.ERROR(line) if child['status'] == 'error' else line)
+        style = self.style.ERROR if status['status'] == 'error' else self.style.SUCCESS
+        self.stdout.write(style(status['message']))
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from events.models import Event
+from events.utils import enrichment
+
+
+class Command(BaseCommand):
+    help = 'Look up pending music events on Spotify, such as those left pending by a restart'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--retry-failed',
+            action='store_true',
+            help='Queue events whose lookup failed again first'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            help='Events per batch (default EVENT_ENRICHMENT_BATCH_SIZE)'
+        )
+
+    def handle(self, *args, **options):
+        if options['retry_failed']:
+            Event.objects.filter(enrichment_status=Event.ENRICHMENT_FAILED).update(
+                enrichment_status=Event.ENRICHMENT_PENDING, updated_at=timezone.now()
+            )
+        done = enrichment.drain(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Enriched {done} events'))
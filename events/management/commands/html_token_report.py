@@ -0,0 +1,34 @@
+import os
+from django.core.management.base import BaseCommand, CommandError
+from events.utils.html_minimizer import token_report
+
+DEFAULT_PAGE = os.path.join(os.path.dirname(__file__), '..', '..', 'scrapers', 'example.html')
+
+
+class Command(BaseCommand):
+    help = 'Report LLM token counts of saved HTML pages before and after minimizing'
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='*', help='HTML files to measure (defaults to events/scrapers/example.html)')
+        parser.add_argument('--chunk-tokens', type=int, default=2000, help='Chunk size used to count extraction chunks')
+        parser.add_argument('--samples', type=int, default=3, help='Repeated elements kept for schema generation')
+
+    def handle(self, *args, **options):
+        paths = options['paths'] or [os.path.normpath(DEFAULT_PAGE)]
+
+        for path in paths:
+            try:
+                with open(path, encoding='utf-8', errors='replace') as f:
+                    html_content = f.read()
+            except OSError as e:
+                raise CommandError(f'Could not read {path}: {e}')
+
+            report = token_report(html_content, max_tokens=options['chunk_tokens'], keep_samples=options['samples'])
+            raw = report['raw_tokens'] or 1
+            self.stdout.write(self.style.SUCCESS(path))
+            self.stdout.write(f"  raw:       {report['raw_tokens']:>8} tokens")
+            self.stdout.write(f"  minimized: {report['minimized_tokens']:>8} tokens "
+                              f"({100 * report['minimized_tokens'] / raw:.1f}%), "
+                              f"{report['chunks']} chunks of <= {options['chunk_tokens']}")
+            self.stdout.write(f"  schema:    {report['schema_tokens']:>8} tokens "
+                              f"({100 * report['schema_tokens'] / raw:.1f}%)")
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from api.changes import prune_tombstones, retention
+
+
+class Command(BaseCommand):
+    help = 'Delete records of deleted events older than EVENT_TOMBSTONE_RETENTION_DAYS'
+
+    def handle(self, *args, **options):
+        deleted = prune_tombstones()
+        self.stdout.write(self.style.SUCCESS(
+            f'Deleted {deleted} tombstones older than {retention().days} days'
+        ))
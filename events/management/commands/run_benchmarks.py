@@ -0,0 +1,77 @@
+import json
+import os
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from events.benchmarks import fixtures, pipeline
+
+
+class Command(BaseCommand):
+    help = 'Time each stage of the event import pipeline on recorded and synthetic fixtures'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=list(fixtures.SYNTHETIC_SIZES),
+                            help='Event counts of the synthetic pages and feeds')
+        parser.add_argument('--listing-sizes', type=int, nargs='*', default=list(fixtures.LISTING_SIZES),
+                            help='Event counts listed through the event API')
+        parser.add_argument('--only', help='Run only scenarios whose name contains this text, e.g. "html:"')
+        parser.add_argument('--repeat', type=int, default=3, help='Runs per scenario, the fastest is reported')
+        parser.add_argument('--output', help='JSON file for the results '
+                                             '(defaults to <BENCHMARK_RESULTS_DIR>/<commit>.json)')
+        parser.add_argument('--compare', help='JSON results of an earlier run to compare against')
+        parser.add_argument('--threshold', type=float, default=0.1,
+                            help='Slowdown reported as a regression, as a fraction (default 0.1)')
+        parser.add_argument('--fail-on-regression', action='store_true',
+                            help='Exit with an error if any stage regressed')
+
+    def handle(self, *args, **options):
+        previous = None
+        if options['compare']:
+            try:
+                with open(options['compare'], encoding='utf-8') as f:
+                    previous = json.load(f)
+            except (OSError, ValueError) as e:
+                raise CommandError(f"Could not read {options['compare']}: {e}")
+
+        scenarios = [
+            scenario for scenario in pipeline.default_scenarios(options['sizes'], options['listing_sizes'])
+            if not options['only'] or options['only'] in scenario.name
+        ]
+        if not scenarios:
+            raise CommandError(f"No scenario matches {options['only']!r}")
+
+        results = pipeline.run_suite(
+            scenarios, options['repeat'], progress=lambda scenario: self.stderr.write(f'Running {scenario.name}...')
+        )
+
+        for name, result in results['scenarios'].items():
+            self.stdout.write(self.style.SUCCESS(f"{name}: {result['events']} events"))
+            for stage, timing in dict(result['stages'], total=result['total']).items():
+                rate = timing['events_per_second']
+                self.stdout.write(
+                    f"  {stage:<12} {timing['seconds'] * 1000:10.1f} ms "
+                    f"{rate if rate is not None else '-':>12} events/s "
+                    f"{timing['peak_memory_bytes'] / 1024:10.1f} KiB peak"
+                )
+
+        path = options['output'] or os.path.join(
+            getattr(settings, 'BENCHMARK_RESULTS_DIR', os.path.join(settings.BASE_DIR, 'benchmark-results')),
+            f"{results['commit'] or 'results'}.json",
+        )
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        self.stdout.write(f'Results written to {path}')
+
+        if previous is None:
+            return
+
+        rows = pipeline.compare(previous, results, options['threshold'])
+        self.stdout.write(f"Compared with {previous.get('commit') or options['compare']}:")
+        for row in rows:
+            line = (f"  {row['scenario']:<22} {row['stage']:<12} {row['before'] * 1000:10.1f} ms -> "
+                    f"{row['after'] * 1000:10.1f} ms ({row['change']:+.0%})")
+            self.stdout.write(self.style.ERROR(line) if row['regression'] else line)
+
+        regressions = [row for row in rows if row['regression']]
+        if regressions and options['fail_on_regression']:
+            raise CommandError(f'{len(regressions)} stages regressed by more than {options["threshold"]:.0%}')
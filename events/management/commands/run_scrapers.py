@@ -0,0 +1,49 @@
+import asyncio
+import time
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from events.utils import scheduler
+
+
+class Command(BaseCommand):
+    help = 'Run active site scrapers whose next scheduled run is due'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--limit',
+            type=int,
+            help='Maximum number of scrapers to run in one pass'
+        )
+        parser.add_argument(
+            '--loop',
+            type=int,
+            metavar='SECONDS',
+            help='Keep running, starting a new pass every SECONDS seconds'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='List the due scrapers without running them'
+        )
+
+    def handle(self, *args, **options):
+        if options['dry_run']:
+            due = scheduler.get_due_scrapers(limit=options['limit'])
+            if not due:
+                self.stdout.write('No scrapers are due')
+            for scraper in due:
+                next_run = scraper.next_run_at.isoformat() if scraper.next_run_at else 'never run'
+                self.stdout.write(f'- {scraper.name} ({scraper.url}): {next_run}')
+            return
+
+        while True:
+            results = asyncio.run(scheduler.run_due_scrapers(limit=options['limit']))
+            self.stdout.write(self.style.SUCCESS(
+                f'{timezone.now():%Y-%m-%d %H:%M:%S} ran {len(results)} scrapers'
+            ))
+            for scraper_id, status in results:
+                self.stdout.write(f'- scraper {scraper_id}: {status}')
+
+            if not options['loop']:
+                break
+            time.sleep(options['loop'])
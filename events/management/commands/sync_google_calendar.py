@@ -0,0 +1,36 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+from googleapiclient.errors import HttpError
+from events.utils.calendar_sync import CalendarSyncError, sync_user_calendar
+
+
+class Command(BaseCommand):
+    help = "Sync users' events with their Google calendars, both ways"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help='Username or email of the user to sync '
+                                           '(defaults to everyone who connected a Google account)')
+        parser.add_argument('--calendar', default='primary', help='Google calendar id (default: primary)')
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        if options['user']:
+            users = User.objects.filter(Q(username=options['user']) | Q(email=options['user']))
+            if users.count() != 1:
+                raise CommandError(f"No single user matches {options['user']!r}")
+        else:
+            users = User.objects.filter(socialaccount__provider='google').distinct()
+
+        failures = 0
+        for user in users:
+            try:
+                counts = sync_user_calendar(user, options['calendar'])
+            except (CalendarSyncError, HttpError) as e:
+                failures += 1
+                self.stdout.write(self.style.ERROR(f'{user}: {e}'))
+                continue
+            summary = ', '.join(f'{count} {name.replace("_", " ")}' for name, count in counts.items() if count)
+            self.stdout.write(self.style.SUCCESS(f"{user}: {summary or 'already in sync'}"))
+        if failures:
+            raise CommandError(f'{failures} of {len(users)} syncs failed')
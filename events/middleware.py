@@ -0,0 +1,43 @@
+import time
+
+from django.core.cache import caches
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+
+from .utils import metrics
+
+
+class MetricsMiddleware:
+    """
+    Record latency, database queries and cache lookups per view.
+
+    Only installed when METRICS_ENABLED is set. Place it first in MIDDLEWARE
+    so the timing covers the other middleware as well.
+    """
+
+    def __init__(self, get_response):
+        if not metrics.enabled():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        trace = metrics.RequestTrace()
+        token = metrics.current_trace.set(trace)
+        # Cache connections are per thread, so instrument the one this request uses
+        metrics.instrument_cache(caches['default'])
+        profiler = metrics.SamplingProfiler.maybe_start()
+        started = time.perf_counter()
+        try:
+            with connection.execute_wrapper(trace.record_query):
+                response = self.get_response(request)
+        finally:
+            elapsed = time.perf_counter() - started
+            if profiler is not None:
+                profiler.stop()
+            metrics.current_trace.reset(token)
+
+        match = request.resolver_match
+        view = match.view_name if match else 'unresolved'
+        metrics.record_request(view, request.method, response.status_code, elapsed, trace)
+        response['Server-Timing'] = trace.server_timing(elapsed)
+        return response
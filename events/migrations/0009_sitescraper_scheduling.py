@@ -0,0 +1,53 @@
+# Generated by Django 4.2.9 on 2026-10-18 22:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0008_alter_event_spotify_artist_id_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sitescraper',
+            name='change_rate',
+            field=models.FloatField(default=0.5),
+        ),
+        migrations.AddField(
+            model_name='sitescraper',
+            name='consecutive_failures',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='sitescraper',
+            name='content_hash',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='sitescraper',
+            name='failure_rate',
+            field=models.FloatField(default=0.0),
+        ),
+        migrations.AddField(
+            model_name='sitescraper',
+            name='last_run_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='sitescraper',
+            name='last_run_status',
+            field=models.CharField(blank=True, max_length=20),
+        ),
+        migrations.AddField(
+            model_name='sitescraper',
+            name='next_run_at',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='sitescraper',
+            name='poll_interval',
+            field=models.PositiveIntegerField(default=360, help_text='Current polling interval in minutes, adapted after every scheduled run'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.9 on 2026-10-18 22:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0009_sitescraper_scheduling'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SchemaCacheEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fingerprint', models.CharField(max_length=64, unique=True)),
+                ('css_schema', models.JSONField(default=dict)),
+                ('source_url', models.URLField(blank=True, max_length=500)),
+                ('hit_count', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('last_used_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name_plural': 'schema cache entries',
+                'ordering': ['-hit_count', '-last_used_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.9 on 2026-10-18 22:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0010_schemacacheentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sitescraper',
+            name='requires_js',
+            field=models.BooleanField(blank=True, null=True),
+        ),
+    ]
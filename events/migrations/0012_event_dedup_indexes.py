@@ -0,0 +1,21 @@
+# Generated by Django 4.2.9 on 2026-10-18 23:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0011_sitescraper_requires_js'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['user', 'start_time'], name='events_even_user_id_ae4b8d_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['user', 'url'], name='events_even_user_id_81b119_idx'),
+        ),
+    ]
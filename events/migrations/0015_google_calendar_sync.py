@@ -0,0 +1,54 @@
+# Generated by Django 4.2.9 on 2026-10-19 00:01
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('events', '0014_event_tombstones'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GoogleCalendarSyncState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('calendar_id', models.CharField(default='primary', max_length=255)),
+                ('sync_token', models.CharField(blank=True, max_length=1024)),
+                ('last_synced_at', models.DateTimeField(blank=True, null=True)),
+                ('last_error', models.TextField(blank=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='google_event_id',
+            field=models.CharField(blank=True, max_length=1024),
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='google_synced_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='eventtombstone',
+            name='google_event_id',
+            field=models.CharField(blank=True, max_length=1024),
+        ),
+        migrations.AddConstraint(
+            model_name='event',
+            constraint=models.UniqueConstraint(condition=models.Q(('google_event_id', ''), _negated=True), fields=('user', 'google_event_id'), name='events_event_unique_google_event_id'),
+        ),
+        migrations.AddField(
+            model_name='googlecalendarsyncstate',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='google_calendar_syncs', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddConstraint(
+            model_name='googlecalendarsyncstate',
+            constraint=models.UniqueConstraint(fields=('user', 'calendar_id'), name='events_google_sync_unique_calendar'),
+        ),
+    ]
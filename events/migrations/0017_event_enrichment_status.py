@@ -0,0 +1,22 @@
+# Generated by Django 4.2.9 on 2026-10-19 00:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0016_event_image'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='enrichment_status',
+            field=models.CharField(choices=[('skipped', 'Not a music event'), ('pending', 'Pending'), ('enriched', 'Enriched'), ('not_found', 'No match'), ('failed', 'Failed')], default='skipped', max_length=10),
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(condition=models.Q(('enrichment_status', 'pending')), fields=['id'], name='events_event_enrichment_queue'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.9 on 2026-10-19 01:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0017_event_enrichment_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sitescraper',
+            name='browser_runs',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='sitescraper',
+            name='requires_js_schema',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+    ]
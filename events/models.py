@@ -1,8 +1,23 @@
 from django.db import models
 from django.conf import settings
 from django.urls import reverse
+from django.utils import timezone
 
 class Event(models.Model):
+    # Spotify enrichment, done after import by events.utils.enrichment
+    ENRICHMENT_SKIPPED = 'skipped'
+    ENRICHMENT_PENDING = 'pending'
+    ENRICHMENT_ENRICHED = 'enriched'
+    ENRICHMENT_NOT_FOUND = 'not_found'
+    ENRICHMENT_FAILED = 'failed'
+    ENRICHMENT_CHOICES = [
+        (ENRICHMENT_SKIPPED, 'Not a music event'),
+        (ENRICHMENT_PENDING, 'Pending'),
+        (ENRICHMENT_ENRICHED, 'Enriched'),
+        (ENRICHMENT_NOT_FOUND, 'No match'),
+        (ENRICHMENT_FAILED, 'Failed'),
+    ]
+
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
@@ -34,6 +49,14 @@ class Event(models.Model):
     spotify_artist_name = models.CharField(max_length=255, blank=True)
     spotify_preview_url = models.URLField(max_length=500, blank=True)
     spotify_external_url = models.URLField(max_length=500, blank=True)
+    enrichment_status = models.CharField(max_length=10, choices=ENRICHMENT_CHOICES, default=ENRICHMENT_SKIPPED)
+    
+    # Identifier of the event in an external system that syncs through the API
+    external_id = models.CharField(max_length=255, blank=True)
+
+    # Google Calendar sync (see events.utils.calendar_sync)
+    google_event_id = models.CharField(max_length=1024, blank=True)
+    google_synced_at = models.DateTimeField(null=True, blank=True)
     
     # Settings
     is_public = models.BooleanField(default=True)
@@ -43,6 +66,29 @@ class Event(models.Model):
     class Meta:
         app_label = 'events'
         ordering = ['start_time']
+        indexes = [
+            # Duplicate lookups during imports
+            models.Index(fields=['user', 'start_time']),
+            models.Index(fields=['user', 'url']),
+            # The changes feed pages through a user's events by (updated_at, id)
+            models.Index(fields=['user', 'updated_at', 'id']),
+            # The enrichment worker's queue
+            models.Index(fields=['id'], condition=models.Q(enrichment_status='pending'),
+                         name='events_event_enrichment_queue'),
+        ]
+        constraints = [
+            # Bulk API upserts match on external_id within a user's events
+            models.UniqueConstraint(
+                fields=['user', 'external_id'],
+                condition=~models.Q(external_id=''),
+                name='events_event_unique_external_id',
+            ),
+            models.UniqueConstraint(
+                fields=['user', 'google_event_id'],
+                condition=~models.Q(google_event_id=''),
+                name='events_event_unique_google_event_id',
+            ),
+        ]
         
     def __str__(self):
         return self.title
@@ -67,6 +113,80 @@ class Event(models.Model):
         """Return the full address as a string."""
         return self.location
 
+class EventTombstone(models.Model):
+    """A deleted event, kept so the changes feed can report the deletion to clients."""
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='event_tombstones'
+    )
+    event_id = models.IntegerField()
+    external_id = models.CharField(max_length=255, blank=True)
+    # Cleared once the deletion has been pushed to Google Calendar
+    google_event_id = models.CharField(max_length=1024, blank=True)
+    deleted_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        app_label = 'events'
+        ordering = ['deleted_at', 'id']
+        indexes = [
+            models.Index(fields=['user', 'deleted_at', 'id']),
+        ]
+
+    def __str__(self):
+        return f"Event {self.event_id} deleted at {self.deleted_at}"
+
+class GoogleCalendarSyncState(models.Model):
+    """Where the last Google Calendar sync of a user's calendar left off."""
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='google_calendar_syncs'
+    )
+    calendar_id = models.CharField(max_length=255, default='primary')
+    # Token from Google's last events.list, so the next pull only gets changes
+    sync_token = models.CharField(max_length=1024, blank=True)
+    last_synced_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+
+    class Meta:
+        app_label = 'events'
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'calendar_id'], name='events_google_sync_unique_calendar'),
+        ]
+
+    def __str__(self):
+        return f"{self.user}: {self.calendar_id}"
+
+class EventImage(models.Model):
+    """An event image URL and the thumbnails stored for it (see events.utils.image_proxy)."""
+    PENDING = 'pending'
+    READY = 'ready'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'),
+        (READY, 'Ready'),
+        (FAILED, 'Failed'),
+    ]
+
+    url_hash = models.CharField(max_length=64, unique=True)
+    source_url = models.URLField(max_length=500)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    # SHA-256 of the downloaded image, which names the thumbnail files
+    digest = models.CharField(max_length=64, blank=True, db_index=True)
+    # Bytes of thumbnails this URL added to storage
+    size = models.PositiveIntegerField(default=0)
+    error = models.CharField(max_length=255, blank=True)
+    # Last download attempt, successful or not
+    fetched_at = models.DateTimeField(null=True, blank=True)
+    last_used_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    class Meta:
+        app_label = 'events'
+
+    def __str__(self):
+        return f"{self.source_url} ({self.status})"
+
 class SiteScraper(models.Model):
     """Model to store site scraper configurations with CSS extraction strategies."""
     user = models.ForeignKey(
@@ -89,7 +209,27 @@ class SiteScraper(models.Model):
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
-    
+
+    # Scheduling (see events.utils.scheduler)
+    poll_interval = models.PositiveIntegerField(
+        default=360,
+        help_text="Current polling interval in minutes, adapted after every scheduled run"
+    )
+    next_run_at = models.DateTimeField(null=True, blank=True, db_index=True)
+    last_run_at = models.DateTimeField(null=True, blank=True)
+    last_run_status = models.CharField(max_length=20, blank=True)
+    consecutive_failures = models.PositiveIntegerField(default=0)
+    failure_rate = models.FloatField(default=0.0)
+    change_rate = models.FloatField(default=0.5)
+    content_hash = models.CharField(max_length=64, blank=True)
+
+    # Whether the page only shows events after JavaScript runs (None until detected)
+    requires_js = models.BooleanField(null=True, blank=True)
+    # Hash of the css_schema requires_js was detected with; a new schema is detected again
+    requires_js_schema = models.CharField(max_length=64, blank=True)
+    # Browser runs since extraction without a browser was last tried
+    browser_runs = models.PositiveIntegerField(default=0)
+
     class Meta:
         app_label = 'events'
         ordering = ['name']
@@ -98,4 +238,21 @@ class SiteScraper(models.Model):
         return self.name
         
     def get_absolute_url(self):
-        return reverse('events:scraper_detail', kwargs={'pk': self.pk})
\ No newline at end of file
+        return reverse('events:scraper_detail', kwargs={'pk': self.pk})
+
+class SchemaCacheEntry(models.Model):
+    """A generated CSS schema cached by the structural fingerprint of the page it was built for."""
+    fingerprint = models.CharField(max_length=64, unique=True)
+    css_schema = models.JSONField(default=dict)
+    source_url = models.URLField(max_length=500, blank=True)
+    hit_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_used_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        app_label = 'events'
+        ordering = ['-hit_count', '-last_used_at']
+        verbose_name_plural = 'schema cache entries'
+
+    def __str__(self):
+        return f"{self.fingerprint[:12]} ({self.source_url})"
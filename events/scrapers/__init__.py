@@ -1 +1,31 @@
-# This file can be empty 
\ No newline at end of file
+"""
+Scrapers by name, imported the first time a job uses them.
+
+The crawl4ai scraper pulls in crawl4ai, Playwright, pydantic and an LLM
+client, which take most of a second and tens of megabytes to import. Views,
+management commands and workers that only serve calendar pages shouldn't pay
+for that, so nothing imports scraper modules at module level; ``get`` loads
+the one a job asks for.
+"""
+from functools import lru_cache
+
+from django.utils.module_loading import import_string
+
+# Name of each import source, as the import form and bulk import call them,
+# and the dotted path of its entry point
+SCRAPERS = {
+    # async scrape_events(url) -> event dicts
+    'crawl4ai': 'events.scrapers.generic_crawl4ai.scrape_events',
+    # ICalScraper().process_events(url) -> event dicts
+    'ical': 'events.scrapers.ical_scraper.ICalScraper',
+}
+
+
+@lru_cache(maxsize=None)
+def get(name: str):
+    """The entry point of the scraper called ``name``, importing its module on first use."""
+    try:
+        path = SCRAPERS[name]
+    except KeyError:
+        raise ValueError(f"Unknown scraper: {name}") from None
+    return import_string(path)
@@ -0,0 +1,166 @@
+"""
+Chunked LLM extraction of events from long pages.
+
+The page is minimized and split into overlapping chunks (see
+events.utils.html_minimizer), every chunk is sent to the LLM concurrently
+under a concurrency limit, and the per-chunk results are merged and
+deduplicated. Wall time is roughly that of the slowest chunk instead of
+growing with the page length, and the output token cap applies per chunk.
+"""
+import asyncio
+import json
+import logging
+import re
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional
+
+from django.conf import settings
+
+from ..utils import metrics
+from ..utils.html_minimizer import minimize_html, chunk_html
+
+logger = logging.getLogger(__name__)
+
+PROMPT_TEMPLATE = """Here is a fragment of the page {url}:
+<html>
+{html}
+</html>
+
+{instruction}
+
+Return ONLY a JSON array of objects matching this JSON schema, or [] if the
+fragment contains no events:
+{schema}
+"""
+
+
+class LLMProvider(ABC):
+    """Something that turns a prompt into the model's text response."""
+
+    @abstractmethod
+    async def complete(self, prompt: str) -> str:
+        """The model's response to ``prompt``."""
+
+
+class LiteLLMProvider(LLMProvider):
+    """Calls a hosted model through litellm, the client crawl4ai already uses."""
+
+    def __init__(self, model: str, api_token: str, extra_args: Dict = None):
+        self.model = model
+        self.api_token = api_token
+        self.extra_args = extra_args or {}
+
+    async def complete(self, prompt: str) -> str:
+        from litellm import acompletion
+
+        response = await acompletion(
+            model=self.model,
+            messages=[{'role': 'user', 'content': prompt}],
+            api_key=self.api_token,
+            **self.extra_args
+        )
+        return response.choices[0].message.content or ''
+
+
+def parse_llm_events(content: str) -> List[Dict]:
+    """Pull the list of event objects out of a model response."""
+    if not content:
+        return []
+    # Models often wrap JSON in a code fence or add a sentence around it
+    match = re.search(r'\[.*\]|\{.*\}', content, re.DOTALL)
+    if not match:
+        logger.warning(f"No JSON found in LLM response: {content[:200]}")
+        return []
+    try:
+        data = json.loads(match.group(0))
+    except json.JSONDecodeError as e:
+        logger.warning(f"Could not parse LLM response as JSON: {str(e)}")
+        return []
+    if isinstance(data, dict):
+        data = data.get('events', [data])
+    return [item for item in data if isinstance(item, dict)]
+
+
+def _normalize(value) -> str:
+    return re.sub(r'[^a-z0-9]+', ' ', str(value or '').lower()).strip()
+
+
+def merge_events(chunk_results: List[List[Dict]], title_key: str = 'event_title',
+                 date_key: str = 'event_date') -> List[Dict]:
+    """
+    Merge per-chunk results in page order, deduplicating by normalized (title, date).
+
+    Events repeated by chunk overlap are combined: empty fields in the first
+    copy are filled from later copies.
+    """
+    merged: Dict[tuple, Dict] = {}
+    for events in chunk_results:
+        for event in events:
+            key = (_normalize(event.get(title_key)), _normalize(event.get(date_key)))
+            if not key[0]:
+                continue
+            if key not in merged:
+                merged[key] = dict(event)
+                continue
+            existing = merged[key]
+            for field, value in event.items():
+                if value and not existing.get(field):
+                    existing[field] = value
+    return list(merged.values())
+
+
+async def extract_chunks(chunks: List[str], url: str, provider: LLMProvider, instruction: str,
+                         schema: Dict, concurrency: int = 4) -> List[List[Dict]]:
+    """Extract events from every chunk concurrently, returning results in chunk order."""
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    schema_json = json.dumps(schema, indent=2)
+
+    async def extract_chunk(index: int, chunk: str) -> List[Dict]:
+        prompt = PROMPT_TEMPLATE.format(url=url, html=chunk, instruction=instruction, schema=schema_json)
+        async with semaphore:
+            try:
+                content = await provider.complete(prompt)
+            except Exception as e:
+                logger.error(f"LLM extraction failed for chunk {index + 1}/{len(chunks)} of {url}: {str(e)}")
+                return []
+        events = parse_llm_events(content)
+        logger.info(f"Chunk {index + 1}/{len(chunks)} of {url}: {len(events)} events")
+        return events
+
+    return await asyncio.gather(*(extract_chunk(index, chunk) for index, chunk in enumerate(chunks)))
+
+
+async def extract_events_from_html(html_content: str, url: str, provider: LLMProvider, instruction: str,
+                                   schema: Dict, chunk_tokens: Optional[int] = None,
+                                   overlap: Optional[int] = None,
+                                   concurrency: Optional[int] = None) -> List[Dict]:
+    """
+    Extract raw event dicts from a page with one LLM call per chunk.
+
+    Args:
+        html_content: The page HTML
+        url: The page URL, passed to the model for context
+        provider: The LLM provider to call
+        instruction: What to extract
+        schema: JSON schema of one event
+        chunk_tokens: Maximum tokens per chunk (LLM_CHUNK_TOKEN_THRESHOLD)
+        overlap: Blocks shared by consecutive chunks (LLM_CHUNK_OVERLAP_BLOCKS)
+        concurrency: Maximum concurrent LLM calls (LLM_EXTRACTION_CONCURRENCY)
+
+    Returns:
+        The merged, deduplicated list of events
+    """
+    chunk_tokens = chunk_tokens or getattr(settings, 'LLM_CHUNK_TOKEN_THRESHOLD', 2000)
+    overlap = overlap if overlap is not None else getattr(settings, 'LLM_CHUNK_OVERLAP_BLOCKS', 1)
+    concurrency = concurrency or getattr(settings, 'LLM_EXTRACTION_CONCURRENCY', 4)
+
+    chunks = chunk_html(minimize_html(html_content), max_tokens=chunk_tokens, overlap=overlap)
+    if not chunks:
+        return []
+    logger.info(f"Extracting events from {url} in {len(chunks)} chunks (concurrency {concurrency})")
+
+    with metrics.span('extract'):
+        chunk_results = await extract_chunks(chunks, url, provider, instruction, schema, concurrency)
+    events = merge_events(chunk_results)
+    logger.info(f"Merged {sum(len(result) for result in chunk_results)} chunk results into {len(events)} events")
+    return events
@@ -0,0 +1,140 @@
+"""
+Cache of generated CSS schemas keyed by a structural fingerprint of the page.
+
+Venues that run the same ticketing or CMS platform share nearly identical
+markup, so a schema generated for one of them usually works for the others.
+The fingerprint is a hash of the page's tag/class skeleton, which ignores text
+and how many times a repeated element (e.g. an event card) occurs.
+"""
+import hashlib
+import logging
+import re
+from typing import Dict, List, Optional
+
+from lxml import etree, html as lxml_html
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# Elements whose contents never describe page structure
+IGNORED_TAGS = {'script', 'style', 'noscript', 'svg', 'template', 'iframe', 'head', 'link', 'meta'}
+
+# Class names with digits are usually per-item ids or build hashes (event-1234, css-1x2y3z)
+VOLATILE_CLASS = re.compile(r'\d')
+
+
+def _node_token(element) -> str:
+    classes = sorted({
+        cls.lower() for cls in (element.get('class') or '').split()
+        if not VOLATILE_CLASS.search(cls)
+    })
+    return '.'.join([element.tag.lower()] + classes)
+
+
+def structural_fingerprint(html_content: str) -> Optional[str]:
+    """
+    Return a hash of the page's tag/class skeleton.
+
+    The skeleton is the set of distinct root-to-node token paths in the body,
+    so text, attribute values, sibling counts and the order of optional fields
+    don't change the fingerprint.
+    """
+    if not html_content:
+        return None
+    try:
+        document = lxml_html.document_fromstring(html_content)
+    except (etree.ParserError, ValueError) as e:
+        logger.warning(f"Could not parse HTML for fingerprinting: {str(e)}")
+        return None
+
+    body = document.find('body')
+    root = body if body is not None else document
+
+    paths = set()
+    stack = [(root, _node_token(root))]
+    while stack:
+        element, path = stack.pop()
+        paths.add(path)
+        for child in element:
+            if not isinstance(child.tag, str) or child.tag.lower() in IGNORED_TAGS:
+                continue
+            stack.append((child, f"{path}>{_node_token(child)}"))
+
+    skeleton = '\n'.join(sorted(paths))
+    return hashlib.sha256(skeleton.encode('utf-8')).hexdigest()
+
+
+def count_schema_matches(css_schema: Dict, html_content: str, url: str = '') -> int:
+    """Count the items with a title that ``css_schema`` extracts from ``html_content``."""
+    if not isinstance(css_schema, dict) or 'baseSelector' not in css_schema:
+        return 0
+
+    from .static_extractor import extract_with_schema
+
+    try:
+        items = extract_with_schema(html_content, css_schema, url)
+    except Exception as e:
+        logger.debug(f"Cached schema failed to run: {str(e)}")
+        return 0
+    return sum(1 for item in items if isinstance(item, dict) and item.get('title'))
+
+
+def store_schema(fingerprint: str, css_schema: Dict, source_url: str = '') -> None:
+    """Remember the schema generated for a page layout."""
+    from ..models import SchemaCacheEntry
+
+    if not fingerprint or not css_schema:
+        return
+    SchemaCacheEntry.objects.update_or_create(
+        fingerprint=fingerprint,
+        defaults={'css_schema': css_schema, 'source_url': source_url},
+    )
+
+
+def find_cached_schema(html_content: str, url: str = '', fingerprint: str = None,
+                       exclude: List[Dict] = None) -> Optional[Dict]:
+    """
+    Return a cached schema for the page, or None if the LLM has to generate one.
+
+    An exact fingerprint match is returned as long as it still extracts events.
+    Otherwise the most used cached schemas are tried against the page and the
+    one extracting the most events is kept and stored under this fingerprint.
+    Schemas in ``exclude`` (e.g. one that just failed) are never returned.
+    """
+    from ..models import SchemaCacheEntry
+
+    fingerprint = fingerprint or structural_fingerprint(html_content)
+    exclude = exclude or []
+    min_matches = getattr(settings, 'SCHEMA_CACHE_MIN_MATCHES', 1)
+
+    if fingerprint:
+        entry = SchemaCacheEntry.objects.filter(fingerprint=fingerprint).first()
+        if entry and entry.css_schema not in exclude:
+            if count_schema_matches(entry.css_schema, html_content, url) >= min_matches:
+                SchemaCacheEntry.objects.filter(pk=entry.pk).update(
+                    hit_count=F('hit_count') + 1, last_used_at=timezone.now()
+                )
+                logger.info(f"Schema cache hit for {url} (fingerprint {fingerprint[:12]})")
+                return entry.css_schema
+
+    candidate_limit = getattr(settings, 'SCHEMA_CACHE_CANDIDATES', 10)
+    best_entry, best_matches = None, 0
+    for entry in SchemaCacheEntry.objects.exclude(fingerprint=fingerprint)[:candidate_limit]:
+        if entry.css_schema in exclude:
+            continue
+        matches = count_schema_matches(entry.css_schema, html_content, url)
+        if matches > best_matches:
+            best_entry, best_matches = entry, matches
+
+    if best_entry is None or best_matches < min_matches:
+        logger.info(f"Schema cache miss for {url}")
+        return None
+
+    logger.info(f"Reusing cached schema from {best_entry.source_url} for {url} ({best_matches} events)")
+    SchemaCacheEntry.objects.filter(pk=best_entry.pk).update(
+        hit_count=F('hit_count') + 1, last_used_at=timezone.now()
+    )
+    store_schema(fingerprint, best_entry.css_schema, url)
+    return best_entry.css_schema
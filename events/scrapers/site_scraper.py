@@ -1,9 +1,11 @@
 import asyncio
+import hashlib
 import os
 import json
 import re
 import logging
-from typing import Optional, Dict, List, Tuple
+from typing import Callable, Optional, Dict, List, Tuple
+from urllib.parse import urlparse, urljoin
 from datetime import datetime, timedelta
 import pytz
 from dotenv import load_dotenv
@@ -18,68 +20,96 @@ from crawl4ai import (
     CacheMode
 )
 
+from .schema_cache import structural_fingerprint, find_cached_schema, store_schema
+from ..utils.html_minimizer import minimize_html, estimate_tokens
+from ..utils import metrics
+from .static_extractor import extract_with_schema, fetch_static_html
+
 # Set up logging
 logger = logging.getLogger(__name__)
 
+BACKGROUND_IMAGE_URL = re.compile(r"url\(['\"]?(https?://[^'\")]+)['\"]?\)")
+
 # Load environment variables
 load_dotenv()
 
-# Function to transform relative URLs to absolute URLs
-def transform_url(url, base_url):
-    if not url:
-        return None
+def make_url_resolver(base_url: str) -> Callable[[str], Optional[str]]:
+    """
+    Return a function that makes URLs found on ``base_url`` absolute.
+    
+    The base URL is parsed once and resolved URLs are memoized, so resolving
+    every link and image of a page costs one parse per distinct URL.
+    """
+    # Make sure base_url is properly formatted
+    if base_url and not (base_url.startswith('http://') or base_url.startswith('https://')):
+        base_url = 'https://' + base_url
+    
+    try:
+        parsed_url = urlparse(base_url)
+        # Use the scheme and netloc as the base for relative URLs
+        base_domain = f"{parsed_url.scheme}://{parsed_url.netloc}"
+    except Exception as e:
+        logger.error(f"Error parsing base URL {base_url}: {str(e)}")
+        base_domain = None
+    
+    resolved = {}
     
+    def resolve(url):
+        if not url or not isinstance(url, str):
+            return None
+        if url not in resolved:
+            resolved[url] = _resolve_url(url, base_url, base_domain)
+        return resolved[url]
+    
+    return resolve
+
+def _resolve_url(url: str, base_url: str, base_domain: Optional[str]) -> Optional[str]:
     # Skip base64 encoded images
-    if url and isinstance(url, str) and url.startswith('data:image'):
+    if url.startswith('data:image'):
         return None
     
     # Handle background-image CSS property
-    if url and isinstance(url, str) and 'background-image:' in url:
+    if 'background-image:' in url:
         # Extract URL from background-image: url('...')
-        match = re.search(r"url\(['\"]?(https?://[^'\")]+)['\"]?\)", url)
-        if match:
-            url = match.group(1)
-        else:
+        match = BACKGROUND_IMAGE_URL.search(url)
+        if not match:
             return None
+        url = match.group(1)
     
     # If the URL is already absolute, return it as is
-    if url and isinstance(url, str) and (url.startswith('http://') or url.startswith('https://')):
+    if url.startswith('http://') or url.startswith('https://'):
         return url
     
-    # Parse the base URL to get the domain
-    from urllib.parse import urlparse, urljoin
-    
-    # Make sure base_url is properly formatted
-    if base_url and not (base_url.startswith('http://') or base_url.startswith('https://')):
-        base_url = 'https://' + base_url
+    if base_domain is None:
+        return url
     
     # For any site, ensure we're using the correct base URL (scheme + netloc)
     # This ensures that relative paths like "/path/to/page" work correctly
     try:
-        parsed_url = urlparse(base_url)
-        # Use the scheme and netloc as the base for relative URLs
-        base_domain = f"{parsed_url.scheme}://{parsed_url.netloc}"
-        
         # If the URL starts with a slash, it's relative to the domain root
-        if url and isinstance(url, str) and url.startswith('/'):
-            absolute_url = f"{base_domain}{url}"
-        else:
-            # Otherwise use urljoin which handles other relative URL formats
-            absolute_url = urljoin(base_url, url)
-            
-        logger.debug(f"Transformed URL: {url} -> {absolute_url} (base: {base_url})")
-        return absolute_url
+        if url.startswith('/'):
+            return f"{base_domain}{url}"
+        # Otherwise use urljoin which handles other relative URL formats
+        return urljoin(base_url, url)
     except Exception as e:
         logger.error(f"Error transforming URL {url} with base {base_url}: {str(e)}")
         return url
 
-async def generate_css_schema(url: str, api_key: str = None) -> Dict:
+# Function to transform relative URLs to absolute URLs
+def transform_url(url, base_url):
+    return make_url_resolver(base_url)(url)
+
+async def generate_css_schema(url: str, api_key: str = None, exclude_schemas: List[Dict] = None) -> Dict:
     """
     Generate a CSS schema for extracting event information from a website.
     
+    Pages whose layout matches a cached schema (see schema_cache) reuse it
+    instead of asking the LLM.
+    
     Args:
         url: The URL of the website to generate a schema for
         api_key: The API key for the LLM provider (Gemini)
+        exclude_schemas: Schemas known not to work for this URL, never reused from the cache
         
     Returns:
         A dictionary containing the CSS schema
@@ -117,6 +147,23 @@ async def generate_css_schema(url: str, api_key: str = None) -> Dict:
                 
             logger.info(f"Successfully fetched HTML content ({len(html_content)} bytes)")
             
+            # Reuse a schema generated for a page with the same layout if one still works
+            fingerprint = structural_fingerprint(html_content)
+            cached_schema = await sync_to_async(find_cached_schema, thread_sensitive=False)(
+                html_content, url, fingerprint, exclude_schemas
+            )
+            if cached_schema:
+                return cached_schema
+            
+            # The LLM only needs a few samples of each repeated element to write selectors
+            schema_html = minimize_html(
+                html_content,
+                collapse_repeated=True,
+                keep_samples=getattr(settings, 'SCHEMA_HTML_SAMPLES', 3)
+            )
+            logger.info(f"Minimized HTML for schema generation: {estimate_tokens(html_content)} -> "
+                        f"{estimate_tokens(schema_html)} tokens")
+            
             # Define the exact same query as crawl4ai_demo.py
             query = """
             You are an expert web scraper. I need to extract event information from a given URL.
@@ -176,7 +223,7 @@ async def generate_css_schema(url: str, api_key: str = None) -> Dict:
             
             # Generate the CSS schema
             css_schema = JsonCssExtractionStrategy.generate_schema(
-                html_content,
+                schema_html,
                 schema_type="CSS",
                 query=query,
                 provider="gemini/gemini-2.0-flash-lite",
@@ -186,11 +233,84 @@ async def generate_css_schema(url: str, api_key: str = None) -> Dict:
             # Log the generated schema
             logger.info(f"Generated CSS schema: {json.dumps(css_schema, indent=2)}")
             
+            await sync_to_async(store_schema, thread_sensitive=False)(fingerprint, css_schema, url)
+            
             return css_schema
     except Exception as e:
         logger.error(f"Error generating CSS schema: {str(e)}")
         raise
 
+@metrics.span('parse_dates')
+def normalize_event_rows(rows: List[Dict], url: str) -> List[Dict]:
+    """
+    Turn the items extracted with a CSS schema into event dicts.
+    
+    Works on the whole page at once: the base URL is parsed once, links and
+    images are resolved through one memoized resolver, each distinct
+    combined date string is split into date and times only once, and each
+    distinct date and times are turned into datetimes only once.
+    
+    Args:
+        rows: The raw items extracted from the page
+        url: The page URL, used to make links and images absolute
+        
+    Returns:
+        A list of normalized events, with ``start_datetime`` and
+        ``end_datetime`` as format_event_datetime returns them
+    """
+    from ..utils.time_parser import extract_date_time_from_string, format_event_datetime
+    
+    resolve = make_url_resolver(url)
+    split_dates = {}
+    datetimes = {}
+    normalized = []
+    
+    for row in rows:
+        if not isinstance(row, dict):
+            continue
+        
+        date = row.get("date", "")
+        start_time = row.get("start_time", "")
+        end_time = row.get("end_time", "")
+        
+        # Handle case where date field contains both date and time information
+        if date and not start_time and isinstance(date, str) and (
+                ':' in date or '-' in date or ' at ' in date.lower()):
+            if date not in split_dates:
+                split_dates[date] = extract_date_time_from_string(date)
+            extracted_date, extracted_start, extracted_end = split_dates[date]
+            date = extracted_date or date
+            start_time = extracted_start or start_time
+            end_time = extracted_end or end_time
+        
+        # Use data-src image if regular image_url is empty
+        image_url = row.get("image_url", "") or row.get("data_image_url") or ""
+        link = row.get("url", "")
+        
+        times = (date, start_time, end_time)
+        if times not in datetimes:
+            datetimes[times] = format_event_datetime(*times)
+        start_datetime, end_datetime = datetimes[times]
+        
+        normalized.append({
+            "title": row.get("title", ""),
+            "description": row.get("description", ""),
+            "date": date,
+            "start_time": start_time,
+            "end_time": end_time,
+            "start_datetime": start_datetime,
+            "end_datetime": end_datetime,
+            "location": row.get("location", ""),
+            "url": resolve(link) if link and isinstance(link, str) else link,
+            "image_url": resolve(image_url) if image_url and isinstance(image_url, str) else image_url,
+        })
+    
+    logger.info(f"Normalized {len(normalized)} events from {url} ({len(split_dates)} distinct combined dates, {len(datetimes)} distinct times)")
+    if normalized:
+        logger.debug(f"First normalized event: {normalized[0]}")
+    
+    return normalized
+
 async def run_css_schema(url: str, css_schema: Dict) -> List[Dict]:
     """
     Test a CSS schema against a website to extract events.
@@ -304,7 +424,8 @@ async def run_css_schema(url: str, css_schema: Dict) -> List[Dict]:
         
         # Run the crawler
         async with crawler:
-            result = await crawler.arun(url=url, config=config)
+            with metrics.span('render'):
+                result = await crawler.arun(url=url, config=config)
             
             if not result.success:
                 if hasattr(result, 'error') and result.error:
@@ -329,55 +450,7 @@ async def run_css_schema(url: str, css_schema: Dict) -> List[Dict]:
             
             logger.info(f"Raw extracted events: {len(events)}")
             
-            # Format the events
-            formatted_events = []
-            for event in events:
-                # Format the event data
-                formatted_event = {
-                    "title": event.get("title", ""),
-                    "description": event.get("description", ""),
-                    "date": event.get("date", ""),
-                    "start_time": event.get("start_time", ""),
-                    "end_time": event.get("end_time", ""),
-                    "location": event.get("location", ""),
-                    "url": event.get("url", ""),
-                    "image_url": event.get("image_url", "")
-                }
-                
-                # Handle case where date field contains both date and time information
-                if formatted_event["date"] and (not formatted_event["start_time"] or formatted_event["start_time"] == ""):
-                    # Check if date field might contain time information
-                    if ':' in formatted_event["date"] or ' at ' in formatted_event["date"].lower() or '-' in formatted_event["date"]:
-                        from ..utils.time_parser import extract_date_time_from_string
-                        
-                        # Extract date, start time, and possibly end time
-                        extracted_date, extracted_start, extracted_end = extract_date_time_from_string(formatted_event["date"])
-                        
-                        if extracted_date:
-                            formatted_event["date"] = extracted_date
-                        if extracted_start:
-                            formatted_event["start_time"] = extracted_start
-                        if extracted_end:
-                            formatted_event["end_time"] = extracted_end
-                            
-                        logger.info(f"Extracted from date field - date: '{formatted_event['date']}', "
-                                   f"start: '{formatted_event['start_time']}', end: '{formatted_event['end_time']}'")
-                
-                # Use data-src image if regular image_url is empty
-                if not formatted_event["image_url"] and event.get("data_image_url"):
-                    formatted_event["image_url"] = event.get("data_image_url")
-                
-                # Ensure URLs are absolute
-                if formatted_event["url"] and isinstance(formatted_event["url"], str):
-                    formatted_event["url"] = transform_url(formatted_event["url"], url)
-                
-                if formatted_event["image_url"] and isinstance(formatted_event["image_url"], str):
-                    formatted_event["image_url"] = transform_url(formatted_event["image_url"], url)
-                
-                # Log the formatted event
-                logger.info(f"Formatted event: {formatted_event}")
-                
-                formatted_events.append(formatted_event)
+            formatted_events = normalize_event_rows(events, url)
             
             logger.info(f"Extracted {len(formatted_events)} events")
             
@@ -389,6 +462,85 @@ async def run_css_schema(url: str, css_schema: Dict) -> List[Dict]:
         logger.error(traceback.format_exc())
         return []
 
+async def run_css_schema_static(url: str, css_schema: Dict) -> List[Dict]:
+    """
+    Extract events with a CSS schema from the page's HTML as served, without a browser.
+    
+    Args:
+        url: The URL of the website
+        css_schema: The CSS schema to apply
+        
+    Returns:
+        A list of extracted events, empty if the page couldn't be fetched or nothing matched
+    """
+    html_content = await sync_to_async(fetch_static_html, thread_sensitive=False)(url)
+    if not html_content:
+        return []
+    
+    events = extract_with_schema(html_content, css_schema, url)
+    logger.info(f"Static extraction found {len(events)} events on {url}")
+    return normalize_event_rows(events, url)
+
+def schema_hash(css_schema: Dict) -> str:
+    return hashlib.sha256(json.dumps(css_schema, sort_keys=True).encode('utf-8')).hexdigest()
+
+async def run_css_schema_for_scraper(scraper) -> List[Dict]:
+    """
+    Extract events for a site scraper, rendering the page in a browser only when needed.
+    
+    The static fast path is tried first unless the scraper is known to need
+    JavaScript. If it finds nothing, the page is rendered with crawl4ai and the
+    outcome is remembered in ``scraper.requires_js``. A page found to need
+    JavaScript is tried without a browser again once its schema changes, and
+    every ``STATIC_RECHECK_RUNS`` runs in case the site changed.
+    
+    Args:
+        scraper: The SiteScraper to run
+        
+    Returns:
+        A list of extracted events
+    """
+    recheck = scraper.requires_js is True and (
+        scraper.requires_js_schema != schema_hash(scraper.css_schema)
+        or scraper.browser_runs >= getattr(settings, 'STATIC_RECHECK_RUNS', 20)
+    )
+    if scraper.requires_js is not True or recheck:
+        events = await run_css_schema_static(scraper.url, scraper.css_schema)
+        if events:
+            if scraper.requires_js is not False:
+                await _set_requires_js(scraper, False)
+            return events
+        logger.info(f"No events found without a browser for {scraper.url}, rendering the page")
+    
+    events = await run_css_schema(scraper.url, scraper.css_schema)
+    if events and (scraper.requires_js is not True or recheck):
+        await _set_requires_js(scraper, True)
+    elif scraper.requires_js is True:
+        await _count_browser_run(scraper)
+    return events
+
+async def _set_requires_js(scraper, requires_js: bool) -> None:
+    from ..models import SiteScraper
+    
+    scraper.requires_js = requires_js
+    scraper.requires_js_schema = schema_hash(scraper.css_schema)
+    scraper.browser_runs = 0
+    if scraper.pk:
+        await sync_to_async(
+            SiteScraper.objects.filter(pk=scraper.pk).update, thread_sensitive=False
+        )(requires_js=requires_js, requires_js_schema=scraper.requires_js_schema, browser_runs=0)
+    logger.info(f"Scraper {scraper.pk} ({scraper.url}) requires_js={requires_js}")
+
+async def _count_browser_run(scraper) -> None:
+    from django.db.models import F
+    from ..models import SiteScraper
+    
+    scraper.browser_runs += 1
+    if scraper.pk:
+        await sync_to_async(
+            SiteScraper.objects.filter(pk=scraper.pk).update, thread_sensitive=False
+        )(browser_runs=F('browser_runs') + 1)
+
 async def scrape_with_site_scraper(scraper_id: int) -> List[Dict]:
     """
     Scrape events using a stored site scraper.
@@ -406,7 +558,7 @@ async def scrape_with_site_scraper(scraper_id: int) -> List[Dict]:
         scraper = await sync_to_async(SiteScraper.objects.get)(pk=scraper_id)
         
         # Test the CSS schema
-        events = await run_css_schema(scraper.url, scraper.css_schema)
+        events = await run_css_schema_for_scraper(scraper)
         
         # Update the last tested timestamp and test results
         scraper.last_tested = timezone.now()
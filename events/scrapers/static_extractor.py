@@ -0,0 +1,121 @@
+"""
+Apply a stored CSS schema to raw HTML without a browser.
+
+Most venue pages are rendered on the server, so a plain HTTP GET returns the
+same event markup as headless Chromium at a fraction of the time and memory.
+LxmlCssExtractionStrategy runs crawl4ai's schema format (baseSelector,
+fields, nested/list fields, transforms, defaults) on an lxml tree, so a
+schema extracts the same items here as in run_css_schema.
+"""
+import logging
+import re
+from functools import lru_cache
+from typing import Dict, List, Optional, Union
+
+import requests
+from cssselect import HTMLTranslator, SelectorError
+from crawl4ai.extraction_strategy import JsonElementExtractionStrategy
+from django.conf import settings
+from lxml import etree, html as lxml_html
+
+from ..utils import metrics, public_http
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HEADERS = {
+    'User-Agent': (
+        'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 '
+        '(KHTML, like Gecko) Chrome/122.0 Safari/537.36'
+    ),
+    'Accept': 'text/html,application/xhtml+xml',
+}
+
+_META_CHARSET = re.compile(rb'<meta[^>]+charset', re.IGNORECASE)
+
+_translator = HTMLTranslator()
+
+
+@lru_cache(maxsize=512)
+def _compile(selector: str, prefix: str) -> etree.XPath:
+    return etree.XPath(_translator.css_to_xpath(selector, prefix=prefix))
+
+
+class LxmlCssExtractionStrategy(JsonElementExtractionStrategy):
+    """crawl4ai's JsonCssExtractionStrategy on lxml instead of BeautifulSoup."""
+
+    def __init__(self, schema: Dict, **kwargs):
+        kwargs['input_format'] = 'html'
+        super().__init__(schema, **kwargs)
+
+    def _parse_html(self, html_content: Union[str, bytes]):
+        return lxml_html.document_fromstring(html_content)
+
+    def _select(self, element, selector: str, prefix: str) -> list:
+        try:
+            return _compile(selector, prefix)(element)
+        except (SelectorError, etree.XPathError) as e:
+            logger.warning(f"Invalid CSS selector '{selector}': {str(e)}")
+            return []
+
+    def _get_base_elements(self, parsed_html, selector: str):
+        return self._select(parsed_html, selector, 'descendant-or-self::')
+
+    def _get_elements(self, element, selector: str):
+        # Like BeautifulSoup's select(), only match descendants, never the element itself
+        return self._select(element, selector, 'descendant::')
+
+    def _get_element_text(self, element) -> str:
+        # Same result as BeautifulSoup's get_text(strip=True)
+        return ''.join(text.strip() for text in element.itertext())
+
+    def _get_element_html(self, element) -> str:
+        return lxml_html.tostring(element, encoding='unicode', with_tail=False)
+
+    def _get_element_attribute(self, element, attribute: str):
+        value = element.get(attribute)
+        # Lazy-loaded images keep the real URL in data-src and a placeholder in src
+        if attribute == 'src' and (not value or value.startswith('data:')):
+            value = element.get('data-src') or value
+        return value
+
+
+@metrics.span('extract')
+def extract_with_schema(html_content: Union[str, bytes], css_schema: Dict, url: str = '') -> List[Dict]:
+    """Run ``css_schema`` against ``html_content``, returning the raw extracted items."""
+    if not html_content or not isinstance(css_schema, dict) or 'baseSelector' not in css_schema:
+        return []
+    try:
+        return LxmlCssExtractionStrategy(schema=css_schema).extract(url, html_content)
+    except (etree.ParserError, ValueError) as e:
+        logger.warning(f"Could not parse HTML from {url}: {str(e)}")
+        return []
+
+
+def decode_html(response: requests.Response) -> Union[str, bytes]:
+    """
+    The page in a response, decoded with the charset its headers name. Pages
+    that only name it in a <meta> tag are left as bytes for lxml to decode,
+    and pages that name none are read as UTF-8, falling back to Windows-1252.
+    """
+    if 'charset=' in response.headers.get('Content-Type', '').lower():
+        return response.text
+    content = response.content
+    if _META_CHARSET.search(content[:4096]):
+        return content
+    try:
+        return content.decode('utf-8')
+    except UnicodeDecodeError:
+        return content.decode('cp1252', errors='replace')
+
+
+@metrics.span('fetch')
+def fetch_static_html(url: str, timeout: Optional[float] = None) -> Optional[Union[str, bytes]]:
+    """GET a page from a public host without rendering it. Returns None if the request fails."""
+    timeout = timeout or getattr(settings, 'STATIC_FETCH_TIMEOUT', 15)
+    try:
+        response = public_http.get(url, headers=DEFAULT_HEADERS, timeout=timeout)
+        response.raise_for_status()
+    except requests.RequestException as e:
+        logger.info(f"Static fetch of {url} failed: {str(e)}")
+        return None
+    return decode_html(response)
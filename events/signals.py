@@ -0,0 +1,43 @@
+from django.db.models import QuerySet
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from profiles.models import Profile
+from .models import Event, EventTombstone
+from .utils import discovery, enrichment, image_proxy
+
+
+@receiver(post_save, sender=Event)
+def update_discovery_on_save(sender, instance, **kwargs):
+    discovery.apply_event_change(instance)
+
+
+@receiver(post_save, sender=Event)
+def prefetch_event_image(sender, instance, update_fields=None, **kwargs):
+    if instance.image_url and (update_fields is None or 'image_url' in update_fields):
+        image_proxy.prefetch([instance.image_url])
+
+
+@receiver(post_save, sender=Event)
+def schedule_enrichment(sender, instance, update_fields=None, **kwargs):
+    if instance.enrichment_status == Event.ENRICHMENT_PENDING and (update_fields is None or
+                                                                   'enrichment_status' in update_fields):
+        enrichment.schedule()
+
+
+@receiver(post_delete, sender=Event)
+def update_discovery_on_delete(sender, instance, **kwargs):
+    discovery.apply_event_change(instance, deleted=True)
+
+
+@receiver(post_delete, sender=Event)
+def record_tombstone(sender, instance, origin=None, **kwargs):
+    # Events removed along with their user have no one left to sync with
+    if isinstance(origin, Event) or (isinstance(origin, QuerySet) and origin.model is Event):
+        EventTombstone.objects.create(user_id=instance.user_id, event_id=instance.pk,
+                                      external_id=instance.external_id,
+                                      google_event_id=instance.google_event_id)
+
+
+@receiver(post_save, sender=Profile)
+def update_discovery_on_profile_save(sender, instance, **kwargs):
+    discovery.apply_profile_change(instance)
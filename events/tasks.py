@@ -1,46 +1,24 @@
 from celery import shared_task
-from django.conf import settings
-from django.utils import timezone
-from .models import EventSource, Event
-from .utils.event_extractor import EventExtractor
+
 
 @shared_task
-def scrape_event_sources(source_id=None):
+def run_due_scrapers(limit=None):
     """
-    Periodic task to scrape event sources
+    Periodic task to run every active site scraper whose next run is due.
     """
-    sources = EventSource.objects.filter(is_active=True)
-    if source_id:
-        sources = sources.filter(id=source_id)
+    from .utils import scheduler
+    from .views import run_async_in_thread
+
+    results = run_async_in_thread(scheduler.run_due_scrapers, limit=limit)
+    return [list(result) for result in results]
 
-    extractor = EventExtractor(openai_api_key=settings.OPENAI_API_KEY)
 
-    for source in sources:
-        try:
-            events_data = extractor.extract_events(source.url)
-            
-            # Create events
-            events_to_create = []
-            for event_data in events_data:
-                event = Event(
-                    title=event_data.get('title'),
-                    description=event_data.get('description'),
-                    start_datetime=event_data.get('start_datetime'),
-                    end_datetime=event_data.get('end_datetime'),
-                    location=event_data.get('location'),
-                    cost=event_data.get('cost'),
-                    url=event_data.get('url'),
-                    source=source
-                )
-                events_to_create.append(event)
-            
-            # Bulk create to improve performance
-            Event.objects.bulk_create(events_to_create)
-            
-            # Update last scraped time
-            source.last_scraped = timezone.now()
-            source.save()
+@shared_task
+def enrich_pending_events():
+    """
+    Periodic task to look up pending music events on Spotify, in case the
+    worker thread that would have was stopped by a restart.
+    """
+    from .utils import enrichment
 
-        except Exception as e:
-            # Log the error
-            print(f"Error scraping {source.url}: {e}")
\ No newline at end of file
+    return enrichment.drain()
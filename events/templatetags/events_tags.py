@@ -1,8 +1,30 @@
 from django import template
+from django.conf import settings
+from ..utils import image_proxy
 
 register = template.Library()
 
 @register.filter
 def get_item(dictionary, key):
     """Get an item from a dictionary using bracket notation."""
-    return dictionary.get(key, key) 
\ No newline at end of file
+    return dictionary.get(key, key)
+
+@register.simple_tag
+def event_image_url(event_id, image_url, width=640):
+    """URL of a thumbnail of an event's image, served by the image proxy."""
+    return image_proxy.thumbnail_url(event_id, image_url, width)
+
+@register.simple_tag
+def event_image_srcset(event_id, image_url):
+    """A srcset offering every thumbnail width of an event's image."""
+    return ', '.join(
+        f'{image_proxy.thumbnail_url(event_id, image_url, width)} {width}w' for width in image_proxy.widths()
+    )
+
+@register.simple_tag
+def event_fragment_seconds():
+    """
+    How long rendered event cards and detail fragments are cached. They are
+    keyed by the event's ``updated_at``, so edits never serve a stale fragment.
+    """
+    return getattr(settings, 'EVENT_FRAGMENT_CACHE_SECONDS', 24 * 3600)
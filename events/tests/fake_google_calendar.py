@@ -0,0 +1,189 @@
+import json
+import threading
+import uuid
+from datetime import datetime, timezone
+from email.parser import Parser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+
+EVENTS_PREFIX = '/calendar/v3/calendars/'
+BATCH_PATH = '/batch/calendar/v3'
+
+
+class FakeCalendarServer:
+    """
+    Stands in for the Google Calendar API in tests, on a local port.
+
+    Serves events.list with page and sync tokens, insert, update, delete and
+    the multipart batch endpoint, for any calendar id. ``http_requests`` logs
+    each HTTP request and ``calls`` each API call, batched ones included.
+    ``add_event``, ``edit_event`` and ``cancel_event`` make changes the way
+    someone using Google Calendar would.
+    """
+
+    def __init__(self, token='test-token'):
+        self.token = token
+        self.events = {}
+        self.sequence = 0
+        self.oldest_sync_token = 0
+        self.http_requests = []
+        self.calls = []
+        self.lock = threading.Lock()
+        self.server = None
+
+    def __enter__(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def handle_one(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                body = self.rfile.read(length).decode() if length else ''
+                fake.http_requests.append((self.command, self.path))
+                if urlsplit(self.path).path == BATCH_PATH:
+                    status, content_type, payload = fake.batch(self.headers, body)
+                else:
+                    status, data = fake.call(self.command, self.path, dict(self.headers), body)
+                    content_type, payload = 'application/json; charset=UTF-8', json.dumps(data) if data else ''
+                payload = payload.encode()
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            do_GET = do_POST = do_PUT = do_DELETE = handle_one
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        threading.Thread(target=self.server.serve_forever, args=(0.05,), daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.shutdown()
+        self.server.server_close()
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.server.server_address[1]}/'
+
+    # Changes made on Google's side
+
+    def _store(self, event):
+        self.sequence += 1
+        event['updated'] = datetime.now(timezone.utc).isoformat(timespec='milliseconds').replace('+00:00', 'Z')
+        event['_sequence'] = self.sequence
+        self.events[event['id']] = event
+        return event
+
+    def add_event(self, summary, start, end, **fields):
+        return self._store({'id': uuid.uuid4().hex, 'status': 'confirmed', 'summary': summary,
+                            'start': {'dateTime': start.isoformat()}, 'end': {'dateTime': end.isoformat()},
+                            **fields})
+
+    def edit_event(self, event_id, **fields):
+        return self._store(dict(self.events[event_id], **fields))
+
+    def cancel_event(self, event_id):
+        return self._store(dict(self.events[event_id], status='cancelled'))
+
+    def expire_sync_tokens(self):
+        self.oldest_sync_token = self.sequence + 1
+
+    def live_events(self):
+        return [event for event in self.events.values() if event['status'] != 'cancelled']
+
+    # The API
+
+    def call(self, method, path, headers, body):
+        with self.lock:
+            self.calls.append((method, urlsplit(path).path))
+            if headers.get('authorization', headers.get('Authorization')) != f'Bearer {self.token}':
+                return 401, _error(401, 'Invalid Credentials')
+            url = urlsplit(path)
+            parts = [unquote(part) for part in url.path[len(EVENTS_PREFIX):].split('/')]
+            if not url.path.startswith(EVENTS_PREFIX) or len(parts) not in (2, 3) or parts[1] != 'events':
+                return 404, _error(404, 'Not Found')
+            query = {name: values[0] for name, values in parse_qs(url.query).items()}
+            data = json.loads(body) if body else {}
+            if len(parts) == 2:
+                if method == 'GET':
+                    return self.list(query)
+                if method == 'POST':
+                    return self.insert(data)
+            else:
+                if method == 'PUT':
+                    return self.update(parts[2], data)
+                if method == 'DELETE':
+                    return self.delete(parts[2])
+            return 405, _error(405, 'Method Not Allowed')
+
+    def list(self, query):
+        if 'syncToken' in query:
+            since = int(query['syncToken'].split('-')[1])
+            if since < self.oldest_sync_token:
+                return 410, _error(410, 'Sync token is no longer valid, a full sync is required.', 'fullSyncRequired')
+        else:
+            since = None
+        offset, snapshot = map(int, query.get('pageToken', f'0:{self.sequence}').split(':'))
+        changes = sorted(
+            (event for event in self.events.values()
+             if event['_sequence'] <= snapshot
+             and (event['_sequence'] > since if since is not None else event['status'] != 'cancelled')),
+            key=lambda event: event['_sequence'],
+        )
+        page_size = int(query.get('maxResults', 250))
+        page = changes[offset:offset + page_size]
+        data = {'kind': 'calendar#events', 'items': [_public(event) for event in page]}
+        if offset + page_size < len(changes):
+            data['nextPageToken'] = f'{offset + page_size}:{snapshot}'
+        else:
+            data['nextSyncToken'] = f'sync-{snapshot}'
+        return 200, data
+
+    def insert(self, data):
+        event_id = data.get('id') or uuid.uuid4().hex
+        if event_id in self.events:
+            return 409, _error(409, 'The requested identifier already exists.', 'duplicate')
+        return 200, _public(self._store(dict(data, id=event_id, status='confirmed')))
+
+    def update(self, event_id, data):
+        if event_id not in self.events or self.events[event_id]['status'] == 'cancelled':
+            return 404, _error(404, 'Not Found')
+        return 200, _public(self._store(dict(data, id=event_id, status='confirmed')))
+
+    def delete(self, event_id):
+        if event_id not in self.events:
+            return 404, _error(404, 'Not Found')
+        if self.events[event_id]['status'] == 'cancelled':
+            return 410, _error(410, 'Resource has been deleted', 'deleted')
+        self.cancel_event(event_id)
+        return 204, None
+
+    def batch(self, headers, body):
+        message = Parser().parsestr(f"Content-Type: {headers['Content-Type']}\r\n\r\n{body}")
+        boundary = uuid.uuid4().hex
+        chunks = []
+        for part in message.get_payload():
+            request_line, _, rest = part.get_payload().partition('\n')
+            method, path, _ = request_line.strip().split(' ')
+            inner = Parser().parsestr(rest)
+            status, data = self.call(method, path, dict(inner.items()), inner.get_payload())
+            content_id = part['Content-ID'].replace('<', '<response-', 1)
+            chunks.append(
+                f'--{boundary}\r\nContent-Type: application/http\r\nContent-ID: {content_id}\r\n\r\n'
+                f'HTTP/1.1 {status} {"OK" if status < 300 else "Error"}\r\n'
+                f'Content-Type: application/json; charset=UTF-8\r\n\r\n{json.dumps(data) if data else ""}\r\n'
+            )
+        return 200, f'multipart/mixed; boundary={boundary}', ''.join(chunks) + f'--{boundary}--\r\n'
+
+
+def _public(event):
+    return {name: value for name, value in event.items() if not name.startswith('_')}
+
+
+def _error(code, message, reason=None):
+    return {'error': {'code': code, 'message': message, 'errors': [{'reason': reason or 'error', 'message': message}]}}
@@ -0,0 +1,32 @@
+import asyncio
+import json
+from events.scrapers.chunked_extraction import LLMProvider
+
+
+class FakeLLMProvider(LLMProvider):
+    """
+    Stands in for an LLM provider in tests.
+
+    ``responses`` is either canned data returned for every prompt or a callable
+    taking the prompt and returning the data. Data that isn't a string is
+    serialized to JSON, the way a model would answer.
+    """
+
+    def __init__(self, responses, delay=0.0):
+        self.responses = responses
+        self.delay = delay
+        self.prompts = []
+        self.active = 0
+        self.max_active = 0
+
+    async def complete(self, prompt):
+        self.prompts.append(prompt)
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            delay = self.delay(prompt) if callable(self.delay) else self.delay
+            await asyncio.sleep(delay)
+            data = self.responses(prompt) if callable(self.responses) else self.responses
+        finally:
+            self.active -= 1
+        return data if isinstance(data, str) else json.dumps(data)
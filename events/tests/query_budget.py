@@ -0,0 +1,36 @@
+"""
+Query-count budgets for views.
+
+assertNumQueries pins an exact number, which breaks on every harmless change.
+A budget is an upper bound: tests seed enough rows that a per-row query (an
+N+1) blows through it, while small changes below the bound keep passing.
+"""
+from contextlib import contextmanager
+
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test.utils import CaptureQueriesContext
+
+
+class QueryBudgetMixin:
+    """TestCase mixin providing assertMaxQueries."""
+
+    @contextmanager
+    def assertMaxQueries(self, budget, using=DEFAULT_DB_ALIAS):
+        with CaptureQueriesContext(connections[using]) as context:
+            yield context
+        executed = len(context.captured_queries)
+        if executed > budget:
+            queries = '\n'.join(
+                f'{position}. {query["sql"]}' for position, query in enumerate(context.captured_queries, 1)
+            )
+            self.fail(f'{executed} queries executed, budget is {budget}\nCaptured queries were:\n{queries}')
+
+    def assertGetWithinBudget(self, url, budget, status_code=200, **extra):
+        """GET ``url`` with the test client and check both the status and the query budget."""
+        with self.assertMaxQueries(budget):
+            response = self.client.get(url, **extra)
+            if response.streaming:
+                # A streamed body runs its queries as it is read
+                response.streaming_content = list(response.streaming_content)
+        self.assertEqual(response.status_code, status_code, url)
+        return response
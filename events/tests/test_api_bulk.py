@@ -0,0 +1,113 @@
+from datetime import timedelta
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from events.models import Event
+
+BULK_URL = '/api/events/bulk/'
+
+
+class TestBulkEventApi(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username='sync', password='testpass')
+        self.other = get_user_model().objects.create_user(username='other', password='testpass')
+        self.client.force_login(self.user)
+        self.start = timezone.now() + timedelta(days=2)
+
+    def item(self, number, **fields):
+        return {'external_id': f'ext-{number}', 'title': f'Show {number}',
+                'start_time': (self.start + timedelta(hours=number)).isoformat(), **fields}
+
+    def post(self, data):
+        return self.client.post(BULK_URL, data, content_type='application/json')
+
+    def test_creates_and_upserts_by_external_id(self):
+        kept = Event.objects.create(user=self.user, title='Old title', external_id='ext-1', start_time=self.start)
+        Event.objects.create(user=self.other, title='Not mine', external_id='ext-2', start_time=self.start)
+
+        with self.assertNumQueries(2 + 1 + 4):  # session and user, lookup, savepoint/insert/update/release
+            response = self.post([self.item(1), self.item(2), {'title': 'No external id'}])
+
+        data = response.json()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((data['created'], data['updated'], data['unchanged'], data['invalid']), (2, 1, 0, 0))
+        self.assertEqual([result['status'] for result in data['results']], ['updated', 'created', 'created'])
+        self.assertEqual(data['results'][0]['id'], kept.pk)
+        kept.refresh_from_db()
+        self.assertEqual(kept.title, 'Show 1')
+        self.assertEqual(Event.objects.filter(user=self.user, external_id='ext-2').count(), 1)
+        self.assertEqual(Event.objects.get(user=self.other).title, 'Not mine')
+
+    def test_updates_by_id_are_partial(self):
+        event = Event.objects.create(user=self.user, title='Jazz Night', description='Keep me', start_time=self.start)
+        foreign = Event.objects.create(user=self.other, title='Not mine', start_time=self.start)
+
+        data = self.post([{'id': event.pk, 'title': 'Jazz Night (Sold Out)'}, {'id': foreign.pk, 'title': 'Mine now'}]).json()
+
+        self.assertEqual(data['results'][0]['status'], 'updated')
+        self.assertEqual(data['results'][1], {'index': 1, 'status': 'invalid', 'errors': {'id': ['Not found.']}})
+        event.refresh_from_db()
+        self.assertEqual((event.title, event.description), ('Jazz Night (Sold Out)', 'Keep me'))
+        foreign.refresh_from_db()
+        self.assertEqual(foreign.title, 'Not mine')
+
+    def test_unchanged_events_are_not_written(self):
+        self.post([self.item(1)])
+
+        with self.assertNumQueries(2 + 1):  # session and user, lookup
+            data = self.post([self.item(1)]).json()
+
+        self.assertEqual(data['results'][0]['status'], 'unchanged')
+
+    def test_invalid_items_are_reported_and_skipped(self):
+        data = self.post([self.item(1), {'external_id': 'ext-2'}, self.item(1, title='Again'), 'nonsense']).json()
+
+        self.assertEqual([result['status'] for result in data['results']], ['created', 'invalid', 'invalid', 'invalid'])
+        self.assertIn('title', data['results'][1]['errors'])
+        self.assertEqual(data['results'][2]['errors'], {'external_id': ['Duplicate of item 0.']})
+        self.assertEqual(Event.objects.filter(user=self.user).count(), 1)
+
+    @override_settings(API_BULK_MAX_ITEMS=2)
+    def test_rejects_oversized_and_malformed_payloads(self):
+        self.assertEqual(self.post([self.item(1), self.item(2), self.item(3)]).status_code, 400)
+        self.assertEqual(self.post({'title': 'Not a list'}).status_code, 400)
+        self.assertFalse(Event.objects.exists())
+
+    def test_bulk_delete(self):
+        by_id = Event.objects.create(user=self.user, title='One', start_time=self.start)
+        Event.objects.create(user=self.user, title='Two', external_id='ext-2', start_time=self.start)
+        foreign = Event.objects.create(user=self.other, title='Not mine', external_id='ext-3', start_time=self.start)
+
+        response = self.client.delete(BULK_URL, {'ids': [by_id.pk, foreign.pk], 'external_ids': ['ext-2', 'ext-3']},
+                                      content_type='application/json')
+
+        data = response.json()
+        self.assertEqual(data['deleted'], 2)
+        self.assertEqual([result['status'] for result in data['results']],
+                         ['deleted', 'not_found', 'deleted', 'not_found'])
+        self.assertEqual(list(Event.objects.all()), [foreign])
+
+    def test_requires_authentication(self):
+        self.client.logout()
+        self.assertEqual(self.post([self.item(1)]).status_code, 403)
+
+    def test_single_event_writes_reject_a_duplicate_external_id(self):
+        taken = Event.objects.create(user=self.user, title='One', external_id='ext-1', start_time=self.start)
+        other = Event.objects.create(user=self.user, title='Two', external_id='ext-2', start_time=self.start)
+        Event.objects.create(user=self.other, title='Not mine', external_id='ext-3', start_time=self.start)
+
+        response = self.client.post('/api/events/', self.item(1), content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('external_id', response.json())
+
+        response = self.client.patch(f'/api/events/{other.pk}/', {'external_id': 'ext-1'},
+                                     content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('external_id', response.json())
+
+        # Keeping an event's own external_id, or taking another user's, is fine
+        response = self.client.patch(f'/api/events/{taken.pk}/', {'external_id': 'ext-1', 'title': 'Renamed'},
+                                     content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        response = self.client.post('/api/events/', self.item(3), content_type='application/json')
+        self.assertEqual(response.status_code, 201)
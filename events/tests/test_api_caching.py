@@ -0,0 +1,133 @@
+from datetime import timedelta
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.utils import timezone
+from events.models import Event
+from profiles.models import Profile
+
+JSON = {'HTTP_ACCEPT': 'application/json'}
+
+
+class TestConditionalGet(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username='cached', password='testpass')
+        self.client.force_login(self.user)
+        self.start = timezone.now() + timedelta(days=1)
+        self.event = Event.objects.create(user=self.user, title='Jazz Night', start_time=self.start)
+
+    def revalidate(self, url, response, **headers):
+        return self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'], **headers, **JSON)
+
+    def test_unchanged_event_list_is_not_modified(self):
+        first = self.client.get('/api/events/', **JSON)
+        self.assertIn('Last-Modified', first)
+
+        with self.assertNumQueries(2 + 1):  # session and user, validators
+            second = self.revalidate('/api/events/', first)
+
+        self.assertEqual(second.status_code, 304)
+        self.assertEqual(second['ETag'], first['ETag'])
+        since = self.client.get('/api/events/', HTTP_IF_MODIFIED_SINCE=first['Last-Modified'], **JSON)
+        self.assertEqual(since.status_code, 304)
+
+    def test_list_changes_with_updates_and_deletions(self):
+        other = Event.objects.create(user=self.user, title='Open Mic', start_time=self.start)
+        first = self.client.get('/api/events/', **JSON)
+
+        self.event.title = 'Jazz Night (Sold Out)'
+        self.event.save()
+        updated = self.revalidate('/api/events/', first)
+        self.assertEqual(updated.status_code, 200)
+
+        other.delete()
+        deleted = self.revalidate('/api/events/', updated)
+        self.assertEqual(deleted.status_code, 200)
+        self.assertEqual([event['title'] for event in deleted.json()], ['Jazz Night (Sold Out)'])
+
+    def test_etag_depends_on_user_and_fields(self):
+        first = self.client.get('/api/events/', **JSON)
+        self.assertEqual(self.revalidate('/api/events/?fields=id', first).status_code, 200)
+
+        twin = get_user_model().objects.create_user(username='twin', password='testpass')
+        Event.objects.create(user=twin, title='Jazz Night', start_time=self.start)
+        self.client.force_login(twin)
+        self.assertEqual(self.revalidate('/api/events/', first).status_code, 200)
+
+    def test_event_detail(self):
+        url = f'/api/events/{self.event.pk}/'
+        first = self.client.get(url, **JSON)
+        self.assertEqual(self.revalidate(url, first).status_code, 304)
+
+        Event.objects.filter(pk=self.event.pk).update(updated_at=timezone.now() + timedelta(seconds=1))
+        self.assertEqual(self.revalidate(url, first).status_code, 200)
+
+    def test_profile_list_and_detail(self):
+        first = self.client.get('/api/profiles/', **JSON)
+        self.assertNotIn('Last-Modified', first)
+        self.assertEqual(self.revalidate('/api/profiles/', first).status_code, 304)
+
+        profile = Profile.objects.get(user=self.user)
+        profile.bio = 'Saxophone'
+        profile.save()
+        self.assertEqual(self.revalidate('/api/profiles/', first).status_code, 200)
+
+        url = f'/api/profiles/{profile.pk}/'
+        detail = self.client.get(url, **JSON)
+        self.assertNotIn('Last-Modified', detail)
+        self.assertEqual(self.revalidate(url, detail).status_code, 304)
+
+    def test_profile_etags_change_with_the_username(self):
+        profile = Profile.objects.get(user=self.user)
+        url = f'/api/profiles/{profile.pk}/'
+        listing = self.client.get('/api/profiles/', **JSON)
+        detail = self.client.get(url, **JSON)
+
+        self.user.username = 'renamed'
+        self.user.save()
+
+        fresh = self.revalidate('/api/profiles/', listing)
+        self.assertEqual(fresh.status_code, 200)
+        self.assertEqual(fresh.json()[0]['username'], 'renamed')
+        self.assertEqual(self.revalidate(url, detail).status_code, 200)
+
+
+class TestSparseFieldsets(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username='sparse', password='testpass')
+        self.client.force_login(self.user)
+        self.event = Event.objects.create(
+            user=self.user, title='Jazz Night', description='A long description', venue_name='Main Stage',
+            venue_city='Boston', start_time=timezone.now() + timedelta(days=1),
+        )
+
+    def test_limits_output_and_columns(self):
+        with self.assertNumQueries(2 + 2) as context:  # session and user, validators, events
+            response = self.client.get('/api/events/?fields=id,title,location', **JSON)
+
+        self.assertEqual(response.json(), [{'id': self.event.pk, 'title': 'Jazz Night', 'location': 'Main Stage, Boston, United States'}])
+        select = context.captured_queries[-1]['sql']
+        self.assertIn('"venue_city"', select)
+        self.assertNotIn('"description"', select)
+
+    def test_detail_and_profile_fields(self):
+        event = self.client.get(f'/api/events/{self.event.pk}/?fields=title', **JSON).json()
+        self.assertEqual(event, {'title': 'Jazz Night'})
+
+        profiles = self.client.get('/api/profiles/?fields=username', **JSON).json()
+        self.assertEqual(profiles, [{'username': 'sparse'}])
+
+        profile = Profile.objects.get(user=self.user)
+        events = self.client.get(f'/api/profiles/{profile.pk}/events/?fields=id', **JSON).json()
+        self.assertEqual(events, [{'id': self.event.pk}])
+
+    def test_unknown_fields_are_rejected(self):
+        response = self.client.get('/api/events/?fields=id,password', **JSON)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'fields': ['Unknown field: password']})
+
+    def test_writes_ignore_fields(self):
+        response = self.client.post('/api/events/?fields=id', {
+            'title': 'Open Mic', 'start_time': (timezone.now() + timedelta(days=2)).isoformat(),
+        }, content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['title'], 'Open Mic')
@@ -0,0 +1,104 @@
+from datetime import timedelta
+from io import StringIO
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from api.changes import encode_cursor
+from events.models import Event, EventTombstone
+
+CHANGES_URL = '/api/events/changes/'
+
+
+@override_settings(EVENT_CHANGES_SETTLE_SECONDS=0)
+class TestEventChanges(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username='mobile', password='testpass')
+        self.client.force_login(self.user)
+        self.start = timezone.now() + timedelta(days=1)
+
+    def event(self, title, **kwargs):
+        return Event.objects.create(user=self.user, title=title, start_time=self.start, **kwargs)
+
+    def changes(self, since=None, **params):
+        if since:
+            params['since'] = since
+        response = self.client.get(CHANGES_URL, params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_reports_only_what_changed_since_the_cursor(self):
+        jazz = self.event('Jazz Night')
+        mic = self.event('Open Mic', external_id='mic-1')
+        first = self.changes()
+        self.assertEqual([event['title'] for event in first['created']], ['Jazz Night', 'Open Mic'])
+
+        jazz.title = 'Jazz Night (Sold Out)'
+        jazz.save()
+        self.event('Poetry Slam')
+        self.client.post(reverse('events:delete', args=[mic.pk]))
+
+        with self.assertNumQueries(2 + 2):  # session and user, events and tombstones
+            changes = self.changes(first['cursor'])
+
+        self.assertEqual([event['title'] for event in changes['created']], ['Poetry Slam'])
+        self.assertEqual([event['title'] for event in changes['updated']], ['Jazz Night (Sold Out)'])
+        self.assertEqual([(item['id'], item['external_id']) for item in changes['deleted']], [(mic.pk, 'mic-1')])
+        self.assertFalse(changes['has_more'])
+
+        unchanged = self.changes(changes['cursor'])
+        self.assertEqual((unchanged['created'], unchanged['updated'], unchanged['deleted']), ([], [], []))
+
+    def test_pages_through_changes_with_equal_timestamps(self):
+        start = self.changes()['cursor']
+        moment = timezone.now()
+        events = [self.event(f'Show {number}') for number in range(5)]
+        Event.objects.filter(pk__in=[event.pk for event in events]).update(updated_at=moment)
+        EventTombstone.objects.create(user=self.user, event_id=999, deleted_at=moment)
+
+        seen, cursor, pages = [], start, 0
+        while True:
+            page = self.changes(cursor, limit=2)
+            seen += [event['id'] for event in page['created'] + page['updated']]
+            seen += [item['id'] for item in page['deleted']]
+            cursor, pages = page['cursor'], pages + 1
+            if not page['has_more']:
+                break
+
+        self.assertEqual(sorted(seen), sorted([event.pk for event in events] + [999]))
+        self.assertEqual(pages, 3)
+
+    def test_bulk_api_deletes_leave_tombstones(self):
+        cursor = self.changes()['cursor']
+        event = self.event('Jazz Night', external_id='jazz')
+
+        self.client.delete('/api/events/bulk/', {'external_ids': ['jazz']}, content_type='application/json')
+
+        self.assertEqual([item['id'] for item in self.changes(cursor)['deleted']], [event.pk])
+
+    def test_deleting_a_user_leaves_no_tombstones(self):
+        other = get_user_model().objects.create_user(username='leaving', password='testpass')
+        Event.objects.create(user=other, title='Farewell', start_time=self.start)
+
+        other.delete()
+
+        self.assertFalse(EventTombstone.objects.exists())
+
+    @override_settings(EVENT_CHANGES_SETTLE_SECONDS=60)
+    def test_recent_changes_are_held_back(self):
+        self.event('Jazz Night')
+        self.assertEqual(self.changes()['created'], [])
+
+    def test_bad_and_expired_cursors(self):
+        self.assertEqual(self.client.get(CHANGES_URL, {'since': 'not-a-cursor'}).status_code, 400)
+        expired = encode_cursor(timezone.now() - timedelta(days=365))
+        self.assertEqual(self.client.get(CHANGES_URL, {'since': expired}).status_code, 410)
+
+    def test_prune_old_tombstones(self):
+        EventTombstone.objects.create(user=self.user, event_id=1, deleted_at=timezone.now() - timedelta(days=365))
+        EventTombstone.objects.create(user=self.user, event_id=2)
+
+        call_command('prune_event_tombstones', stdout=StringIO())
+
+        self.assertEqual(list(EventTombstone.objects.values_list('event_id', flat=True)), [2])
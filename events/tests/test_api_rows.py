@@ -0,0 +1,76 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from api.renderers import FastJSONRenderer
+from api.serializers import EventRowSerializer, EventSerializer
+from events.models import Event
+from profiles.models import Profile
+
+JSON = {'HTTP_ACCEPT': 'application/json'}
+
+
+class TestEventRowSerializer(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username='rows', password='testpass')
+        self.client.force_login(self.user)
+        summer = datetime(2026, 7, 4, 20, 30, 15, 123456, tzinfo=dt_timezone.utc)
+        Event.objects.create(
+            user=self.user, title='Café “Jazz” Night', description='Line one\nLine two \\ </script> \u2028',
+            venue_name='Main Stage', venue_city='Boston', venue_country='', start_time=summer,
+            end_time=summer + timedelta(hours=2), is_public=True, external_id='jazz-1',
+        )
+        Event.objects.create(
+            user=self.user, title='Open Mic 🎤', start_time=datetime(2026, 12, 1, 5, 0, tzinfo=dt_timezone.utc),
+        )
+        self.events = Event.objects.filter(user=self.user)
+
+    def assertSameBytes(self, fields=None):
+        serializer = EventSerializer(self.events, many=True)
+        if fields:
+            for name in set(EventSerializer.Meta.fields) - set(fields):
+                serializer.child.fields.pop(name)
+        expected = JSONRenderer().render(serializer.data)
+        self.assertEqual(FastJSONRenderer().render(EventRowSerializer(self.events, fields).data), expected)
+        return expected
+
+    def test_matches_event_serializer_byte_for_byte(self):
+        self.assertSameBytes()
+        self.assertSameBytes(['title', 'location', 'end_time'])
+        with timezone.override('America/New_York'):
+            self.assertIn(b'-04:00', self.assertSameBytes())
+
+    def test_list_endpoints(self):
+        expected = self.assertSameBytes()
+        self.assertEqual(self.client.get('/api/events/', **JSON).content, expected)
+
+        profile = Profile.objects.get(user=self.user)
+        self.assertEqual(self.client.get(f'/api/profiles/{profile.pk}/events/', **JSON).content, expected)
+
+        sparse = self.client.get('/api/events/?fields=id,title', **JSON).json()
+        self.assertEqual([list(event) for event in sparse], [['id', 'title'], ['id', 'title']])
+
+    def test_list_runs_one_query(self):
+        with self.assertNumQueries(2 + 2):  # session and user, validators, rows
+            self.client.get('/api/events/', **JSON)
+
+
+class TestFastJSONRenderer(TestCase):
+    def test_matches_json_renderer(self):
+        data = {
+            'when': datetime(2026, 7, 4, 20, 30, 15, 123456, tzinfo=dt_timezone.utc),
+            'price': Decimal('12.50'),
+            'big': 2 ** 70,
+            'text': 'tab\tand \u2028\u2029 and é',
+            'nested': [None, True, 1.5, {'empty': []}],
+        }
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+
+    def test_indent_falls_back(self):
+        data = {'title': 'Jazz Night'}
+        self.assertEqual(
+            FastJSONRenderer().render(data, 'application/json; indent=4'),
+            JSONRenderer().render(data, 'application/json; indent=4'),
+        )
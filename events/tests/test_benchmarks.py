@@ -0,0 +1,103 @@
+import json
+import os
+import tempfile
+from io import StringIO
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import SimpleTestCase, TestCase
+from events.benchmarks import fixtures, pipeline
+from events.models import Event
+from events.scrapers.static_extractor import extract_with_schema
+
+
+class TestFixtures(SimpleTestCase):
+    def test_synthetic_inputs_have_the_requested_size(self):
+        rows = extract_with_schema(fixtures.synthetic_page(30), fixtures.SYNTHETIC_SCHEMA)
+        events = pipeline.parse_ical(fixtures.synthetic_feed(30))
+
+        self.assertEqual(len(rows), 30)
+        self.assertEqual(rows[0]['image_url'], '/lazy/show-0.jpg')
+        self.assertEqual(len(events), 30)
+        self.assertEqual(events[1]['venue_city'], 'Boston')
+
+    def test_compare_flags_slower_stages(self):
+        def run(seconds):
+            timing = {'seconds': seconds, 'events_per_second': None, 'peak_memory_bytes': 0}
+            return {'scenarios': {'html:example': {'stages': {'extract': timing}, 'total': timing}}}
+
+        rows = pipeline.compare(run(0.010), run(0.013), threshold=0.2)
+
+        self.assertEqual([(row['stage'], row['regression']) for row in rows], [('extract', True), ('total', True)])
+        self.assertFalse(any(row['regression'] for row in pipeline.compare(run(0.010), run(0.011), 0.2)))
+
+
+class TestRunBenchmarks(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.output = os.path.join(self.directory.name, 'results.json')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def run_command(self, *args):
+        call_command('run_benchmarks', '--sizes', '10', '--repeat', '1', *args, stdout=StringIO(), stderr=StringIO())
+
+    def test_writes_stage_timings_and_leaves_no_events(self):
+        self.run_command('--only', 'synthetic', '--output', self.output)
+
+        with open(self.output) as f:
+            results = json.load(f)
+        page = results['scenarios']['html:synthetic-10']
+        self.assertEqual(set(results['scenarios']), {'ical:synthetic-10', 'html:synthetic-10'})
+        self.assertEqual(list(page['stages']), ['extract', 'parse_dates', 'classify', 'db_upsert', 'enrichment'])
+        self.assertEqual(page['events'], 10)
+        self.assertEqual(page['upsert'], {'created': 10, 'merged': 0, 'enriched': 10})
+        self.assertGreater(page['total']['peak_memory_bytes'], 0)
+        self.assertEqual(Event.objects.count(), 0)
+
+    def test_listing_scenario(self):
+        self.run_command('--only', 'api:list', '--listing-sizes', '20', '--output', self.output)
+
+        with open(self.output) as f:
+            listing = json.load(f)['scenarios']['api:list-20']
+        self.assertEqual(list(listing['stages']), ['seed', 'serializer', 'rows'])
+        self.assertEqual(listing['events'], 20)
+        self.assertEqual(Event.objects.count(), 0)
+
+    def test_export_scenario(self):
+        self.run_command('--only', 'export:ical', '--listing-sizes', '20', '--output', self.output)
+
+        with open(self.output) as f:
+            export = json.load(f)['scenarios']['export:ical-20']
+        self.assertEqual(list(export['stages']), ['seed', 'icalendar', 'generator'])
+        self.assertEqual(export['events'], 20)
+        self.assertEqual(Event.objects.count(), 0)
+
+    def test_render_scenario(self):
+        self.run_command('--only', 'render:list', '--output', self.output)
+
+        with open(self.output) as f:
+            render = json.load(f)['scenarios']['render:list-500']
+        self.assertEqual(list(render['stages']), ['seed', 'cold', 'warm'])
+        self.assertLess(render['stages']['warm']['seconds'], render['stages']['cold']['seconds'])
+        self.assertEqual(Event.objects.count(), 0)
+
+    def test_music_scenario(self):
+        self.run_command('--only', 'music:labeled', '--output', self.output)
+
+        with open(self.output) as f:
+            labeled = json.load(f)['scenarios']['music:labeled']
+        self.assertEqual(list(labeled['stages']), ['keywords', 'classifier', 'accuracy'])
+        self.assertGreater(labeled['upsert']['classifier'], labeled['upsert']['keywords'])
+
+    def test_fail_on_regression(self):
+        previous = os.path.join(self.directory.name, 'previous.json')
+        with open(previous, 'w') as f:
+            json.dump({'scenarios': {'ical:wayland-post': {
+                'stages': {'ical_parse': {'seconds': 1e-9}},
+                'total': {'seconds': 1e-9},
+            }}}, f)
+
+        with self.assertRaises(CommandError):
+            self.run_command('--only', 'wayland', '--output', self.output, '--compare', previous,
+                             '--fail-on-regression')
@@ -0,0 +1,180 @@
+import asyncio
+import json
+import logging
+from datetime import timedelta
+from unittest.mock import patch
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
+from django.urls import reverse
+from django.utils import timezone
+from events.models import Event, SiteScraper
+from events.utils import bulk_import, job_logs, scheduler
+from events.views import get_job_status, set_job_status
+
+OPML = """<?xml version="1.0"?>
+<opml version="2.0"><body>
+  <outline text="Venues">
+    <outline text="Club" xmlUrl="https://club.example.com/events.ics"/>
+    <outline text="Hall" htmlUrl="https://hall.example.com/calendar"/>
+  </outline>
+</body></opml>"""
+
+
+class TestParseSources(SimpleTestCase):
+    def test_lines_and_csv(self):
+        text = 'name,url\nClub,https://club.example.com/events.ics\nHall,https://hall.example.com/\n' \
+               'webcal://feeds.example.com/city\nnot a url\nhttps://hall.example.com/'
+        self.assertEqual(bulk_import.parse_sources(text), [
+            'https://club.example.com/events.ics',
+            'https://hall.example.com/',
+            'webcal://feeds.example.com/city',
+        ])
+
+    def test_opml(self):
+        self.assertEqual(bulk_import.parse_sources(OPML),
+                         ['https://club.example.com/events.ics', 'https://hall.example.com/calendar'])
+
+    def test_invalid_opml(self):
+        with self.assertRaises(ValueError):
+            bulk_import.parse_sources('<opml><body>')
+
+
+class TestProbeIsIcal(SimpleTestCase):
+    def test_refuses_private_addresses(self):
+        with patch('events.utils.public_http.socket.getaddrinfo', return_value=[(2, 1, 6, '', ('127.0.0.1', 80))]), \
+                patch('events.utils.public_http.requests.Session.get') as get:
+            self.assertFalse(bulk_import.probe_is_ical('http://localhost:8000/admin/'))
+            self.assertFalse(bulk_import.probe_is_ical('file:///etc/passwd'))
+        get.assert_not_called()
+
+
+class TestDetectImporter(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username='importer', password='testpass')
+        self.scraper = SiteScraper.objects.create(user=self.user, name='Hall', url='https://hall.example.com/calendar')
+
+    def test_feed_urls_need_no_request(self):
+        with patch.object(bulk_import, 'probe_is_ical') as probe:
+            self.assertEqual(bulk_import.detect_importer(self.user, 'webcal://feeds.example.com/city')[0], 'ical')
+            self.assertEqual(bulk_import.detect_importer(self.user, 'https://a.example.com/?ical=1')[0], 'ical')
+        probe.assert_not_called()
+
+    def test_site_scraper_then_probe_then_llm(self):
+        self.assertEqual(bulk_import.detect_importer(self.user, 'https://hall.example.com/calendar/'),
+                         ('css', self.scraper))
+        with patch.object(bulk_import, 'probe_is_ical', return_value=True):
+            self.assertEqual(bulk_import.detect_importer(self.user, 'https://feed.example.com/x'), ('ical', None))
+        with patch.object(bulk_import, 'probe_is_ical', return_value=False):
+            self.assertEqual(bulk_import.detect_importer(self.user, 'https://club.example.com/'), ('crawl4ai', None))
+
+
+class TestBulkImport(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(username='importer', password='testpass')
+        self.throttle = scheduler.DomainThrottle(concurrency=10, delay=0)
+
+    def run_import(self, urls, max_concurrency=2):
+        job = bulk_import.BulkImport('bulk_test', urls, self.user, max_concurrency, self.throttle)
+
+        async def run():
+            with job_logs.job_log('bulk_test'):
+                return await job.run()
+
+        return asyncio.run(run())
+
+    def test_children_run_concurrently_within_the_limit(self):
+        running = []
+        peak = []
+
+        async def fake_crawl(source_url, job_id, user):
+            logging.getLogger('events.views').warning(f'Crawling {source_url}')
+            running.append(job_id)
+            peak.append(len(running))
+            await asyncio.sleep(0.01)
+            running.remove(job_id)
+            if 'broken' in source_url:
+                set_job_status(job_id, {'status': 'error', 'message': 'Page did not load'})
+            else:
+                set_job_status(job_id, {'status': 'complete', 'message': 'ok',
+                                        'stats': {'found': 3, 'created': 2, 'updated': 1}})
+
+        urls = [f'https://site{number}.example.com/' for number in range(4)] + ['https://broken.example.com/']
+        with patch.object(bulk_import, 'probe_is_ical', return_value=False), \
+                patch('events.views.scrape_crawl4ai_events_async', fake_crawl):
+            status = self.run_import(urls)
+
+        self.assertEqual(max(peak), 2)
+        self.assertEqual(status['status'], 'complete')
+        self.assertEqual(status['stats'], {'sources': 5, 'finished': 5, 'failed': 1,
+                                           'found': 12, 'created': 8, 'updated': 4})
+        self.assertEqual(status['children'][4]['status'], 'error')
+        self.assertEqual(status['children'][4]['message'], 'Page did not load')
+        self.assertEqual(get_job_status('bulk_test')['progress'], {'overall': 100})
+        # Each child's log is stored with its own status, the parent's with the parent's
+        child_log = get_job_status(status['children'][4]['job_id'])['log']
+        self.assertIn('Crawling https://broken.example.com/', child_log)
+        self.assertNotIn('site0', child_log)
+        self.assertNotIn('Crawling', get_job_status('bulk_test')['log'])
+
+    def test_ical_child_saves_events(self):
+        start = timezone.now() + timedelta(days=3)
+        feed_events = [{'title': 'Jazz Night', 'start_time': start, 'end_time': start + timedelta(hours=2),
+                        'venue_name': 'Blue Room'}]
+
+        with patch('events.views.ICalScraper.process_events', return_value=feed_events):
+            status = self.run_import(['https://club.example.com/events.ics'])
+
+        child = status['children'][0]
+        self.assertEqual((child['importer'], child['status']), ('ical', 'complete'))
+        self.assertEqual(child['stats'], {'found': 1, 'created': 1, 'updated': 0})
+        self.assertEqual(get_job_status(child['job_id'])['stats']['created'], 1)
+        self.assertTrue(Event.objects.filter(user=self.user, title='Jazz Night').exists())
+
+    def test_all_children_failing_fails_the_parent(self):
+        with patch('events.views.ICalScraper.process_events', side_effect=Exception('Invalid iCal data')):
+            status = self.run_import(['https://club.example.com/events.ics'])
+
+        self.assertEqual(status['status'], 'error')
+        self.assertIn('Invalid iCal data', status['children'][0]['message'])
+
+
+class TestBulkImportView(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(username='importer', password='testpass')
+        self.client.force_login(self.user)
+
+    def test_starts_parent_job_with_children(self):
+        with patch('events.views.Thread') as thread:
+            response = self.client.post(reverse('events:bulk_import'), json.dumps({'urls': [
+                'https://club.example.com/events.ics', 'https://hall.example.com/calendar',
+            ]}), content_type='application/json')
+
+        data = response.json()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([child['job_id'] for child in data['children']],
+                         [f"{data['job_id']}-1", f"{data['job_id']}-2"])
+        thread.return_value.start.assert_called_once()
+
+        status = self.client.get(reverse('events:import_status', args=[data['job_id']])).json()
+        self.assertEqual(status['status'], 'started')
+        self.assertEqual(status['stats']['sources'], 2)
+
+    def test_uploaded_opml(self):
+        with patch('events.views.Thread'):
+            response = self.client.post(reverse('events:bulk_import'), {
+                'sources': SimpleUploadedFile('feeds.opml', OPML.encode()),
+            })
+        self.assertEqual(len(response.json()['children']), 2)
+
+    def test_rejects_empty_and_oversized_lists(self):
+        response = self.client.post(reverse('events:bulk_import'), {'urls': 'nothing here'})
+        self.assertEqual(response.status_code, 400)
+
+        with self.settings(BULK_IMPORT_MAX_URLS=1):
+            response = self.client.post(reverse('events:bulk_import'),
+                                        {'urls': 'https://a.example.com/\nhttps://b.example.com/'})
+        self.assertEqual(response.status_code, 400)
@@ -0,0 +1,164 @@
+from datetime import timedelta
+from io import StringIO
+from allauth.socialaccount.models import SocialAccount, SocialApp, SocialToken
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from events.models import Event, GoogleCalendarSyncState
+from events.utils.calendar_sync import CalendarSyncError, GoogleCalendarSync, google_event_id
+from .fake_google_calendar import FakeCalendarServer
+
+
+class TestGoogleCalendarSync(TestCase):
+    def setUp(self):
+        self.google = FakeCalendarServer().__enter__()
+        self.addCleanup(self.google.__exit__, None, None, None)
+        settings = override_settings(GOOGLE_CALENDAR_API_URL=self.google.url)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+        self.user = get_user_model().objects.create_user(username='synced', email='synced@example.com')
+        app = SocialApp.objects.create(provider='google', name='Google', client_id='client', secret='secret')
+        account = SocialAccount.objects.create(user=self.user, provider='google', uid='1')
+        SocialToken.objects.create(app=app, account=account, token='test-token', token_secret='refresh',
+                                   expires_at=timezone.now() + timedelta(hours=1))
+        self.start = (timezone.now() + timedelta(days=3)).replace(microsecond=0)
+
+    def event(self, title, **fields):
+        return Event.objects.create(user=self.user, title=title, start_time=self.start,
+                                    end_time=self.start + timedelta(hours=3), **fields)
+
+    def sync(self):
+        self.google.http_requests.clear()
+        return GoogleCalendarSync(self.user).sync()
+
+    def google_titles(self):
+        return sorted(event['summary'] for event in self.google.live_events())
+
+    def local_titles(self):
+        return sorted(Event.objects.filter(user=self.user).values_list('title', flat=True))
+
+    def test_first_sync_pushes_and_pulls_everything(self):
+        self.event('Jazz Night', venue_name='Main Stage')
+        self.event('Open Mic')
+        Event.objects.create(user=self.user, title='Date to be announced')
+        self.google.add_event('Dentist', self.start, self.start + timedelta(hours=1))
+
+        counts = self.sync()
+
+        self.assertEqual((counts['pulled_created'], counts['pushed_created']), (1, 2))
+        self.assertEqual(self.google_titles(), ['Dentist', 'Jazz Night', 'Open Mic'])
+        self.assertEqual(self.local_titles(), ['Date to be announced', 'Dentist', 'Jazz Night', 'Open Mic'])
+        # One list, one batch of inserts
+        self.assertEqual([method for method, _ in self.google.http_requests], ['GET', 'POST'])
+        jazz = Event.objects.get(title='Jazz Night')
+        self.assertEqual(self.google.events[jazz.google_event_id]['location'], 'Main Stage, United States')
+        self.assertEqual(jazz.google_synced_at, jazz.updated_at)
+
+    def test_repeat_sync_transfers_only_changes(self):
+        self.event('Jazz Night')
+        self.google.add_event('Dentist', self.start, self.start + timedelta(hours=1))
+        self.sync()
+        before = dict(Event.objects.values_list('pk', 'updated_at'))
+
+        # Google reports back the events just pushed; they match and nothing is written
+        self.assertFalse(any(self.sync().values()))
+        self.assertEqual(dict(Event.objects.values_list('pk', 'updated_at')), before)
+        self.assertFalse(any(self.sync().values()))
+        self.assertEqual([method for method, _ in self.google.http_requests], ['GET'])
+
+    def test_changes_on_both_sides(self):
+        jazz, mic, slam = self.event('Jazz Night'), self.event('Open Mic'), self.event('Poetry Slam')
+        self.sync()
+        dentist = self.google.add_event('Dentist', self.start, self.start + timedelta(hours=1))
+        self.sync()
+        for event in (jazz, mic, slam):
+            event.refresh_from_db()
+
+        jazz.title = 'Jazz Night (Sold Out)'
+        jazz.save()
+        mic.delete()
+        self.event('Book Club')
+        self.google.edit_event(slam.google_event_id, summary='Poetry Slam (Moved)', location='The Parlor')
+        self.google.cancel_event(dentist['id'])
+        self.google.add_event('Haircut', self.start, self.start + timedelta(hours=1))
+
+        counts = self.sync()
+
+        expected = ['Book Club', 'Haircut', 'Jazz Night (Sold Out)', 'Poetry Slam (Moved)']
+        self.assertEqual(self.google_titles(), expected)
+        self.assertEqual(self.local_titles(), expected)
+        self.assertEqual(counts, {'pulled_created': 1, 'pulled_updated': 1, 'pulled_deleted': 1,
+                                  'pushed_created': 1, 'pushed_updated': 1, 'pushed_deleted': 1, 'failed': 0})
+        slam.refresh_from_db()
+        self.assertEqual((slam.venue_name, slam.location), ('The Parlor', 'The Parlor'))
+        self.assertFalse(any(self.sync().values()))
+
+    def test_newer_edit_wins(self):
+        event = self.event('Jazz Night')
+        self.sync()
+        event.refresh_from_db()
+
+        self.google.edit_event(event.google_event_id, summary='Jazz Night (Google)')
+        event.title = 'Jazz Night (Local)'
+        event.save()
+        self.sync()
+        self.assertEqual(self.google_titles(), ['Jazz Night (Local)'])
+
+        event.title = 'Jazz Night (Local again)'
+        event.save()
+        edited = self.google.edit_event(event.google_event_id, summary='Jazz Night (Google again)')
+        # Google's timestamps are in milliseconds; keep its edit clearly newer
+        edited['updated'] = (timezone.now() + timedelta(seconds=1)).isoformat()
+        self.sync()
+        self.assertEqual(self.local_titles(), ['Jazz Night (Google again)'])
+        self.assertEqual(self.google_titles(), ['Jazz Night (Google again)'])
+
+    @override_settings(GOOGLE_CALENDAR_BATCH_SIZE=2)
+    def test_pushes_in_batches(self):
+        for number in range(5):
+            self.event(f'Show {number}')
+
+        self.assertEqual(self.sync()['pushed_created'], 5)
+
+        self.assertEqual([method for method, _ in self.google.http_requests], ['GET', 'POST', 'POST', 'POST'])
+        self.assertEqual(len(self.google.calls), 1 + 5)
+
+    def test_retried_insert_does_not_duplicate(self):
+        event = self.event('Jazz Night')
+        # An earlier push reached Google but its response was lost
+        self.google.insert({'id': google_event_id(event), 'summary': 'Jazz Night',
+                            'start': {'dateTime': self.start.isoformat()}, 'end': {'dateTime': self.start.isoformat()}})
+        GoogleCalendarSyncState.objects.create(user=self.user, sync_token=f'sync-{self.google.sequence}')
+
+        self.sync()
+
+        self.assertEqual(len(self.google.live_events()), 1)
+        event.refresh_from_db()
+        self.assertEqual(event.google_event_id, google_event_id(event))
+        self.assertEqual(self.google.events[event.google_event_id]['end']['dateTime'],
+                         (self.start + timedelta(hours=3)).isoformat())
+
+    def test_expired_sync_token_triggers_full_sync(self):
+        self.event('Jazz Night')
+        self.sync()
+        self.google.add_event('Dentist', self.start, self.start + timedelta(hours=1))
+        self.google.expire_sync_tokens()
+
+        self.sync()
+
+        self.assertEqual(self.local_titles(), ['Dentist', 'Jazz Night'])
+        self.assertEqual(len(self.google.live_events()), 2)
+
+    def test_requires_a_google_account(self):
+        other = get_user_model().objects.create_user(username='offline')
+        with self.assertRaises(CalendarSyncError):
+            GoogleCalendarSync(other)
+
+    def test_command(self):
+        self.event('Jazz Night')
+        out = StringIO()
+        call_command('sync_google_calendar', stdout=out)
+        self.assertIn('1 pushed created', out.getvalue())
+        self.assertEqual(self.google_titles(), ['Jazz Night'])
@@ -0,0 +1,111 @@
+import asyncio
+import re
+import time
+from django.test import SimpleTestCase
+from events.scrapers.chunked_extraction import (
+    LLMProvider,
+    extract_events_from_html,
+    merge_events,
+    parse_llm_events,
+)
+from .fake_llm import FakeLLMProvider
+
+SCHEMA = {'type': 'object', 'properties': {'event_title': {'type': 'string'}}}
+
+
+def calendar_page(count):
+    cards = ''.join(
+        f'<div class="event"><h2>Show {index}</h2><p class="date">2025-03-{index % 28 + 1:02d}</p>'
+        f'<p>{"Lorem ipsum dolor sit amet. " * 5}</p></div>'
+        for index in range(count)
+    )
+    return f'<html><body><main>{cards}</main></body></html>'
+
+
+def events_in_prompt(prompt):
+    """Answer like a model would: every event card present in the chunk."""
+    return [
+        {'event_title': f'Show {index}', 'event_date': date}
+        for index, date in re.findall(r'<h2>Show (\d+)</h2><p class="date">([\d-]+)</p>', prompt)
+    ]
+
+
+class TestLLMProvider(SimpleTestCase):
+    def test_providers_must_implement_complete(self):
+        class Incomplete(LLMProvider):
+            pass
+
+        with self.assertRaises(TypeError):
+            Incomplete()
+
+
+class TestParseLLMEvents(SimpleTestCase):
+    def test_parses_fenced_json(self):
+        content = 'Here are the events:\n```json\n[{"event_title": "Show"}]\n```'
+        self.assertEqual(parse_llm_events(content), [{'event_title': 'Show'}])
+
+    def test_unwraps_events_key_and_single_objects(self):
+        self.assertEqual(parse_llm_events('{"events": [{"event_title": "A"}]}'), [{'event_title': 'A'}])
+        self.assertEqual(parse_llm_events('{"event_title": "A"}'), [{'event_title': 'A'}])
+
+    def test_garbage(self):
+        self.assertEqual(parse_llm_events('no events here'), [])
+        self.assertEqual(parse_llm_events('[{"event_title": '), [])
+        self.assertEqual(parse_llm_events(''), [])
+
+
+class TestMergeEvents(SimpleTestCase):
+    def test_dedupes_by_normalized_title_and_date(self):
+        merged = merge_events([
+            [{'event_title': 'Jazz Night!', 'event_date': '2025-03-01', 'event_url': ''}],
+            [
+                {'event_title': 'jazz night', 'event_date': '2025-03-01', 'event_url': '/jazz'},
+                {'event_title': 'Jazz Night', 'event_date': '2025-03-08', 'event_url': ''},
+                {'event_title': '', 'event_date': '2025-03-09'},
+            ],
+        ])
+
+        self.assertEqual(len(merged), 2)
+        self.assertEqual(merged[0]['event_title'], 'Jazz Night!')
+        self.assertEqual(merged[0]['event_url'], '/jazz')
+
+
+class TestChunkedExtraction(SimpleTestCase):
+    def extract(self, provider, html, **kwargs):
+        return asyncio.run(extract_events_from_html(
+            html, 'https://venue.example.com', provider, 'Extract events', SCHEMA, **kwargs
+        ))
+
+    def test_long_page_is_chunked_and_merged(self):
+        provider = FakeLLMProvider(events_in_prompt)
+        events = self.extract(provider, calendar_page(120), chunk_tokens=500, overlap=1, concurrency=4)
+
+        self.assertGreater(len(provider.prompts), 5)
+        self.assertEqual(sorted(int(event['event_title'].split()[1]) for event in events), list(range(120)))
+
+    def test_concurrency_is_limited(self):
+        provider = FakeLLMProvider(events_in_prompt, delay=0.01)
+        self.extract(provider, calendar_page(120), chunk_tokens=500, concurrency=3)
+
+        self.assertEqual(provider.max_active, 3)
+
+    def test_wall_time_follows_slowest_chunk(self):
+        provider = FakeLLMProvider(events_in_prompt, delay=0.2)
+        started = time.monotonic()
+        self.extract(provider, calendar_page(60), chunk_tokens=500, concurrency=20)
+        elapsed = time.monotonic() - started
+
+        self.assertGreater(len(provider.prompts), 3)
+        self.assertLess(elapsed, 0.2 * len(provider.prompts) / 2)
+
+    def test_failed_chunk_does_not_lose_other_chunks(self):
+        def flaky(prompt):
+            if 'Show 0<' in prompt:
+                raise RuntimeError('rate limited')
+            return events_in_prompt(prompt)
+
+        events = self.extract(FakeLLMProvider(flaky), calendar_page(60), chunk_tokens=500, overlap=0)
+
+        titles = {event['event_title'] for event in events}
+        self.assertNotIn('Show 0', titles)
+        self.assertIn('Show 59', titles)
@@ -0,0 +1,168 @@
+from datetime import datetime
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+from events.models import Event
+from events.utils.dedup import (
+    EventIndex,
+    merge_event,
+    save_deduplicated,
+    title_similarity,
+    title_tokens,
+)
+
+
+def local(*args):
+    return timezone.make_aware(datetime(*args))
+
+
+class TestTitleSimilarity(SimpleTestCase):
+    def test_ignores_case_punctuation_and_filler(self):
+        first = title_tokens('The Jazz Trio LIVE!')
+        second = title_tokens('jazz trio')
+        self.assertEqual(title_similarity(first, second), 1.0)
+
+    def test_containment_only_counts_at_the_same_venue(self):
+        first = title_tokens('Jazz Trio')
+        second = title_tokens('Jazz Trio - Album Release Party')
+        self.assertLess(title_similarity(first, second), 0.8)
+        self.assertEqual(title_similarity(first, second, same_venue=True), 1.0)
+
+
+class TestEventIndex(SimpleTestCase):
+    def setUp(self):
+        self.stored = Event(
+            pk=1, title='The Jazz Trio', venue_name='The Blue Room',
+            start_time=local(2025, 3, 1, 20, 0), url='https://venue.example.com/jazz',
+        )
+        self.index = EventIndex([self.stored])
+
+    def test_url_match_is_same_source(self):
+        url = 'https://venue.example.com/jazz'
+        self.assertEqual(self.index.find({'url': url, 'title': 'Jazz Trio'}), (self.stored, True))
+        self.assertEqual(self.index.find({'url': url, 'title': 'Jazz Trio (rescheduled)',
+                                          'start_time': local(2025, 3, 1, 21, 0)}), (self.stored, True))
+        # The same URL on another day with another title is another event
+        self.assertEqual(self.index.find({'url': url, 'title': 'Blues Night',
+                                          'start_time': local(2025, 3, 8, 20, 0)}), (None, False))
+
+    def test_fuzzy_match_from_another_source(self):
+        event, same_source = self.index.find({
+            'title': 'Jazz Trio - Album Release', 'venue_name': 'Blue Room',
+            'start_time': local(2025, 3, 1, 20, 30), 'url': 'https://tickets.example.com/123',
+        })
+        self.assertEqual(event, self.stored)
+        self.assertFalse(same_source)
+
+    def test_unknown_venue_still_matches(self):
+        event, _ = self.index.find({'title': 'Jazz Trio', 'start_time': local(2025, 3, 1, 20, 0)})
+        self.assertEqual(event, self.stored)
+
+    def test_different_venue_day_or_time_does_not_match(self):
+        self.assertEqual(self.index.find({
+            'title': 'Jazz Trio - Album Release', 'venue_name': 'Town Hall', 'start_time': local(2025, 3, 1, 20, 0),
+        }), (None, False))
+        self.assertEqual(self.index.find({
+            'title': 'The Jazz Trio', 'venue_name': 'Blue Room', 'start_time': local(2025, 3, 2, 20, 0),
+        }), (None, False))
+        self.assertEqual(self.index.find({
+            'title': 'The Jazz Trio', 'venue_name': 'Blue Room', 'start_time': local(2025, 3, 1, 14, 0),
+        }), (None, False))
+
+    def test_date_only_start_matches_any_time_that_day(self):
+        event, _ = self.index.find({'title': 'Jazz Trio', 'start_time': local(2025, 3, 1)})
+        self.assertEqual(event, self.stored)
+
+
+class TestMergeEvent(SimpleTestCase):
+    def test_other_source_only_fills_gaps(self):
+        event = Event(title='Jazz Trio', description='Jazz.', start_time=local(2025, 3, 1), image_url='')
+        changed = merge_event(event, {
+            'title': 'Jazz Trio - Album Release',
+            'description': 'An evening of jazz.',
+            'start_time': local(2025, 3, 1, 20, 0),
+            'image_url': 'https://img.example.com/jazz.jpg',
+        })
+
+        self.assertEqual(sorted(changed), ['description', 'image_url', 'start_time'])
+        self.assertEqual(event.title, 'Jazz Trio')
+        self.assertEqual(event.start_time, local(2025, 3, 1, 20, 0))
+
+    def test_same_source_refreshes(self):
+        event = Event(title='Jazz Trio', description='An evening of jazz.')
+        changed = merge_event(event, {'title': 'Jazz Trio (Sold Out)', 'description': 'Jazz.'}, same_source=True)
+
+        self.assertEqual(changed, ['title', 'description'])
+        self.assertEqual(event.description, 'Jazz.')
+
+    def test_reimport_keeps_enrichment_unless_the_title_changed(self):
+        event = Event(title='Jazz Trio', enrichment_status=Event.ENRICHMENT_ENRICHED, spotify_track_id='track')
+
+        changed = merge_event(event, {'title': 'Jazz Trio', 'enrichment_status': Event.ENRICHMENT_PENDING},
+                              same_source=True)
+        self.assertEqual(changed, [])
+        self.assertEqual(event.enrichment_status, Event.ENRICHMENT_ENRICHED)
+
+        changed = merge_event(event, {'title': 'Miles Quartet', 'enrichment_status': Event.ENRICHMENT_PENDING},
+                              same_source=True)
+        self.assertEqual(changed, ['title', 'enrichment_status'])
+        self.assertEqual(event.enrichment_status, Event.ENRICHMENT_PENDING)
+
+
+class TestSaveDeduplicated(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username='dedup', password='testpass')
+        self.other = get_user_model().objects.create_user(username='other', password='testpass')
+        Event.objects.create(
+            user=self.user, title='The Jazz Trio', venue_name='Blue Room',
+            start_time=local(2025, 3, 1, 20, 0), url='https://venue.example.com/jazz',
+        )
+        Event.objects.create(user=self.other, title='Open Mic', start_time=local(2025, 3, 1, 19, 0))
+
+    def test_import_merges_across_sources_and_within_batch(self):
+        rows = [
+            {'title': 'Jazz Trio', 'venue_name': 'The Blue Room', 'start_time': '2025-03-01T20:15:00',
+             'url': 'https://tickets.example.com/1', 'image_url': 'https://img.example.com/jazz.jpg',
+             'not_a_field': 'ignored'},
+            {'title': 'Open Mic', 'start_time': '2025-03-01T19:00:00', 'url': 'https://tickets.example.com/2'},
+            {'title': 'Open Mic Night', 'start_time': '2025-03-01T19:00:00', 'url': 'https://feed.example.com/2'},
+        ]
+        index = EventIndex.for_user(self.user, rows)
+        results = [save_deduplicated(index, self.user, row) for row in rows]
+
+        self.assertEqual([created for _, created in results], [False, True, False])
+        self.assertEqual(results[1][0], results[2][0])
+        self.assertEqual(Event.objects.filter(user=self.user).count(), 2)
+        jazz = Event.objects.get(user=self.user, title='The Jazz Trio')
+        self.assertEqual(jazz.image_url, 'https://img.example.com/jazz.jpg')
+        self.assertEqual(jazz.url, 'https://venue.example.com/jazz')
+
+    def test_events_sharing_a_url_stay_distinct(self):
+        # Feeds often give every event the venue's calendar page
+        rows = [
+            {'title': 'Poetry Slam', 'start_time': '2025-04-01T20:00:00', 'url': 'https://venue.example.com/calendar'},
+            {'title': 'Salsa Night', 'start_time': '2025-04-02T21:00:00', 'url': 'https://venue.example.com/calendar'},
+            {'title': 'Book Swap', 'start_time': '2025-04-03T18:00:00', 'url': 'https://venue.example.com/calendar'},
+        ]
+        index = EventIndex.for_user(self.user, rows)
+        results = [save_deduplicated(index, self.user, row) for row in rows]
+
+        self.assertEqual([created for _, created in results], [True, True, True])
+        self.assertEqual(Event.objects.filter(user=self.user, url='https://venue.example.com/calendar').count(), 3)
+
+        # Re-importing the same listing, moved to a new time, still updates it in place
+        index = EventIndex.for_user(self.user, rows)
+        event, created = save_deduplicated(index, self.user, dict(rows[1], start_time='2025-04-09T21:00:00'))
+        self.assertFalse(created)
+        self.assertEqual(event.pk, results[1][0].pk)
+        self.assertEqual(event.start_time, local(2025, 4, 9, 21, 0))
+
+    def test_days_outside_preload_are_loaded_on_demand(self):
+        # Start times that are only parsed during the import are not in the preload
+        index = EventIndex.for_user(self.user, [{'title': 'Jazz Trio'}])
+        with self.assertNumQueries(1):
+            event, created = save_deduplicated(index, self.user, {
+                'title': 'Jazz Trio', 'start_time': local(2025, 3, 1, 20, 30),
+            })
+        self.assertFalse(created)
+        self.assertEqual(event.title, 'The Jazz Trio')
@@ -0,0 +1,181 @@
+from datetime import timedelta
+from unittest.mock import patch
+from asgiref.sync import async_to_sync, sync_to_async
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from events.models import Event
+from events.utils import discovery
+
+User = get_user_model()
+
+
+def make_user(username, public=True):
+    user = User.objects.create_user(username=username, email=f'{username}@example.com', password='testpass')
+    user.profile.first_name = username.title()
+    user.profile.calendar_public = public
+    user.profile.save()
+    return user
+
+
+class DiscoveryTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.soon = (timezone.now() + timedelta(days=2)).replace(hour=20, minute=0, second=0, microsecond=0)
+        self.alice = make_user('alice')
+        self.bob = make_user('bob')
+        self.carol = make_user('carol', public=False)
+
+    def tearDown(self):
+        cache.clear()
+
+    def event(self, user, title, start=None, **kwargs):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Event.objects.create(user=user, title=title, start_time=start or self.soon, **kwargs)
+
+    def committed(self, change, *args):
+        with self.captureOnCommitCallbacks(execute=True):
+            change(*args)
+
+    def titles(self):
+        return [entry['title'] for entry in discovery.upcoming_entries()]
+
+
+class TestBuildTimeline(DiscoveryTestCase):
+    def test_only_upcoming_public_events_of_public_calendars(self):
+        self.event(self.alice, 'Jazz Night')
+        self.event(self.alice, 'Private Party', is_public=False)
+        self.event(self.alice, 'Last Week', start=timezone.now() - timedelta(days=7))
+        self.event(self.carol, 'Hidden Calendar')
+
+        self.assertEqual(self.titles(), ['Jazz Night'])
+
+    def test_same_show_from_several_users_is_one_entry(self):
+        self.event(self.alice, 'The Jazz Trio', venue_name='Blue Room')
+        self.event(self.bob, 'Jazz Trio - Album Release', venue_name='The Blue Room', image_url='https://img.example.com/j.jpg')
+        self.event(self.bob, 'Jazz Trio', venue_name='Town Hall')
+
+        entries = discovery.upcoming_entries()
+        self.assertEqual(len(entries), 2)
+        self.assertEqual([owner['name'] for owner in entries[0]['owners']], ['Alice', 'Bob'])
+        self.assertEqual(entries[0]['image_url'], 'https://img.example.com/j.jpg')
+
+    @override_settings(DISCOVERY_FEED_SIZE=3)
+    def test_timeline_is_bounded(self):
+        for day in range(5):
+            self.event(self.alice, f'Show {day}', start=self.soon + timedelta(days=day))
+
+        self.assertEqual(self.titles(), ['Show 0', 'Show 1', 'Show 2'])
+
+
+class TestIncrementalUpdates(DiscoveryTestCase):
+    def test_feed_read_is_one_cache_read(self):
+        self.event(self.alice, 'Jazz Night')
+        discovery.upcoming_entries()
+
+        with self.assertNumQueries(0):
+            self.assertEqual(self.titles(), ['Jazz Night'])
+
+    def test_saved_events_are_applied_in_place(self):
+        first = self.event(self.alice, 'Jazz Night')
+        self.assertEqual(self.titles(), ['Jazz Night'])
+
+        earlier = self.event(self.bob, 'Open Mic', start=self.soon - timedelta(hours=3))
+        self.event(self.carol, 'Hidden Calendar')
+        first.title = 'Jazz Night (Sold Out)'
+        self.committed(first.save)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(self.titles(), ['Open Mic', 'Jazz Night (Sold Out)'])
+
+        earlier.is_public = False
+        self.committed(earlier.save)
+        self.committed(first.delete)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.titles(), [])
+
+    @override_settings(DISCOVERY_FEED_SIZE=2)
+    def test_removal_from_full_timeline_rebuilds(self):
+        shows = [self.event(self.alice, f'Show {day}', start=self.soon + timedelta(days=day)) for day in range(3)]
+        self.assertEqual(self.titles(), ['Show 0', 'Show 1'])
+
+        self.committed(shows[0].delete)
+        self.assertEqual(self.titles(), ['Show 1', 'Show 2'])
+
+    def test_saves_outside_the_timeline_do_not_load_it(self):
+        self.event(self.alice, 'Jazz Night')
+        self.assertEqual(self.titles(), ['Jazz Night'])
+        key = discovery._timeline_key()
+
+        with patch.object(discovery.cache, 'get', wraps=discovery.cache.get) as get:
+            self.event(self.carol, 'Hidden Calendar')
+            self.event(self.alice, 'Private Party', is_public=False)
+
+        self.assertNotIn(key, [call.args[0] for call in get.call_args_list])
+
+    def test_batched_imports_apply_their_events_once(self):
+        self.assertEqual(self.titles(), [])
+
+        @discovery.batched
+        async def run_import():
+            for hour in range(3):
+                await sync_to_async(self.event)(self.alice, f'Show {hour}', self.soon + timedelta(hours=hour))
+            # Nothing is applied until the import ends
+            self.assertEqual(await sync_to_async(self.titles)(), [])
+
+        with patch('events.utils.discovery.apply_changes', wraps=discovery.apply_changes) as apply_changes:
+            async_to_sync(run_import)()
+
+        apply_changes.assert_called_once()
+        self.assertEqual(self.titles(), ['Show 0', 'Show 1', 'Show 2'])
+
+    def test_invalidation_during_an_update_is_not_overwritten(self):
+        event = self.event(self.alice, 'Jazz Night')
+        self.assertEqual(self.titles(), ['Jazz Night'])
+        # Renamed without signals, so only a rebuild shows it
+        Event.objects.filter(pk=event.pk).update(title='Jazz Night (Moved)')
+
+        add = discovery.Timeline.add
+
+        def invalidated_meanwhile(timeline, event):
+            discovery.invalidate()
+            return add(timeline, event)
+
+        with patch.object(discovery.Timeline, 'add', invalidated_meanwhile):
+            self.event(self.bob, 'Open Mic')
+
+        self.assertEqual(self.titles(), ['Jazz Night (Moved)', 'Open Mic'])
+
+    def test_profile_visibility_change_rebuilds(self):
+        self.event(self.carol, 'Hidden Calendar')
+        self.assertEqual(self.titles(), [])
+
+        self.carol.profile.calendar_public = True
+        self.carol.profile.save()
+        self.assertEqual(self.titles(), ['Hidden Calendar'])
+
+
+class TestDiscoveryViews(DiscoveryTestCase):
+    @override_settings(DISCOVERY_PAGE_SIZE=2)
+    def test_discover_page_is_paginated(self):
+        for day in range(3):
+            self.event(self.alice, f'Show {day}', start=self.soon + timedelta(days=day))
+
+        response = self.client.get(reverse('events:discover'), {'page': 2})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([entry['title'] for entry in response.context['entries']], ['Show 2'])
+        self.assertContains(response, reverse('profiles:detail', kwargs={'email': 'alice@example.com'}))
+
+    def test_anonymous_ical_export_is_bounded_to_the_feed(self):
+        self.event(self.alice, 'Jazz Night')
+        self.event(self.carol, 'Hidden Calendar')
+        self.event(self.alice, 'Last Week', start=timezone.now() - timedelta(days=7))
+
+        content = self.client.get(reverse('events:export_ical')).content.decode()
+
+        self.assertIn('SUMMARY:Jazz Night', content)
+        self.assertNotIn('Hidden Calendar', content)
+        self.assertNotIn('Last Week', content)
@@ -0,0 +1,121 @@
+from unittest.mock import patch
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from events.models import Event
+from events.utils import dedup, enrichment
+
+
+def track(artist):
+    return {'id': f'track-{artist}', 'name': 'Song', 'artist': artist, 'artist_id': f'artist-{artist}',
+            'preview_url': None, 'external_url': f'https://open.spotify.com/track/{artist}'}
+
+
+def search_track(query, artist_name=None, limit=10):
+    return None if artist_name == 'Nobody Band' else [track(artist_name)]
+
+
+class TestEnrichment(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.user = get_user_model().objects.create_user(username='listener', password='password123')
+
+    def import_events(self, rows):
+        index = dedup.EventIndex.for_user(self.user, rows)
+        return [dedup.save_deduplicated(index, self.user, enrichment.mark(dict(row, start_time=timezone.now())))[0]
+                for row in rows]
+
+    def test_imports_save_music_events_as_pending(self):
+        concert, meetup = self.import_events([
+            {'title': 'Copper Street Band at The Sinclair', 'description': 'Live music'},
+            {'title': 'Startup Showcase', 'description': 'Pitches and demos'},
+        ])
+
+        self.assertEqual(concert.enrichment_status, Event.ENRICHMENT_PENDING)
+        self.assertEqual(concert.spotify_track_id, '')
+        self.assertEqual(meetup.enrichment_status, Event.ENRICHMENT_SKIPPED)
+
+    @patch('events.utils.enrichment.SpotifyAPI.search_track', side_effect=search_track)
+    def test_reimports_keep_enriched_events_enriched(self, search):
+        row = {'title': 'Copper Street Band at The Sinclair', 'description': 'concert',
+               'url': 'https://venue.example.com/copper', 'start_time': timezone.now()}
+        index = dedup.EventIndex.for_user(self.user, [row])
+        event, _ = dedup.save_deduplicated(index, self.user, enrichment.mark(dict(row)))
+        enrichment.drain()
+        event.refresh_from_db()
+        updated_at = event.updated_at
+
+        index = dedup.EventIndex.for_user(self.user, [row])
+        with patch('events.utils.enrichment.schedule') as schedule:
+            dedup.save_deduplicated(index, self.user, enrichment.mark(dict(row)))
+
+        event.refresh_from_db()
+        self.assertEqual((event.enrichment_status, event.updated_at), (Event.ENRICHMENT_ENRICHED, updated_at))
+        schedule.assert_not_called()
+        self.assertEqual(search.call_count, 1)
+
+    @patch('events.utils.enrichment.SpotifyAPI.search_track', side_effect=search_track)
+    def test_drain_searches_each_artist_once(self, search):
+        self.import_events([
+            {'title': 'Copper Street Band at The Sinclair', 'description': 'concert'},
+            {'title': 'Copper Street Band at Paradise', 'description': 'concert'},
+            {'title': 'copper street band at Brighton Music Hall', 'description': 'concert'},
+            {'title': 'Nobody Band at The Middle East', 'description': 'concert'},
+        ])
+
+        # The third Copper Street Band event, in the second batch, is found in the cache
+        self.assertEqual(enrichment.drain(batch_size=2), 4)
+
+        self.assertEqual([call.kwargs['artist_name'] for call in search.call_args_list],
+                         ['Copper Street Band', 'Nobody Band'])
+        statuses = list(Event.objects.order_by('pk').values_list('enrichment_status', 'spotify_track_id'))
+        self.assertEqual(statuses, [(Event.ENRICHMENT_ENRICHED, 'track-Copper Street Band')] * 3
+                         + [(Event.ENRICHMENT_NOT_FOUND, '')])
+
+        # So are misses, for later imports
+        self.import_events([{'title': 'Nobody Band at Great Scott', 'description': 'concert'}])
+        enrichment.drain()
+        self.assertEqual(search.call_count, 2)
+
+    @patch('events.utils.enrichment.SpotifyAPI.search_track', side_effect=RuntimeError('rate limited'))
+    def test_failed_searches_are_recorded_and_not_cached(self, search):
+        event, = self.import_events([{'title': 'Copper Street Band at The Sinclair', 'description': 'concert'}])
+
+        enrichment.drain()
+
+        event.refresh_from_db()
+        self.assertEqual(event.enrichment_status, Event.ENRICHMENT_FAILED)
+        self.assertIsNone(cache.get(enrichment.cache_key('Copper Street Band')))
+
+    def test_saving_a_pending_event_wakes_the_worker(self):
+        with override_settings(EVENT_ENRICHMENT_WORKER=True), patch('events.utils.enrichment.wake') as wake:
+            with self.captureOnCommitCallbacks(execute=True):
+                event, = self.import_events([{'title': 'Copper Street Band at The Sinclair',
+                                              'description': 'concert'}])
+            with self.captureOnCommitCallbacks(execute=True):
+                event.save(update_fields=['title'])
+
+        wake.assert_called_once_with()
+
+    @patch('events.utils.enrichment.SpotifyAPI.search_track', side_effect=search_track)
+    def test_detail_page_polls_until_enriched(self, search):
+        event, = self.import_events([{'title': 'Copper Street Band at The Sinclair', 'description': 'concert'}])
+        self.client.login(username='listener', password='password123')
+        status_url = reverse('events:enrichment', args=[event.pk])
+
+        self.assertContains(self.client.get(event.get_absolute_url()), f'data-url="{status_url}"')
+        self.assertEqual(self.client.get(status_url).json()['status'], Event.ENRICHMENT_PENDING)
+
+        enrichment.drain()
+
+        self.assertEqual(self.client.get(status_url).json(), {
+            'status': Event.ENRICHMENT_ENRICHED,
+            'spotify_track_id': 'track-Copper Street Band',
+            'spotify_artist_name': 'Copper Street Band',
+        })
+        content = self.client.get(event.get_absolute_url()).content.decode()
+        self.assertNotIn(status_url, content)
+        self.assertIn('open.spotify.com/embed/track/track-Copper Street Band', content)
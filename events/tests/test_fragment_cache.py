@@ -0,0 +1,52 @@
+from datetime import datetime
+from zoneinfo import ZoneInfo
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from events.models import Event
+
+
+class TestFragmentCache(TestCase):
+    def setUp(self):
+        caches['template_fragments'].clear()
+        self.user = get_user_model().objects.create_user(username='cached', password='password123')
+        self.client.login(username='cached', password='password123')
+        self.event = Event.objects.create(user=self.user, title='Jazz Night', description='Quartet',
+                                          start_time=datetime(2025, 7, 1, 20, tzinfo=ZoneInfo('America/New_York')))
+
+    def test_cards_are_cached_until_the_event_is_saved(self):
+        self.assertContains(self.client.get(reverse('events:list')), 'Jazz Night')
+
+        # update() leaves updated_at alone, so the cached card is served
+        Event.objects.filter(pk=self.event.pk).update(title='Blues Night')
+        self.assertContains(self.client.get(reverse('events:list')), 'Jazz Night')
+
+        self.event.refresh_from_db()
+        self.event.save()
+        content = self.client.get(reverse('events:list')).content.decode()
+        self.assertIn('Blues Night', content)
+        self.assertNotIn('Jazz Night', content)
+
+    def test_cards_are_cached_per_timezone(self):
+        with timezone.override(ZoneInfo('America/New_York')):
+            new_york = self.client.get(reverse('events:list'))
+        with timezone.override(ZoneInfo('America/Los_Angeles')):
+            los_angeles = self.client.get(reverse('events:list'))
+
+        self.assertContains(new_york, 'July 1, 2025 8:00 PM')
+        self.assertContains(los_angeles, 'July 1, 2025 5:00 PM')
+
+    def test_detail_fragments_follow_enrichment(self):
+        url = self.event.get_absolute_url()
+        self.assertContains(self.client.get(url), 'Quartet')
+
+        Event.objects.filter(pk=self.event.pk).update(description='Trio')
+        self.assertContains(self.client.get(url), 'Quartet')
+
+        # Enrichment writes updated_at along with the Spotify fields
+        Event.objects.filter(pk=self.event.pk).update(spotify_track_id='track-1', updated_at=timezone.now())
+        response = self.client.get(url)
+        self.assertContains(response, 'Trio')
+        self.assertContains(response, 'open.spotify.com/embed/track/track-1')
@@ -6,6 +6,9 @@ import pytz
 import pytest
 from ..utils.time_parser import parse_datetime
 from ..scrapers.generic_crawl4ai import GenericCrawl4AIScraper, EventModel
+from .fake_llm import FakeLLMProvider
+
+PAGE_HTML = '<html><body><div class="event"><h2>Event</h2></div></body></html>'
 
 class TestGenericCrawl4AIScraper(unittest.TestCase):
     def setUp(self):
@@ -195,13 +198,13 @@ class TestGenericCrawl4AIScraper_Async:
 
         for events_data in test_cases:
             mock_response = MagicMock()
-            mock_response.extracted_content = events_data
+            mock_response.html = PAGE_HTML
             
             mock_crawler_instance = AsyncMock()
             mock_crawler_instance.arun.return_value = mock_response
             mock_crawler.return_value.__aenter__.return_value = mock_crawler_instance
 
-            scraper = GenericCrawl4AIScraper(api_token="test_token")
+            scraper = GenericCrawl4AIScraper(api_token="test_token", provider=FakeLLMProvider(events_data))
             events = await scraper.extract_events("http://test.com")
 
             assert len(events) == len(events_data)
@@ -213,13 +216,13 @@ class TestGenericCrawl4AIScraper_Async:
     async def test_extract_events_empty_response(self, mock_crawler):
         """Test handling of empty response from crawler"""
         mock_response = MagicMock()
-        mock_response.extracted_content = []
+        mock_response.html = PAGE_HTML
         
         mock_crawler_instance = AsyncMock()
         mock_crawler_instance.arun.return_value = mock_response
         mock_crawler.return_value.__aenter__.return_value = mock_crawler_instance
 
-        scraper = GenericCrawl4AIScraper(api_token="test_token")
+        scraper = GenericCrawl4AIScraper(api_token="test_token", provider=FakeLLMProvider([]))
         events = await scraper.extract_events("http://test.com")
         assert events == []
 
@@ -235,13 +238,13 @@ class TestGenericCrawl4AIScraper_Async:
 
         for data in invalid_data:
             mock_response = MagicMock()
-            mock_response.extracted_content = data
+            mock_response.html = PAGE_HTML
             
             mock_crawler_instance = AsyncMock()
             mock_crawler_instance.arun.return_value = mock_response
             mock_crawler.return_value.__aenter__.return_value = mock_crawler_instance
 
-            scraper = GenericCrawl4AIScraper(api_token="test_token")
+            scraper = GenericCrawl4AIScraper(api_token="test_token", provider=FakeLLMProvider(data))
             events = await scraper.extract_events("http://test.com")
             assert events == []
 
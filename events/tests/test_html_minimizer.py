@@ -0,0 +1,91 @@
+import os
+from unittest import mock
+from django.test import TestCase
+from lxml import html as lxml_html
+from events.utils.html_minimizer import minimize_html, chunk_html, estimate_tokens, token_report
+
+EXAMPLE_PAGE = os.path.join(os.path.dirname(__file__), '..', 'scrapers', 'example.html')
+
+
+def event_page(count):
+    cards = ''.join(
+        f'<div class="event-card" data-tracking="abc{index}" style="color: red">'
+        f'<h2 class="title">Show {index}</h2>'
+        f'<img src="/img/{index}.jpg" srcset="/img/{index}@2x.jpg 2x">'
+        f'<a href="/events/{index}" onclick="track()">Details</a>'
+        f'</div>'
+        for index in range(count)
+    )
+    return (
+        '<html><head><title>Venue</title><style>.x { color: red }</style></head>'
+        '<body><script>window.dataLayer = [];</script>'
+        '<svg><path d="M0 0L10 10"/></svg><!-- analytics -->'
+        f'<main class="events">{cards}</main></body></html>'
+    )
+
+
+class TestMinimizeHtml(TestCase):
+    def test_strips_non_content(self):
+        minimized = minimize_html(event_page(2))
+
+        for removed in ('<script', '<style', '<svg', 'analytics', 'data-tracking', 'onclick', 'srcset', 'color: red'):
+            self.assertNotIn(removed, minimized)
+        for kept in ('class="event-card"', 'Show 1', 'href="/events/1"', 'src="/img/1.jpg"'):
+            self.assertIn(kept, minimized)
+
+    def test_keeps_background_images(self):
+        html = '<div class="poster" style="color: blue; background-image: url(/p.jpg)">Show</div>'
+        self.assertIn('style="background-image: url(/p.jpg)"', minimize_html(html))
+
+    def test_collapse_keeps_samples(self):
+        minimized = minimize_html(event_page(20), collapse_repeated=True, keep_samples=3)
+
+        self.assertEqual(minimized.count('class="event-card"'), 3)
+        self.assertIn('Show 2', minimized)
+        self.assertNotIn('Show 3', minimized)
+
+    def test_empty_html(self):
+        self.assertEqual(minimize_html(''), '')
+        self.assertEqual(chunk_html(''), [])
+
+
+class TestChunkHtml(TestCase):
+    def test_chunks_respect_limit_and_keep_cards_whole(self):
+        minimized = minimize_html(event_page(60))
+        chunks = chunk_html(minimized, max_tokens=300, overlap=1)
+
+        self.assertGreater(len(chunks), 1)
+        for chunk in chunks:
+            self.assertLessEqual(estimate_tokens(chunk), 300)
+            self.assertEqual(chunk.count('<div class="event-card"'), chunk.count('</div>'))
+        for index in range(60):
+            self.assertTrue(any(f'Show {index}<' in chunk for chunk in chunks))
+
+    def test_consecutive_chunks_overlap(self):
+        chunks = chunk_html(minimize_html(event_page(60)), max_tokens=300, overlap=1)
+        last_card = chunks[0].rsplit('<div class="event-card"', 1)[1]
+        self.assertIn(last_card, chunks[1])
+
+    def test_small_page_is_one_chunk(self):
+        self.assertEqual(len(chunk_html(minimize_html(event_page(2)), max_tokens=2000)), 1)
+
+    def test_only_kept_blocks_are_serialized(self):
+        # Cards nested 200 wrappers deep must not serialize each wrapper on the way down
+        page = '<div>' * 200 + minimize_html(event_page(60)) + '</div>' * 200
+        with mock.patch('events.utils.html_minimizer.lxml_html.tostring',
+                        wraps=lxml_html.tostring) as tostring:
+            chunks = chunk_html(page, max_tokens=300, overlap=1)
+
+        self.assertLess(tostring.call_count, 100)
+        for index in range(60):
+            self.assertTrue(any(f'Show {index}<' in chunk for chunk in chunks))
+
+
+class TestTokenReport(TestCase):
+    def test_example_page_shrinks(self):
+        with open(EXAMPLE_PAGE, encoding='utf-8') as f:
+            report = token_report(f.read(), max_tokens=2000)
+
+        self.assertLess(report['minimized_tokens'], report['raw_tokens'] / 2)
+        self.assertLess(report['schema_tokens'], report['minimized_tokens'])
+        self.assertGreater(report['chunks'], 1)
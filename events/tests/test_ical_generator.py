@@ -0,0 +1,128 @@
+import re
+from datetime import datetime, timedelta
+from datetime import timezone as dt_timezone
+from zoneinfo import ZoneInfo
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from icalendar import Calendar
+from events.models import Event
+from events.utils import ical_generator
+from events.utils.ical_generator import ICalGenerator, escape_text, fold
+
+NEW_YORK = ZoneInfo('America/New_York')
+
+
+def unstamped(content):
+    # DTSTAMP is the time of writing
+    return re.sub(r'DTSTAMP:\S+', '', content)
+
+
+class TestICalGenerator(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username='exporter', password='password123')
+
+    def event(self, title, start, **fields):
+        return Event.objects.create(user=self.user, title=title, start_time=start, **fields)
+
+    def parse(self, content):
+        return Calendar.from_ical(content)
+
+    def vevents(self, content):
+        return {str(component['summary']): component for component in self.parse(content).walk('VEVENT')}
+
+    def test_text_round_trips_through_icalendar(self):
+        description = 'Doors 7pm; tickets $10, $15 at the door\nBring a friend \\ or two\r\nAll ages'
+        long_title = 'Ünïcödé Fëstïvål 🎸🎺 ' * 10
+        self.event(long_title, datetime(2025, 3, 1, 20, tzinfo=NEW_YORK), description=description,
+                   venue_name='Café; Bar', venue_city='Boston')
+
+        content = ICalGenerator(tz=NEW_YORK).generate(Event.objects.all())
+        event = self.vevents(content)[long_title]
+
+        self.assertEqual(str(event['description']), description.replace('\r\n', '\n'))
+        self.assertEqual(str(event['location']), 'Café; Bar, Boston, United States')
+        self.assertEqual(event.decoded('dtstart'), datetime(2025, 3, 1, 20, tzinfo=NEW_YORK))
+        # No end: an hour long
+        self.assertEqual(event.decoded('dtend'), datetime(2025, 3, 1, 21, tzinfo=NEW_YORK))
+
+    def test_lines_are_folded_at_75_octets(self):
+        self.event('🎸' * 100, datetime(2025, 3, 1, 20, tzinfo=NEW_YORK), description='x' * 500)
+
+        content = ICalGenerator(tz=NEW_YORK).generate(Event.objects.all())
+
+        self.assertTrue(content.endswith('END:VCALENDAR\r\n'))
+        for line in content.split('\r\n'):
+            self.assertLessEqual(len(line.encode('utf-8')), 75)
+        self.assertNotIn('\n', content.replace('\r\n', ''))
+        self.assertEqual(fold('a' * 75), 'a' * 75)
+        self.assertEqual(escape_text('a,b;c\\d\ne'), 'a\\,b\\;c\\\\d\\ne')
+
+    def test_one_vtimezone_covers_every_event(self):
+        # Either side of both 2025 changes, and into 2026
+        for month in (1, 4, 7, 11, 12):
+            self.event(f'Show {month}', datetime(2025, month, 15, 20, tzinfo=NEW_YORK))
+        self.event('Next Year', datetime(2026, 6, 1, 20, tzinfo=NEW_YORK))
+
+        calendar = self.parse(ICalGenerator(tz=NEW_YORK).generate(Event.objects.all()))
+        timezones = calendar.walk('VTIMEZONE')
+
+        self.assertEqual(len(timezones), 1)
+        self.assertEqual(str(timezones[0]['tzid']), 'America/New_York')
+        described = timezones[0].to_tz()
+        instant = datetime(2025, 1, 1, 12, tzinfo=dt_timezone.utc)
+        while instant < datetime(2027, 1, 1, tzinfo=dt_timezone.utc):
+            self.assertEqual(instant.astimezone(described).utcoffset(), instant.astimezone(NEW_YORK).utcoffset(),
+                             instant)
+            instant += timedelta(days=5, hours=7)
+        for component in calendar.walk('VEVENT'):
+            self.assertEqual(component['dtstart'].params['TZID'], 'America/New_York')
+
+    def test_utc_calendars_have_no_vtimezone(self):
+        self.event('Jazz Night', datetime(2025, 7, 1, 20, tzinfo=NEW_YORK))
+
+        content = ICalGenerator(tz=dt_timezone.utc).generate(Event.objects.all())
+
+        self.assertNotIn('VTIMEZONE', content)
+        self.assertIn('DTSTART:20250702T000000Z', content)
+
+    def test_stream_matches_generate(self):
+        for index in range(7):
+            self.event(f'Show {index}', datetime(2025, 5, 1, 20, tzinfo=NEW_YORK) + timedelta(days=index))
+        Event.objects.create(user=self.user, title='Date to be announced')
+        generator = ICalGenerator(tz=NEW_YORK, base_url='https://example.com/', uid_domain='example.com')
+
+        original, ical_generator.CHUNK_SIZE = ical_generator.CHUNK_SIZE, 3
+        try:
+            chunks = list(generator.stream(Event.objects.all()))
+        finally:
+            ical_generator.CHUNK_SIZE = original
+
+        # Header, two full chunks, the rest with the footer
+        self.assertEqual(len(chunks), 4)
+        self.assertEqual(unstamped(''.join(chunks)), unstamped(generator.generate(list(Event.objects.all()))))
+        events = self.vevents(''.join(chunks))
+        self.assertEqual(len(events), 7)
+        show = Event.objects.get(title='Show 0')
+        self.assertEqual(str(events['Show 0']['uid']), f'{show.pk}@example.com')
+        self.assertEqual(str(events['Show 0']['url']), f'https://example.com{show.get_absolute_url()}')
+
+    def test_empty_calendar(self):
+        calendar = self.parse(ICalGenerator(tz=NEW_YORK).generate(Event.objects.none()))
+
+        self.assertEqual(calendar.walk('VEVENT'), [])
+        self.assertEqual(calendar.walk('VTIMEZONE'), [])
+
+    def test_both_exports_use_the_generator(self):
+        self.event('Jazz Night', datetime(2025, 7, 1, 20, tzinfo=NEW_YORK), is_public=True)
+        self.client.login(username='exporter', password='password123')
+
+        streamed = self.client.get(reverse('events:export'))
+        whole = self.client.get(reverse('events:export_ical'))
+
+        self.assertTrue(streamed.streaming)
+        self.assertEqual(streamed['Content-Disposition'], 'attachment; filename="events.ics"')
+        for content in (b''.join(streamed.streaming_content), whole.content):
+            calendar = self.parse(content)
+            self.assertEqual(len(calendar.walk('VTIMEZONE')), 1)
+            self.assertEqual([str(event['summary']) for event in calendar.walk('VEVENT')], ['Jazz Night'])
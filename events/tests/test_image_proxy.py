@@ -0,0 +1,251 @@
+import io
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from unittest.mock import MagicMock, patch
+import requests
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+from events.models import Event, EventImage
+from events.utils import image_proxy, public_http
+
+
+def png(width, height, color='red'):
+    output = io.BytesIO()
+    Image.new('RGBA', (width, height), color).save(output, 'PNG')
+    return output.getvalue()
+
+
+def redirect_response(location):
+    response = MagicMock()
+    response.is_redirect = True
+    response.headers = {'Location': location}
+    response.__enter__.return_value = response
+    return response
+
+
+def resolving_to(*addresses):
+    return lambda host, port, **kwargs: [(2, 1, 6, '', (address, port)) for address in addresses]
+
+
+def image_response(data, content_type='image/png'):
+    response = MagicMock()
+    response.is_redirect = False
+    response.headers = {'Content-Type': content_type}
+    response.iter_content.return_value = [data[i:i + 1000] for i in range(0, len(data), 1000)]
+    response.__enter__.return_value = response
+    return response
+
+
+class TestImageProxy(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        settings = override_settings(MEDIA_ROOT=self.media_root, EVENT_IMAGE_WIDTHS=(320, 640, 1280))
+        settings.enable()
+        self.addCleanup(settings.disable)
+        resolver = patch('events.utils.public_http.socket.getaddrinfo', side_effect=resolving_to('93.184.216.34'))
+        self.resolve = resolver.start()
+        self.addCleanup(resolver.stop)
+        self.user = get_user_model().objects.create_user(username='pictures', password='password123')
+
+    def event(self, image_url='https://img.example.com/hero.png'):
+        return Event.objects.create(user=self.user, title='Jazz Night', start_time=timezone.now(),
+                                    image_url=image_url)
+
+    def process(self, url, data):
+        with patch('events.utils.public_http.requests.Session.get', return_value=image_response(data)):
+            return image_proxy.process(image_proxy.register([url])[0])
+
+    def stored(self, image, width, extension):
+        return os.path.join(self.media_root, image_proxy.thumbnail_name(image.digest, width, extension))
+
+    def test_thumbnails_are_stored_by_content_and_never_scaled_up(self):
+        image = self.process('https://img.example.com/hero.png', png(800, 400))
+
+        self.assertEqual(image.status, EventImage.READY)
+        for width, expected in ((320, (320, 160)), (640, (640, 320)), (1280, (800, 400))):
+            for extension, format_name in (('webp', 'WEBP'), ('jpg', 'JPEG')):
+                with Image.open(self.stored(image, width, extension)) as thumbnail:
+                    self.assertEqual((thumbnail.format, thumbnail.size), (format_name, expected))
+        self.assertEqual(image.size, sum(
+            os.path.getsize(self.stored(image, width, extension))
+            for width in image_proxy.widths() for extension in image_proxy.FORMATS
+        ))
+
+    def test_urls_with_the_same_image_share_thumbnails(self):
+        first = self.process('https://img.example.com/hero.png', png(800, 400))
+        second = self.process('https://cdn.example.com/copy.png', png(800, 400))
+
+        self.assertEqual(second.digest, first.digest)
+        self.assertEqual(second.size, 0)
+
+    def test_non_images_fail_and_are_retried_later(self):
+        with patch('events.utils.public_http.requests.Session.get', return_value=image_response(b'<html>', 'text/html')):
+            image = image_proxy.process(image_proxy.register(['https://example.com/page'])[0])
+
+        self.assertEqual(image.status, EventImage.FAILED)
+        self.assertIn('text/html', image.error)
+        self.assertFalse(image_proxy.is_due(image))
+        image.fetched_at -= timedelta(days=2)
+        self.assertTrue(image_proxy.is_due(image))
+
+    def test_fetch_refuses_non_public_hosts_and_schemes(self):
+        with patch('events.utils.public_http.requests.Session.get') as get:
+            for url in ('file:///etc/passwd', 'ftp://img.example.com/a.png', 'http:///a.png'):
+                with self.assertRaisesMessage(image_proxy.ImageFetchError, 'Not an http(s) URL'):
+                    image_proxy.fetch(url)
+            for address in ('127.0.0.1', '10.0.0.5', '192.168.1.1', '169.254.169.254', '::1', 'fe80::1%eth0',
+                            '::ffff:127.0.0.1', '0.0.0.0', '224.0.0.1'):
+                self.resolve.side_effect = resolving_to('93.184.216.34', address)
+                with self.assertRaisesMessage(image_proxy.ImageFetchError, 'non-public address'):
+                    image_proxy.fetch('https://img.example.com/hero.png')
+        get.assert_not_called()
+
+    def test_fetch_checks_every_redirect(self):
+        data = png(10, 10)
+        with patch('events.utils.public_http.requests.Session.get',
+                   side_effect=[redirect_response('/moved.png'), image_response(data)]) as get:
+            self.assertEqual(image_proxy.fetch('https://img.example.com/hero.png'), data)
+        # Each hop connects to the address that was checked, under the original name
+        self.assertEqual(get.call_args.args[0], 'https://93.184.216.34/moved.png')
+        self.assertEqual(get.call_args.kwargs['headers']['Host'], 'img.example.com')
+        self.assertFalse(get.call_args.kwargs['allow_redirects'])
+
+        self.resolve.side_effect = lambda host, port, **kwargs: resolving_to(
+            '169.254.169.254' if host == 'metadata.internal' else '93.184.216.34')(host, port)
+        with patch('events.utils.public_http.requests.Session.get',
+                   return_value=redirect_response('http://metadata.internal/latest/')) as get:
+            with self.assertRaisesMessage(image_proxy.ImageFetchError, 'non-public address'):
+                image_proxy.fetch('https://img.example.com/hero.png')
+        get.assert_called_once()
+
+        with override_settings(EVENT_IMAGE_MAX_REDIRECTS=2), \
+                patch('events.utils.public_http.requests.Session.get', return_value=redirect_response('/again.png')) as get:
+            with self.assertRaisesMessage(image_proxy.ImageFetchError, 'More than 2 redirects'):
+                image_proxy.fetch('https://img.example.com/hero.png')
+        self.assertEqual(get.call_count, 3)
+
+    def test_tls_is_checked_against_the_original_hostname(self):
+        adapter = public_http.PinnedAdapter('img.example.com')
+        request = requests.Request('GET', 'https://93.184.216.34/hero.png').prepare()
+
+        host_params, pool_kwargs = adapter.build_connection_pool_key_attributes(request, True)
+
+        self.assertEqual(host_params['host'], '93.184.216.34')
+        self.assertEqual((pool_kwargs['server_hostname'], pool_kwargs['assert_hostname']),
+                         ('img.example.com', 'img.example.com'))
+
+    def test_least_recently_served_images_are_evicted(self):
+        old = self.process('https://img.example.com/old.png', png(800, 400, 'blue'))
+        recent = self.process('https://img.example.com/recent.png', png(800, 400, 'green'))
+        EventImage.objects.filter(pk=old.pk).update(last_used_at=timezone.now() - timedelta(days=1))
+        old_file = self.stored(old, 320, 'jpg')
+
+        self.assertEqual(image_proxy.evict(max_bytes=recent.size), 1)
+
+        old.refresh_from_db()
+        self.assertEqual((old.status, old.size), (EventImage.PENDING, 0))
+        self.assertFalse(os.path.exists(old_file))
+        self.assertTrue(os.path.exists(self.stored(recent, 320, 'jpg')))
+
+    def test_endpoint_serves_cached_thumbnails(self):
+        event = self.event()
+        image = self.process(event.image_url, png(800, 400))
+        EventImage.objects.filter(pk=image.pk).update(last_used_at=timezone.now() - timedelta(days=1))
+        url = image_proxy.thumbnail_url(event.pk, event.image_url, 320)
+
+        webp = self.client.get(url, HTTP_ACCEPT='image/avif,image/webp,*/*')
+        jpeg = self.client.get(url, HTTP_ACCEPT='*/*')
+
+        self.assertEqual((webp.status_code, webp['Content-Type']), (200, 'image/webp'))
+        self.assertEqual(jpeg['Content-Type'], 'image/jpeg')
+        self.assertIn('immutable', webp['Cache-Control'])
+        self.assertIn('max-age=31536000', webp['Cache-Control'])
+        self.assertEqual(webp['Vary'], 'Accept')
+        with Image.open(io.BytesIO(b''.join(jpeg.streaming_content))) as thumbnail:
+            self.assertEqual(thumbnail.size, (320, 160))
+        image.refresh_from_db()
+        self.assertGreater(image.last_used_at, timezone.now() - timedelta(minutes=1))
+
+    def test_endpoint_answers_an_uncached_404_until_ready(self):
+        event = self.event()
+
+        with patch('events.utils.image_proxy.schedule') as schedule:
+            response = self.client.get(image_proxy.thumbnail_url(event.pk, event.image_url, 640))
+
+        self.assertEqual(response.status_code, 404)
+        self.assertNotIn('Location', response)
+        self.assertIn('no-store', response['Cache-Control'])
+        schedule.assert_called_once_with([event.image_url])
+        self.assertEqual(EventImage.objects.get().status, EventImage.PENDING)
+
+    def test_endpoint_answers_404_for_evicted_thumbnails(self):
+        event = self.event()
+        image = self.process(event.image_url, png(800, 400))
+        os.remove(self.stored(image, 320, 'jpg'))
+
+        with patch('events.utils.image_proxy.schedule') as schedule:
+            response = self.client.get(image_proxy.thumbnail_url(event.pk, event.image_url, 320))
+
+        self.assertEqual(response.status_code, 404)
+        self.assertIn('no-store', response['Cache-Control'])
+        schedule.assert_called_once_with([event.image_url])
+        image.refresh_from_db()
+        self.assertEqual(image.status, EventImage.PENDING)
+
+    def test_private_events_images_are_only_served_to_their_owner(self):
+        event = self.event()
+        Event.objects.filter(pk=event.pk).update(is_public=False)
+        self.process(event.image_url, png(800, 400))
+        url = image_proxy.thumbnail_url(event.pk, event.image_url, 320)
+
+        self.assertEqual(self.client.get(url).status_code, 404)
+        self.client.login(username='pictures', password='password123')
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('private', response['Cache-Control'])
+        self.assertNotIn('public', response['Cache-Control'])
+
+    def test_endpoint_only_serves_the_events_own_image(self):
+        event = self.event()
+        other = image_proxy.url_hash('https://attacker.example.com/x.png')
+
+        self.assertEqual(self.client.get(reverse('events:image', args=[event.pk, other, 640])).status_code, 404)
+        self.assertEqual(self.client.get(image_proxy.thumbnail_url(event.pk, event.image_url, 500)).status_code,
+                         404)
+        self.assertFalse(EventImage.objects.exists())
+
+    def test_endpoint_does_not_serve_another_events_cached_image(self):
+        event = self.event()
+        private = self.event(image_url='https://img.example.com/private.png')
+        image = self.process(private.image_url, png(800, 400))
+
+        response = self.client.get(reverse('events:image', args=[event.pk, image.url_hash, 320]))
+
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(self.client.get(image_proxy.thumbnail_url(private.pk, private.image_url, 320)).status_code,
+                         200)
+
+    def test_saving_an_event_prefetches_its_image(self):
+        with override_settings(EVENT_IMAGE_PREFETCH=True), patch('events.utils.image_proxy.schedule') as schedule:
+            with self.captureOnCommitCallbacks(execute=True):
+                event = self.event()
+            with self.captureOnCommitCallbacks(execute=True):
+                event.save(update_fields=['title'])
+
+        schedule.assert_called_once_with(['https://img.example.com/hero.png'])
+
+    def test_listing_links_thumbnails(self):
+        event = self.event()
+        self.client.login(username='pictures', password='password123')
+
+        content = self.client.get(reverse('events:list')).content.decode()
+
+        self.assertIn(f'src="{image_proxy.thumbnail_url(event.pk, event.image_url, 640)}"', content)
+        self.assertIn(f'{image_proxy.thumbnail_url(event.pk, event.image_url, 1280)} 1280w', content)
+        self.assertNotIn('src="https://img.example.com/hero.png"', content)
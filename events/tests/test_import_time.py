@@ -0,0 +1,41 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+from django.test import SimpleTestCase
+from events import scrapers
+from events.scrapers.ical_scraper import ICalScraper
+
+ROOT = Path(__file__).resolve().parents[2]
+# Only import jobs that need them may load these
+HEAVY = ('crawl4ai', 'playwright', 'litellm')
+
+
+def import_times(code):
+    """Cumulative microseconds by module for everything ``code`` imports, from ``python -X importtime``."""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], cwd=ROOT, capture_output=True,
+                            text=True, timeout=120, env=dict(os.environ, PYTHONPATH=str(ROOT)))
+    if result.returncode:
+        raise AssertionError(result.stderr[-2000:])
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+class TestImportTime(SimpleTestCase):
+    def test_urlconf_does_not_import_scrapers(self):
+        times = import_times('import django; django.setup(); import socialcal.urls')
+
+        self.assertIn('socialcal.urls', times)
+        heavy = sorted(name for name in times if name.split('.')[0] in HEAVY)
+        slowest = sorted(times.items(), key=lambda item: -item[1])[:10]
+        self.assertEqual(heavy, [], f'Slowest imports: {slowest}')
+
+    def test_registry_imports_scrapers_when_asked(self):
+        self.assertIs(scrapers.get('ical'), ICalScraper)
+        with self.assertRaises(ValueError):
+            scrapers.get('firecrawl')
@@ -0,0 +1,84 @@
+import asyncio
+import logging
+from asgiref.sync import sync_to_async
+from django.test import SimpleTestCase, override_settings
+from events.utils.job_logs import JobLog, capture_job_logs, captured_log
+from events.views import get_job_status, set_job_status
+
+logger = logging.getLogger('events.scrapers.test_job_logs')
+
+
+class TestJobLog(SimpleTestCase):
+    def test_keeps_newest_lines_within_limit(self):
+        job_log = JobLog('job', max_bytes=100)
+        for number in range(50):
+            job_log.append(f'line {number:02d}')
+
+        text = job_log.getvalue()
+        self.assertLessEqual(job_log.size, 100)
+        # 'line NN' plus a newline is 8 bytes, so the newest 12 lines fit
+        self.assertTrue(text.startswith('[38 earlier lines dropped]\nline 38'))
+        self.assertTrue(text.endswith('line 49'))
+        self.assertNotIn('line 37', text)
+
+    def test_oversized_line_keeps_its_end(self):
+        job_log = JobLog('job', max_bytes=10)
+        job_log.append('x' * 20 + 'END')
+        self.assertEqual(job_log.getvalue(), 'x' * 6 + 'END')
+
+    def test_limit_counts_utf8_bytes(self):
+        job_log = JobLog('job', max_bytes=100)
+        for number in range(50):
+            job_log.append(f'Café Ñandú {number:02d}')
+
+        self.assertLessEqual(len(job_log.getvalue().split('\n', 1)[1].encode('utf-8')), 100)
+        self.assertEqual(job_log.size, sum(len(line.encode('utf-8')) + 1 for line in job_log.lines))
+
+        job_log = JobLog('job', max_bytes=10)
+        job_log.append('€' * 5)
+        # 9 bytes fit three 3-byte characters
+        self.assertEqual(job_log.getvalue(), '€' * 3)
+
+
+class TestCaptureJobLogs(SimpleTestCase):
+    def test_concurrent_jobs_capture_their_own_lines(self):
+        @capture_job_logs
+        async def job(name, job_id):
+            for step in range(3):
+                logger.warning(f'{name} step {step}')
+                await asyncio.sleep(0)
+            # Work handed to a thread still logs into the job
+            await sync_to_async(logger.warning, thread_sensitive=False)(f'{name} in thread')
+            return captured_log(job_id)
+
+        async def run_both():
+            return await asyncio.gather(job('first', job_id='a'), job('second', job_id='b'))
+
+        first, second = asyncio.run(run_both())
+
+        self.assertIn('first step 2', first)
+        self.assertIn('first in thread', first)
+        self.assertNotIn('second', first)
+        self.assertIn('second step 0', second)
+        self.assertNotIn('first', second)
+
+    def test_nothing_captured_outside_jobs(self):
+        logger.warning('no job running')
+        self.assertIsNone(captured_log('a'))
+
+    @override_settings(JOB_LOG_MAX_BYTES=200)
+    def test_log_is_stored_with_job_status(self):
+        @capture_job_logs
+        async def job(job_id):
+            for number in range(20):
+                logger.error(f'failure {number}')
+            set_job_status(job_id, {'status': 'error'})
+            set_job_status('other-job', {'status': 'started'})
+
+        asyncio.run(job('log-job'))
+
+        status = get_job_status('log-job')
+        self.assertEqual(status['status'], 'error')
+        self.assertLessEqual(len(status['log']), 250)
+        self.assertIn('failure 19', status['log'])
+        self.assertNotIn('log', get_job_status('other-job'))
@@ -0,0 +1,123 @@
+import threading
+import time
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from events.utils import metrics
+
+METRICS_MIDDLEWARE = ['events.middleware.MetricsMiddleware'] + settings.MIDDLEWARE
+
+
+class TestRegistry(SimpleTestCase):
+    def test_prometheus_text_format(self):
+        registry = metrics.Registry()
+        counter = registry.counter('jobs_total', 'Jobs.')
+        histogram = registry.histogram('job_seconds', 'Job time.', buckets=(0.1, 1.0))
+        counter.inc(view='events:list', status=200)
+        counter.inc(2, view='events:list', status=200)
+        histogram.observe(0.5, stage='fetch')
+        histogram.observe(3, stage='fetch')
+
+        text = registry.render()
+
+        self.assertIn('# TYPE jobs_total counter', text)
+        self.assertIn('jobs_total{status="200",view="events:list"} 3', text)
+        self.assertIn('job_seconds_bucket{stage="fetch",le="0.1"} 0', text)
+        self.assertIn('job_seconds_bucket{stage="fetch",le="1"} 1', text)
+        self.assertIn('job_seconds_bucket{stage="fetch",le="+Inf"} 2', text)
+        self.assertIn('job_seconds_sum{stage="fetch"} 3.5', text)
+
+    def test_label_values_are_escaped(self):
+        registry = metrics.Registry()
+        registry.counter('odd_total', 'Odd labels.').inc(path='a"b\\c\nd')
+        self.assertIn('odd_total{path="a\\"b\\\\c\\nd"} 1', registry.render())
+
+
+class TestSpans(SimpleTestCase):
+    def setUp(self):
+        metrics.REGISTRY.reset()
+
+    def stage_count(self, stage):
+        state = metrics.STAGE_SECONDS.values.get((('stage', stage),))
+        return state[len(metrics.STAGE_SECONDS.buckets)] if state else 0
+
+    def test_disabled_by_default(self):
+        with metrics.span('fetch'):
+            pass
+        self.assertEqual(self.stage_count('fetch'), 0)
+
+    @override_settings(METRICS_ENABLED=True)
+    def test_records_duration_and_errors(self):
+        @metrics.span('parse_dates')
+        def parse():
+            return 'parsed'
+
+        self.assertEqual(parse(), 'parsed')
+        with self.assertRaises(ValueError):
+            with metrics.span('fetch'):
+                raise ValueError('timeout')
+
+        self.assertEqual(self.stage_count('parse_dates'), 1)
+        self.assertEqual(self.stage_count('fetch'), 1)
+        self.assertEqual(metrics.STAGE_ERRORS.values[(('stage', 'fetch'),)], 1)
+
+
+@override_settings(METRICS_ENABLED=True, MIDDLEWARE=METRICS_MIDDLEWARE, METRICS_TOKEN='secret')
+class TestMetricsMiddleware(TestCase):
+    def setUp(self):
+        metrics.REGISTRY.reset()
+        cache.clear()
+
+    def test_records_view_latency_queries_and_cache(self):
+        self.client.get(reverse('events:discover'))
+        response = self.client.get(reverse('events:discover'))
+
+        self.assertIn('db;dur=', response['Server-Timing'])
+        self.assertEqual(metrics.REQUESTS.values[(('method', 'GET'), ('status', '200'), ('view', 'events:discover'))], 2)
+        self.assertGreater(metrics.REQUEST_QUERIES.values[(('view', 'events:discover'),)], 0)
+        # The timeline's generation, then the timeline itself
+        self.assertEqual(metrics.CACHE_LOOKUPS.values[(('result', 'miss'), ('view', 'events:discover'))], 2)
+        self.assertEqual(metrics.CACHE_LOOKUPS.values[(('result', 'hit'), ('view', 'events:discover'))], 2)
+
+    def test_endpoint_requires_token_or_staff(self):
+        self.client.get(reverse('events:discover'))
+
+        self.assertEqual(self.client.get(reverse('events:metrics')).status_code, 403)
+        response = self.client.get(reverse('events:metrics'), HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('socialcal_http_request_duration_seconds_count{view="events:discover"} 1',
+                      response.content.decode())
+
+        staff = get_user_model().objects.create_user(username='ops', password='testpass', is_staff=True)
+        self.client.force_login(staff)
+        self.assertEqual(self.client.get(reverse('events:metrics_profile')).status_code, 200)
+
+    @override_settings(METRICS_ENABLED=False)
+    def test_endpoint_hidden_when_disabled(self):
+        response = self.client.get(reverse('events:metrics'), HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(response.status_code, 404)
+
+
+class TestSamplingProfiler(SimpleTestCase):
+    def test_samples_target_thread(self):
+        metrics.SamplingProfiler.reset()
+
+        def busy_loop_for_profiler():
+            deadline = time.monotonic() + 0.1
+            while time.monotonic() < deadline:
+                pass
+
+        worker = threading.Thread(target=busy_loop_for_profiler)
+        worker.start()
+        profiler = metrics.SamplingProfiler(worker.ident, interval=0.002)
+        profiler._thread.start()
+        worker.join()
+        profiler.stop()
+
+        self.assertIn('busy_loop_for_profiler', metrics.SamplingProfiler.folded())
+
+    @override_settings(METRICS_PROFILE_SAMPLE_RATE=0)
+    def test_sampling_off_by_default(self):
+        self.assertIsNone(metrics.SamplingProfiler.maybe_start())
@@ -0,0 +1,38 @@
+from django.test import SimpleTestCase
+from events.benchmarks.fixtures import LABELED_EVENTS
+from events.utils import music
+
+
+class TestMusicClassifier(SimpleTestCase):
+    def test_keywords_match_whole_words(self):
+        self.assertFalse(music.classify({'title': 'Startup Showcase', 'description': 'Pitches and demos'}).is_music)
+        self.assertFalse(music.classify({'title': 'Bandwidth Planning', 'description': ''}).is_music)
+        self.assertTrue(music.classify({'title': 'Hip-Hop Showcase', 'description': ''}).is_music)
+        self.assertEqual(music.classify({'title': 'Jazz Bands', 'description': ''}).keywords, ['band', 'jazz'])
+
+    def test_more_evidence_means_more_confidence(self):
+        show = music.classify({'title': 'Friday Show', 'description': ''})
+        rock_show = music.classify({'title': 'Friday Rock Show', 'description': ''})
+        in_description = music.classify({'title': 'Friday Night', 'description': 'A jazz trio'})
+        in_title = music.classify({'title': 'Friday Jazz Trio', 'description': ''})
+
+        self.assertLess(show.confidence, rock_show.confidence)
+        self.assertLess(in_description.confidence, in_title.confidence)
+        self.assertFalse(show.is_music)
+        self.assertIsNone(show.artist)
+        self.assertEqual(music.classify({'title': 'Book Club', 'description': None}).confidence, 0.0)
+
+    def test_batch_matches_single(self):
+        events = [{'title': title, 'description': description} for title, description, _, _ in LABELED_EVENTS]
+
+        self.assertEqual(music.classify_events(events), [music.classify(event) for event in events])
+
+    def test_labeled_events(self):
+        events = [{'title': title, 'description': description} for title, description, _, _ in LABELED_EVENTS]
+        results = music.classify_events(events)
+
+        music_correct = sum(result.is_music == is_music for result, (_, _, is_music, _) in zip(results, LABELED_EVENTS))
+        artist_correct = sum(result.artist == artist
+                             for result, (_, _, is_music, artist) in zip(results, LABELED_EVENTS) if is_music)
+        self.assertGreaterEqual(music_correct / len(LABELED_EVENTS), 0.9)
+        self.assertGreaterEqual(artist_correct / sum(1 for *_, is_music, _ in LABELED_EVENTS if is_music), 0.9)
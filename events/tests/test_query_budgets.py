@@ -0,0 +1,124 @@
+from datetime import timedelta
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from events.models import Event, SiteScraper
+from profiles.models import Profile
+from .query_budget import QueryBudgetMixin
+
+User = get_user_model()
+
+# Enough rows that one query per row can't stay under any budget below
+USERS = 10
+EVENTS_PER_USER = 6
+
+# Every request of a signed-in user loads the session and the user
+SESSION = 2
+
+
+class QueryBudgetTestCase(QueryBudgetMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        start = timezone.now() + timedelta(days=1)
+        cls.users = []
+        for index in range(USERS):
+            user = User.objects.create_user(
+                username=f'user{index}', email=f'user{index}@example.com', password='testpass123'
+            )
+            user.profile.calendar_public = True
+            user.profile.save()
+            cls.users.append(user)
+            for number in range(EVENTS_PER_USER):
+                begins = start + timedelta(days=number)
+                Event.objects.create(
+                    user=user, title=f'Show {index}-{number}', start_time=begins,
+                    end_time=begins + timedelta(hours=2), venue_name='Main Stage', is_public=number % 2 == 0,
+                )
+            SiteScraper.objects.create(
+                user=user, name=f'Venue {index}', url=f'https://venue{index}.example.com/events',
+                css_schema={'baseSelector': '.event', 'fields': []},
+            )
+        cls.user = cls.users[0]
+        cls.other = cls.users[1]
+        cls.event = cls.user.events.first()
+        cls.scraper = cls.user.site_scrapers.first()
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+
+class TestEventViewBudgets(QueryBudgetTestCase):
+    def test_event_pages(self):
+        self.assertGetWithinBudget(reverse('events:list'), SESSION + 2)
+        self.assertGetWithinBudget(reverse('events:create'), SESSION)
+        self.assertGetWithinBudget(reverse('events:detail', args=[self.event.pk]), SESSION + 1)
+        self.assertGetWithinBudget(reverse('events:edit', args=[self.event.pk]), SESSION + 1)
+        self.assertGetWithinBudget(reverse('events:delete', args=[self.event.pk]), SESSION + 1)
+
+    def test_exports(self):
+        # The VTIMEZONE's date range, then the streamed rows
+        self.assertGetWithinBudget(reverse('events:export'), SESSION + 2)
+        self.assertGetWithinBudget(reverse('events:export_ical'), SESSION + 1)
+        self.assertGetWithinBudget(f"{reverse('events:export_ical')}?event_id={self.event.pk}", SESSION + 1)
+
+    def test_discovery_feed(self):
+        # Building the timeline: public profiles, then events
+        self.assertGetWithinBudget(reverse('events:discover'), SESSION + 2)
+        self.assertGetWithinBudget(reverse('events:discover'), SESSION)
+
+    def test_scraper_pages(self):
+        self.assertGetWithinBudget(reverse('events:scraper_list'), SESSION + 1)
+        self.assertGetWithinBudget(reverse('events:scraper_create'), SESSION)
+        self.assertGetWithinBudget(reverse('events:scraper_detail', args=[self.scraper.pk]), SESSION + 1)
+        self.assertGetWithinBudget(reverse('events:scraper_edit', args=[self.scraper.pk]), SESSION + 1)
+        self.assertGetWithinBudget(reverse('events:scraper_delete', args=[self.scraper.pk]), SESSION + 1)
+
+    def test_job_status_endpoints(self):
+        for name in ('import_status', 'scraper_test_status', 'scraper_schema_status'):
+            self.assertGetWithinBudget(reverse(f'events:{name}', args=['missing']), SESSION, status_code=404)
+
+
+class TestProfileViewBudgets(QueryBudgetTestCase):
+    def test_profile_list(self):
+        # Paginator count, then one page of profiles with their users
+        self.assertGetWithinBudget(reverse('profiles:list'), SESSION + 2)
+
+    def test_profile_detail(self):
+        for user in (self.user, self.other):
+            self.assertGetWithinBudget(reverse('profiles:detail', args=[user.email]), SESSION + 2)
+
+    def test_profile_edit(self):
+        self.assertGetWithinBudget(reverse('profiles:edit', args=[self.user.email]), SESSION + 1)
+
+    def test_profile_calendar(self):
+        for user in (self.user, self.other):
+            self.assertGetWithinBudget(reverse('profiles:calendar', args=[user.email]), SESSION + 3)
+
+    def test_user_save_does_not_resave_profile(self):
+        with self.assertMaxQueries(2) as context:
+            self.user.save()
+        self.assertFalse(any('UPDATE "profiles_profile"' in query['sql'] for query in context.captured_queries))
+
+        with self.assertMaxQueries(1):
+            self.user.save(update_fields=['last_login'])
+
+
+class TestCalendarViewBudgets(QueryBudgetTestCase):
+    def test_calendar_pages(self):
+        today = timezone.localdate() + timedelta(days=1)
+        self.assertGetWithinBudget(reverse('calendar:calendar'), SESSION + 1)
+        self.assertGetWithinBudget(reverse('calendar:month', args=[today.year, today.month]), SESSION + 1)
+
+
+class TestApiBudgets(QueryBudgetTestCase):
+    def test_api_endpoints(self):
+        json = {'HTTP_ACCEPT': 'application/json'}
+        profile = Profile.objects.get(user=self.user)
+        # Lists aggregate their ETag and Last-Modified before loading the page
+        self.assertGetWithinBudget('/api/events/', SESSION + 2, **json)
+        self.assertGetWithinBudget('/api/profiles/', SESSION + 2, **json)
+        self.assertGetWithinBudget(f'/api/profiles/{profile.pk}/', SESSION + 1, **json)
+        self.assertGetWithinBudget(f'/api/profiles/{profile.pk}/events/', SESSION + 2, **json)
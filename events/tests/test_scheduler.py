@@ -0,0 +1,184 @@
+import asyncio
+import random
+from datetime import timedelta
+from django.contrib.auth import get_user_model
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+from events.models import SiteScraper
+from events.utils import scheduler
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestPollInterval(TestCase):
+    def test_changing_pages_poll_more_often(self):
+        busy = scheduler.compute_poll_interval(0.9, 0.0, 0, 60, 4320)
+        static = scheduler.compute_poll_interval(0.1, 0.0, 0, 60, 4320)
+        self.assertLess(busy, static)
+
+    def test_interval_stays_within_bounds(self):
+        self.assertEqual(scheduler.compute_poll_interval(1.0, 0.0, 0, 60, 4320), 60)
+        self.assertEqual(scheduler.compute_poll_interval(0.0, 0.0, 0, 60, 4320), 4320)
+        self.assertEqual(scheduler.compute_poll_interval(0.0, 1.0, 10, 60, 4320), 4320)
+
+    def test_failures_back_off(self):
+        healthy = scheduler.compute_poll_interval(0.8, 0.0, 0, 60, 4320)
+        failing = scheduler.compute_poll_interval(0.8, 0.3, 2, 60, 4320)
+        self.assertGreaterEqual(failing, healthy * 4)
+
+    def test_jitter_is_bounded(self):
+        rng = random.Random(1)
+        for _ in range(50):
+            delta = scheduler.apply_jitter(100, jitter=0.1, rng=rng)
+            self.assertGreaterEqual(delta, timedelta(minutes=90))
+            self.assertLessEqual(delta, timedelta(minutes=110))
+
+    def test_get_domain_ignores_www(self):
+        self.assertEqual(scheduler.get_domain('https://www.Example.com/events'), 'example.com')
+
+
+class TestSchedulerRuns(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username='scheduler', password='testpass')
+        self.now = timezone.now()
+
+    def make_scraper(self, name, **kwargs):
+        return SiteScraper.objects.create(
+            user=self.user,
+            name=name,
+            url=kwargs.pop('url', f'https://{name}.example.com/events'),
+            css_schema={'baseSelector': '.event', 'fields': []},
+            **kwargs
+        )
+
+    def test_due_scrapers_are_ordered_by_next_run(self):
+        never_run = self.make_scraper('new')
+        overdue = self.make_scraper('overdue', next_run_at=self.now - timedelta(hours=2))
+        due = self.make_scraper('due', next_run_at=self.now - timedelta(minutes=1))
+        self.make_scraper('later', next_run_at=self.now + timedelta(hours=1))
+        self.make_scraper('inactive', is_active=False)
+
+        due_scrapers = scheduler.get_due_scrapers(now=self.now, limit=10)
+
+        self.assertEqual(due_scrapers, [never_run, overdue, due])
+
+    def test_record_run_tracks_changes(self):
+        scraper = self.make_scraper('venue')
+        events = [{'title': 'Show', 'start_time': '2025-03-01 20:00', 'venue_name': 'Hall'}]
+
+        scheduler.record_run(scraper, events, now=self.now)
+        first_interval = scraper.poll_interval
+        self.assertEqual(scraper.last_run_status, 'changed')
+
+        scheduler.record_run(scraper, events, now=self.now)
+        scraper.refresh_from_db()
+        self.assertEqual(scraper.last_run_status, 'unchanged')
+        self.assertGreater(scraper.poll_interval, first_interval)
+        self.assertEqual(scraper.last_run_at, self.now)
+        self.assertGreater(scraper.next_run_at, self.now)
+
+    def test_record_run_backs_off_on_failure(self):
+        scraper = self.make_scraper('broken')
+
+        scheduler.record_run(scraper, [], failed=True, now=self.now)
+        scheduler.record_run(scraper, None, failed=True, now=self.now)
+
+        scraper.refresh_from_db()
+        self.assertEqual(scraper.consecutive_failures, 2)
+        self.assertEqual(scraper.last_run_status, 'failed')
+        self.assertGreater(scraper.failure_rate, 0)
+
+    def test_runs_without_events_are_not_failures(self):
+        scraper = self.make_scraper('quiet')
+        events = [{'title': 'Show', 'start_time': '2025-03-01 20:00', 'venue_name': 'Hall'}]
+        scheduler.record_run(scraper, events, now=self.now)
+        interval, change_rate, content_hash = scraper.poll_interval, scraper.change_rate, scraper.content_hash
+
+        scheduler.record_run(scraper, [], now=self.now)
+
+        scraper.refresh_from_db()
+        self.assertEqual((scraper.consecutive_failures, scraper.failure_rate), (0, 0))
+        self.assertEqual(scraper.last_run_status, 'empty')
+        self.assertEqual(scraper.content_hash, content_hash)
+        # Only the change rate lengthens the interval
+        self.assertLess(scraper.change_rate, change_rate)
+        self.assertEqual(scraper.poll_interval, scheduler.compute_poll_interval(scraper.change_rate, 0, 0))
+        self.assertGreater(scraper.poll_interval, interval)
+
+        scheduler.record_run(scraper, events, now=self.now)
+        self.assertEqual(scraper.last_run_status, 'unchanged')
+
+
+class TestDomainThrottle(TestCase):
+    def test_same_domain_runs_are_serialized_and_delayed(self):
+        clock = FakeClock()
+        throttle = scheduler.DomainThrottle(concurrency=1, delay=5.0, clock=clock)
+        active = {'count': 0, 'max': 0}
+        starts = []
+
+        async def fake_sleep(seconds):
+            clock.now += seconds
+
+        async def visit(url):
+            async with throttle.slot(url):
+                starts.append((url, clock.now))
+                active['count'] += 1
+                active['max'] = max(active['max'], active['count'])
+                await asyncio.sleep(0)
+                active['count'] -= 1
+
+        async def run():
+            original_sleep = scheduler.asyncio.sleep
+            scheduler.asyncio.sleep = fake_sleep
+            try:
+                await asyncio.gather(
+                    visit('https://a.example.com/1'),
+                    visit('https://a.example.com/2'),
+                    visit('https://b.example.com/1'),
+                )
+            finally:
+                scheduler.asyncio.sleep = original_sleep
+
+        asyncio.run(run())
+
+        a_starts = [start for url, start in starts if 'a.example.com' in url]
+        self.assertEqual(len(a_starts), 2)
+        self.assertGreaterEqual(a_starts[1] - a_starts[0], 5.0)
+
+
+class TestRunDueScrapers(TransactionTestCase):
+    def test_run_due_scrapers_respects_limits_and_reschedules(self):
+        user = get_user_model().objects.create_user(username='runner', password='testpass')
+        for index in range(3):
+            SiteScraper.objects.create(
+                user=user,
+                name=f'scraper {index}',
+                url=f'https://venue{index % 2}.example.com/events',
+                css_schema={'baseSelector': '.event', 'fields': []},
+            )
+
+        running = {'count': 0, 'max': 0}
+
+        async def runner(scraper):
+            running['count'] += 1
+            running['max'] = max(running['max'], running['count'])
+            await asyncio.sleep(0.01)
+            running['count'] -= 1
+            if scraper.name == 'scraper 2':
+                raise RuntimeError('boom')
+            return {'events': [{'title': scraper.name}], 'failed': False}
+
+        throttle = scheduler.DomainThrottle(concurrency=1, delay=0)
+        results = asyncio.run(scheduler.run_due_scrapers(
+            max_concurrency=1, throttle=throttle, runner=runner
+        ))
+
+        self.assertEqual(sorted(status for _, status in results), ['changed', 'changed', 'failed'])
+        self.assertEqual(running['max'], 1)
+        self.assertFalse(scheduler.get_due_scrapers())
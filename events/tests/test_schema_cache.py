@@ -0,0 +1,102 @@
+from django.test import TestCase
+from events.models import SchemaCacheEntry
+from events.scrapers.schema_cache import (
+    structural_fingerprint,
+    count_schema_matches,
+    find_cached_schema,
+    store_schema,
+)
+
+CARD_SCHEMA = {
+    'name': 'Events',
+    'baseSelector': '.event-card',
+    'fields': [
+        {'name': 'title', 'selector': '.event-title', 'type': 'text'},
+        {'name': 'date', 'selector': '.event-date', 'type': 'text'},
+        {'name': 'url', 'selector': 'a', 'type': 'attribute', 'attribute': 'href'},
+    ],
+}
+
+LIST_SCHEMA = {
+    'name': 'Events',
+    'baseSelector': 'li.listing',
+    'fields': [
+        {'name': 'title', 'selector': 'h3', 'type': 'text'},
+    ],
+}
+
+
+def card_page(titles, venue='The Venue', extra_script=''):
+    cards = ''.join(
+        f'<div class="event-card event-{index}">'
+        f'<h2 class="event-title">{title}</h2>'
+        f'<span class="event-date">March {index + 1}, 2025</span>'
+        f'<a href="/events/{index}">More</a>'
+        f'</div>'
+        for index, title in enumerate(titles)
+    )
+    return (
+        f'<html><head><title>{venue}</title><script>{extra_script}</script></head>'
+        f'<body><header class="site-header"><h1>{venue}</h1></header>'
+        f'<main class="events">{cards}</main></body></html>'
+    )
+
+
+def list_page(titles):
+    items = ''.join(f'<li class="listing"><h3>{title}</h3></li>' for title in titles)
+    return f'<html><body><ul class="listings">{items}</ul></body></html>'
+
+
+class TestStructuralFingerprint(TestCase):
+    def test_same_layout_different_content_matches(self):
+        first = card_page(['Jazz Night', 'Open Mic'], venue='Club A', extra_script='var a = 1;')
+        second = card_page(['Blues Jam', 'Poetry', 'Karaoke', 'Trivia'], venue='Club B')
+
+        self.assertEqual(structural_fingerprint(first), structural_fingerprint(second))
+
+    def test_different_layout_differs(self):
+        self.assertNotEqual(
+            structural_fingerprint(card_page(['Jazz Night'])),
+            structural_fingerprint(list_page(['Jazz Night'])),
+        )
+
+    def test_empty_html(self):
+        self.assertIsNone(structural_fingerprint(''))
+
+
+class TestSchemaCache(TestCase):
+    def test_count_schema_matches(self):
+        html = card_page(['Jazz Night', 'Open Mic'])
+        self.assertEqual(count_schema_matches(CARD_SCHEMA, html), 2)
+        self.assertEqual(count_schema_matches(LIST_SCHEMA, html), 0)
+        self.assertEqual(count_schema_matches({'title': '.event-title'}, html), 0)
+
+    def test_exact_fingerprint_hit(self):
+        store_schema(structural_fingerprint(card_page(['Jazz Night'])), CARD_SCHEMA, 'https://a.example.com')
+
+        html = card_page(['Blues Jam', 'Karaoke'])
+        self.assertEqual(find_cached_schema(html, 'https://b.example.com'), CARD_SCHEMA)
+        self.assertEqual(SchemaCacheEntry.objects.get().hit_count, 1)
+
+    def test_validating_candidate_is_reused_and_stored(self):
+        store_schema('unrelated-fingerprint', LIST_SCHEMA, 'https://lists.example.com')
+        store_schema('other-card-site', CARD_SCHEMA, 'https://cards.example.com')
+
+        html = card_page(['Jazz Night', 'Open Mic']).replace('site-header', 'masthead')
+        schema = find_cached_schema(html, 'https://new.example.com')
+
+        self.assertEqual(schema, CARD_SCHEMA)
+        self.assertTrue(SchemaCacheEntry.objects.filter(
+            fingerprint=structural_fingerprint(html),
+            source_url='https://new.example.com',
+        ).exists())
+
+    def test_miss_when_nothing_validates(self):
+        store_schema('unrelated-fingerprint', LIST_SCHEMA, 'https://lists.example.com')
+        self.assertIsNone(find_cached_schema(card_page(['Jazz Night']), 'https://new.example.com'))
+
+    def test_excluded_schema_is_not_returned(self):
+        html = card_page(['Jazz Night'])
+        store_schema(structural_fingerprint(html), CARD_SCHEMA, 'https://a.example.com')
+
+        self.assertIsNone(find_cached_schema(html, 'https://a.example.com', exclude=[CARD_SCHEMA]))
@@ -8,6 +8,7 @@ from events.scrapers.site_scraper import (
     transform_url,
     generate_css_schema,
     run_css_schema,
+    normalize_event_rows,
     AsyncWebCrawler
 )
 from events.utils.time_parser import extract_date_time_from_string, parse_datetime, format_event_datetime
@@ -374,4 +375,64 @@ class TestSiteScraper(TestCase):
         self.assertIn("2025-03-15 00:00:00", start_dt)
         
         # Verify the end time is 11:59 PM on the first day
-        self.assertIn("2025-03-15 23:59:00", end_dt) 
\ No newline at end of file
+        self.assertIn("2025-03-15 23:59:00", end_dt) 
+
+
+class TestNormalizeEventRows(TestCase):
+    """Tests for the batch normalization of extracted rows."""
+
+    def test_resolves_urls_and_images(self):
+        rows = [
+            {'title': 'A', 'url': '/events/a', 'image_url': 'img/a.jpg'},
+            {'title': 'B', 'url': 'https://tickets.example.org/b', 'image_url': '', 'data_image_url': '/lazy/b.jpg'},
+            {'title': 'C', 'url': '', 'image_url': 'data:image/png;base64,abc'},
+            {'title': 'D', 'image_url': "background-image: url('https://cdn.example.com/d.jpg')"},
+        ]
+
+        events = normalize_event_rows(rows, 'venue.example.com/calendar/')
+
+        self.assertEqual(events[0]['url'], 'https://venue.example.com/events/a')
+        self.assertEqual(events[0]['image_url'], 'https://venue.example.com/calendar/img/a.jpg')
+        self.assertEqual(events[1]['url'], 'https://tickets.example.org/b')
+        self.assertEqual(events[1]['image_url'], 'https://venue.example.com/lazy/b.jpg')
+        self.assertEqual(events[2]['url'], '')
+        self.assertIsNone(events[2]['image_url'])
+        self.assertEqual(events[3]['image_url'], 'https://cdn.example.com/d.jpg')
+
+    def test_splits_each_combined_date_once(self):
+        rows = [{'title': f'Show {index}', 'date': 'March 6, 2025 at 8:00 PM'} for index in range(50)]
+        rows.append({'title': 'Timed', 'date': 'March 7, 2025', 'start_time': '9:00 PM'})
+
+        with patch('events.utils.time_parser.extract_date_time_from_string',
+                   wraps=extract_date_time_from_string) as split:
+            events = normalize_event_rows(rows, 'https://example.com')
+
+        split.assert_called_once_with('March 6, 2025 at 8:00 PM')
+        self.assertEqual(events[0]['date'], events[49]['date'])
+        self.assertEqual(events[0]['start_time'], events[49]['start_time'])
+        self.assertEqual(events[50]['start_time'], '9:00 PM')
+
+    def test_formats_each_distinct_datetime_once(self):
+        rows = [{'title': f'Show {index}', 'date': 'March 6, 2025', 'start_time': '8:00 PM'} for index in range(50)]
+        rows.append({'title': 'Late', 'date': 'March 6, 2025', 'start_time': '11:00 PM'})
+
+        with patch('events.utils.time_parser.format_event_datetime',
+                   wraps=format_event_datetime) as format_datetime:
+            events = normalize_event_rows(rows, 'https://example.com')
+
+        self.assertEqual(format_datetime.call_count, 2)
+        self.assertIn('2025-03-06 20:00:00', events[0]['start_datetime'])
+        self.assertEqual(events[0]['end_datetime'], events[49]['end_datetime'])
+        self.assertIn('2025-03-06 23:00:00', events[50]['start_datetime'])
+
+    def test_matches_single_row_normalization(self):
+        rows = [
+            {'title': 'A', 'date': 'Mon Mar 3rd 5:00pm - 11:00pm', 'url': 'a'},
+            {'title': 'B', 'date': 'March 15, 2025 - March 18, 2025', 'url': '/b'},
+            'not a row',
+        ]
+        batch = normalize_event_rows(rows, 'https://example.com/events/')
+        one_by_one = [event for row in rows for event in normalize_event_rows([row], 'https://example.com/events/')]
+
+        self.assertEqual(batch, one_by_one)
+        self.assertEqual(len(batch), 2)
@@ -0,0 +1,189 @@
+import asyncio
+import os
+from unittest.mock import patch, AsyncMock
+import requests
+from crawl4ai import JsonCssExtractionStrategy
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TransactionTestCase, override_settings
+from events.models import SiteScraper
+from events.scrapers.site_scraper import run_css_schema_for_scraper, schema_hash
+from events.scrapers.static_extractor import extract_with_schema, fetch_static_html
+
+EXAMPLE_PAGE = os.path.join(os.path.dirname(__file__), '..', 'scrapers', 'example.html')
+
+BERKLEE_SCHEMA = {
+    'name': 'Berklee events',
+    'baseSelector': '.event.teaser',
+    'fields': [
+        {'name': 'title', 'selector': '.title a', 'type': 'text'},
+        {'name': 'url', 'selector': '.title a', 'type': 'attribute', 'attribute': 'href'},
+        {'name': 'date', 'selector': 'time', 'type': 'text'},
+        {'name': 'start_time', 'selector': 'time', 'type': 'attribute', 'attribute': 'datetime'},
+        {'name': 'image_url', 'selector': 'img', 'type': 'attribute', 'attribute': 'src'},
+        {'name': 'sponsor', 'selector': '.field--name-field-event-sponsorship .field__item',
+         'type': 'text', 'transform': 'lowercase'},
+        {'name': 'price', 'selector': '.price', 'type': 'text', 'default': 'Free'},
+        {'name': 'dates', 'selector': 'time', 'type': 'list', 'fields': [
+            {'name': 'datetime', 'type': 'attribute', 'attribute': 'datetime'},
+        ]},
+    ],
+}
+
+EVENTS_HTML = """
+<html><body>
+  <div class="event"><h2>Jazz Night</h2><img src="data:image/gif;base64,R0lGOD" data-src="/img/jazz.jpg">
+    <a href="/events/jazz">More</a></div>
+  <div class="event"><h2>Open Mic</h2><img src="/img/mic.jpg"><a href="https://other.example.com/mic">More</a></div>
+</body></html>
+"""
+
+EVENTS_SCHEMA = {
+    'baseSelector': '.event',
+    'fields': [
+        {'name': 'title', 'selector': 'h2', 'type': 'text'},
+        {'name': 'url', 'selector': 'a', 'type': 'attribute', 'attribute': 'href'},
+        {'name': 'image_url', 'selector': 'img', 'type': 'attribute', 'attribute': 'src'},
+    ],
+}
+
+
+class TestExtractWithSchema(SimpleTestCase):
+    def test_matches_crawl4ai_on_example_page(self):
+        with open(EXAMPLE_PAGE, encoding='utf-8') as f:
+            html = f.read()
+
+        static_items = extract_with_schema(html, BERKLEE_SCHEMA)
+        browser_items = JsonCssExtractionStrategy(schema=BERKLEE_SCHEMA).extract('', html)
+
+        self.assertEqual(len(static_items), 17)
+        self.assertEqual(static_items, browser_items)
+
+    def test_data_src_fallback(self):
+        items = extract_with_schema(EVENTS_HTML, EVENTS_SCHEMA)
+
+        self.assertEqual(items[0]['image_url'], '/img/jazz.jpg')
+        self.assertEqual(items[1]['image_url'], '/img/mic.jpg')
+
+    def test_child_selectors_do_not_match_base_element(self):
+        schema = {'baseSelector': 'div.event', 'fields': [
+            {'name': 'title', 'selector': 'h2', 'type': 'text'},
+            {'name': 'inner', 'selector': 'div', 'type': 'text'},
+        ]}
+        self.assertEqual(extract_with_schema(EVENTS_HTML, schema), [{'title': 'Jazz Night'}, {'title': 'Open Mic'}])
+
+    def test_invalid_schemas(self):
+        self.assertEqual(extract_with_schema(EVENTS_HTML, {'title': 'h2'}), [])
+        self.assertEqual(extract_with_schema(EVENTS_HTML, {'baseSelector': '!!', 'fields': []}), [])
+        self.assertEqual(extract_with_schema('', EVENTS_SCHEMA), [])
+
+
+def html_response(content, content_type='text/html'):
+    response = requests.Response()
+    response.status_code = 200
+    response.headers['Content-Type'] = content_type
+    response._content = content
+    # As requests' adapter sets it
+    response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+    return response
+
+
+class TestFetchStaticHtml(SimpleTestCase):
+    def fetch(self, response, address='93.184.216.34'):
+        with patch('events.utils.public_http.socket.getaddrinfo', return_value=[(2, 1, 6, '', (address, 443))]), \
+                patch('events.utils.public_http.requests.Session.get', return_value=response) as get:
+            return fetch_static_html('https://venue.example.com/events'), get
+
+    def test_refuses_private_addresses(self):
+        html, get = self.fetch(html_response(b'<html></html>'), address='10.0.0.8')
+
+        self.assertIsNone(html)
+        get.assert_not_called()
+
+    def test_pages_without_a_header_charset_keep_non_ascii_titles(self):
+        page = '<html><head>{}</head><body><div class="event"><h2>Café Ñandú – “Jazz”</h2></div></body></html>'
+        for meta, encoding in (('', 'utf-8'), ('<meta charset="windows-1252">', 'cp1252'),
+                               ('<meta charset="utf-8">', 'utf-8')):
+            html, _ = self.fetch(html_response(page.format(meta).encode(encoding)))
+            self.assertEqual(extract_with_schema(html, EVENTS_SCHEMA), [{'title': 'Café Ñandú – “Jazz”'}])
+
+        html, _ = self.fetch(html_response(page.format('').encode('cp1252'), 'text/html; charset=windows-1252'))
+        self.assertEqual(extract_with_schema(html, EVENTS_SCHEMA), [{'title': 'Café Ñandú – “Jazz”'}])
+
+
+class TestRunCssSchemaForScraper(TransactionTestCase):
+    def setUp(self):
+        user = get_user_model().objects.create_user(username='static', password='testpass')
+        self.scraper = SiteScraper.objects.create(
+            user=user, name='Venue', url='https://venue.example.com/events', css_schema=EVENTS_SCHEMA
+        )
+
+    def run_scraper(self, static_html, browser_events):
+        browser = AsyncMock(return_value=browser_events)
+        with patch('events.scrapers.site_scraper.fetch_static_html', return_value=static_html), \
+                patch('events.scrapers.site_scraper.run_css_schema', browser):
+            events = asyncio.run(run_css_schema_for_scraper(self.scraper))
+        self.scraper.refresh_from_db()
+        return events, browser
+
+    def test_static_page_skips_browser(self):
+        events, browser = self.run_scraper(EVENTS_HTML, [])
+
+        browser.assert_not_called()
+        self.assertEqual([event['title'] for event in events], ['Jazz Night', 'Open Mic'])
+        self.assertEqual(events[0]['url'], 'https://venue.example.com/events/jazz')
+        self.assertEqual(events[0]['image_url'], 'https://venue.example.com/img/jazz.jpg')
+        self.assertIs(self.scraper.requires_js, False)
+
+    def test_empty_static_result_falls_back_to_browser(self):
+        events, browser = self.run_scraper('<html><body><div id="app"></div></body></html>', [{'title': 'Rendered'}])
+
+        browser.assert_called_once()
+        self.assertEqual(events, [{'title': 'Rendered'}])
+        self.assertIs(self.scraper.requires_js, True)
+
+    def mark_js(self, **fields):
+        SiteScraper.objects.filter(pk=self.scraper.pk).update(
+            requires_js=True, requires_js_schema=schema_hash(EVENTS_SCHEMA), **fields
+        )
+        self.scraper.refresh_from_db()
+
+    def test_js_scrapers_go_straight_to_browser(self):
+        self.mark_js()
+
+        with patch('events.scrapers.site_scraper.fetch_static_html') as fetch, \
+                patch('events.scrapers.site_scraper.run_css_schema', AsyncMock(return_value=[{'title': 'Rendered'}])):
+            events = asyncio.run(run_css_schema_for_scraper(self.scraper))
+
+        fetch.assert_not_called()
+        self.assertEqual(events, [{'title': 'Rendered'}])
+        self.scraper.refresh_from_db()
+        self.assertEqual(self.scraper.browser_runs, 1)
+
+    @override_settings(STATIC_RECHECK_RUNS=5)
+    def test_js_scrapers_are_rechecked_after_some_runs(self):
+        self.mark_js(browser_runs=5)
+
+        events, browser = self.run_scraper(EVENTS_HTML, [])
+
+        browser.assert_not_called()
+        self.assertEqual(len(events), 2)
+        self.assertIs(self.scraper.requires_js, False)
+
+        # Still needing a browser starts the count again
+        self.mark_js(browser_runs=5)
+        self.run_scraper(None, [{'title': 'Rendered'}])
+        self.assertEqual((self.scraper.requires_js, self.scraper.browser_runs), (True, 0))
+
+    def test_js_scrapers_are_rechecked_when_the_schema_changes(self):
+        self.mark_js()
+        self.scraper.css_schema = dict(EVENTS_SCHEMA, baseSelector='div.event')
+        self.scraper.save()
+
+        events, browser = self.run_scraper(EVENTS_HTML, [])
+
+        browser.assert_not_called()
+        self.assertIs(self.scraper.requires_js, False)
+
+    def test_nothing_found_leaves_detection_open(self):
+        self.run_scraper(None, [])
+        self.assertIsNone(self.scraper.requires_js)
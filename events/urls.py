@@ -6,14 +6,20 @@ app_name = 'events'
 urlpatterns = [
     path('', views.event_list, name='list'),
     path('create/', views.event_create, name='create'),
+    path('discover/', views.discover, name='discover'),
     path('<int:pk>/', views.event_detail, name='detail'),
     path('<int:pk>/edit/', views.event_edit, name='edit'),
     path('<int:pk>/delete/', views.event_delete, name='delete'),
+    path('<int:pk>/image/<str:key>/<int:width>/', views.event_image, name='image'),
+    path('<int:pk>/enrichment/', views.event_enrichment, name='enrichment'),
     path('import/', views.scraper_list, name='import'),
+    path('import/bulk/', views.event_bulk_import, name='bulk_import'),
     path('import/status/<str:job_id>/', views.event_import_status, name='import_status'),
     path('export/', views.event_export, name='export'),
     path('spotify/search/', views.spotify_search, name='spotify_search'),
     path('export/ical/', views.export_ical, name='export_ical'),
+    path('metrics/', views.metrics_export, name='metrics'),
+    path('metrics/profile/', views.metrics_profile, name='metrics_profile'),
     
     # Site Scraper URLs
     path('scrapers/', views.scraper_list, name='scraper_list'),
@@ -0,0 +1,203 @@
+"""
+Import events from many sources in one job.
+
+A bulk import takes a list of URLs, or a CSV or OPML file of feeds, and runs
+one child job per URL under a parent job. Each child picks its own importer:
+
+- ``ical`` for iCal/webcal feeds, recognised by their URL or content type
+- ``css`` for pages the user has an active site scraper for, which run the
+  scraper's stored CSS schema
+- ``crawl4ai`` for any other page, which is extracted with the LLM
+
+Children run concurrently, at most BULK_IMPORT_MAX_CONCURRENCY at a time and
+with the scheduler's per-domain throttle. Each child reports progress under
+its own job ID as a single import does. The parent job lists its children and
+sums up their results as they finish.
+"""
+import asyncio
+import csv
+import io
+import logging
+import re
+import time
+from typing import Dict, List, Optional
+from xml.etree import ElementTree
+
+import requests
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from . import job_logs, public_http
+from .scheduler import DomainThrottle
+
+logger = logging.getLogger(__name__)
+
+ICAL_URL_PATTERN = re.compile(r'^webcal://|\.ics(\?|$)|[?&](ical|ics)=1|format=ical|outlook-ical', re.I)
+ICAL_CONTENT_TYPES = ('text/calendar', 'text/x-vcalendar', 'application/ics')
+DONE_STATUSES = {'complete', 'completed'}
+
+
+def get_bulk_setting(name: str, default):
+    return getattr(settings, name, default)
+
+
+def _is_url(value: str) -> bool:
+    return value.startswith(('http://', 'https://', 'webcal://'))
+
+
+def parse_sources(text: str) -> List[str]:
+    """
+    URLs from a pasted list, a CSV export or an OPML feed list, in order and without repeats.
+
+    OPML outlines contribute their ``xmlUrl`` (or ``url``/``htmlUrl``); CSV rows
+    contribute every cell that is a URL; anything else is read one URL per line.
+    """
+    text = text.lstrip('\ufeff').strip()
+    urls = []
+    if text.startswith('<'):
+        try:
+            root = ElementTree.fromstring(text)
+        except ElementTree.ParseError as e:
+            raise ValueError(f'Invalid OPML: {e}')
+        for outline in root.iter('outline'):
+            url = outline.get('xmlUrl') or outline.get('url') or outline.get('htmlUrl')
+            if url:
+                urls.append(url.strip())
+    else:
+        for row in csv.reader(io.StringIO(text)):
+            urls.extend(cell.strip() for cell in row if _is_url(cell.strip()))
+    return list(dict.fromkeys(url for url in urls if _is_url(url)))
+
+
+def find_site_scraper(user, url: str):
+    from ..models import SiteScraper
+
+    candidates = {url, url.rstrip('/'), url.rstrip('/') + '/'}
+    return SiteScraper.objects.filter(user=user, is_active=True, url__in=candidates).first()
+
+
+def probe_is_ical(url: str) -> bool:
+    """Whether ``url``, on a public host, serves an iCal feed, judged from its content type or first bytes."""
+    try:
+        with public_http.get(url, stream=True,
+                             timeout=get_bulk_setting('BULK_IMPORT_PROBE_TIMEOUT', 10)) as response:
+            content_type = response.headers.get('content-type', '').lower()
+            if any(kind in content_type for kind in ICAL_CONTENT_TYPES):
+                return True
+            head = next(response.iter_content(64), b'')
+    except requests.RequestException as e:
+        logger.warning(f"Could not probe {url}: {str(e)}")
+        return False
+    return head.lstrip().upper().startswith(b'BEGIN:VCALENDAR')
+
+
+def detect_importer(user, url: str):
+    """Returns ``(importer, site_scraper)``; see the module docstring for the importers."""
+    if ICAL_URL_PATTERN.search(url):
+        return 'ical', None
+    site_scraper = find_site_scraper(user, url)
+    if site_scraper is not None:
+        return 'css', site_scraper
+    if probe_is_ical(url):
+        return 'ical', None
+    return 'crawl4ai', None
+
+
+class BulkImport:
+    """A parent job running one child import job per source URL."""
+
+    def __init__(self, job_id: str, urls: List[str], user, max_concurrency: Optional[int] = None,
+                 throttle: Optional[DomainThrottle] = None):
+        self.job_id = job_id
+        self.user = user
+        self.max_concurrency = max_concurrency or get_bulk_setting('BULK_IMPORT_MAX_CONCURRENCY', 4)
+        self.throttle = throttle or DomainThrottle()
+        self.children = [
+            {'job_id': f'{job_id}-{number}', 'url': url, 'importer': None, 'status': 'pending',
+             'message': 'Waiting to start', 'stats': {'found': 0, 'created': 0, 'updated': 0}}
+            for number, url in enumerate(urls, 1)
+        ]
+
+    def status(self) -> Dict:
+        finished = [child for child in self.children if child['status'] in DONE_STATUSES | {'error'}]
+        failed = sum(1 for child in finished if child['status'] == 'error')
+        total = len(self.children)
+        stats = {'sources': total, 'finished': len(finished), 'failed': failed}
+        for key in ('found', 'created', 'updated'):
+            stats[key] = sum(child['stats'].get(key, 0) for child in self.children)
+
+        if len(finished) < total:
+            status = 'running' if finished or any(child['status'] == 'running' for child in self.children) \
+                else 'started'
+            message = f'Imported {len(finished)} of {total} sources'
+        else:
+            status = 'error' if total and failed == total else 'complete'
+            message = f"Imported {total - failed} of {total} sources: " \
+                      f"{stats['created']} events created, {stats['updated']} updated"
+        if failed:
+            message += f' ({failed} failed)'
+        return {
+            'status': status,
+            'message': message,
+            'progress': {'overall': int(100 * len(finished) / total) if total else 100},
+            'stats': stats,
+            'children': [dict(child) for child in self.children],
+        }
+
+    def publish(self) -> None:
+        from ..views import set_job_status
+
+        set_job_status(self.job_id, self.status())
+
+    async def run_child(self, child: Dict) -> None:
+        from ..views import (get_job_status, import_events_async, scrape_crawl4ai_events_async,
+                             scrape_ical_events_async, set_job_status)
+
+        url = child['url']
+        # Each child keeps its own log, stored with its job status
+        with job_logs.job_log(child['job_id']):
+            try:
+                importer, site_scraper = await sync_to_async(detect_importer, thread_sensitive=False)(self.user, url)
+                child.update(importer=importer, status='running', message=f'Importing with {importer}')
+                self.publish()
+                logger.info(f"Bulk import {self.job_id}: {url} with {importer}")
+
+                if importer == 'css':
+                    await import_events_async(site_scraper.pk, child['job_id'], self.user.pk)
+                elif importer == 'ical':
+                    await scrape_ical_events_async(url, child['job_id'], self.user)
+                else:
+                    await scrape_crawl4ai_events_async(url, child['job_id'], self.user)
+                result = get_job_status(child['job_id']) or {}
+            except Exception as e:
+                logger.error(f"Bulk import {self.job_id}: {url} failed: {str(e)}")
+                result = {'status': 'error', 'message': str(e)}
+                set_job_status(child['job_id'], result)
+
+        child['status'] = 'complete' if result.get('status') in DONE_STATUSES else 'error'
+        child['message'] = result.get('message', '')
+        child['stats'] = {key: result.get('stats', {}).get(key, 0) for key in ('found', 'created', 'updated')}
+        self.publish()
+
+    async def run(self) -> Dict:
+        self.publish()
+        global_semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def run_one(child):
+            # Wait for the domain slot first so a throttled domain doesn't hold a global slot
+            async with self.throttle.slot(child['url']):
+                async with global_semaphore:
+                    await self.run_child(child)
+
+        await asyncio.gather(*(run_one(child) for child in self.children))
+        status = self.status()
+        logger.info(f"Bulk import {self.job_id}: {status['message']}")
+        return status
+
+
+def new_job_id() -> str:
+    return f'bulk_{time.time()}'
+
+
+async def run_bulk_import(job_id: str, urls: List[str], user, max_concurrency: Optional[int] = None) -> Dict:
+    return await BulkImport(job_id, urls, user, max_concurrency).run()
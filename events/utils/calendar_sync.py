@@ -1,30 +1,359 @@
+"""
+Two-way sync between a user's events and their Google Calendar.
+
+A sync pulls, then pushes:
+
+- The pull lists events with the sync token Google returned last time, so
+  only events changed since then come back; the first sync lists them all.
+  Events are matched to local ones by ``google_event_id``, cancelled ones are
+  deleted locally, and when an event was edited on both sides the newer edit
+  wins.
+- The push sends local events created or edited since they were last synced,
+  and deletions recorded in tombstones, as batch requests of
+  GOOGLE_CALENDAR_BATCH_SIZE calls (default 50). Inserts carry an event id
+  derived from the local one, so an insert retried after a lost response gets
+  a 409 rather than creating a duplicate.
+
+An event is in sync while ``google_synced_at`` equals its ``updated_at``.
+Writes made by the sync set both, so pulled changes are not pushed back and
+repeat syncs only send what changed.
+"""
+import hashlib
+import json
+import logging
+from datetime import timezone as dt_timezone
+from datetime import datetime, time, timedelta
+from typing import Dict, List, Optional
+
+from allauth.socialaccount.adapter import get_adapter
+from allauth.socialaccount.models import SocialApp, SocialToken
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
 from google.oauth2.credentials import Credentials
-from googleapiclient.discovery import build
+from googleapiclient.discovery import build, build_from_document
+from googleapiclient.discovery_cache import get_static_doc
+from googleapiclient.errors import HttpError
+
+from ..models import Event, EventTombstone, GoogleCalendarSyncState
+from . import discovery
+
+logger = logging.getLogger(__name__)
+
+GOOGLE_TOKEN_URI = 'https://oauth2.googleapis.com/token'
+LIST_PAGE_SIZE = 250
+# Events without an end get this long on Google, which requires one
+DEFAULT_DURATION = timedelta(hours=2)
+# The fields a sync compares and copies, in both directions
+SYNCED_FIELDS = ['title', 'description', 'venue_name', 'venue_address', 'venue_city', 'venue_state',
+                 'venue_postal_code', 'venue_country', 'start_time', 'end_time']
+
+
+class CalendarSyncError(Exception):
+    pass
+
+
+def batch_size() -> int:
+    return getattr(settings, 'GOOGLE_CALENDAR_BATCH_SIZE', 50)
+
+
+def load_credentials(user) -> Credentials:
+    """The user's Google OAuth credentials from their allauth social token."""
+    token = (
+        SocialToken.objects.select_related('app')
+        .filter(account__user=user, account__provider='google')
+        .order_by('-id').first()
+    )
+    if token is None:
+        raise CalendarSyncError(f'{user} has not connected a Google account')
+    try:
+        app = token.app or get_adapter().get_app(None, provider='google')
+    except SocialApp.DoesNotExist:
+        raise CalendarSyncError('No Google app is configured')
+    credentials = Credentials(
+        token=token.token,
+        refresh_token=token.token_secret or None,
+        token_uri=GOOGLE_TOKEN_URI,
+        client_id=app.client_id,
+        client_secret=app.secret,
+        # google-auth compares against naive UTC
+        expiry=timezone.make_naive(token.expires_at, dt_timezone.utc) if token.expires_at else None,
+    )
+    credentials.social_token = token
+    return credentials
+
+
+def save_refreshed_token(credentials: Credentials) -> None:
+    """Store an access token google-auth refreshed during the sync."""
+    token = getattr(credentials, 'social_token', None)
+    if token is None or credentials.token == token.token:
+        return
+    token.token = credentials.token
+    if credentials.expiry:
+        token.expires_at = timezone.make_aware(credentials.expiry, dt_timezone.utc)
+    token.save(update_fields=['token', 'expires_at'])
+
+
+def build_service(credentials: Credentials):
+    """
+    A Calendar API client. GOOGLE_CALENDAR_API_URL points it, batch requests
+    included, at another server, such as the fake one the tests run.
+    """
+    root_url = getattr(settings, 'GOOGLE_CALENDAR_API_URL', None)
+    if not root_url:
+        return build('calendar', 'v3', credentials=credentials, cache_discovery=False)
+    document = json.loads(get_static_doc('calendar', 'v3'))
+    document['rootUrl'] = root_url.rstrip('/') + '/'
+    return build_from_document(document, credentials=credentials)
+
+
+def google_event_id(event: Event) -> str:
+    # Google ids use the base32hex alphabet, which covers hex digits
+    return 'sc' + hashlib.sha1(f'socialcal:{event.user_id}:{event.pk}'.encode()).hexdigest()
+
+
+def _seconds(value: Optional[datetime]) -> Optional[datetime]:
+    # Google keeps times to the second
+    return value.replace(microsecond=0) if value else value
+
+
+def to_google(event: Event) -> Dict:
+    end_time = event.end_time or event.start_time + DEFAULT_DURATION
+    return {
+        'summary': event.title,
+        'description': event.description,
+        'location': event.location,
+        'start': {'dateTime': _seconds(event.start_time).isoformat()},
+        'end': {'dateTime': _seconds(end_time).isoformat()},
+        'extendedProperties': {'private': {'socialcalId': str(event.pk)}},
+    }
+
+
+def _parse_when(when: Dict, end: bool = False) -> Optional[datetime]:
+    if 'dateTime' in when:
+        return datetime.fromisoformat(when['dateTime'].replace('Z', '+00:00'))
+    if 'date' in when:
+        # All-day events end on the following day on Google; locally they end at 11:59 PM
+        day = datetime.fromisoformat(when['date']).date()
+        if end:
+            return timezone.make_aware(datetime.combine(day - timedelta(days=1), time(23, 59)))
+        return timezone.make_aware(datetime.combine(day, time.min))
+    return None
+
+
+def from_google(item: Dict, event: Optional[Event] = None) -> Dict:
+    """Local field values for a Google event; the venue stays as it is unless the location changed."""
+    fields = {
+        'title': (item.get('summary') or '(No title)')[:200],
+        'description': item.get('description', ''),
+        'start_time': _parse_when(item.get('start', {})),
+        'end_time': _parse_when(item.get('end', {}), end=True),
+    }
+    if event is not None and event.start_time and not event.end_time and \
+            fields['end_time'] == _seconds(event.start_time) + DEFAULT_DURATION:
+        # The end to_google made up
+        fields['end_time'] = None
+    location = item.get('location', '')
+    if event is None or location != event.location:
+        fields.update(venue_name=location[:200], venue_address='', venue_city='', venue_state='',
+                      venue_postal_code='', venue_country='')
+    return fields
+
 
 class GoogleCalendarSync:
-    def __init__(self, user):
+    """Syncs one user's events with one of their Google calendars."""
+
+    def __init__(self, user, calendar_id: str = 'primary', service=None):
         self.user = user
-        self.credentials = self._get_user_credentials()
+        self.calendar_id = calendar_id
+        self.credentials = None
+        if service is None:
+            self.credentials = load_credentials(user)
+            service = build_service(self.credentials)
+        self.service = service
+        self.state, _ = GoogleCalendarSyncState.objects.get_or_create(user=user, calendar_id=calendar_id)
+
+    def sync(self) -> Dict[str, int]:
+        """Pull, then push; returns counts of what changed on each side."""
+        counts = {'pulled_created': 0, 'pulled_updated': 0, 'pulled_deleted': 0,
+                  'pushed_created': 0, 'pushed_updated': 0, 'pushed_deleted': 0, 'failed': 0}
+        try:
+            self.pull(counts)
+            self.push(counts)
+        except (HttpError, CalendarSyncError) as e:
+            self.state.last_error = str(e)
+            self.state.save(update_fields=['last_error'])
+            raise
+        finally:
+            if self.credentials is not None:
+                save_refreshed_token(self.credentials)
+        self.state.last_synced_at = timezone.now()
+        self.state.last_error = ''
+        self.state.save(update_fields=['sync_token', 'last_synced_at', 'last_error'])
+        logger.info(f"Synced {self.user}'s events with Google calendar {self.calendar_id}: {counts}")
+        return counts
+
+    # Pull
+
+    def pull(self, counts: Dict[str, int]) -> None:
+        params = {'calendarId': self.calendar_id, 'maxResults': LIST_PAGE_SIZE}
+        if self.state.sync_token:
+            params['syncToken'] = self.state.sync_token
+        page_token = None
+        while True:
+            try:
+                response = self.service.events().list(pageToken=page_token, **params).execute()
+            except HttpError as e:
+                if e.resp.status == 410 and 'syncToken' in params:
+                    # The token expired; Google wants a full sync
+                    logger.info(f'Sync token for {self.user} expired, listing all events again')
+                    self.state.sync_token = ''
+                    return self.pull(counts)
+                raise
+            self.apply(response.get('items', []), counts)
+            page_token = response.get('nextPageToken')
+            if not page_token:
+                break
+        self.state.sync_token = response.get('nextSyncToken', '')
+
+    def apply(self, items: List[Dict], counts: Dict[str, int]) -> None:
+        """Write one page of Google events to the user's events."""
+        cancelled = [item['id'] for item in items if item.get('status') == 'cancelled']
+        changed = [item for item in items if item.get('status') != 'cancelled' and 'start' in item]
+        existing = {
+            event.google_event_id: event
+            for event in Event.objects.filter(user=self.user, google_event_id__in=[item['id'] for item in changed])
+        }
+
+        now = timezone.now()
+        to_create, to_update = [], []
+        for item in changed:
+            event = existing.get(item['id'])
+            fields = from_google(item, event)
+            if fields['start_time'] is None:
+                continue
+            if event is None:
+                to_create.append(Event(user=self.user, google_event_id=item['id'], **fields))
+                continue
+            if all(_seconds(getattr(event, name)) == value if name.endswith('_time') else getattr(event, name) == value
+                   for name, value in fields.items()):
+                continue
+            edited_here = event.google_synced_at is None or event.updated_at > event.google_synced_at
+            if edited_here and event.updated_at > _parse_when({'dateTime': item['updated']}):
+                # The local edit is newer; the push sends it
+                continue
+            for name, value in fields.items():
+                setattr(event, name, value)
+            # bulk_update doesn't apply auto_now
+            event.updated_at = event.google_synced_at = now
+            to_update.append(event)
 
-    def _get_user_credentials(self):
-        # Retrieve and validate user's Google OAuth credentials
-        pass
+        with transaction.atomic():
+            if to_create:
+                created = Event.objects.bulk_create(to_create)
+                # bulk_create sets updated_at itself, after google_synced_at could be
+                Event.objects.filter(pk__in=[event.pk for event in created]).update(google_synced_at=F('updated_at'))
+            if to_update:
+                Event.objects.bulk_update(to_update, SYNCED_FIELDS + ['updated_at', 'google_synced_at'])
+            if cancelled:
+                deleted, _ = Event.objects.filter(user=self.user, google_event_id__in=cancelled).delete()
+                counts['pulled_deleted'] += deleted
+                # Google already knows about these deletions
+                EventTombstone.objects.filter(user=self.user, google_event_id__in=cancelled).update(google_event_id='')
+            if to_create or to_update:
+                transaction.on_commit(discovery.invalidate)
+        counts['pulled_created'] += len(to_create)
+        counts['pulled_updated'] += len(to_update)
 
-    def sync_events(self, events):
-        service = build('calendar', 'v3', credentials=self.credentials)
-        
+    # Push
+
+    def push(self, counts: Dict[str, int]) -> None:
+        pending = list(
+            Event.objects.filter(user=self.user, start_time__isnull=False)
+            .filter(Q(google_synced_at__isnull=True) | Q(updated_at__gt=F('google_synced_at')))
+        )
+        conflicts = []
+        for offset in range(0, len(pending), batch_size()):
+            conflicts += self._push_events(pending[offset:offset + batch_size()], counts)
+        # Inserts that already happened (a retry after a lost response) become updates
+        for offset in range(0, len(conflicts), batch_size()):
+            self._push_events(conflicts[offset:offset + batch_size()], counts)
+
+        tombstones = list(EventTombstone.objects.filter(user=self.user).exclude(google_event_id=''))
+        for offset in range(0, len(tombstones), batch_size()):
+            self._push_deletions(tombstones[offset:offset + batch_size()], counts)
+
+    def _push_events(self, events: List[Event], counts: Dict[str, int]) -> List[Event]:
+        """Insert or update one batch of events; returns inserts Google already had."""
+        synced, conflicts, missing = [], [], []
+
+        def done(request_id, response, exception):
+            event = by_id[request_id]
+            if exception is None:
+                if not event.google_event_id:
+                    event.google_event_id = response['id']
+                    counts['pushed_created'] += 1
+                else:
+                    counts['pushed_updated'] += 1
+                synced.append(event)
+            elif isinstance(exception, HttpError) and exception.resp.status == 409 and not event.google_event_id:
+                event.google_event_id = google_event_id(event)
+                conflicts.append(event)
+            elif isinstance(exception, HttpError) and exception.resp.status in (404, 410):
+                missing.append(event)
+            else:
+                logger.warning(f'Could not push event {event.pk} to Google Calendar: {exception}')
+                counts['failed'] += 1
+
+        by_id = {str(event.pk): event for event in events}
+        batch = self.service.new_batch_http_request(callback=done)
         for event in events:
-            google_event = {
-                'summary': event.title,
-                'location': event.location,
-                'description': event.description,
-                'start': {
-                    'dateTime': event.start_datetime.isoformat(),
-                    'timeZone': 'UTC',
-                },
-                'end': {
-                    'dateTime': event.end_datetime.isoformat(),
-                    'timeZone': 'UTC',
-                },
-            }
-            service.events().insert(calendarId='primary', body=google_event).execute()
\ No newline at end of file
+            body = to_google(event)
+            if event.google_event_id:
+                request = self.service.events().update(
+                    calendarId=self.calendar_id, eventId=event.google_event_id, body=body)
+            else:
+                request = self.service.events().insert(
+                    calendarId=self.calendar_id, body=dict(body, id=google_event_id(event)))
+            batch.add(request, request_id=str(event.pk))
+        batch.execute()
+
+        for event in synced:
+            # bulk_update leaves updated_at alone, so this marks the version that was sent
+            event.google_synced_at = event.updated_at
+        Event.objects.bulk_update(synced, ['google_event_id', 'google_synced_at'])
+        if missing:
+            # Deleted on Google since the pull; the deletion wins, as it does when pulled
+            deleted, _ = Event.objects.filter(pk__in=[event.pk for event in missing]).delete()
+            counts['pulled_deleted'] += deleted
+            EventTombstone.objects.filter(
+                user=self.user, google_event_id__in=[event.google_event_id for event in missing]
+            ).update(google_event_id='')
+        return conflicts
+
+    def _push_deletions(self, tombstones: List[EventTombstone], counts: Dict[str, int]) -> None:
+        pushed = []
+
+        def done(request_id, response, exception):
+            tombstone = by_id[request_id]
+            if exception is None:
+                counts['pushed_deleted'] += 1
+                pushed.append(tombstone.pk)
+            elif isinstance(exception, HttpError) and exception.resp.status in (404, 410):
+                pushed.append(tombstone.pk)
+            else:
+                logger.warning(f'Could not delete event {tombstone.event_id} from Google Calendar: {exception}')
+                counts['failed'] += 1
+
+        by_id = {str(tombstone.pk): tombstone for tombstone in tombstones}
+        batch = self.service.new_batch_http_request(callback=done)
+        for tombstone in tombstones:
+            batch.add(self.service.events().delete(calendarId=self.calendar_id, eventId=tombstone.google_event_id),
+                      request_id=str(tombstone.pk))
+        batch.execute()
+        EventTombstone.objects.filter(pk__in=pushed).update(google_event_id='')
+
+
+def sync_user_calendar(user, calendar_id: str = 'primary') -> Dict[str, int]:
+    return GoogleCalendarSync(user, calendar_id).sync()
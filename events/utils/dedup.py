@@ -0,0 +1,296 @@
+"""
+Cross-source event deduplication.
+
+The same show often reaches a user's calendar from the venue site, an iCal
+feed and a ticketing page, each with slightly different titles and times.
+EventIndex groups a user's events into blocks keyed by (local date,
+normalized venue), so an incoming event is only compared with the handful of
+events on the same day, and compares titles by token-set similarity. The work
+per imported event stays roughly constant as the user's history grows.
+"""
+import logging
+import re
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+# Words that say nothing about which event it is
+TITLE_STOPWORDS = {
+    'a', 'an', 'and', 'the', 'of', 'at', 'in', 'on', 'with', 'w', 'feat', 'featuring',
+    'ft', 'presents', 'present', 'live', 'tickets', 'event',
+}
+VENUE_STOPWORDS = {'the', 'at', 'venue'}
+
+NON_WORD = re.compile(r'[^\w]+')
+
+# Lookups of many URLs are split so the query stays under database parameter limits
+URL_LOOKUP_BATCH = 500
+
+
+def title_tokens(title: str) -> frozenset:
+    words = NON_WORD.sub(' ', (title or '').lower()).split()
+    tokens = frozenset(word for word in words if word not in TITLE_STOPWORDS)
+    # A title made only of stopwords still has to compare with something
+    return tokens or frozenset(words)
+
+
+def normalize_venue(venue: str) -> str:
+    words = NON_WORD.sub(' ', (venue or '').lower()).split()
+    return ' '.join(word for word in words if word not in VENUE_STOPWORDS)
+
+
+def title_similarity(first: frozenset, second: frozenset, same_venue: bool = False) -> float:
+    """
+    Token-set similarity of two titles between 0 and 1.
+
+    At a known venue, one title containing the other ("Jazz Trio" and
+    "The Jazz Trio - Album Release") counts as a full match.
+    """
+    if not first or not second:
+        return 0.0
+    common = len(first & second)
+    score = 2 * common / (len(first) + len(second))
+    if same_venue:
+        score = max(score, common / min(len(first), len(second)))
+    return score
+
+
+def to_datetime(value) -> Optional[datetime]:
+    """Coerce the start/end values scrapers return (datetime or string) to an aware datetime."""
+    if value is None or value == '':
+        return None
+    if isinstance(value, str):
+        try:
+            value = parse_datetime(value.strip())
+        except ValueError:
+            return None
+        if value is None:
+            return None
+    if not isinstance(value, datetime):
+        return None
+    if timezone.is_naive(value):
+        value = timezone.make_aware(value)
+    return value
+
+
+def is_date_only(value: Optional[datetime]) -> bool:
+    """True for start times that are a date placeholder (local midnight) rather than a real time."""
+    if value is None:
+        return True
+    local = timezone.localtime(value)
+    return local.hour == 0 and local.minute == 0
+
+
+class EventIndex:
+    """A user's events blocked by (local date, normalized venue), plus an exact URL lookup."""
+
+    def __init__(self, events: Iterable = (), user=None, loaded_days: Iterable = ()):
+        self.threshold = getattr(settings, 'DEDUP_TITLE_THRESHOLD', 0.8)
+        self.time_tolerance = timedelta(minutes=getattr(settings, 'DEDUP_TIME_TOLERANCE_MINUTES', 90))
+        # With a user, days that weren't preloaded are read from the database on first use
+        self.user = user
+        self.loaded_days = set(loaded_days)
+        self.indexed = set()
+        # url -> events; feeds often give many events one listing or venue URL
+        self.by_url = defaultdict(list)
+        # date -> venue -> [(title tokens, event)]
+        self.blocks = defaultdict(lambda: defaultdict(list))
+        for event in events:
+            self.add(event)
+
+    @classmethod
+    def for_user(cls, user, candidates: List[Dict]) -> 'EventIndex':
+        """
+        Index the user's events that an import of ``candidates`` could collide with.
+
+        Events between the earliest and latest incoming start time (plus a day
+        on each side) and events sharing an incoming URL are loaded up front.
+        Days of start times that are only known later are loaded when needed.
+        """
+        from ..models import Event
+
+        starts = [start for start in (to_datetime(data.get('start_time')) for data in candidates) if start]
+        urls = sorted({data['url'] for data in candidates if data.get('url')})
+
+        queryset = Event.objects.filter(user=user)
+        events = []
+        loaded_days = set()
+        if starts:
+            first, last = min(starts) - timedelta(days=1), max(starts) + timedelta(days=1)
+            events = list(queryset.filter(start_time__range=(first, last)))
+            day, last_day = timezone.localdate(first) + timedelta(days=1), timezone.localdate(last)
+            while day < last_day:
+                loaded_days.add(day)
+                day += timedelta(days=1)
+        for offset in range(0, len(urls), URL_LOOKUP_BATCH):
+            events.extend(queryset.filter(url__in=urls[offset:offset + URL_LOOKUP_BATCH]))
+
+        logger.debug(f"Dedup index for user {user.pk}: {len(events)} existing events")
+        return cls(events, user=user, loaded_days=loaded_days)
+
+    def add(self, event) -> None:
+        if event.pk is not None:
+            if event.pk in self.indexed:
+                return
+            self.indexed.add(event.pk)
+        if event.url:
+            self.by_url[event.url].append(event)
+        start = to_datetime(event.start_time)
+        if start is None:
+            return
+        self.blocks[timezone.localdate(start)][normalize_venue(event.venue_name)].append(
+            (title_tokens(event.title), event)
+        )
+
+    def _load_day(self, day) -> None:
+        if self.user is None or day in self.loaded_days:
+            return
+        from ..models import Event
+
+        self.loaded_days.add(day)
+        start = timezone.make_aware(datetime.combine(day, datetime.min.time()))
+        for event in Event.objects.filter(user=self.user, start_time__gte=start,
+                                          start_time__lt=start + timedelta(days=1)):
+            self.add(event)
+
+    def _candidates(self, day, venue: str):
+        self._load_day(day)
+        block = self.blocks.get(day)
+        if not block:
+            return
+        if venue:
+            # Sources often leave the venue out, so unknown-venue events are candidates too
+            yield from ((True, item) for item in block.get(venue, ()))
+            yield from ((False, item) for item in block.get('', ()))
+        else:
+            for items in block.values():
+                yield from ((False, item) for item in items)
+
+    def find(self, fields: Dict) -> Tuple[Optional[object], bool]:
+        """
+        Return ``(event, same_source)`` for the stored event ``fields`` duplicates.
+
+        ``same_source`` is True for exact URL or title-and-time matches (a
+        re-import of the same listing) and False for fuzzy matches from
+        another source. A URL only matches an event with the same start
+        date or title, since one URL is often shared by many events.
+        """
+        start = to_datetime(fields.get('start_time'))
+        tokens = title_tokens(fields.get('title', ''))
+        url = fields.get('url')
+        for event in self.by_url.get(url, ()) if url else ():
+            candidate_start = to_datetime(event.start_time)
+            same_day = start is not None and candidate_start is not None and \
+                timezone.localdate(start) == timezone.localdate(candidate_start)
+            if same_day or (fields.get('title') and title_tokens(event.title) == tokens):
+                return event, True
+
+        if start is None or not fields.get('title'):
+            return None, False
+
+        venue = normalize_venue(fields.get('venue_name', ''))
+        best, best_score = None, 0.0
+        for same_venue, (candidate_tokens, event) in self._candidates(timezone.localdate(start), venue):
+            candidate_start = to_datetime(event.start_time)
+            if not (is_date_only(start) or is_date_only(candidate_start)) and \
+                    abs(candidate_start - start) > self.time_tolerance:
+                continue
+            score = title_similarity(tokens, candidate_tokens, same_venue)
+            if score >= self.threshold and score > best_score:
+                best, best_score = event, score
+
+        if best is not None:
+            if best_score == 1.0 and tokens == title_tokens(best.title) and to_datetime(best.start_time) == start:
+                # Same title and time: the same listing seen again, not another source
+                return best, True
+            logger.info(f"'{fields['title']}' duplicates event {best.pk} '{best.title}' (score {best_score:.2f})")
+        return best, False
+
+
+def merge_event(event, fields: Dict, same_source: bool = False) -> List[str]:
+    """
+    Merge incoming ``fields`` into a stored duplicate ``event``, returning the changed field names.
+
+    A re-import of the same listing refreshes every field it provides.
+    A match from another source only fills in what the stored event lacks:
+    empty fields, a longer description, and a real start time where only a
+    date was known.
+
+    ``enrichment_status`` only follows the import when the title, and so
+    possibly the artist, changed; otherwise the event keeps what Spotify
+    enrichment found instead of being queued again on every re-import.
+    """
+    changed = []
+    for name, value in fields.items():
+        if value is None or value == '' or name == 'enrichment_status':
+            continue
+        if name in ('start_time', 'end_time'):
+            value = to_datetime(value)
+            if value is None:
+                continue
+        current = getattr(event, name)
+        if name in ('start_time', 'end_time'):
+            current = to_datetime(current)
+
+        if same_source or current is None or current == '':
+            replace = True
+        elif name == 'description':
+            replace = len(str(value)) > len(current)
+        elif name == 'start_time':
+            replace = is_date_only(current) and not is_date_only(value)
+        else:
+            replace = False
+
+        if replace and value != current:
+            setattr(event, name, value)
+            changed.append(name)
+
+    status = fields.get('enrichment_status')
+    if status and 'title' in changed and status != event.enrichment_status:
+        event.enrichment_status = status
+        changed.append('enrichment_status')
+    return changed
+
+
+def event_fields(data: Dict) -> Dict:
+    """The subset of a scraped event dict that maps onto Event model fields."""
+    from ..models import Event
+
+    names = {field.name for field in Event._meta.concrete_fields} - {'id', 'user', 'created_at', 'updated_at'}
+    return {name: value for name, value in data.items() if name in names}
+
+
+@metrics.span('db_write')
+def save_deduplicated(index: EventIndex, user, data: Dict) -> Tuple[object, bool]:
+    """
+    Store a scraped event for ``user``, merging it into a duplicate if there is one.
+
+    Returns ``(event, created)``. New events are added to ``index`` so
+    duplicates within the same import are caught as well.
+    """
+    from ..models import Event
+
+    fields = event_fields(data)
+    for name in ('start_time', 'end_time'):
+        if name in fields:
+            fields[name] = to_datetime(fields[name])
+
+    existing, same_source = index.find(fields)
+    if existing is not None:
+        changed = merge_event(existing, fields, same_source)
+        if changed:
+            existing.save(update_fields=changed + ['updated_at'])
+        return existing, False
+
+    event = Event(user=user, **fields)
+    event.save()
+    index.add(event)
+    return event, True
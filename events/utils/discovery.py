@@ -0,0 +1,306 @@
+"""
+Public "what's on" timeline aggregated across users.
+
+The timeline holds the upcoming public events of every user whose calendar
+is public, with the same show saved by several users merged into one entry.
+It is built once and kept in the cache as a single value, so rendering the
+feed is one cache read. Event and profile signals keep it current: a saved or
+deleted event is applied to the cached timeline in place once it commits,
+and changes that can't be applied that way (a calendar made public or
+private, a shrinking truncated timeline) drop it so the next read rebuilds
+it. Imports apply all their events at once when they end.
+
+The ids and owners in the timeline are cached beside it, so saves that don't
+touch it never load it. Dropping the timeline moves the key it lives under
+to a new generation, so an update that read it before the drop can't write
+it back.
+"""
+import logging
+import time
+from bisect import bisect_left, bisect_right
+from contextvars import ContextVar
+from datetime import datetime, timedelta
+from functools import partial, wraps
+from typing import Dict, List, Optional
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from .dedup import normalize_venue, title_similarity, title_tokens
+
+logger = logging.getLogger(__name__)
+
+TIMELINE_KEY = 'discovery:timeline'
+GENERATION_KEY = 'discovery:timeline:generation'
+LOCK_KEY = 'discovery:timeline:lock'
+
+# Event changes of the running ``batched`` import, by event id
+_batch: ContextVar[Optional[Dict]] = ContextVar('discovery_batch', default=None)
+
+# Fields copied from an event into its timeline entry
+ENTRY_FIELDS = ('title', 'description', 'start_time', 'end_time', 'venue_name', 'venue_city', 'url', 'image_url')
+
+
+def feed_size() -> int:
+    return getattr(settings, 'DISCOVERY_FEED_SIZE', 500)
+
+
+def _timeout() -> int:
+    return getattr(settings, 'DISCOVERY_FEED_TIMEOUT', 60 * 60)
+
+
+def _owner(profile) -> Dict:
+    return {'user_id': profile.user_id, 'email': profile.user.email, 'name': profile.get_full_name()}
+
+
+def _day_bounds(start: datetime):
+    day = timezone.make_aware(datetime.combine(timezone.localdate(start), datetime.min.time()))
+    return day, day + timedelta(days=1)
+
+
+class Timeline:
+    """Upcoming public events as entries sorted by start time, plus the owners they may come from."""
+
+    def __init__(self, owners: Dict[int, Dict], size: int):
+        self.owners = owners
+        self.size = size
+        self.entries: List[Dict] = []
+        # Start times in entry order, for bisecting
+        self.starts: List[datetime] = []
+        self.truncated = False
+
+    def qualifies(self, event) -> bool:
+        return (
+            event.is_public and event.start_time is not None
+            and event.start_time >= timezone.now() and event.user_id in self.owners
+        )
+
+    def _same_day(self, start: datetime) -> range:
+        first, last = _day_bounds(start)
+        return range(bisect_left(self.starts, first), bisect_right(self.starts, last))
+
+    def _find_group(self, event) -> Optional[Dict]:
+        tokens = title_tokens(event.title)
+        venue = normalize_venue(event.venue_name)
+        threshold = getattr(settings, 'DEDUP_TITLE_THRESHOLD', 0.8)
+        for position in self._same_day(event.start_time):
+            entry = self.entries[position]
+            if entry['venue_key'] != venue:
+                continue
+            if title_similarity(tokens, entry['tokens'], same_venue=True) >= threshold:
+                return entry
+        return None
+
+    def add(self, event) -> bool:
+        """Add ``event`` to the timeline. Returns False if it falls beyond a full timeline."""
+        entry = self._find_group(event)
+        if entry is not None:
+            entry['event_ids'].append(event.pk)
+            if event.user_id not in {owner['user_id'] for owner in entry['owners']}:
+                entry['owners'].append(self.owners[event.user_id])
+            for name in ('description', 'url', 'image_url', 'venue_city', 'end_time'):
+                if not entry[name]:
+                    entry[name] = getattr(event, name)
+            return True
+
+        if len(self.entries) >= self.size and event.start_time >= self.starts[-1]:
+            self.truncated = True
+            return False
+
+        entry = {name: getattr(event, name) for name in ENTRY_FIELDS}
+        entry.update({
+            'id': event.pk,
+            'event_ids': [event.pk],
+            'owners': [self.owners[event.user_id]],
+            'tokens': title_tokens(event.title),
+            'venue_key': normalize_venue(event.venue_name),
+        })
+        position = bisect_right(self.starts, event.start_time)
+        self.entries.insert(position, entry)
+        self.starts.insert(position, event.start_time)
+        if len(self.entries) > self.size:
+            self.entries.pop()
+            self.starts.pop()
+            self.truncated = True
+        return True
+
+    def remove(self, event_id: int) -> bool:
+        """Remove ``event_id`` from its entry, dropping the entry once no event is left in it."""
+        for position, entry in enumerate(self.entries):
+            if event_id not in entry['event_ids']:
+                continue
+            entry['event_ids'].remove(event_id)
+            if not entry['event_ids']:
+                del self.entries[position]
+                del self.starts[position]
+            elif entry['id'] == event_id:
+                # The entry still shows the removed event's details; rebuilding is simplest
+                return False
+            return True
+        return True
+
+    def members(self) -> Dict:
+        """The event ids and owners in the timeline, cached beside it so saves can skip it cheaply."""
+        return {
+            'event_ids': {event_id for entry in self.entries for event_id in entry['event_ids']},
+            'owners': self.owners,
+        }
+
+    def upcoming(self) -> List[Dict]:
+        now = timezone.now()
+        return self.entries[bisect_left(self.starts, now):]
+
+
+def build_timeline() -> Timeline:
+    """Build the timeline from the database."""
+    from profiles.models import Profile
+    from ..models import Event
+
+    owners = {
+        profile.user_id: _owner(profile)
+        for profile in Profile.objects.filter(calendar_public=True).select_related('user')
+    }
+    timeline = Timeline(owners, feed_size())
+    events = Event.objects.filter(
+        is_public=True, start_time__gte=timezone.now(), user_id__in=list(owners)
+    ).order_by('start_time', 'pk')
+    for event in events.iterator(chunk_size=500):
+        if not timeline.add(event):
+            # Events arrive in start order, so nothing later fits either
+            break
+    logger.info(f"Built discovery timeline with {len(timeline.entries)} entries from {len(owners)} public calendars")
+    return timeline
+
+
+def _timeline_key() -> str:
+    """The cache key of the current timeline, which invalidate() moves on from."""
+    generation = cache.get(GENERATION_KEY)
+    if generation is None:
+        # Starting from the clock keeps a lost counter from going back to an old key
+        generation = time.time_ns()
+        if not cache.add(GENERATION_KEY, generation, None):
+            generation = cache.get(GENERATION_KEY, generation)
+    return f'{TIMELINE_KEY}:{generation}'
+
+
+def _store(key: str, timeline: Timeline) -> None:
+    cache.set_many({key: timeline, f'{key}:members': timeline.members()}, _timeout())
+
+
+def get_timeline() -> Timeline:
+    """The cached timeline, building it on a miss."""
+    key = _timeline_key()
+    timeline = cache.get(key)
+    if timeline is None:
+        timeline = build_timeline()
+        _store(key, timeline)
+    return timeline
+
+
+def upcoming_entries() -> List[Dict]:
+    return get_timeline().upcoming()
+
+
+def invalidate() -> None:
+    """Drop the cached timeline. Updates already under way write to the old key, where nothing reads them."""
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        # No counter, so the next read starts a new generation anyway
+        pass
+
+
+def apply_event_change(event, deleted: bool = False) -> None:
+    """
+    Apply a saved or deleted event to the cached timeline once the current
+    transaction commits, or at the end of a ``batched`` import.
+    """
+    changes = _batch.get()
+    if changes is not None:
+        changes[event.pk] = None if deleted else event
+        return
+    transaction.on_commit(partial(apply_changes, {event.pk: None if deleted else event}))
+
+
+def apply_changes(changes: Dict[int, Optional[object]]) -> None:
+    """
+    Apply saved events, and deleted ones given as None by id, to the cached
+    timeline, reading and writing it once for all of them.
+    """
+    key = _timeline_key()
+    members = cache.get(f'{key}:members')
+    if members is None:
+        # Nothing cached, the next read builds a fresh timeline
+        return
+    changes = {
+        pk: event for pk, event in changes.items()
+        if pk in members['event_ids'] or (event is not None and event.is_public and event.user_id in members['owners'])
+    }
+    if not changes:
+        return
+    if any(event is not None and event.start_time is not None and not isinstance(event.start_time, datetime)
+           for event in changes.values()):
+        # Saved from a raw string; the stored value isn't known without reloading
+        invalidate()
+        return
+
+    # Another process is updating the timeline; dropping it is always safe
+    if not cache.add(LOCK_KEY, True, 30):
+        invalidate()
+        return
+    try:
+        timeline = cache.get(key)
+        if timeline is None:
+            return
+        applied = True
+        for pk, event in changes.items():
+            applied = timeline.remove(pk)
+            if not applied:
+                break
+            if event is not None and timeline.qualifies(event):
+                timeline.add(event)
+        if applied and timeline.truncated and len(timeline.entries) < timeline.size:
+            # Whatever was cut off to make room could belong in the timeline now
+            applied = False
+        if applied:
+            _store(key, timeline)
+        else:
+            invalidate()
+    finally:
+        cache.delete(LOCK_KEY)
+
+
+def batched(func):
+    """
+    Decorate an async import job so the events it saves are applied to the
+    timeline together when it ends, instead of one cache round trip each.
+    """
+    @wraps(func)
+    async def wrapper(*args, **kwargs):
+        if _batch.get() is not None:
+            return await func(*args, **kwargs)
+        changes = {}
+        token = _batch.set(changes)
+        try:
+            return await func(*args, **kwargs)
+        finally:
+            _batch.reset(token)
+            if changes:
+                await sync_to_async(apply_changes)(changes)
+    return wrapper
+
+
+def apply_profile_change(profile) -> None:
+    """Drop the cached timeline if ``profile`` joins, leaves or is shown differently in it."""
+    members = cache.get(f'{_timeline_key()}:members')
+    if members is None:
+        return
+    current = members['owners'].get(profile.user_id)
+    if profile.calendar_public:
+        if current != _owner(profile):
+            invalidate()
+    elif current is not None:
+        invalidate()
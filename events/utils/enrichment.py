@@ -0,0 +1,184 @@
+"""
+Spotify enrichment of imported events, after the import.
+
+Imports used to search Spotify for every music event before saving it, so
+users waited on Spotify to see their events. Now imports only classify
+events: music events with an artist are saved with ``enrichment_status``
+pending, and a worker thread started once the import commits drains the
+pending events in batches of ``EVENT_ENRICHMENT_BATCH_SIZE``. Each batch
+searches Spotify once per distinct artist, and the results are cached for
+``EVENT_ENRICHMENT_CACHE_SECONDS`` so later imports of the same artists
+don't search again. The event detail page polls until the event is done.
+
+Events left pending by a restart are picked up by the next import or by
+``manage.py enrich_events``.
+"""
+import hashlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import QuerySet
+from django.utils import timezone
+
+from ..models import Event
+from . import music
+from .spotify import SpotifyAPI
+
+logger = logging.getLogger(__name__)
+
+SPOTIFY_FIELDS = [
+    'spotify_track_id', 'spotify_track_name', 'spotify_artist_id', 'spotify_artist_name',
+    'spotify_preview_url', 'spotify_external_url',
+]
+
+
+def get_enrichment_setting(name: str, default):
+    return getattr(settings, name, default)
+
+
+def mark(event_data: Dict, classification: Optional[music.Classification] = None) -> Dict:
+    """Set the ``enrichment_status`` an imported event is saved with."""
+    if classification is None:
+        classification = music.classify(event_data)
+    if classification.is_music and classification.artist:
+        event_data['enrichment_status'] = Event.ENRICHMENT_PENDING
+    else:
+        event_data['enrichment_status'] = Event.ENRICHMENT_SKIPPED
+    return event_data
+
+
+def track_fields(track: Dict) -> Dict[str, str]:
+    """The Event fields for a track from ``SpotifyAPI.search_track``."""
+    return {
+        'spotify_track_id': track['id'],
+        'spotify_track_name': track['name'],
+        'spotify_artist_id': track.get('artist_id', ''),
+        'spotify_artist_name': track['artist'],
+        'spotify_preview_url': track['preview_url'] or '',
+        'spotify_external_url': track['external_url'],
+    }
+
+
+def cache_key(artist: str) -> str:
+    return f"spotify_artist_track:{hashlib.sha1(artist.lower().encode('utf-8')).hexdigest()}"
+
+
+def lookup_artists(artists: Iterable[str]) -> Dict[str, Optional[Dict[str, str]]]:
+    """
+    The Spotify fields of each artist's top track, or None without a match,
+    searching once per artist that isn't cached. Artists whose search
+    raised are left out.
+    """
+    keys = {cache_key(artist): artist for artist in artists}
+    cached = cache.get_many(keys)
+    found = {keys[key]: fields or None for key, fields in cached.items()}
+
+    fresh = {}
+    for key, artist in keys.items():
+        if key in cached:
+            continue
+        try:
+            tracks = SpotifyAPI.search_track('', artist_name=artist)
+        except Exception:
+            logger.exception(f"Spotify search for artist {artist} failed")
+            continue
+        fields = track_fields(tracks[0]) if tracks else None
+        found[artist] = fields
+        # Misses are cached too, as an empty dict
+        fresh[key] = fields or {}
+    if fresh:
+        cache.set_many(fresh, get_enrichment_setting('EVENT_ENRICHMENT_CACHE_SECONDS', 24 * 3600))
+    return found
+
+
+def enrich(events: List[Event]) -> Dict[str, int]:
+    """Look up the artists of ``events`` on Spotify and save what was found. Returns counts by status."""
+    artists = {}
+    for event in events:
+        artists[event.pk] = music.extract_artist(event.title)
+    # One search for artists differing only in case
+    by_key = {}
+    for artist in artists.values():
+        by_key.setdefault(artist.lower(), artist)
+    found = lookup_artists(by_key.values())
+
+    now = timezone.now()
+    counts = {}
+    for event in events:
+        artist = by_key[artists[event.pk].lower()]
+        if artist not in found:
+            event.enrichment_status = Event.ENRICHMENT_FAILED
+        elif found[artist] is None:
+            event.enrichment_status = Event.ENRICHMENT_NOT_FOUND
+        else:
+            event.enrichment_status = Event.ENRICHMENT_ENRICHED
+            for name, value in found[artist].items():
+                setattr(event, name, value)
+        event.updated_at = now
+        counts[event.enrichment_status] = counts.get(event.enrichment_status, 0) + 1
+    # bulk_update skips post_save, so saving doesn't schedule the worker again
+    Event.objects.bulk_update(events, SPOTIFY_FIELDS + ['enrichment_status', 'updated_at'])
+    return counts
+
+
+def drain(batch_size: Optional[int] = None, events: Optional[QuerySet] = None) -> int:
+    """
+    Enrich the pending events among ``events`` (default all) a batch at a
+    time until none are left. Returns how many were enriched.
+    """
+    batch_size = batch_size or get_enrichment_setting('EVENT_ENRICHMENT_BATCH_SIZE', 50)
+    pending = (Event.objects.all() if events is None else events).filter(enrichment_status=Event.ENRICHMENT_PENDING)
+    done = 0
+    while True:
+        batch = list(pending.order_by('pk').only('pk', 'title', 'enrichment_status', *SPOTIFY_FIELDS)[:batch_size])
+        if not batch:
+            return done
+        enrich(batch)
+        done += len(batch)
+
+
+_executor = None
+_lock = threading.Lock()
+_running = False
+_woken = False
+
+
+def _drain_in_background() -> None:
+    global _running, _woken
+    while True:
+        try:
+            drain()
+        except Exception:
+            logger.exception("Event enrichment failed")
+        finally:
+            connection.close()
+        with _lock:
+            # Events may have been queued after the last batch came up empty
+            if not _woken:
+                _running = False
+                return
+            _woken = False
+
+
+def wake() -> None:
+    """Start the worker thread, or have the running one look for new events before it stops."""
+    global _executor, _running, _woken
+    with _lock:
+        if _running:
+            _woken = True
+            return
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='event-enrichment')
+        _running = True
+        _executor.submit(_drain_in_background)
+
+
+def schedule() -> None:
+    """Once the current transaction commits, have the worker enrich pending events."""
+    if get_enrichment_setting('EVENT_ENRICHMENT_WORKER', True):
+        transaction.on_commit(wake)
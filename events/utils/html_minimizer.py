@@ -0,0 +1,218 @@
+"""
+Shrink page HTML before it is sent to an LLM.
+
+Raw venue pages are mostly scripts, styles, inline SVG icons and tracking
+markup. The LLM only needs the visible structure, so this module strips the
+rest, optionally collapses long runs of repeated siblings (event cards) to a
+few samples for schema generation, and splits long pages into chunks for
+extraction.
+"""
+import logging
+import re
+from collections import deque
+from typing import Dict, List, Optional
+
+from lxml import etree, html as lxml_html
+
+logger = logging.getLogger(__name__)
+
+try:
+    import tiktoken
+    _ENCODING = tiktoken.get_encoding('cl100k_base')
+except Exception:  # tiktoken missing or its encoding file can't be loaded
+    _ENCODING = None
+
+# Elements that never carry event content
+REMOVED_TAGS = [
+    'script', 'style', 'noscript', 'svg', 'template', 'iframe', 'canvas',
+    'link', 'meta', 'object', 'embed', 'head',
+]
+
+# Attributes the LLM needs to write selectors and find links/images
+KEPT_ATTRIBUTES = {'class', 'id', 'href', 'src', 'data-src', 'datetime', 'alt', 'title'}
+
+WHITESPACE = re.compile(r'\s+')
+BACKGROUND_IMAGE = re.compile(r'background-image\s*:\s*url\([^)]*\)', re.IGNORECASE)
+
+
+def estimate_tokens(text: str) -> int:
+    """Count LLM tokens in ``text``, or estimate them at ~4 characters per token."""
+    if not text:
+        return 0
+    if _ENCODING is not None:
+        return len(_ENCODING.encode(text, disallowed_special=()))
+    return len(text) // 4
+
+
+def _parse(html_content: str):
+    try:
+        return lxml_html.document_fromstring(html_content)
+    except (etree.ParserError, ValueError) as e:
+        logger.warning(f"Could not parse HTML for minimizing: {str(e)}")
+        return None
+
+
+def _sibling_signature(element) -> str:
+    return f"{element.tag}.{' '.join(sorted((element.get('class') or '').split()))}"
+
+
+def _clean_tree(document) -> None:
+    etree.strip_elements(document, *REMOVED_TAGS, etree.Comment, etree.ProcessingInstruction, with_tail=False)
+
+    for element in document.iter():
+        if not isinstance(element.tag, str):
+            continue
+        for name, value in list(element.attrib.items()):
+            if name == 'style':
+                # Keep only background images, which some sites use instead of <img>
+                match = BACKGROUND_IMAGE.search(value)
+                if match:
+                    element.set('style', match.group(0))
+                else:
+                    del element.attrib[name]
+            elif name not in KEPT_ATTRIBUTES or not value.strip() or value.startswith('data:'):
+                del element.attrib[name]
+        if element.text:
+            element.text = WHITESPACE.sub(' ', element.text)
+        if element.tail:
+            element.tail = WHITESPACE.sub(' ', element.tail)
+
+
+def _collapse_repeated(document, keep: int) -> int:
+    """Remove all but the first ``keep`` siblings sharing a tag and class list."""
+    removed = 0
+    for parent in list(document.iter()):
+        if not isinstance(parent.tag, str):
+            continue
+        seen = {}
+        for child in list(parent):
+            if not isinstance(child.tag, str):
+                continue
+            signature = _sibling_signature(child)
+            seen[signature] = seen.get(signature, 0) + 1
+            if seen[signature] > keep:
+                child.drop_tree()
+                removed += 1
+    return removed
+
+
+def _body(document):
+    body = document.find('body')
+    return body if body is not None else document
+
+
+def minimize_html(html_content: str, collapse_repeated: bool = False, keep_samples: int = 3) -> str:
+    """
+    Return the page body without non-content markup.
+
+    Args:
+        html_content: The raw page HTML
+        collapse_repeated: Keep only ``keep_samples`` of each run of identical
+            siblings. Enough for writing selectors, not for extracting every event.
+        keep_samples: How many repeated siblings to keep when collapsing
+
+    Returns:
+        The minimized HTML, or the original HTML if it can't be parsed
+    """
+    if not html_content:
+        return ''
+    document = _parse(html_content)
+    if document is None:
+        return html_content
+
+    _clean_tree(document)
+    if collapse_repeated:
+        removed = _collapse_repeated(document, keep_samples)
+        logger.debug(f"Collapsed {removed} repeated elements")
+
+    return lxml_html.tostring(_body(document), encoding='unicode')
+
+
+def _serialized_lengths(root) -> Dict:
+    """
+    The length of every element's markup under ``root``, tail included,
+    summed up from its children in one pass instead of serializing each
+    subtree. Escaping and void elements make it approximate.
+    """
+    lengths = {}
+    # Reversed document order visits every element after its descendants
+    for node in reversed(list(root.iter())):
+        if not isinstance(node.tag, str):
+            lengths[node] = len(lxml_html.tostring(node, encoding='unicode'))
+            continue
+        lengths[node] = (
+            2 * len(node.tag) + 5
+            + sum(len(name) + len(value) + 4 for name, value in node.attrib.items())
+            + len(node.text or '') + len(node.tail or '')
+            + sum(lengths[child] for child in node)
+        )
+    return lengths
+
+
+def chunk_html(html_content: str, max_tokens: int = 2000, overlap: int = 1) -> List[str]:
+    """
+    Split a (minimized) page into chunks of at most ``max_tokens`` tokens.
+
+    The page is split at element boundaries: containers that are too large
+    are opened up until their children fit, so an event card is never cut in
+    half. Sizes come from ``_serialized_lengths``, so only the blocks kept
+    are serialized. Consecutive chunks share ``overlap`` blocks so an event straddling a
+    boundary appears whole in at least one chunk.
+    """
+    if not html_content:
+        return []
+    document = _parse(html_content)
+    if document is None:
+        return [html_content]
+
+    body = _body(document)
+    lengths = _serialized_lengths(body)
+    blocks = []
+    pending = deque([body])
+    while pending:
+        element = pending.popleft()
+        children = [child for child in element if isinstance(child.tag, str)]
+        if children and lengths[element] // 4 > max_tokens:
+            markup, tokens = None, None
+        else:
+            markup = lxml_html.tostring(element, encoding='unicode')
+            tokens = estimate_tokens(markup)
+        if markup is not None and (tokens <= max_tokens or not children):
+            blocks.append((markup, tokens))
+        else:
+            # Text directly inside the container would be lost, keep it as its own block
+            text = (element.text or '').strip()
+            if text:
+                blocks.append((text, estimate_tokens(text)))
+            pending.extendleft(reversed(children))
+
+    chunks: List[str] = []
+    current: List[tuple] = []
+    current_tokens = 0
+    for block in blocks:
+        if current and current_tokens + block[1] > max_tokens:
+            chunks.append(''.join(markup for markup, _ in current))
+            current = current[-overlap:] if overlap else []
+            # Drop the overlap if it alone would overflow the next chunk
+            if sum(tokens for _, tokens in current) + block[1] > max_tokens:
+                current = []
+            current_tokens = sum(tokens for _, tokens in current)
+        current.append(block)
+        current_tokens += block[1]
+    if current:
+        chunks.append(''.join(markup for markup, _ in current))
+    return chunks
+
+
+def token_report(html_content: str, max_tokens: Optional[int] = None, keep_samples: int = 3) -> dict:
+    """Token counts of a page before and after each minimizing step."""
+    minimized = minimize_html(html_content)
+    collapsed = minimize_html(html_content, collapse_repeated=True, keep_samples=keep_samples)
+    report = {
+        'raw_tokens': estimate_tokens(html_content),
+        'minimized_tokens': estimate_tokens(minimized),
+        'schema_tokens': estimate_tokens(collapsed),
+    }
+    if max_tokens:
+        report['chunks'] = len(chunk_html(minimized, max_tokens=max_tokens))
+    return report
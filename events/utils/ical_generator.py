@@ -1,22 +1,229 @@
-from icalendar import Calendar, Event as IcalEvent
-from datetime import datetime
-from typing import List
-from events.models import Event
+"""
+iCalendar (RFC 5545) export of events.
+
+ICalGenerator writes the text itself instead of building an ``icalendar``
+object tree, which costs more than the export is worth on large calendars.
+Text values are escaped and lines folded at 75 octets as RFC 5545 requires.
+Times are written in the calendar's timezone, described once by a VTIMEZONE
+holding every UTC offset change between the first and the last event.
+
+``stream`` yields the calendar a few events at a time, so a
+StreamingHttpResponse can send any number of events in constant memory;
+``generate`` returns it as one string.
+"""
+from datetime import timezone as dt_timezone
+from datetime import datetime, timedelta
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+from django.db.models import Max, Min, QuerySet
+from django.db.models.functions import Coalesce
+from django.urls import reverse
+from django.utils import timezone
+
+from ..models import Event
+
+CRLF = '\r\n'
+# Events without an end last this long in calendar apps
+DEFAULT_DURATION = timedelta(hours=1)
+# Events written per chunk when streaming
+CHUNK_SIZE = 500
+
+_TEXT_ESCAPES = str.maketrans({'\\': '\\\\', ';': '\\;', ',': '\\,', '\n': '\\n'})
+
+
+def escape_text(value: str) -> str:
+    """A TEXT property value (RFC 5545 3.3.11)."""
+    return value.replace('\r\n', '\n').replace('\r', '\n').translate(_TEXT_ESCAPES)
+
+
+def fold(line: str) -> str:
+    """Fold a content line into lines of at most 75 octets, never splitting a UTF-8 character."""
+    if len(line) <= 75 and line.isascii():
+        return line
+    if line.isascii():
+        return (CRLF + ' ').join([line[:75]] + [line[i:i + 74] for i in range(75, len(line), 74)])
+    parts, current, size, limit = [], [], 0, 75
+    for char in line:
+        width = len(char.encode('utf-8'))
+        if size + width > limit:
+            parts.append(''.join(current))
+            # Continuation lines start with a space, which counts against the 75
+            current, size, limit = [], 0, 74
+        current.append(char)
+        size += width
+    parts.append(''.join(current))
+    return (CRLF + ' ').join(parts)
+
+
+def _utc(value: datetime) -> str:
+    return value.astimezone(dt_timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def _offset(delta: timedelta) -> str:
+    seconds = int(delta.total_seconds())
+    sign = '+' if seconds >= 0 else '-'
+    hours, rest = divmod(abs(seconds), 3600)
+    minutes, seconds = divmod(rest, 60)
+    return f'{sign}{hours:02d}{minutes:02d}' + (f'{seconds:02d}' if seconds else '')
+
+
+def _transitions(tz, first: datetime, last: datetime) -> List[datetime]:
+    """The UTC instants between ``first`` and ``last`` at which ``tz`` changes its offset."""
+    found = []
+    day = first.astimezone(dt_timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    end = last.astimezone(dt_timezone.utc) + timedelta(days=1)
+    offset = day.astimezone(tz).utcoffset()
+    while day < end:
+        following = day + timedelta(days=1)
+        if following.astimezone(tz).utcoffset() != offset:
+            # Offsets change at most once a day; bisect down to the second
+            low, high = day, following
+            while high - low > timedelta(seconds=1):
+                middle = low + (high - low) / 2
+                if middle.astimezone(tz).utcoffset() == offset:
+                    low = middle
+                else:
+                    high = middle
+            found.append(high)
+            offset = following.astimezone(tz).utcoffset()
+        day = following
+    return found
+
+
+def vtimezone(tz, first: datetime, last: datetime) -> List[str]:
+    """
+    Content lines of a VTIMEZONE for ``tz`` valid from ``first`` to ``last``.
+
+    Each offset change becomes its own STANDARD or DAYLIGHT observance, which
+    every client understands, rather than a recurrence rule, which zoneinfo
+    doesn't expose.
+    """
+    first = first.astimezone(tz).replace(month=1, day=1, hour=0, minute=0, second=0, microsecond=0)
+    last = last.astimezone(tz).replace(month=12, day=31, hour=23, minute=59, second=59, microsecond=0)
+    observances: List[Tuple[datetime, timedelta]] = [(first, first.utcoffset())]
+    observances += [(instant, instant.astimezone(tz).utcoffset()) for instant in _transitions(tz, first, last)]
+
+    lines = ['BEGIN:VTIMEZONE', f'TZID:{tz}']
+    previous = observances[0][1]
+    for instant, offset in observances:
+        local = instant.astimezone(tz)
+        kind = 'DAYLIGHT' if local.dst() else 'STANDARD'
+        # DTSTART is the local time of the change under the offset in force before it
+        onset = (instant.astimezone(dt_timezone.utc) + previous).replace(tzinfo=None)
+        lines += [
+            f'BEGIN:{kind}',
+            f'DTSTART:{onset:%Y%m%dT%H%M%S}',
+            f'TZOFFSETFROM:{_offset(previous)}',
+            f'TZOFFSETTO:{_offset(offset)}',
+        ]
+        if local.tzname():
+            lines.append(f'TZNAME:{escape_text(local.tzname())}')
+        lines.append(f'END:{kind}')
+        previous = offset
+    lines.append('END:VTIMEZONE')
+    return lines
+
 
 class ICalGenerator:
+    """
+    Writes events as an iCalendar feed.
+
+    ``tz`` is the timezone times are written in, the current one by default;
+    UTC needs no VTIMEZONE and times are written with a Z. ``base_url``
+    turns event URLs absolute and ``uid_domain`` makes UIDs unique across
+    sites.
+    """
+
+    def __init__(self, tz=None, base_url: str = '', uid_domain: str = 'socialcal',
+                 prodid: str = '-//SocialCal//EN', method: Optional[str] = 'PUBLISH'):
+        self.tz = tz or timezone.get_current_timezone()
+        self.utc = self.tz.utcoffset(datetime(2000, 1, 1)) == timedelta(0) and \
+            self.tz.utcoffset(datetime(2000, 7, 1)) == timedelta(0)
+        self.base_url = base_url.rstrip('/')
+        # Event.get_absolute_url without resolving the URL once per event
+        self.event_url = self.base_url + reverse('events:detail', kwargs={'pk': 0}).replace('/0/', '/{}/')
+        self.uid_domain = uid_domain
+        self.prodid = prodid
+        self.method = method
+
+    def _datetime(self, name: str, value: datetime) -> str:
+        if self.utc:
+            return f'{name}:{_utc(value)}'
+        return f'{name};TZID={self.tz}:{value.astimezone(self.tz):%Y%m%dT%H%M%S}'
+
+    def header(self, span: Optional[Tuple[datetime, datetime]]) -> str:
+        lines = ['BEGIN:VCALENDAR', 'VERSION:2.0', f'PRODID:{escape_text(self.prodid)}', 'CALSCALE:GREGORIAN']
+        if self.method:
+            lines.append(f'METHOD:{self.method}')
+        lines.append(f'X-WR-TIMEZONE:{self.tz}')
+        if span and not self.utc:
+            lines += vtimezone(self.tz, *span)
+        return CRLF.join(fold(line) for line in lines) + CRLF
+
+    def vevent(self, event: Event, stamp: str) -> str:
+        end_time = event.end_time or event.start_time + DEFAULT_DURATION
+        lines = [
+            'BEGIN:VEVENT',
+            f'UID:{event.pk}@{self.uid_domain}',
+            f'DTSTAMP:{stamp}',
+            self._datetime('DTSTART', event.start_time),
+            self._datetime('DTEND', end_time),
+            f'SUMMARY:{escape_text(event.title)}',
+        ]
+        if event.description:
+            lines.append(f'DESCRIPTION:{escape_text(event.description)}')
+        location = event.location
+        if location:
+            lines.append(f'LOCATION:{escape_text(location)}')
+        if self.base_url:
+            lines.append(f'URL:{self.event_url.format(event.pk)}')
+        if event.updated_at:
+            lines.append(f'LAST-MODIFIED:{_utc(event.updated_at)}')
+        lines += ['STATUS:CONFIRMED', 'END:VEVENT']
+        return CRLF.join(fold(line) for line in lines) + CRLF
+
     @staticmethod
-    def generate_ical(events: List[Event]) -> str:
-        cal = Calendar()
-        cal.add('prodid', '-//SocialCal Events//example.com//')
-        cal.add('version', '2.0')
+    def span(events) -> Optional[Tuple[datetime, datetime]]:
+        """The first start and the last end of ``events``, from one aggregate for a queryset."""
+        if isinstance(events, QuerySet):
+            bounds = events.aggregate(first=Min('start_time'), last=Max(Coalesce('end_time', 'start_time')))
+            if bounds['first'] is None:
+                return None
+            return bounds['first'], bounds['last'] + DEFAULT_DURATION
+        times = [event.start_time for event in events] + [event.end_time for event in events if event.end_time]
+        return (min(times), max(times) + DEFAULT_DURATION) if times else None
+
+    def stream(self, events: Iterable[Event]) -> Iterator[str]:
+        """
+        Yield the calendar in chunks. A queryset is read with ``iterator()``
+        after one aggregate for the VTIMEZONE's range.
+        """
+        if isinstance(events, QuerySet):
+            events = events.filter(start_time__isnull=False)
+            span = self.span(events) if not self.utc else None
+            events = events.iterator(chunk_size=CHUNK_SIZE)
+        else:
+            events = [event for event in events if event.start_time]
+            span = self.span(events) if not self.utc else None
+        yield self.header(span)
 
+        stamp = _utc(timezone.now())
+        chunk = []
         for event in events:
-            ical_event = IcalEvent()
-            ical_event.add('summary', event.title)
-            ical_event.add('description', event.description)
-            ical_event.add('dtstart', event.start_datetime)
-            ical_event.add('dtend', event.end_datetime)
-            ical_event.add('location', event.location)
-            cal.add_component(ical_event)
-
-        return cal.to_ical().decode('utf-8')
\ No newline at end of file
+            chunk.append(self.vevent(event, stamp))
+            if len(chunk) == CHUNK_SIZE:
+                yield ''.join(chunk)
+                chunk = []
+        chunk.append('END:VCALENDAR' + CRLF)
+        yield ''.join(chunk)
+
+    def generate(self, events: Iterable[Event]) -> str:
+        if isinstance(events, QuerySet):
+            # One query, with the VTIMEZONE range worked out from the rows
+            events = list(events)
+        return ''.join(self.stream(events))
+
+
+def for_request(request, **kwargs) -> ICalGenerator:
+    """A generator writing absolute event URLs and UIDs for the site serving ``request``."""
+    return ICalGenerator(base_url=request.build_absolute_uri('/'), uid_domain=request.get_host(), **kwargs)
@@ -0,0 +1,255 @@
+"""
+Thumbnails of event images, served from our own storage.
+
+Events point at third-party images, often full-size venue photos. When an
+event with an image is saved, the image is downloaded in the background and
+resized to a few widths, as WebP and as JPEG for browsers without WebP. The
+files are stored in the default storage under the SHA-256 of the original,
+so events and feeds sharing an image share its thumbnails.
+
+``EventImage`` rows map an image URL to its thumbnails and record when they
+were last served. Once the thumbnails take more than
+``EVENT_IMAGE_CACHE_MAX_BYTES`` the least recently served are deleted; they
+are fetched again the next time they are asked for. Until an image is ready
+the endpoint answers 404, and pages fall back to the original.
+"""
+import hashlib
+import io
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import requests
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from django.db.models import Sum
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from ..models import Event, EventImage
+from . import public_http
+
+logger = logging.getLogger(__name__)
+
+# Name, content type and encoder options of each output format, preferred first
+FORMATS = {
+    'webp': ('WEBP', 'image/webp', {'quality': 80, 'method': 4}),
+    'jpg': ('JPEG', 'image/jpeg', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+STORAGE_PREFIX = 'event-images'
+
+
+class ImageFetchError(Exception):
+    """The image could not be downloaded or decoded."""
+
+
+def get_image_setting(name: str, default):
+    return getattr(settings, name, default)
+
+
+def widths() -> Tuple[int, ...]:
+    return tuple(get_image_setting('EVENT_IMAGE_WIDTHS', (320, 640, 1280)))
+
+
+def url_hash(url: str) -> str:
+    return hashlib.sha256(url.encode('utf-8')).hexdigest()
+
+
+def thumbnail_url(event_id: int, image_url: str, width: int) -> str:
+    """Path of the endpoint serving ``image_url`` at ``width``, or '' without an image."""
+    if not image_url:
+        return ''
+    return reverse('events:image', args=[event_id, url_hash(image_url), width])
+
+
+def thumbnail_name(digest: str, width: int, extension: str) -> str:
+    return f'{STORAGE_PREFIX}/{digest[:2]}/{digest}/{width}.{extension}'
+
+
+def negotiate(accept: str) -> str:
+    """The file extension to serve for an Accept header."""
+    return 'webp' if 'image/webp' in accept else 'jpg'
+
+
+def lookup(event: Event, key: str) -> Optional[EventImage]:
+    """
+    The EventImage behind a thumbnail URL of ``event``, registering the
+    event's image if it was saved before images were fetched. None if
+    ``key`` isn't the hash of the event's image URL.
+    """
+    if not event.image_url or url_hash(event.image_url) != key:
+        return None
+    image = EventImage.objects.filter(url_hash=key).first()
+    if image is not None:
+        return image
+    return register([event.image_url])[0]
+
+
+def register(urls: Iterable[str]) -> List[EventImage]:
+    """EventImage rows for ``urls``, creating missing ones as pending."""
+    by_hash = {url_hash(url): url for url in urls if url}
+    EventImage.objects.bulk_create(
+        [EventImage(url_hash=digest, source_url=url) for digest, url in by_hash.items()],
+        ignore_conflicts=True,
+    )
+    return list(EventImage.objects.filter(url_hash__in=by_hash))
+
+
+def is_due(image: EventImage) -> bool:
+    """Whether ``image`` should be fetched: never tried, evicted, or failed long enough ago to retry."""
+    if image.status == EventImage.PENDING:
+        return True
+    retry_after = timedelta(seconds=get_image_setting('EVENT_IMAGE_RETRY_AFTER', 24 * 3600))
+    return image.status == EventImage.FAILED and (image.fetched_at is None or
+                                                   timezone.now() - image.fetched_at >= retry_after)
+
+
+def touch(image: EventImage) -> None:
+    """Record that ``image`` was served, at most once per EVENT_IMAGE_TOUCH_INTERVAL."""
+    now = timezone.now()
+    if now - image.last_used_at >= timedelta(seconds=get_image_setting('EVENT_IMAGE_TOUCH_INTERVAL', 3600)):
+        EventImage.objects.filter(pk=image.pk).update(last_used_at=now)
+
+
+def fetch(url: str) -> bytes:
+    """Download an image from a public host, refusing anything that isn't one or is too large."""
+    max_bytes = get_image_setting('EVENT_IMAGE_MAX_DOWNLOAD_BYTES', 10 * 1024 * 1024)
+    try:
+        with public_http.get(url, max_redirects=get_image_setting('EVENT_IMAGE_MAX_REDIRECTS', 5), stream=True,
+                             timeout=get_image_setting('EVENT_IMAGE_TIMEOUT', 10),
+                             headers={'User-Agent': 'SocialCal image proxy'}) as response:
+            response.raise_for_status()
+            content_type = response.headers.get('Content-Type', '')
+            if not content_type.startswith('image/'):
+                raise ImageFetchError(f'Not an image: {content_type or "no content type"}')
+            data = bytearray()
+            for chunk in response.iter_content(64 * 1024):
+                data += chunk
+                if len(data) > max_bytes:
+                    raise ImageFetchError(f'Image larger than {max_bytes} bytes')
+    except requests.RequestException as e:
+        raise ImageFetchError(str(e)) from e
+    return bytes(data)
+
+
+def render_thumbnails(data: bytes) -> Dict[Tuple[int, str], bytes]:
+    """Thumbnails of an image by (width, extension). Nothing is scaled up."""
+    try:
+        original = Image.open(io.BytesIO(data))
+        # JPEGs much larger than the largest width decode at a fraction of their size
+        original.draft('RGB', (max(widths()), max(widths())))
+        original = ImageOps.exif_transpose(original)
+        original.load()
+    except (OSError, ValueError, Image.DecompressionBombError) as e:
+        raise ImageFetchError(f'Unreadable image: {e}') from e
+
+    if original.mode not in ('RGB', 'L'):
+        # Transparent images get a white background, which JPEG needs anyway
+        background = Image.new('RGB', original.size, 'white')
+        rgba = original.convert('RGBA')
+        background.paste(rgba, mask=rgba.getchannel('A'))
+        original = background
+
+    thumbnails = {}
+    for width in sorted(widths(), reverse=True):
+        image = original.copy()
+        image.thumbnail((width, image.height), Image.LANCZOS)
+        for extension, (format_name, _, options) in FORMATS.items():
+            output = io.BytesIO()
+            image.save(output, format_name, **options)
+            thumbnails[(width, extension)] = output.getvalue()
+    return thumbnails
+
+
+def process(image: EventImage) -> EventImage:
+    """Download and resize ``image`` and store its thumbnails, then evict the least recently served."""
+    try:
+        data = fetch(image.source_url)
+        digest = hashlib.sha256(data).hexdigest()
+        names = {(width, extension): thumbnail_name(digest, width, extension)
+                 for width in widths() for extension in FORMATS}
+        size = 0
+        # Another URL with the same image may have stored them already
+        if not all(default_storage.exists(name) for name in names.values()):
+            for key, content in render_thumbnails(data).items():
+                if default_storage.exists(names[key]):
+                    default_storage.delete(names[key])
+                default_storage.save(names[key], ContentFile(content))
+                size += len(content)
+    except ImageFetchError as e:
+        logger.info(f"Could not fetch event image {image.source_url}: {e}")
+        image.status, image.error, image.fetched_at = EventImage.FAILED, str(e)[:255], timezone.now()
+        image.save(update_fields=['status', 'error', 'fetched_at'])
+        return image
+
+    image.status, image.error = EventImage.READY, ''
+    image.digest, image.size, image.fetched_at = digest, size, timezone.now()
+    image.save(update_fields=['status', 'error', 'digest', 'size', 'fetched_at'])
+    evict()
+    return image
+
+
+def evict(max_bytes: Optional[int] = None) -> int:
+    """
+    Delete the least recently served thumbnails until they fit in
+    ``max_bytes``. Returns the number of images evicted.
+    """
+    if max_bytes is None:
+        max_bytes = get_image_setting('EVENT_IMAGE_CACHE_MAX_BYTES', 512 * 1024 * 1024)
+    ready = EventImage.objects.filter(status=EventImage.READY)
+    total = ready.aggregate(total=Sum('size'))['total'] or 0
+    evicted = 0
+    while total > max_bytes:
+        oldest = ready.order_by('last_used_at', 'pk').first()
+        if oldest is None:
+            break
+        # The files are shared by every URL with the same image, so they all go
+        sharing = ready.filter(digest=oldest.digest)
+        total -= sharing.aggregate(total=Sum('size'))['total'] or 0
+        for width in widths():
+            for extension in FORMATS:
+                default_storage.delete(thumbnail_name(oldest.digest, width, extension))
+        evicted += sharing.update(status=EventImage.PENDING, digest='', size=0)
+    return evicted
+
+
+_executor = None
+_executor_lock = threading.Lock()
+_scheduled = set()
+
+
+def _process_in_background(url: str) -> None:
+    try:
+        image = register([url])[0]
+        if is_due(image):
+            process(image)
+    except Exception:
+        logger.exception(f"Event image {url} failed")
+    finally:
+        _scheduled.discard(url)
+        connection.close()
+
+
+def schedule(urls: Iterable[str]) -> None:
+    """Fetch the images at ``urls`` on a background thread, each once however often it's asked for."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=get_image_setting('EVENT_IMAGE_WORKERS', 2),
+                                           thread_name_prefix='event-images')
+        for url in urls:
+            if url and url not in _scheduled:
+                _scheduled.add(url)
+                _executor.submit(_process_in_background, url)
+
+
+def prefetch(urls: Iterable[str]) -> None:
+    """Once the current transaction commits, start fetching the images at ``urls``."""
+    urls = [url for url in urls if url]
+    if urls and get_image_setting('EVENT_IMAGE_PREFETCH', True):
+        transaction.on_commit(lambda: schedule(urls))
@@ -0,0 +1,116 @@
+"""
+Per-job log capture for background scraping jobs.
+
+A job runs with its own JobLog in a context variable. JobLogHandler sits on
+the ``events`` logger and copies each record into the log of the job that
+emitted it. The context is inherited by asyncio tasks and by sync_to_async
+threads, so concurrent jobs don't see each other's lines. A JobLog keeps only
+its newest JOB_LOG_MAX_BYTES of UTF-8 text and is dropped with the job, so a
+long-lived worker never accumulates log history.
+"""
+import contextlib
+import contextvars
+import functools
+import inspect
+import logging
+from collections import deque
+from typing import Optional
+
+from django.conf import settings
+
+LOG_FORMAT = '%(asctime)s %(levelname)s %(name)s: %(message)s'
+
+
+class JobLog:
+    """A ring buffer of formatted log lines holding at most ``max_bytes`` of text."""
+
+    def __init__(self, job_id, max_bytes: Optional[int] = None, parent: Optional['JobLog'] = None):
+        self.job_id = job_id
+        # The log of the job running this one, like a bulk import running its children
+        self.parent = parent
+        self.max_bytes = max_bytes or getattr(settings, 'JOB_LOG_MAX_BYTES', 16 * 1024)
+        self.lines = deque()
+        self.size = 0
+        self.dropped = 0
+
+    def append(self, line: str) -> None:
+        # Each line costs its UTF-8 length plus a newline
+        encoded = line.encode('utf-8')
+        if len(encoded) >= self.max_bytes:
+            # Cut on a character boundary, dropping a character split by the cut
+            line = encoded[-(self.max_bytes - 1):].decode('utf-8', errors='ignore')
+        self.lines.append(line)
+        self.size += _size(line)
+        while self.size > self.max_bytes:
+            self.size -= _size(self.lines.popleft())
+            self.dropped += 1
+
+    def getvalue(self) -> str:
+        text = '\n'.join(self.lines)
+        if self.dropped:
+            return f'[{self.dropped} earlier lines dropped]\n{text}'
+        return text
+
+
+def _size(line: str) -> int:
+    return len(line.encode('utf-8')) + 1
+
+
+current_job_log: contextvars.ContextVar[Optional[JobLog]] = contextvars.ContextVar('job_log', default=None)
+
+
+class JobLogHandler(logging.Handler):
+    """Copies records into the JobLog of the job running in the current context."""
+
+    def emit(self, record):
+        job_log = current_job_log.get()
+        if job_log is None:
+            return
+        try:
+            job_log.append(self.format(record))
+        except Exception:
+            self.handleError(record)
+
+
+def install(logger_name: str = 'events') -> None:
+    """Attach a JobLogHandler to ``logger_name`` once."""
+    logger = logging.getLogger(logger_name)
+    if any(isinstance(handler, JobLogHandler) for handler in logger.handlers):
+        return
+    handler = JobLogHandler(level=getattr(settings, 'JOB_LOG_LEVEL', logging.INFO))
+    handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    logger.addHandler(handler)
+
+
+def captured_log(job_id) -> Optional[str]:
+    """The captured log text of ``job_id`` if it is the job running in this context or one running it."""
+    job_log = current_job_log.get()
+    while job_log is not None and job_log.job_id != job_id:
+        job_log = job_log.parent
+    return job_log.getvalue() if job_log is not None else None
+
+
+@contextlib.contextmanager
+def job_log(job_id):
+    """Capture the log of ``job_id`` in this context, carrying on with its JobLog if it already has one."""
+    current = current_job_log.get()
+    if current is not None and current.job_id == job_id:
+        yield current
+        return
+    token = current_job_log.set(JobLog(job_id, parent=current))
+    try:
+        yield current_job_log.get()
+    finally:
+        current_job_log.reset(token)
+
+
+def capture_job_logs(func):
+    """Run the async job ``func`` with its own JobLog, keyed by its ``job_id`` argument."""
+    signature = inspect.signature(func)
+
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        with job_log(signature.bind_partial(*args, **kwargs).arguments.get('job_id')):
+            return await func(*args, **kwargs)
+
+    return wrapper
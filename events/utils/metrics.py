@@ -0,0 +1,287 @@
+"""
+In-process request and scraper metrics in the Prometheus text format.
+
+Everything here is opt-in through METRICS_ENABLED and has no dependencies
+beyond the standard library, so it works the same offline and in tests.
+Metrics live in the memory of each worker process; a Prometheus server
+scrapes every worker (or the single worker in development).
+
+- MetricsMiddleware (events.middleware) records per-view latency, database
+  query count and time, and cache hits for each request.
+- ``span(stage)`` times a scraper stage (fetch, render, extract, parse_dates,
+  spotify, db_write) wherever it runs, including the background threads that
+  run imports.
+- SamplingProfiler samples the stack of a request's thread while it runs.
+  METRICS_PROFILE_SAMPLE_RATE sets the share of requests profiled. The
+  samples are folded into flame-graph input.
+"""
+import contextvars
+import logging
+import random
+import sys
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Dict, Iterable, Optional, Tuple
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Distinct stacks kept by the profiler; rarer ones beyond this are counted as one
+MAX_PROFILE_STACKS = 5000
+MAX_STACK_DEPTH = 64
+
+
+def enabled() -> bool:
+    return getattr(settings, 'METRICS_ENABLED', False)
+
+
+def _label_key(labels: Dict[str, str]) -> Tuple:
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(key: Tuple, extra: Iterable[Tuple[str, str]] = ()) -> str:
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name: str, documentation: str):
+        self.name = name
+        self.documentation = documentation
+        self.values = defaultdict(float)
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        with _lock:
+            self.values[_label_key(labels)] += amount
+
+    def samples(self):
+        for key, value in sorted(self.values.items()):
+            yield f'{self.name}{_format_labels(key)} {value:g}'
+
+
+class Histogram:
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(buckets)
+        # label key -> [per-bucket counts..., +Inf count, sum]
+        self.values = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = _label_key(labels)
+        with _lock:
+            state = self.values.get(key)
+            if state is None:
+                state = self.values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            for position, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[position] += 1
+            state[len(self.buckets)] += 1
+            state[-1] += value
+
+    def samples(self):
+        for key, state in sorted(self.values.items()):
+            for position, bound in enumerate(self.buckets):
+                yield f'{self.name}_bucket{_format_labels(key, [("le", f"{bound:g}")])} {state[position]}'
+            total = state[len(self.buckets)]
+            yield f'{self.name}_bucket{_format_labels(key, [("le", "+Inf")])} {total}'
+            yield f'{self.name}_sum{_format_labels(key)} {state[-1]:g}'
+            yield f'{self.name}_count{_format_labels(key)} {total}'
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def counter(self, name: str, documentation: str) -> Counter:
+        metric = Counter(name, documentation)
+        self.metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, documentation: str, buckets=DEFAULT_BUCKETS) -> Histogram:
+        metric = Histogram(name, documentation, buckets)
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        with _lock:
+            for metric in self.metrics:
+                lines.append(f'# HELP {metric.name} {metric.documentation}')
+                lines.append(f'# TYPE {metric.name} {metric.kind}')
+                lines.extend(metric.samples())
+        return '\n'.join(lines) + '\n'
+
+    def reset(self) -> None:
+        with _lock:
+            for metric in self.metrics:
+                metric.values.clear()
+
+
+_lock = threading.Lock()
+REGISTRY = Registry()
+
+REQUESTS = REGISTRY.counter('socialcal_http_requests_total', 'Requests by view, method and status.')
+REQUEST_SECONDS = REGISTRY.histogram('socialcal_http_request_duration_seconds', 'Request latency by view.')
+REQUEST_QUERIES = REGISTRY.counter('socialcal_http_db_queries_total', 'Database queries run by requests, by view.')
+REQUEST_QUERY_SECONDS = REGISTRY.counter(
+    'socialcal_http_db_query_seconds_total', 'Time requests spent in database queries, by view.'
+)
+CACHE_LOOKUPS = REGISTRY.counter('socialcal_cache_lookups_total', 'Cache lookups by view and result (hit or miss).')
+STAGE_SECONDS = REGISTRY.histogram('socialcal_stage_duration_seconds', 'Duration of scraper stages.')
+STAGE_ERRORS = REGISTRY.counter('socialcal_stage_errors_total', 'Scraper stages that raised, by stage.')
+
+
+class RequestTrace:
+    """What one request did, collected while it runs."""
+
+    def __init__(self):
+        self.queries = 0
+        self.query_seconds = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.stages = defaultdict(float)
+
+    def record_query(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.query_seconds += time.perf_counter() - started
+
+    def server_timing(self, total: float) -> str:
+        """A Server-Timing header value, so browser dev tools show the breakdown."""
+        parts = [f'total;dur={total * 1000:.1f}', f'db;dur={self.query_seconds * 1000:.1f};desc="{self.queries} queries"']
+        parts.extend(f'{stage};dur={seconds * 1000:.1f}' for stage, seconds in self.stages.items())
+        return ', '.join(parts)
+
+
+current_trace: contextvars.ContextVar[Optional[RequestTrace]] = contextvars.ContextVar('metrics_trace', default=None)
+
+
+def record_request(view: str, method: str, status: int, seconds: float, trace: RequestTrace) -> None:
+    REQUESTS.inc(view=view, method=method, status=status)
+    REQUEST_SECONDS.observe(seconds, view=view)
+    REQUEST_QUERIES.inc(trace.queries, view=view)
+    REQUEST_QUERY_SECONDS.inc(trace.query_seconds, view=view)
+    if trace.cache_hits:
+        CACHE_LOOKUPS.inc(trace.cache_hits, view=view, result='hit')
+    if trace.cache_misses:
+        CACHE_LOOKUPS.inc(trace.cache_misses, view=view, result='miss')
+
+
+@contextmanager
+def span(stage: str):
+    """Time a scraper stage. Does nothing unless metrics are enabled."""
+    if not enabled():
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        STAGE_ERRORS.inc(stage=stage)
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        STAGE_SECONDS.observe(elapsed, stage=stage)
+        trace = current_trace.get()
+        if trace is not None:
+            trace.stages[stage] += elapsed
+
+
+_MISSING = object()
+
+
+def instrument_cache(backend) -> None:
+    """Count hits and misses of ``backend.get`` for the current request's trace."""
+    if getattr(backend, '_metrics_instrumented', False):
+        return
+    original_get = backend.get
+
+    def get(key, default=None, version=None):
+        value = original_get(key, _MISSING, version=version)
+        trace = current_trace.get()
+        if value is _MISSING:
+            if trace is not None:
+                trace.cache_misses += 1
+            return default
+        if trace is not None:
+            trace.cache_hits += 1
+        return value
+
+    backend.get = get
+    backend._metrics_instrumented = True
+
+
+class SamplingProfiler:
+    """Samples one thread's Python stack at a fixed interval from a helper thread."""
+
+    samples = defaultdict(int)
+
+    def __init__(self, thread_id: int, interval: Optional[float] = None):
+        self.thread_id = thread_id
+        self.interval = interval or getattr(settings, 'METRICS_PROFILE_INTERVAL', 0.005)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='metrics-profiler', daemon=True)
+
+    @classmethod
+    def maybe_start(cls) -> Optional['SamplingProfiler']:
+        """Start profiling the calling thread for a METRICS_PROFILE_SAMPLE_RATE share of calls."""
+        rate = getattr(settings, 'METRICS_PROFILE_SAMPLE_RATE', 0.0)
+        if rate <= 0 or random.random() >= rate:
+            return None
+        profiler = cls(threading.get_ident())
+        profiler._thread.start()
+        return profiler
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                return
+            self._record(frame)
+
+    def _record(self, frame) -> None:
+        names = []
+        while frame is not None and len(names) < MAX_STACK_DEPTH:
+            code = frame.f_code
+            names.append(f'{frame.f_globals.get("__name__", "?")}:{code.co_name}')
+            frame = frame.f_back
+        stack = ';'.join(reversed(names))
+        with _lock:
+            if stack not in self.samples and len(self.samples) >= MAX_PROFILE_STACKS:
+                stack = '<other>'
+            self.samples[stack] += 1
+
+    @classmethod
+    def folded(cls) -> str:
+        """Samples as ``stack count`` lines, the input format of flamegraph.pl and speedscope."""
+        with _lock:
+            items = sorted(cls.samples.items(), key=lambda item: -item[1])
+        return ''.join(f'{stack} {count}\n' for stack, count in items)
+
+    @classmethod
+    def reset(cls) -> None:
+        with _lock:
+            cls.samples.clear()
@@ -0,0 +1,83 @@
+"""
+Requests to URLs that users give us: event images, scraper pages and feeds.
+
+Those requests run on our servers, so they must not reach our own network.
+Only http(s) URLs whose host resolves to public addresses are fetched, and
+the connection goes to the address that was checked, with the original name
+in the Host header and for TLS, so a DNS answer that changes between the
+check and the connection can't point it elsewhere. Redirects are followed
+by hand and every hop is checked the same way.
+"""
+import ipaddress
+import socket
+from urllib.parse import urljoin, urlsplit, urlunsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class UnsafeURLError(requests.RequestException):
+    """The URL isn't http(s), or its host doesn't resolve to public addresses only."""
+
+
+def check_url(url: str) -> str:
+    """The address to connect to for ``url``, refusing non-http(s) URLs and hosts with non-public addresses."""
+    parts = urlsplit(url)
+    try:
+        port = parts.port or (443 if parts.scheme == 'https' else 80)
+    except ValueError:
+        raise UnsafeURLError(f'Invalid port in {url}') from None
+    if parts.scheme not in ('http', 'https') or not parts.hostname:
+        raise UnsafeURLError(f'Not an http(s) URL: {url}')
+    try:
+        addresses = socket.getaddrinfo(parts.hostname, port, type=socket.SOCK_STREAM)
+    except (socket.gaierror, UnicodeError) as e:
+        raise UnsafeURLError(f'Cannot resolve {parts.hostname}: {e}') from e
+    for *_, sockaddr in addresses:
+        address = ipaddress.ip_address(sockaddr[0].split('%')[0])
+        if address.version == 6 and address.ipv4_mapped:
+            address = address.ipv4_mapped
+        if not address.is_global or address.is_multicast:
+            raise UnsafeURLError(f'{parts.hostname} resolves to a non-public address')
+    return addresses[0][4][0]
+
+
+class PinnedAdapter(HTTPAdapter):
+    """Connects to whatever address the URL names, sending ``hostname`` for SNI and matching the certificate to it."""
+
+    def __init__(self, hostname: str, **kwargs):
+        self.hostname = hostname
+        super().__init__(**kwargs)
+
+    def build_connection_pool_key_attributes(self, request, verify, cert=None):
+        host_params, pool_kwargs = super().build_connection_pool_key_attributes(request, verify, cert)
+        if host_params['scheme'] == 'https':
+            pool_kwargs['server_hostname'] = self.hostname
+            pool_kwargs['assert_hostname'] = self.hostname
+        return host_params, pool_kwargs
+
+
+def get(url: str, max_redirects: int = 5, headers=None, **kwargs) -> requests.Response:
+    """
+    ``requests.get`` for a URL from a user, following up to ``max_redirects``
+    redirects. Raises UnsafeURLError for a URL or redirect ``check_url``
+    refuses.
+    """
+    for _ in range(max_redirects + 1):
+        address = check_url(url)
+        parts = urlsplit(url)
+        host = parts.netloc.rpartition('@')[2]
+        netloc = f'[{address}]' if ':' in address else address
+        if parts.port:
+            netloc = f'{netloc}:{parts.port}'
+        session = requests.Session()
+        session.mount(f'{parts.scheme}://', PinnedAdapter(parts.hostname))
+        response = session.get(urlunsplit(parts._replace(netloc=netloc)), allow_redirects=False,
+                               headers={**(headers or {}), 'Host': host}, **kwargs)
+        if not response.is_redirect:
+            # Callers see the URL they asked for, not the address
+            response.url = url
+            return response
+        response.close()
+        url = urljoin(url, response.headers['Location'])
+    raise UnsafeURLError(f'More than {max_redirects} redirects')
@@ -0,0 +1,230 @@
+"""
+Scheduling for active site scrapers.
+
+A periodic pass picks the active scrapers whose ``next_run_at`` is due, runs
+them under a global concurrency limit plus per-domain concurrency and delay
+limits, and then reschedules each scraper. The polling interval adapts to how
+often the scraped events change and how often runs fail, so busy venue pages
+are polled more often and static or broken ones less.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import random
+import time
+from contextlib import asynccontextmanager
+from datetime import timedelta
+from urllib.parse import urlparse
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import F, Q
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# Weight of the newest observation in the change/failure moving averages
+EWMA_ALPHA = 0.3
+# Consecutive failures beyond this no longer double the interval
+MAX_BACKOFF_EXPONENT = 5
+
+
+def get_scheduler_setting(name, default):
+    """Read a SCRAPER_* scheduler setting, falling back to the default."""
+    return getattr(settings, name, default)
+
+
+def get_domain(url):
+    """Return the host used to group scrapers for politeness limits."""
+    netloc = urlparse(url).netloc.lower()
+    if netloc.startswith('www.'):
+        netloc = netloc[4:]
+    return netloc
+
+
+def events_fingerprint(events):
+    """Hash the identifying fields of a run's events to detect page changes."""
+    keys = sorted(
+        (
+            str(event.get('title', '')),
+            str(event.get('start_time', '')),
+            str(event.get('venue_name', '')),
+        )
+        for event in events
+    )
+    return hashlib.sha256(json.dumps(keys).encode('utf-8')).hexdigest()
+
+
+def compute_poll_interval(change_rate, failure_rate, consecutive_failures,
+                          min_interval=None, max_interval=None):
+    """
+    Return the next polling interval in minutes.
+
+    The interval is interpolated on a log scale between the configured bounds:
+    a page that changes on every run converges on the minimum interval and a
+    page that never changes on the maximum. Failures back off exponentially.
+    """
+    if min_interval is None:
+        min_interval = get_scheduler_setting('SCRAPER_MIN_POLL_MINUTES', 60)
+    if max_interval is None:
+        max_interval = get_scheduler_setting('SCRAPER_MAX_POLL_MINUTES', 4320)
+
+    change_rate = min(max(change_rate, 0.0), 1.0)
+    interval = max_interval * (min_interval / max_interval) ** change_rate
+
+    # Flaky sites get polled less, and repeated failures back off exponentially
+    interval *= 1 + failure_rate
+    if consecutive_failures:
+        interval *= 2 ** min(consecutive_failures, MAX_BACKOFF_EXPONENT)
+
+    return int(round(min(max(interval, min_interval), max_interval)))
+
+
+def apply_jitter(minutes, jitter=None, rng=random):
+    """Spread a run by +/- ``jitter`` (a fraction) so scrapers don't align."""
+    if jitter is None:
+        jitter = get_scheduler_setting('SCRAPER_SCHEDULE_JITTER', 0.1)
+    return timedelta(minutes=minutes * (1 + rng.uniform(-jitter, jitter)))
+
+
+def record_run(scraper, events=None, failed=False, now=None, rng=random):
+    """
+    Update a scraper's rates and reschedule it after a run.
+
+    A failed run backs off and leaves the change rate untouched; otherwise
+    the change rate moves towards 1 when the events differ from the previous
+    run and towards 0 when they don't. A run that finds no events, like a
+    venue with a quiet month, counts as unchanged rather than failed, and the
+    previous events stay the baseline for the next run.
+    """
+    now = now or timezone.now()
+    events = events or []
+
+    scraper.failure_rate += EWMA_ALPHA * ((1.0 if failed else 0.0) - scraper.failure_rate)
+    if failed:
+        scraper.consecutive_failures += 1
+        scraper.last_run_status = 'failed'
+    else:
+        fingerprint = events_fingerprint(events) if events else scraper.content_hash
+        changed = fingerprint != scraper.content_hash
+        scraper.change_rate += EWMA_ALPHA * ((1.0 if changed else 0.0) - scraper.change_rate)
+        scraper.content_hash = fingerprint
+        scraper.consecutive_failures = 0
+        if not events:
+            scraper.last_run_status = 'empty'
+        else:
+            scraper.last_run_status = 'changed' if changed else 'unchanged'
+
+    scraper.poll_interval = compute_poll_interval(
+        scraper.change_rate, scraper.failure_rate, scraper.consecutive_failures
+    )
+    scraper.last_run_at = now
+    scraper.next_run_at = now + apply_jitter(scraper.poll_interval, rng=rng)
+    scraper.save(update_fields=[
+        'failure_rate', 'change_rate', 'consecutive_failures', 'content_hash',
+        'last_run_status', 'poll_interval', 'last_run_at', 'next_run_at',
+    ])
+    return scraper
+
+
+def get_due_scrapers(now=None, limit=None):
+    """Return active scrapers that are due, never-run scrapers first."""
+    from ..models import SiteScraper
+
+    now = now or timezone.now()
+    if limit is None:
+        limit = get_scheduler_setting('SCRAPER_SCHEDULE_BATCH_SIZE', 20)
+
+    scrapers = SiteScraper.objects.filter(is_active=True).filter(
+        Q(next_run_at__isnull=True) | Q(next_run_at__lte=now)
+    ).order_by(F('next_run_at').asc(nulls_first=True), 'pk')
+    return list(scrapers[:limit])
+
+
+class DomainThrottle:
+    """
+    Per-domain politeness for concurrent scraping.
+
+    At most ``concurrency`` runs hit the same domain at once, and consecutive
+    runs against a domain start at least ``delay`` seconds apart.
+    """
+
+    def __init__(self, concurrency=None, delay=None, clock=time.monotonic):
+        if concurrency is None:
+            concurrency = get_scheduler_setting('SCRAPER_PER_DOMAIN_CONCURRENCY', 1)
+        if delay is None:
+            delay = get_scheduler_setting('SCRAPER_PER_DOMAIN_DELAY', 5.0)
+        self.concurrency = concurrency
+        self.delay = delay
+        self.clock = clock
+        self._semaphores = {}
+        self._locks = {}
+        self._last_start = {}
+
+    @asynccontextmanager
+    async def slot(self, url):
+        domain = get_domain(url)
+        semaphore = self._semaphores.setdefault(domain, asyncio.Semaphore(self.concurrency))
+        lock = self._locks.setdefault(domain, asyncio.Lock())
+        async with semaphore:
+            async with lock:
+                last_start = self._last_start.get(domain)
+                if last_start is not None:
+                    wait = last_start + self.delay - self.clock()
+                    if wait > 0:
+                        await asyncio.sleep(wait)
+                self._last_start[domain] = self.clock()
+            yield
+
+
+async def import_with_site_scraper(scraper):
+    """Default runner: import the scraper's events and report the outcome."""
+    from ..views import import_events_async, get_job_status
+
+    job_id = f'scheduled_{scraper.pk}_{time.time()}'
+    await import_events_async(scraper.pk, job_id, scraper.user_id)
+    status = get_job_status(job_id) or {}
+    return {
+        'events': status.get('events', []),
+        'failed': status.get('status') != 'completed',
+    }
+
+
+async def run_due_scrapers(now=None, limit=None, max_concurrency=None, throttle=None, runner=None):
+    """
+    Run every due scraper once and reschedule it.
+
+    Returns a list of ``(scraper_id, last_run_status)`` tuples.
+    """
+    if max_concurrency is None:
+        max_concurrency = get_scheduler_setting('SCRAPER_MAX_CONCURRENCY', 4)
+    throttle = throttle or DomainThrottle()
+    runner = runner or import_with_site_scraper
+
+    scrapers = await sync_to_async(get_due_scrapers, thread_sensitive=False)(now, limit)
+    if not scrapers:
+        return []
+
+    logger.info(f"Running {len(scrapers)} due site scrapers")
+    global_semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def run_one(scraper):
+        # Wait for the domain slot first so a throttled domain doesn't hold a global slot
+        async with throttle.slot(scraper.url):
+            async with global_semaphore:
+                try:
+                    outcome = await runner(scraper)
+                except Exception as e:
+                    logger.error(f"Scheduled run of scraper {scraper.pk} failed: {str(e)}")
+                    outcome = {'events': [], 'failed': True}
+        await sync_to_async(record_run, thread_sensitive=False)(
+            scraper, outcome.get('events'), outcome.get('failed', False)
+        )
+        logger.info(
+            f"Scraper {scraper.pk} ({scraper.url}): {scraper.last_run_status}, "
+            f"next run in {scraper.poll_interval} minutes"
+        )
+        return scraper.pk, scraper.last_run_status
+
+    return await asyncio.gather(*(run_one(scraper) for scraper in scrapers))
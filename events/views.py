@@ -1,13 +1,13 @@
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.http import JsonResponse, HttpResponse
+from django.http import FileResponse, Http404, JsonResponse, HttpResponse, HttpResponseNotFound, StreamingHttpResponse
 from .models import Event, SiteScraper
 from .forms import EventForm, SiteScraperForm
-from .scrapers.generic_crawl4ai import scrape_events as scrape_crawl4ai_events
+from . import scrapers
 from .scrapers.ical_scraper import ICalScraper
 from .utils.spotify import SpotifyAPI
-import io
+from .utils import bulk_import, dedup, discovery, enrichment, ical_generator, image_proxy, job_logs, metrics, music
 import logging
 import json
 from threading import Thread
@@ -15,29 +15,26 @@ import time
 from requests.exceptions import HTTPError, RequestException
 import traceback
 import asyncio
-from icalendar import Calendar, Event as ICalEvent
 from asgiref.sync import sync_to_async, async_to_sync
 from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.utils.cache import patch_cache_control, patch_vary_headers
 import pickle
 from threading import Lock
 from django.urls import reverse
-import re
 from django.db import models
 from django.utils import timezone
+from django.core.paginator import Paginator
+from django.conf import settings
 
-# Create a string buffer to capture log output
-log_stream = io.StringIO()
-# Create a handler that writes to the string buffer
-stream_handler = logging.StreamHandler(log_stream)
-stream_handler.setLevel(logging.DEBUG)
-# Add the handler to the logger
-logger = logging.getLogger('events.scrapers.generic_scraper')
-logger.addHandler(stream_handler)
+logger = logging.getLogger(__name__)
 
 # Async helper functions with thread_sensitive=False for better connection handling
 save_event = sync_to_async(lambda event: event.save(), thread_sensitive=False)
 get_event = sync_to_async(get_object_or_404, thread_sensitive=False)
 filter_events = sync_to_async(lambda **kwargs: list(Event.objects.filter(**kwargs)), thread_sensitive=False)
+build_event_index = sync_to_async(dedup.EventIndex.for_user, thread_sensitive=False)
+save_deduplicated = sync_to_async(dedup.save_deduplicated, thread_sensitive=False)
 
 class TimedLock:
     """A lock that automatically releases after a timeout period"""
@@ -75,7 +72,10 @@ def get_job_status(job_id):
     return pickle.loads(status) if status else None
 
 def set_job_status(job_id, status):
-    """Set job status in Redis cache"""
+    """Set job status in Redis cache, with the job's captured log when called from the job"""
+    log = job_logs.captured_log(job_id)
+    if log is not None:
+        status = {**status, 'log': log}
     cache.set(f'scraping_job_{job_id}', pickle.dumps(status), timeout=3600)  # 1 hour timeout
 
 @login_required
@@ -115,6 +115,58 @@ def event_list(request):
         'search_query': search_query
     })
 
+def discover(request):
+    """Upcoming public events from every public calendar, read from the cached timeline."""
+    page = Paginator(discovery.upcoming_entries(), getattr(settings, 'DISCOVERY_PAGE_SIZE', 20)).get_page(
+        request.GET.get('page')
+    )
+    return render(request, 'events/discover.html', {'page_obj': page, 'entries': page.object_list})
+
+def event_image(request, pk, key, width):
+    """
+    A thumbnail of an event's image, for the event's owner or, if the event
+    is public, anyone. The URL names the image by the hash of its source URL,
+    so a thumbnail never changes and is cached for a year. Until it's ready
+    the endpoint answers an uncached 404 and the page's <img> falls back to
+    the original.
+    """
+    if width not in image_proxy.widths():
+        raise Http404
+    event = Event.objects.filter(pk=pk).only('user_id', 'is_public', 'image_url').first()
+    if event is None or not (event.is_public or event.user_id == request.user.pk):
+        raise Http404
+    image = image_proxy.lookup(event, key)
+    if image is None:
+        raise Http404
+
+    if image.status != image.READY:
+        image_proxy.schedule([image.source_url])
+        return image_not_ready()
+
+    extension = image_proxy.negotiate(request.headers.get('Accept', ''))
+    name = image_proxy.thumbnail_name(image.digest, width, extension)
+    try:
+        file = default_storage.open(name)
+    except FileNotFoundError:
+        # Evicted or lost from storage since the row was read
+        image.status = image.PENDING
+        image.save(update_fields=['status'])
+        image_proxy.schedule([image.source_url])
+        return image_not_ready()
+    image_proxy.touch(image)
+    response = FileResponse(file, content_type=image_proxy.FORMATS[extension][1])
+    response['ETag'] = f'"{image.digest[:16]}-{width}-{extension}"'
+    visibility = {'public': True} if event.is_public else {'private': True}
+    patch_cache_control(response, max_age=365 * 24 * 3600, immutable=True, **visibility)
+    patch_vary_headers(response, ['Accept'])
+    return response
+
+def image_not_ready():
+    """A 404 for a thumbnail that isn't ready yet, which nothing may cache."""
+    response = HttpResponseNotFound()
+    patch_cache_control(response, no_store=True)
+    return response
+
 @login_required
 def event_create(request):
     if request.method == 'POST':
@@ -142,6 +194,16 @@ def event_detail(request, pk):
     event = get_object_or_404(Event, pk=pk, user=request.user)
     return render(request, 'events/detail.html', {'event': event})
 
+@login_required
+def event_enrichment(request, pk):
+    """The Spotify data of an event, which the detail page polls for while it's pending."""
+    event = get_object_or_404(Event, pk=pk, user=request.user)
+    return JsonResponse({
+        'status': event.enrichment_status,
+        'spotify_track_id': event.spotify_track_id,
+        'spotify_artist_name': event.spotify_artist_name,
+    })
+
 @login_required
 def event_edit(request, pk):
     event = get_object_or_404(Event, pk=pk, user=request.user)
@@ -178,6 +240,49 @@ def event_import_status(request, job_id):
     # Return the job status
     return JsonResponse(status)
 
+@login_required
+def event_bulk_import(request):
+    """
+    Start importing events from many sources under one parent job.
+
+    Takes ``urls`` (one per line, or a JSON list) and/or an uploaded
+    ``sources`` file (a URL list, CSV or OPML). Progress of the parent and
+    of each child job is polled through ``import_status``.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'status': 'error', 'message': 'POST required'}, status=405)
+
+    try:
+        if request.content_type == 'application/json':
+            urls = json.loads(request.body or b'{}').get('urls', [])
+            text = '\n'.join(url for url in urls if isinstance(url, str))
+        else:
+            text = request.POST.get('urls', '')
+            upload = request.FILES.get('sources')
+            if upload:
+                text += '\n' + upload.read().decode('utf-8', errors='replace')
+        urls = bulk_import.parse_sources(text)
+    except (ValueError, AttributeError) as e:
+        return JsonResponse({'status': 'error', 'message': f'Could not read sources: {e}'}, status=400)
+
+    if not urls:
+        return JsonResponse({'status': 'error', 'message': 'No http(s) or webcal URLs found'}, status=400)
+    max_urls = getattr(settings, 'BULK_IMPORT_MAX_URLS', 200)
+    if len(urls) > max_urls:
+        return JsonResponse({'status': 'error', 'message': f'At most {max_urls} URLs per bulk import'}, status=400)
+
+    job = bulk_import.BulkImport(bulk_import.new_job_id(), urls, request.user)
+    job.publish()
+    thread = Thread(target=run_async_in_thread, args=(bulk_import_async, job.job_id, urls, request.user))
+    thread.start()
+
+    return JsonResponse({
+        'status': 'started',
+        'job_id': job.job_id,
+        'children': [{'job_id': child['job_id'], 'url': child['url']} for child in job.children],
+        'message': f'Importing {len(urls)} sources'
+    })
+
 def run_async_in_thread(coroutine, *args, **kwargs):
     """Helper function to run async code in a thread."""
     from django.db import connections
@@ -195,6 +300,7 @@ def run_async_in_thread(coroutine, *args, **kwargs):
 def event_import(request):
     return async_to_sync(_event_import)(request)
 
+@discovery.batched
 async def _event_import(request):
     # Get the user's site scrapers for the template
     site_scrapers = await sync_to_async(list)(SiteScraper.objects.filter(user=request.user, is_active=True))
@@ -211,7 +317,7 @@ async def _event_import(request):
         if not source_url:
             messages.error(request, 'Source URL is required')
             return HttpResponse('Source URL is required', status=400)
-        if scraper_type not in ['crawl4ai', 'ical']:
+        if scraper_type not in scrapers.SCRAPERS:
             messages.error(request, 'Invalid scraper type')
             return HttpResponse('Invalid scraper type', status=400)
 
@@ -261,35 +367,19 @@ async def _event_import(request):
                         processed_events = []
                         updated_count = 0
                         created_count = 0
+                        event_index = await build_event_index(request.user, events)
                         
-                        for event_data in events:
+                        for event_data, classification in zip(events, music.classify_events(events)):
                             try:
-                                # Add Spotify track if it's a music event
-                                event_data = await add_spotify_track_to_event(event_data)
+                                # Music events are saved pending and looked up on Spotify afterwards
+                                event_data = enrichment.mark(event_data, classification)
                                 
-                                # Check for existing event
-                                existing = await filter_events(
-                                    user=request.user,
-                                    title=event_data.get('title'),
-                                    start_time=event_data.get('start_time')
-                                )
-                                existing = existing[0] if existing else None
-                                
-                                if existing:
-                                    # Update existing event
-                                    for field, value in event_data.items():
-                                        if hasattr(existing, field):
-                                            setattr(existing, field, value)
-                                    await save_event(existing)
-                                    updated_count += 1
-                                else:
-                                    # Create new event
-                                    event = Event(user=request.user)
-                                    for field, value in event_data.items():
-                                        if hasattr(event, field):
-                                            setattr(event, field, value)
-                                    await save_event(event)
+                                # Merge into a duplicate from any source, or create the event
+                                event, created = await save_deduplicated(event_index, request.user, event_data)
+                                if created:
                                     created_count += 1
+                                else:
+                                    updated_count += 1
                                 
                                 processed_events.append(event_data)
                             except Exception as e:
@@ -332,35 +422,19 @@ async def _event_import(request):
                     processed_events = []
                     updated_count = 0
                     created_count = 0
+                    event_index = await build_event_index(request.user, events)
                     
-                    for event_data in events:
+                    for event_data, classification in zip(events, music.classify_events(events)):
                         try:
-                            # Add Spotify track if it's a music event
-                            event_data = await add_spotify_track_to_event(event_data)
-                            
-                            # Check for existing event
-                            existing = await filter_events(
-                                user=request.user,
-                                title=event_data.get('title'),
-                                start_time=event_data.get('start_time')
-                            )
-                            existing = existing[0] if existing else None
+                            # Music events are saved pending and looked up on Spotify afterwards
+                            event_data = enrichment.mark(event_data, classification)
                             
-                            if existing:
-                                # Update existing event
-                                for field, value in event_data.items():
-                                    if hasattr(existing, field):
-                                        setattr(existing, field, value)
-                                await save_event(existing)
-                                updated_count += 1
-                            else:
-                                # Create new event
-                                event = Event(user=request.user)
-                                for field, value in event_data.items():
-                                    if hasattr(event, field):
-                                        setattr(event, field, value)
-                                await save_event(event)
+                            # Merge into a duplicate from any source, or create the event
+                            event, created = await save_deduplicated(event_index, request.user, event_data)
+                            if created:
                                 created_count += 1
+                            else:
+                                updated_count += 1
                             
                             processed_events.append(event_data)
                         except Exception as e:
@@ -397,78 +471,32 @@ async def _event_import(request):
 
 @login_required
 def event_export(request):
-    # Get all events for the user
+    """Download all of the user's events as one .ics file, streamed however many there are."""
     events = Event.objects.filter(user=request.user)
-    
-    # Create the calendar
-    cal = Calendar()
-    cal.add('prodid', '-//SocialCal//Event Calendar//EN')
-    cal.add('version', '2.0')
-    
-    # Add events to the calendar
-    for event in events:
-        cal_event = ICalEvent()
-        cal_event.add('summary', event.title)
-        cal_event.add('description', event.description)
-        cal_event.add('dtstart', event.start_time)
-        cal_event.add('dtend', event.end_time)
-        cal_event.add('location', event.get_full_address())
-        cal.add_component(cal_event)
-    
-    # Create the response
-    response = HttpResponse(content_type='text/calendar')
+    response = StreamingHttpResponse(ical_generator.for_request(request).stream(events), content_type='text/calendar')
     response['Content-Disposition'] = 'attachment; filename="events.ics"'
-    response.write(cal.to_ical())
     return response
 
 def is_music_event(event_data):
     """Check if an event is likely a music event based on its data."""
-    music_keywords = {
-        'concert', 'live music', 'band', 'performance', 'gig', 'show',
-        'musician', 'singer', 'performer', 'dj', 'jazz', 'rock', 'blues',
-        'hip hop', 'rap', 'electronic', 'classical', 'orchestra', 'ensemble',
-        'quartet', 'trio', 'recital', 'festival'
-    }
-    
-    # Check title and description for music-related keywords
-    text_to_check = f"{event_data.get('title', '')} {event_data.get('description', '')}".lower()
-    return any(keyword in text_to_check for keyword in music_keywords)
+    return music.classify(event_data).is_music
 
 def get_artist_from_event(event_data):
     """Extract potential artist name from event data."""
-    title = event_data.get('title', '')
-    
-    # Common patterns in music event titles
-    patterns = [
-        # Full ensemble/band name patterns
-        r"^([\w\s]+(?:Orchestra|Band|Ensemble|Quartet|Trio|Quintet|Sextet|Septet|Octet|Group|Seven))\s*(?:[-–]\s*|:|$)",
-        r"^([\w\s]+(?:Orchestra|Band|Ensemble|Quartet|Trio|Quintet|Sextet|Septet|Octet|Group|Seven))\s+(?:presents|performs|in|at)",
-        # Artist with location/venue
-        r"^(.+?)\s+(?:live at|at|@)",
-        # Artist after presenting words
-        r"(?:presents|featuring|feat\.|ft\.|with)\s+(.+?)(?:\s+at|\s+in|\s*$)",
-        # Artist before event type
-        r"^(.+?)\s+(?:in concert|concert|performance|show|gig)",
-        # Artist with descriptive text
-        r"^(.+?),\s*(?:live|in concert|performing)"
-    ]
-    
-    for pattern in patterns:
-        match = re.search(pattern, title, re.IGNORECASE)
-        if match:
-            return match.group(1).strip()
-    
-    # If no patterns match, return the first part of the title before any common separators
-    separators = [' at ', ' in ', ' with ', ' - ', ' @ ', ' presents ', ': ']
-    for separator in separators:
-        if separator.lower() in title.lower():
-            return title.split(separator)[0].strip()
-    
-    # If still no match, return the whole title
-    return title.strip()
+    return music.extract_artist(event_data.get('title', ''))
+
+@metrics.span('spotify')
+def add_spotify_track_to_event(event_data, classification=None):
+    """
+    Search for and add a Spotify track to the event data if it's a music event.
+
+    Imports no longer call this; they leave the search to events.utils.enrichment.
 
-def add_spotify_track_to_event(event_data):
-    """Search for and add a Spotify track to the event data if it's a music event."""
+    ``classification`` is the event's entry from ``music.classify_events``
+    when the whole import was scored at once.
+    """
+    if classification is None:
+        classification = music.classify(event_data)
     # Initialize Spotify fields with empty values
     spotify_defaults = {
         'spotify_track_id': '',
@@ -481,7 +509,7 @@ def add_spotify_track_to_event(event_data):
     }
     event_data.update(spotify_defaults)
     
-    if not is_music_event(event_data):
+    if not classification.is_music:
         return event_data
         
     # Check if we already have Spotify data
@@ -503,7 +531,7 @@ def add_spotify_track_to_event(event_data):
             })
             return event_data
         
-    artist = get_artist_from_event(event_data)
+    artist = classification.artist
     if not artist:
         return event_data
         
@@ -513,15 +541,7 @@ def add_spotify_track_to_event(event_data):
         if tracks and len(tracks) > 0:
             # Use the first track that matches
             track = tracks[0]
-            event_data.update({
-                'spotify_track_id': track['id'],
-                'spotify_track_name': track['name'],
-                'spotify_artist_id': track.get('artist_id', ''),
-                'spotify_artist_name': track['artist'],
-                'spotify_artist_id': track['artist_id'],
-                'spotify_preview_url': track['preview_url'] or '',
-                'spotify_external_url': track['external_url']
-            })
+            event_data.update(enrichment.track_fields(track))
             
             # Cache the results in the session if available
             if 'session' in event_data and isinstance(event_data['session'], dict):
@@ -540,7 +560,30 @@ def add_spotify_track_to_event(event_data):
     
     return event_data
 
+async def scrape_crawl4ai_events(source_url):
+    """Scrape a page with crawl4ai, which is imported the first time this runs."""
+    return await scrapers.get('crawl4ai')(source_url)
+
+async def fetch_ical_events(source_url):
+    """Fetch and parse an iCal feed, or the feeds a page links to, without blocking the event loop."""
+    scraper = ICalScraper()
+    return await sync_to_async(scraper.process_events, thread_sensitive=False)(source_url)
+
+@job_logs.capture_job_logs
 async def scrape_crawl4ai_events_async(source_url, job_id, user):
+    await run_scrape_job(scrape_crawl4ai_events, source_url, job_id, user)
+
+@job_logs.capture_job_logs
+async def scrape_ical_events_async(source_url, job_id, user):
+    await run_scrape_job(fetch_ical_events, source_url, job_id, user)
+
+@job_logs.capture_job_logs
+async def bulk_import_async(job_id, urls, user):
+    return await bulk_import.run_bulk_import(job_id, urls, user)
+
+@discovery.batched
+async def run_scrape_job(scrape, source_url, job_id, user):
+    """Scrape ``source_url`` with ``scrape`` and save the events, reporting progress on ``job_id``."""
     loop = None
     try:
         # Initialize status with progress tracking
@@ -565,7 +608,7 @@ async def scrape_crawl4ai_events_async(source_url, job_id, user):
         })
 
         # Start scraping
-        events = await scrape_crawl4ai_events(source_url)
+        events = await scrape(source_url)
         
         # Update progress after scraping
         set_job_status(job_id, {
@@ -590,9 +633,11 @@ async def scrape_crawl4ai_events_async(source_url, job_id, user):
         processed_events = []
         updated_count = 0
         created_count = 0
+        event_index = await build_event_index(user, events)
         
         total_events = len(events)
-        for index, event_data in enumerate(events, 1):
+        classifications = music.classify_events(events)
+        for index, (event_data, classification) in enumerate(zip(events, classifications), 1):
             try:
                 # Calculate progress
                 processing_progress = int((index / total_events) * 100)
@@ -618,32 +663,15 @@ async def scrape_crawl4ai_events_async(source_url, job_id, user):
                     'events': processed_events
                 })
                 
-                # Add Spotify track if it's a music event
-                event_data = add_spotify_track_to_event(event_data)
-                
-                # Check for existing event
-                existing = await filter_events(
-                    user=user,
-                    title=event_data.get('title'),
-                    start_time=event_data.get('start_time')
-                )
-                existing = existing[0] if existing else None
+                # Music events are saved pending and looked up on Spotify afterwards
+                event_data = enrichment.mark(event_data, classification)
                 
-                if existing:
-                    # Update existing event
-                    for field, value in event_data.items():
-                        if hasattr(existing, field):
-                            setattr(existing, field, value)
-                    await save_event(existing)
-                    updated_count += 1
-                else:
-                    # Create new event
-                    event = Event(user=user)
-                    for field, value in event_data.items():
-                        if hasattr(event, field):
-                            setattr(event, field, value)
-                    await save_event(event)
+                # Merge into a duplicate from any source, or create the event
+                event, created = await save_deduplicated(event_index, user, event_data)
+                if created:
                     created_count += 1
+                else:
+                    updated_count += 1
                 
                 processed_events.append(event_data)
             except Exception as e:
@@ -685,8 +713,7 @@ async def scrape_crawl4ai_events_async(source_url, job_id, user):
             'status_message': {
                 'scraping': 'Error occurred during scraping',
                 'processing': 'Process stopped due to error'
-            },
-            'log': log_stream.getvalue()
+            }
         }
         set_job_status(job_id, error_status)
     finally:
@@ -710,17 +737,6 @@ def spotify_search(request):
 
 def export_ical(request, events=None):
     """Export events as iCalendar feed."""
-    # Create calendar
-    cal = Calendar()
-    cal.add('prodid', '-//SocialCal//EN')
-    cal.add('version', '2.0')
-    cal.add('calscale', 'GREGORIAN')
-    cal.add('method', 'PUBLISH')  # Add method for better compatibility
-    
-    # Add timezone information
-    tz = timezone.get_current_timezone()
-    cal.add('x-wr-timezone', str(tz))
-    
     # Get user_id from request parameters
     user_id = request.GET.get('user_id')
     
@@ -741,58 +757,14 @@ def export_ical(request, events=None):
         if user_id:
             # Get all events for the specified user
             events = Event.objects.filter(user_id=user_id)
+        elif request.user.is_authenticated:
+            events = Event.objects.filter(user=request.user)
         else:
-            # Fall back to public events only
-            events = Event.objects.filter(is_public=True)
-    
-    # Add events to calendar
-    for event in events:
-        cal_event = ICalEvent()
-        cal_event.add('summary', event.title)
-        cal_event.add('description', event.description)
-        
-        # Add start time (required)
-        cal_event.add('dtstart', event.start_time)
-        
-        # Add end time (if not set, default to 1 hour after start)
-        if event.end_time:
-            cal_event.add('dtend', event.end_time)
-        else:
-            cal_event.add('dtend', event.start_time + timezone.timedelta(hours=1))
-        
-        # Add location if available
-        location_parts = []
-        if event.venue_name:
-            location_parts.append(event.venue_name)
-        if event.venue_address:
-            location_parts.append(event.venue_address)
-        if event.venue_city:
-            location_parts.append(event.venue_city)
-        if event.venue_state:
-            location_parts.append(event.venue_state)
-        if event.venue_postal_code:
-            location_parts.append(event.venue_postal_code)
-        if location_parts:
-            location_parts.append('United States')  # Add country
-            location = ', '.join(location_parts)
-            cal_event.add('location', location)
-        
-        # Add URL to event detail page
-        cal_event.add('url', request.build_absolute_uri(event.get_absolute_url()))
-        
-        # Add creation timestamp
-        cal_event.add('dtstamp', timezone.now())
-        
-        # Add unique identifier
-        cal_event.add('uid', f'{event.id}@{request.get_host()}')
-        
-        # Add status
-        cal_event.add('status', 'CONFIRMED')
-        
-        cal.add_component(cal_event)
+            # Fall back to the upcoming public events of the discovery feed
+            event_ids = [entry['id'] for entry in discovery.upcoming_entries()]
+            events = Event.objects.filter(id__in=event_ids).order_by('start_time')
     
-    # Return calendar as response
-    response = HttpResponse(cal.to_ical(), content_type='text/calendar')
+    response = HttpResponse(ical_generator.for_request(request).generate(events), content_type='text/calendar')
     filename = f"event_{event_id}.ics" if event_id else "events.ics"
     response['Content-Disposition'] = f'attachment; filename={filename}'
     
@@ -806,6 +778,31 @@ def export_ical(request, events=None):
     
     return response
 
+def can_read_metrics(request):
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    if token and request.headers.get('Authorization') == f'Bearer {token}':
+        return True
+    return request.user.is_authenticated and request.user.is_staff
+
+def metrics_export(request):
+    """Request and scraper metrics in the Prometheus text format."""
+    if not metrics.enabled():
+        return HttpResponse(status=404)
+    if not can_read_metrics(request):
+        return HttpResponse(status=403)
+    return HttpResponse(metrics.REGISTRY.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+def metrics_profile(request):
+    """Folded stacks from the sampling profiler, for flame graphs. ?reset=1 clears them."""
+    if not metrics.enabled():
+        return HttpResponse(status=404)
+    if not can_read_metrics(request):
+        return HttpResponse(status=403)
+    response = HttpResponse(metrics.SamplingProfiler.folded(), content_type='text/plain; charset=utf-8')
+    if request.GET.get('reset'):
+        metrics.SamplingProfiler.reset()
+    return response
+
 # Site Scraper Views
 @login_required
 def scraper_list(request):
@@ -1030,6 +1027,7 @@ def scraper_regenerate_schema(request, pk):
     })
 
 # Async functions for site scraper operations
+@job_logs.capture_job_logs
 async def generate_schema_async(scraper_id, job_id):
     """Generate a CSS schema for a site scraper."""
     from .scrapers.site_scraper import generate_css_schema
@@ -1084,9 +1082,10 @@ async def generate_schema_async(scraper_id, job_id):
         logger.error(f"Error generating CSS schema: {str(e)}")
         logger.error(traceback.format_exc())
 
+@job_logs.capture_job_logs
 async def test_scraper_async(scraper_id, job_id):
     """Test a site scraper."""
-    from .scrapers.site_scraper import run_css_schema, generate_css_schema
+    from .scrapers.site_scraper import run_css_schema_for_scraper, generate_css_schema
     from .models import SiteScraper
     
     try:
@@ -1107,7 +1106,7 @@ async def test_scraper_async(scraper_id, job_id):
             'progress': 30
         })
         
-        events = await run_css_schema(scraper.url, scraper.css_schema)
+        events = await run_css_schema_for_scraper(scraper)
         
         # If no events were found, try to generate a new CSS schema
         if not events:
@@ -1117,8 +1116,8 @@ async def test_scraper_async(scraper_id, job_id):
                 'progress': 50
             })
             
-            # Generate a new CSS schema
-            new_css_schema = await generate_css_schema(scraper.url)
+            # Generate a new CSS schema, skipping the one that just failed
+            new_css_schema = await generate_css_schema(scraper.url, exclude_schemas=[scraper.css_schema])
             
             if new_css_schema:
                 # Update the scraper with the new CSS schema
@@ -1130,7 +1129,7 @@ async def test_scraper_async(scraper_id, job_id):
                 })
                 
                 # Test the new CSS schema
-                events = await run_css_schema(scraper.url, scraper.css_schema)
+                events = await run_css_schema_for_scraper(scraper)
         
         # Update the scraper with the test results
         scraper.last_tested = timezone.now()
@@ -1158,12 +1157,13 @@ async def test_scraper_async(scraper_id, job_id):
         logger.error(f"Error testing scraper: {str(e)}")
         logger.error(traceback.format_exc())
 
+@job_logs.capture_job_logs
+@discovery.batched
 async def import_events_async(scraper_id, job_id, user_id):
     """Import events from a site scraper."""
-    from .scrapers.site_scraper import run_css_schema
-    from .models import SiteScraper, Event
+    from .scrapers.site_scraper import run_css_schema_for_scraper
+    from .models import SiteScraper
     from django.contrib.auth import get_user_model
-    from .utils.time_parser import format_event_datetime
     from django.db import connections, close_old_connections
     import logging
     
@@ -1206,7 +1206,7 @@ async def import_events_async(scraper_id, job_id, user_id):
             }
         })
         
-        events = await run_css_schema(scraper.url, scraper.css_schema)
+        events = await run_css_schema_for_scraper(scraper)
         
         # Update status with found events count
         current_status = get_job_status(job_id)
@@ -1235,6 +1235,7 @@ async def import_events_async(scraper_id, job_id, user_id):
         skipped_count = 0
         error_details = []
         processed_events = []
+        event_index = await build_event_index(user, events)
         
         for index, event_data in enumerate(events):
             try:
@@ -1261,25 +1262,9 @@ async def import_events_async(scraper_id, job_id, user_id):
                 # Log the event data for debugging
                 logger.info(f"Processing event: {event_data}")
                 
-                # Format date and time
-                start_datetime = None
-                end_datetime = None
-                
-                try:
-                    # Special handling for "All Day" events
-                    if event_data.get('start_time', '').lower() == 'all day':
-                        logger.info(f"Detected 'All Day' event: {event_data.get('title')}")
-                        # Let format_event_datetime handle the "All Day" conversion
-                    
-                    start_datetime, end_datetime = format_event_datetime(
-                        event_data.get('date', ''),
-                        event_data.get('start_time', ''),
-                        event_data.get('end_time', '')
-                    )
-                except Exception as e:
-                    error_msg = f"Error parsing date/time for event '{event_data.get('title')}': {str(e)}"
-                    logger.error(error_msg)
-                    error_details.append(error_msg)
+                # normalize_event_rows has already parsed each distinct date and time once
+                start_datetime = event_data.get('start_datetime')
+                end_datetime = event_data.get('end_datetime')
                 
                 if not start_datetime:
                     error_msg = f"Skipping event '{event_data.get('title')}': Could not parse date/time"
@@ -1288,51 +1273,22 @@ async def import_events_async(scraper_id, job_id, user_id):
                     skipped_count += 1
                     continue
                 
-                # Check if event already exists (by URL or title and start time)
-                existing_event = None
-                if event_data.get('url'):
-                    existing_events = await filter_events(user=user, url=event_data.get('url'))
-                    if existing_events:
-                        existing_event = existing_events[0]
-                
-                if not existing_event and event_data.get('title') and start_datetime:
-                    existing_events = await filter_events(
-                        user=user,
-                        title=event_data.get('title'),
-                        start_time=start_datetime
-                    )
-                    if existing_events:
-                        existing_event = existing_events[0]
-                
-                # Create or update the event
-                if existing_event:
-                    # Update existing event
-                    event = existing_event
-                    event.title = event_data.get('title', event.title)
-                    event.description = event_data.get('description', event.description)
-                    event.start_time = start_datetime
-                    event.end_time = end_datetime
-                    event.venue_name = event_data.get('location', event.venue_name)
-                    event.url = event_data.get('url', event.url)
-                    event.image_url = event_data.get('image_url', event.image_url)
-                    await save_event(event)
-                    updated_count += 1
-                    logger.info(f"Updated event: {event.title}")
-                else:
-                    # Create new event
-                    event = Event(
-                        user=user,
-                        title=event_data.get('title', ''),
-                        description=event_data.get('description', ''),
-                        start_time=start_datetime,
-                        end_time=end_datetime,
-                        venue_name=event_data.get('location', ''),
-                        url=event_data.get('url', ''),
-                        image_url=event_data.get('image_url', '')
-                    )
-                    await save_event(event)
+                # Merge into an existing event from this or another source, or create it
+                event, created = await save_deduplicated(event_index, user, {
+                    'title': event_data.get('title', ''),
+                    'description': event_data.get('description', ''),
+                    'start_time': start_datetime,
+                    'end_time': end_datetime,
+                    'venue_name': event_data.get('location', ''),
+                    'url': event_data.get('url', ''),
+                    'image_url': event_data.get('image_url', ''),
+                })
+                if created:
                     imported_count += 1
                     logger.info(f"Created new event: {event.title}")
+                else:
+                    updated_count += 1
+                    logger.info(f"Updated event: {event.title}")
                 
                 # Add the processed event to the list
                 event_display = {
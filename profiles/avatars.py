@@ -0,0 +1,143 @@
+"""
+Avatar uploads and their resized variants.
+
+An uploaded avatar is re-encoded before it is stored, which drops its EXIF
+metadata (camera, location) after applying the EXIF orientation, and is
+named after the SHA-256 of the result. Square variants at AVATAR_SIZES are
+then rendered on a background thread, as WebP and JPEG, under
+``avatars/variants/<hash>/``. Their URLs change whenever the avatar does,
+so they can be cached for as long as a CDN or the web server likes.
+
+``Profile.avatar_hash`` is set once the variants exist; until then
+templates fall back to the avatar itself.
+"""
+import hashlib
+import io
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Tuple
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from PIL import Image, ImageOps
+
+from events.utils.image_proxy import FORMATS
+
+logger = logging.getLogger(__name__)
+
+VARIANT_PREFIX = 'avatars/variants'
+
+
+def sizes() -> Tuple[int, ...]:
+    return tuple(getattr(settings, 'AVATAR_SIZES', (160, 320, 640)))
+
+
+def variant_name(avatar_hash: str, size: int, extension: str) -> str:
+    return f'{VARIANT_PREFIX}/{avatar_hash}/{size}.{extension}'
+
+
+def variant_url(profile, size: int, extension: str = 'jpg') -> str:
+    """URL of the variant of ``profile``'s avatar closest above ``size``, or the avatar until they exist."""
+    if not profile.avatar:
+        return ''
+    if not profile.avatar_hash:
+        return profile.avatar.url
+    size = min((available for available in sizes() if available >= size), default=max(sizes()))
+    return default_storage.url(variant_name(profile.avatar_hash, size, extension))
+
+
+def strip_metadata(upload) -> ContentFile:
+    """
+    The upload re-encoded without metadata, no larger than AVATAR_MAX_DIMENSION,
+    and named by its content hash. Transparent images stay PNG; the rest become JPEG.
+    """
+    max_dimension = getattr(settings, 'AVATAR_MAX_DIMENSION', 1024)
+    upload.seek(0)
+    with Image.open(upload) as original:
+        image = ImageOps.exif_transpose(original)
+        image.thumbnail((max_dimension, max_dimension), Image.LANCZOS)
+        icc_profile = original.info.get('icc_profile')
+    output = io.BytesIO()
+    options = {'icc_profile': icc_profile} if icc_profile else {}
+    if image.mode in ('RGBA', 'LA', 'P') and image.has_transparency_data:
+        image.convert('RGBA').save(output, 'PNG', optimize=True, **options)
+        extension = 'png'
+    else:
+        image.convert('RGB').save(output, 'JPEG', quality=90, **options)
+        extension = 'jpg'
+    data = output.getvalue()
+    return ContentFile(data, name=f'{hashlib.sha256(data).hexdigest()}.{extension}')
+
+
+def render_variants(data: bytes) -> dict:
+    """Square crops of an avatar by (size, extension)."""
+    with Image.open(io.BytesIO(data)) as original:
+        original.draft('RGB', (max(sizes()), max(sizes())))
+        image = original.convert('RGBA')
+    # JPEG has no transparency, so variants get a white background
+    flat = Image.new('RGB', image.size, 'white')
+    flat.paste(image, mask=image.getchannel('A'))
+
+    variants = {}
+    for size in sizes():
+        square = ImageOps.fit(flat, (size, size), Image.LANCZOS)
+        for extension, (format_name, _, options) in FORMATS.items():
+            output = io.BytesIO()
+            square.save(output, format_name, **options)
+            variants[(size, extension)] = output.getvalue()
+    return variants
+
+
+def generate_variants(profile) -> str:
+    """Render and store the variants of ``profile``'s avatar and record their hash."""
+    from .models import Profile
+
+    name = profile.avatar.name
+    with default_storage.open(name) as avatar:
+        data = avatar.read()
+    avatar_hash = hashlib.sha256(data).hexdigest()
+    names = {key: variant_name(avatar_hash, *key) for key in ((size, extension)
+                                                               for size in sizes() for extension in FORMATS)}
+    if not all(default_storage.exists(variant) for variant in names.values()):
+        for key, content in render_variants(data).items():
+            if default_storage.exists(names[key]):
+                default_storage.delete(names[key])
+            default_storage.save(names[key], ContentFile(content))
+    # The avatar may have been replaced while this ran
+    Profile.objects.filter(pk=profile.pk, avatar=name).update(avatar_hash=avatar_hash)
+    return avatar_hash
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _generate_in_background(profile_id: int) -> None:
+    from .models import Profile
+
+    try:
+        profile = Profile.objects.filter(pk=profile_id).first()
+        if profile is not None and profile.avatar and not profile.avatar_hash:
+            generate_variants(profile)
+    except Exception:
+        logger.exception(f"Avatar variants for profile {profile_id} failed")
+    finally:
+        connection.close()
+
+
+def schedule_variants(profile) -> None:
+    """Render the variants of ``profile``'s avatar on a background thread once the transaction commits."""
+    if not getattr(settings, 'AVATAR_VARIANTS_ASYNC', True):
+        transaction.on_commit(lambda: generate_variants(profile))
+        return
+
+    def submit():
+        global _executor
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='avatars')
+            _executor.submit(_generate_in_background, profile.pk)
+    transaction.on_commit(submit)
@@ -1,7 +1,12 @@
+import logging
+
 from django.db import models
 from django.conf import settings
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, pre_save
 from django.dispatch import receiver
+from PIL import Image
+
+logger = logging.getLogger(__name__)
 
 class Profile(models.Model):
     user = models.OneToOneField(
@@ -14,11 +19,14 @@ class Profile(models.Model):
     location = models.CharField(max_length=100, blank=True)
     birth_date = models.DateField(null=True, blank=True)
     avatar = models.ImageField(upload_to='avatars/', blank=True)
+    # SHA-256 of the avatar the resized variants were made from (see profiles.avatars)
+    avatar_hash = models.CharField(max_length=64, blank=True)
     calendar_public = models.BooleanField(
         default=False,
         verbose_name="Make calendar public",
         help_text="If checked, other users can see your events. If unchecked, your events are private."
     )
+    updated_at = models.DateTimeField(auto_now=True)
     
     def __str__(self):
         full_name = f"{self.first_name} {self.last_name}".strip()
@@ -36,10 +44,27 @@ def create_user_profile(sender, instance, created, **kwargs):
         Profile.objects.create(user=instance)
 
 @receiver(post_save, sender=settings.AUTH_USER_MODEL)
-def save_user_profile(sender, instance, **kwargs):
-    try:
-        if not hasattr(instance, 'profile'):
-            Profile.objects.create(user=instance)
-        instance.profile.save()
-    except Profile.DoesNotExist:
-        Profile.objects.create(user=instance) 
\ No newline at end of file
+def save_user_profile(sender, instance, created, update_fields=None, **kwargs):
+    # Nothing on the profile comes from the user, so an existing profile is left
+    # alone; only users without one get it back. Partial saves such as the
+    # last_login update on every login skip the check.
+    if created or update_fields:
+        return
+    Profile.objects.get_or_create(user=instance)
+
+@receiver(pre_save, sender=Profile)
+def strip_avatar_metadata(sender, instance, **kwargs):
+    # A new upload hasn't been written to storage yet
+    if instance.avatar and not instance.avatar._committed:
+        from . import avatars
+        try:
+            instance.avatar = avatars.strip_metadata(instance.avatar.file)
+        except (OSError, ValueError, Image.DecompressionBombError):
+            logger.warning(f"Could not re-encode the avatar of profile {instance.pk}", exc_info=True)
+        instance.avatar_hash = ''
+
+@receiver(post_save, sender=Profile)
+def schedule_avatar_variants(sender, instance, **kwargs):
+    if instance.avatar and not instance.avatar_hash:
+        from . import avatars
+        avatars.schedule_variants(instance)
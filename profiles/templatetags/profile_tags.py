@@ -0,0 +1,9 @@
+from django import template
+from .. import avatars
+
+register = template.Library()
+
+@register.simple_tag
+def avatar_url(profile, size, extension='jpg'):
+    """URL of a square variant of the profile's avatar at least ``size`` pixels wide."""
+    return avatars.variant_url(profile, size, extension)
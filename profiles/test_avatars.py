@@ -0,0 +1,95 @@
+import hashlib
+import io
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.urls import reverse
+from PIL import Image
+from profiles import avatars
+from profiles.forms import ProfileForm
+
+User = get_user_model()
+
+
+def photo(width=1600, height=1200, orientation=None):
+    image = Image.new('RGB', (width, height), 'orange')
+    exif = Image.Exif()
+    exif[0x010F] = 'Phone Maker'  # Make
+    exif[0x8825] = {2: (42.0, 21.0, 0.0)}  # GPS latitude
+    if orientation:
+        exif[0x0112] = orientation
+    output = io.BytesIO()
+    image.save(output, 'JPEG', exif=exif)
+    return SimpleUploadedFile('IMG_0001.jpg', output.getvalue(), content_type='image/jpeg')
+
+
+@pytest.fixture
+def media(settings, tmp_path):
+    settings.MEDIA_ROOT = str(tmp_path)
+    return tmp_path
+
+
+@pytest.fixture
+def profile(db):
+    return User.objects.create_user(username='pic', email='pic@example.com', password='testpass123').profile
+
+
+@pytest.mark.django_db
+class TestAvatars:
+    def upload(self, profile, django_capture_on_commit_callbacks, upload):
+        form = ProfileForm(data={'first_name': 'Pic', 'calendar_public': True}, files={'avatar': upload},
+                           instance=profile)
+        assert form.is_valid(), form.errors
+        with django_capture_on_commit_callbacks(execute=True):
+            form.save()
+        profile.refresh_from_db()
+        return profile
+
+    def test_upload_drops_metadata_and_is_named_by_content(self, media, profile, django_capture_on_commit_callbacks):
+        profile = self.upload(profile, django_capture_on_commit_callbacks, photo(orientation=6))
+
+        with default_storage.open(profile.avatar.name) as stored:
+            data = stored.read()
+        with Image.open(io.BytesIO(data)) as image:
+            assert dict(image.getexif()) == {}
+            # Rotated by the EXIF orientation and scaled down to 1024
+            assert image.size == (768, 1024)
+        assert profile.avatar.name == f'avatars/{hashlib.sha256(data).hexdigest()}.jpg'
+
+    def test_variants_are_square_in_both_formats(self, media, profile, django_capture_on_commit_callbacks):
+        profile = self.upload(profile, django_capture_on_commit_callbacks, photo())
+
+        assert len(profile.avatar_hash) == 64
+        for size in avatars.sizes():
+            for extension, format_name in (('webp', 'WEBP'), ('jpg', 'JPEG')):
+                with default_storage.open(avatars.variant_name(profile.avatar_hash, size, extension)) as variant:
+                    with Image.open(variant) as image:
+                        assert (image.format, image.size) == (format_name, (size, size))
+
+    def test_variant_urls_fall_back_to_the_avatar_until_ready(self, media, profile):
+        profile.avatar = photo()
+        profile.save()
+
+        assert avatars.variant_url(profile, 320) == profile.avatar.url
+
+        avatars.generate_variants(profile)
+        profile.refresh_from_db()
+        assert avatars.variant_url(profile, 300, 'webp') == default_storage.url(
+            avatars.variant_name(profile.avatar_hash, 320, 'webp'))
+        assert avatars.variant_url(profile, 2000).endswith('/640.jpg')
+
+    def test_new_upload_replaces_the_variants(self, media, profile, django_capture_on_commit_callbacks):
+        first = self.upload(profile, django_capture_on_commit_callbacks, photo()).avatar_hash
+        second = self.upload(profile, django_capture_on_commit_callbacks, photo(800, 800)).avatar_hash
+
+        assert first != second
+
+    def test_directory_uses_the_small_variant(self, client, media, profile, django_capture_on_commit_callbacks):
+        profile = self.upload(profile, django_capture_on_commit_callbacks, photo())
+
+        content = client.get(reverse('profiles:list')).content.decode()
+
+        assert f'src="{avatars.variant_url(profile, 320)}"' in content
+        assert f'srcset="{avatars.variant_url(profile, 320, "webp")}"' in content
+        assert profile.avatar.url not in content
@@ -1,40 +1,48 @@
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth import get_user_model
+from django.conf import settings
+from django.core.paginator import Paginator
 from .models import Profile
 from .forms import ProfileForm
 from django.utils import timezone
 
 User = get_user_model()
 
+# Event fields the profile templates render
+EVENT_LIST_FIELDS = ('id', 'user', 'title', 'description', 'start_time', 'venue_name')
+CALENDAR_FIELDS = ('id', 'user', 'title', 'start_time', 'end_time', 'venue_name', 'venue_city', 'venue_state', 'is_public')
+
+
+def get_profile(email):
+    """The profile of the user with ``email``, with the user loaded in the same query."""
+    return get_object_or_404(Profile.objects.select_related('user'), user__email=email)
+
+
 def profile_list(request):
-    profiles = Profile.objects.select_related('user').all()
-    return render(request, 'profiles/list.html', {'profiles': profiles})
+    profiles = Profile.objects.select_related('user').order_by('user__email')
+    page = Paginator(profiles, getattr(settings, 'PROFILE_LIST_PAGE_SIZE', 24)).get_page(request.GET.get('page'))
+    return render(request, 'profiles/list.html', {'profiles': page.object_list, 'page_obj': page})
 
 def profile_detail(request, email):
-    user = get_object_or_404(User, email=email)
-    profile = get_object_or_404(Profile, user=user)
+    profile = get_profile(email)
+    user = profile.user
+    is_owner = request.user.is_authenticated and request.user == user
     
     # Show events if the profile owner is viewing or if calendar is public
     events = []
-    if (request.user.is_authenticated and request.user == user) or profile.calendar_public:
-        events = user.events.filter(
-            start_time__gte=timezone.now(),
-            is_public=True
-        ).order_by('start_time')
-        
-        # If user is the owner, also show private events
-        if request.user.is_authenticated and request.user == user:
-            private_events = user.events.filter(
-                start_time__gte=timezone.now(),
-                is_public=False
-            ).order_by('start_time')
-            events = list(events) + list(private_events)
+    if is_owner or profile.calendar_public:
+        events = user.events.filter(start_time__gte=timezone.now())
+        # Only the owner sees their private events
+        if not is_owner:
+            events = events.filter(is_public=True)
+        limit = getattr(settings, 'PROFILE_UPCOMING_EVENTS', 50)
+        events = events.only(*EVENT_LIST_FIELDS).order_by('start_time')[:limit]
     
     context = {
         'profile': profile,
         'events': events,
-        'can_view_events': (request.user.is_authenticated and request.user == user) or profile.calendar_public,
+        'can_view_events': is_owner or profile.calendar_public,
     }
     return render(request, 'profiles/detail.html', context)
 
@@ -55,12 +63,15 @@ def profile_edit(request, email):
 
 @login_required
 def profile_calendar(request, email):
-    user = get_object_or_404(User, email=email)
-    profile = get_object_or_404(Profile, user=user)
+    profile = get_profile(email)
+    user = profile.user
     
     # Only show calendar if the viewer is the owner or calendar is public
     if request.user != user and not profile.calendar_public:
         return redirect('profiles:detail', email=email)
     
-    events = user.events.all().order_by('start_time')
-    return render(request, 'profiles/calendar.html', {'events': events, 'profile': profile}) 
\ No newline at end of file
+    events = user.events.only(*CALENDAR_FIELDS).order_by('start_time')
+    if request.user != user:
+        events = events.filter(is_public=True)
+    page = Paginator(events, getattr(settings, 'PROFILE_CALENDAR_PAGE_SIZE', 50)).get_page(request.GET.get('page'))
+    return render(request, 'profiles/calendar.html', {'events': page.object_list, 'page_obj': page, 'profile': profile})
@@ -49,6 +49,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Removes itself unless METRICS_ENABLED is set
+    'events.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -123,11 +125,14 @@ SOCIALACCOUNT_PROVIDERS = {
             'email',
             'https://www.googleapis.com/auth/calendar'
         ],
+        # Calendar sync runs without the user, so it needs a refresh token
         'AUTH_PARAMS': {
-            'access_type': 'online',
+            'access_type': 'offline',
         }
     }
 }
+# events.utils.calendar_sync reads the Google tokens allauth stores
+SOCIALACCOUNT_STORE_TOKENS = True
 
 # django-allauth settings
 ACCOUNT_EMAIL_REQUIRED = True
@@ -152,4 +157,24 @@ ACCOUNT_ADAPTER = 'accounts.adapters.EmailAccountAdapter'
 # Login/Logout settings
 LOGIN_REDIRECT_URL = 'core:home'
 LOGOUT_REDIRECT_URL = 'core:home'
-LOGIN_URL = 'account_login' 
\ No newline at end of file
+LOGIN_URL = 'account_login' 
+
+# Request and scraper metrics, served in the Prometheus format at /events/metrics/
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'False') == 'True'
+# Bearer token Prometheus sends; staff users can always read the metrics
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+# Share of requests run under the sampling profiler (0 turns it off)
+METRICS_PROFILE_SAMPLE_RATE = float(os.environ.get('METRICS_PROFILE_SAMPLE_RATE', '0'))
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # Rendered event cards and detail fragments, with room for a long event
+    # list. Settings that replace CACHES without it use the default cache.
+    'template_fragments': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'template-fragments',
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+}
@@ -147,6 +147,8 @@ INSTALLED_APPS = [
 
 # Middleware configuration - ensure WhiteNoise is properly positioned
 MIDDLEWARE = [
+    # Removes itself unless METRICS_ENABLED is set
+    'events.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',  # Make sure this is right after SecurityMiddleware
     'django.contrib.sessions.middleware.SessionMiddleware',
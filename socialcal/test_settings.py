@@ -117,3 +117,22 @@ AUTHENTICATION_BACKENDS = [
     'django.contrib.auth.backends.ModelBackend',
     'allauth.account.auth_backends.AuthenticationBackend',
 ]
+
+# Tests fetch event images themselves, with the network mocked
+EVENT_IMAGE_PREFETCH = False
+
+# Render avatar variants when the saving transaction commits rather than on a thread
+AVATAR_VARIANTS_ASYNC = False
+
+# Tests drain the enrichment queue themselves, with Spotify mocked
+EVENT_ENRICHMENT_WORKER = False
+
+# Room for every card of the 500-event page the render benchmark renders
+CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'template_fragments': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'template-fragments',
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+}